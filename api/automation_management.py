@@ -15,9 +15,13 @@ import uuid
 from flask import current_app
 from werkzeug.utils import secure_filename
 from config.logger import log_error, log_info
+from config.ui_config import UIConfig
 from utils.image_upload_manager import image_upload_manager
 import re
 from utils.file_manager import file_manager
+from utils.fast_json import json_columns
+from utils.run_registry import run_registry, LocalRunTable
+from utils.metrics import execution_queue_seconds, execution_run_seconds
 from utils.auth_accounts import read_accounts, write_accounts
 from utils.auth_accounts import generate_unique_accounts_for_addresses, generate_unique_accounts_list_for_addresses
 from utils.auth_accounts import read_accounts_list, read_accounts_slots, read_product_address_slots, read_accounts_by_addresses, lookup_accounts_for_addresses
@@ -25,8 +29,8 @@ from utils.auth_accounts import lookup_accounts_for_addresses
 
 automation_bp = Blueprint('automation', __name__)
 
-# 全局变量存储正在执行的测试任务
-running_tests = {}
+# 本 worker 正在执行的测试任务（线程、进程句柄）；跨 worker 共享的运行状态见 utils/run_registry.py
+running_tests = LocalRunTable()
 attempt = 0
 
 
@@ -104,11 +108,14 @@ def clean_assertion_images():
         data = request.get_json()
         days = data.get('days', 30) if data else 30
         
-        image_upload_manager.clean_old_assertion_images(days)
+        # 由存储清理器按增量索引清理，项目中仍在引用的断言图不会被删除
+        from utils.storage_janitor import storage_janitor
+        report = storage_janitor.run(only=os.path.join('IMG_LOGS', 'IMA_ASSERT'), max_age_days=days)
         
         return jsonify({
             'success': True,
-            'message': f'成功清理超过{days}天的图片断言文件'
+            'message': f'成功清理超过{days}天的图片断言文件',
+            'data': {'deleted_count': report['deleted'], 'reclaimed_bytes': report['reclaimed_bytes']}
         })
         
     except Exception as e:
@@ -456,17 +463,17 @@ def get_automation_projects():
                     'id': row[0],
                     'project_id': row[1],
                     'process_name': row[2],
-                    'product_ids': json.loads(row[3]) if row[3] else [],
+                    'product_ids': json_columns.decode(row[3], [], ('automation_projects', 'product_ids', row[0], row[12])),
                     'system': row[4],
                     'product_type': row[5],
                     'environment': row[6],
                     'product_address': row[7],
-                    'test_steps': json.loads(row[8]) if row[8] else [],
+                    'test_steps': json_columns.decode(row[8], [], ('automation_projects', 'test_steps', row[0], row[12])),
                     'status': row[9],
                     'created_by': row[10],
                     'created_at': row[11],
                     'updated_at': row[12],
-                    'product_package_names': json.loads(row[13]) if row[13] else [],
+                    'product_package_names': json_columns.decode(row[13], [], ('automation_projects', 'product_package_names', row[0], row[12])),
                     'execution_count': row[14],
                     'last_start_time': row[15],
                     'last_status': row[16]
@@ -893,12 +900,12 @@ def get_automation_project(project_id):
                 'id': row[0],
                 'project_id': row[1],
                 'process_name': row[2],
-                'product_ids': json.loads(row[3]) if row[3] else [],
+                'product_ids': json_columns.decode(row[3], [], ('automation_projects', 'product_ids', row[0], row[12])),
                 'system': row[4],
                 'product_type': row[5],
                 'environment': row[6],
                 'product_address': row[7],
-                'test_steps': json.loads(row[8]) if row[8] else [],
+                'test_steps': json_columns.decode(row[8], [], ('automation_projects', 'test_steps', row[0], row[12])),
                 'status': row[9],
                 'created_by': row[10],
                 'created_at': row[11],
@@ -1223,13 +1230,17 @@ def update_automation_project(project_id):
 @automation_bp.route('/projects/<int:project_id>/execute', methods=['POST'])
 def execute_test(project_id):
     """执行测试"""
+    claimed = False
+    queued_at = time.monotonic()
     try:
-        # 检查是否已有测试在运行
-        if project_id in running_tests:
+        # 检查是否已有测试在运行（共享运行状态中登记，其他 worker 上的运行也能检测到）
+        current_user = get_current_user()
+        if project_id in running_tests or not run_registry.claim(project_id, executed_by=current_user):
             return jsonify({
                 'success': False,
                 'message': '该项目测试正在运行中'
             }), 400
+        claimed = True
         
         # 获取项目信息
         with get_db_connection_with_retry() as conn:
@@ -1237,6 +1248,7 @@ def execute_test(project_id):
             project_results = execute_query_with_results(conn, query, (project_id,))
             
             if not project_results:
+                run_registry.release(project_id)
                 return jsonify({
                     'success': False,
                     'message': '项目不存在'
@@ -1248,17 +1260,13 @@ def execute_test(project_id):
         
         # 记录测试开始的执行记录
         start_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        current_user = get_current_user()
         execution_id = create_execution_record(project_id, 'running', 
                                              executed_by=current_user,
                                              log_message='测试开始执行', start_time=start_time)
+        run_registry.update(project_id, execution_id=execution_id)
         
-        # 设置当前执行ID，用于实时日志记录
-        from config.logger import set_current_execution_id
-        set_current_execution_id(execution_id)
-        
-        # 在后台执行测试
-        thread = threading.Thread(target=run_test_in_background, args=(project_id, start_time, execution_id, current_user))
+        # 在后台执行测试（执行线程内设置当前执行ID，用于实时日志记录和执行日志文件）
+        thread = threading.Thread(target=run_test_with_execution_log, args=(project_id, start_time, execution_id, current_user, queued_at))
         thread.daemon = True
         thread.start()
         
@@ -1275,6 +1283,8 @@ def execute_test(project_id):
         })
         
     except Exception as e:
+        if claimed and project_id not in running_tests:
+            run_registry.release(project_id)
         return jsonify({
             'success': False,
             'message': f'执行测试失败: {str(e)}'
@@ -1389,8 +1399,12 @@ def cancel_test(project_id):
         project = project_results[0]
         current_status = project[0]
         
+        # 项目可能运行在其他 worker 上：以共享运行状态为准
+        shared_run = run_registry.get(project_id)
+        running_elsewhere = project_id not in running_tests and shared_run is not None and not shared_run['stale']
+        
         # 如果项目不在运行中，检查是否需要清理状态
-        if project_id not in running_tests:
+        if project_id not in running_tests and not running_elsewhere:
             # 检查是否存在状态不一致的情况
             with get_db_connection_with_retry() as conn:
                 query = adapt_query_placeholders('''
@@ -1451,13 +1465,14 @@ def cancel_test(project_id):
                     'message': f'项目当前状态为 {current_status}，无法取消'
                 }), 400
         
-        # 终止测试进程
-        test_info = running_tests[project_id]
-        thread = test_info.get('thread')
+        # 设置取消标志：运行在其他 worker 上时由其心跳线程同步取消标志并终止进程
+        run_registry.request_cancel(project_id, cancel_type)
+        test_info = running_tests.get(project_id, {})
         process = test_info.get('process')
-        
-        # 设置取消标志
-        test_info['cancelled'] = True
+        if test_info:
+            test_info['cancelled'] = True
+        else:
+            log_info(f"项目 {project_id} 运行在 worker {shared_run['owner']} 上，已写入取消标志")
         
         # 如果有subprocess进程，终止它
         if process and process.poll() is None:
@@ -1757,7 +1772,12 @@ def stop_project(project_id):
                 WHERE id = ?
             ''')
             execute_query(conn, query3, (execution_id,))
-            
+
+            # 通知执行该测试的 worker 终止进程（可能是其他 worker）
+            run_registry.request_cancel(project_id, 'stop')
+            if project_id in running_tests:
+                running_tests[project_id]['cancelled'] = True
+
             # 记录停止日志
             log_info(f"项目 {project[1]} (ID: {project_id}) 的执行被手动停止")
             
@@ -1793,12 +1813,28 @@ def upload_test_image():
             os.makedirs(upload_dir, exist_ok=True)
             
             file_path = os.path.join(upload_dir, filename)
+            if os.path.exists(file_path):
+                # 已有同名文件可能是产物存储对象的硬链接，先删除再写，避免改写共享对象
+                os.remove(file_path)
             file.save(file_path)
+            # 入库并以硬链接放回原路径，内容相同的上传只占一份磁盘
+            from utils.artifact_store import artifact_store
+            artifact_store.import_file(file_path, kind='template')
+            
+            # 记录截取模板时的DPR和CSS尺寸，识别时统一换算到CSS像素
+            template_meta = None
+            source_dpr = request.form.get('dpr', type=float)
+            if source_dpr:
+                template_meta = image_upload_manager.record_template_meta(
+                    file_path, source_dpr,
+                    css_width=request.form.get('css_width', type=int),
+                    css_height=request.form.get('css_height', type=int)
+                )
             
             return jsonify({
                 'success': True,
                 'message': '图片上传成功',
-                'data': {'file_path': file_path}
+                'data': {'file_path': file_path, 'template_meta': template_meta}
             })
         else:
             return jsonify({'success': False, 'message': '不支持的图片格式'}), 400
@@ -1887,6 +1923,136 @@ def update_blocker_templates():
         log_error(f"更新 BLOCKER_TEMPLATES 失败: {e}")
         return jsonify({'success': False, 'message': f'更新失败: {str(e)}'}), 500
 
+@automation_bp.route('/template-priors', methods=['GET'])
+def get_template_priors():
+    """查看模板先验统计，可通过 ?template=Game_Img/xxx.png 只看单个模板"""
+    try:
+        from utils.template_priors import template_priors
+        template_priors.reload()
+        template = request.args.get('template') or None
+        stats = template_priors.get_stats(template)
+        return jsonify({
+            'success': True,
+            'data': stats,
+            'total_templates': len(stats),
+            'file_path': template_priors.file_path
+        })
+    except Exception as e:
+        log_error(f"获取模板先验统计失败: {e}")
+        return jsonify({'success': False, 'message': f'获取失败: {str(e)}'}), 500
+
+@automation_bp.route('/template-priors/reset', methods=['POST'])
+def reset_template_priors():
+    """重置模板先验统计
+    - 不传参数：清空全部
+    - template：只清空该模板；同时传 layout（如 960x540@1.25）时只清空该布局
+    """
+    try:
+        from utils.template_priors import template_priors
+        data = request.get_json(silent=True) or {}
+        template = data.get('template') or None
+        layout = data.get('layout') or None
+        if layout and not template:
+            return jsonify({'success': False, 'message': '参数错误：指定 layout 时必须同时指定 template'}), 400
+        template_priors.reload()
+        removed = template_priors.reset(template, layout)
+        return jsonify({'success': True, 'message': '模板先验已重置', 'data': {'removed_count': removed}})
+    except Exception as e:
+        log_error(f"重置模板先验统计失败: {e}")
+        return jsonify({'success': False, 'message': f'重置失败: {str(e)}'}), 500
+
+@automation_bp.route('/auth-sessions', methods=['GET'])
+def get_auth_sessions():
+    """查看已保存的登录会话（不返回Cookie内容）"""
+    try:
+        from utils.session_vault import session_vault
+        sessions = session_vault.list_sessions()
+        return jsonify({'success': True, 'data': sessions, 'total': len(sessions)})
+    except Exception as e:
+        log_error(f"获取登录会话失败: {e}")
+        return jsonify({'success': False, 'message': f'获取失败: {str(e)}'}), 500
+
+@automation_bp.route('/auth-sessions/clear', methods=['POST'])
+def clear_auth_sessions():
+    """删除登录会话，下次执行时重新登录
+    - 不传参数：删除全部
+    - address：只删除该产品地址的会话；同时传 email 时只删除该账号的会话
+    """
+    try:
+        from utils.session_vault import session_vault
+        data = request.get_json(silent=True) or {}
+        address = (data.get('address') or '').strip() or None
+        email = (data.get('email') or '').strip() or None
+        if email and not address:
+            return jsonify({'success': False, 'message': '参数错误：指定 email 时必须同时指定 address'}), 400
+        removed = session_vault.clear(address, email)
+        return jsonify({'success': True, 'message': '登录会话已删除', 'data': {'removed_count': removed}})
+    except Exception as e:
+        log_error(f"删除登录会话失败: {e}")
+        return jsonify({'success': False, 'message': f'删除失败: {str(e)}'}), 500
+
+@automation_bp.route('/auth-accounts/pool', methods=['GET'])
+def get_account_pool_stats():
+    """查看预生成账号池状态（空闲/租用中/已使用/已作废数量）"""
+    try:
+        from utils.auth_accounts import account_pool
+        return jsonify({'success': True, 'data': account_pool.get_stats()})
+    except Exception as e:
+        log_error(f"获取账号池状态失败: {e}")
+        return jsonify({'success': False, 'message': f'获取失败: {str(e)}'}), 500
+
+@automation_bp.route('/auth-accounts/pool/refill', methods=['POST'])
+def refill_account_pool():
+    """立即补充预生成账号池到目标数量"""
+    try:
+        from utils.auth_accounts import account_pool
+        created = account_pool.refill()
+        return jsonify({'success': True, 'message': '账号池已补充', 'data': {'created_count': created, **account_pool.get_stats()}})
+    except Exception as e:
+        log_error(f"补充账号池失败: {e}")
+        return jsonify({'success': False, 'message': f'补充失败: {str(e)}'}), 500
+
+@automation_bp.route('/janitor', methods=['GET'])
+def get_janitor_status():
+    """查看存储清理配置和最近一次清理报告"""
+    try:
+        from utils.storage_janitor import storage_janitor
+        return jsonify({'success': True, 'data': storage_janitor.get_status()})
+    except Exception as e:
+        log_error(f"获取存储清理状态失败: {e}")
+        return jsonify({'success': False, 'message': f'获取失败: {str(e)}'}), 500
+
+@automation_bp.route('/janitor/run', methods=['POST'])
+def run_janitor():
+    """立即执行一次存储清理
+    - dry_run：只统计将删除的文件和可释放的空间，不删除
+    - dir：只清理该目录（如 IMG_LOGS/IMA_ASSERT）
+    """
+    try:
+        from utils.storage_janitor import storage_janitor
+        data = request.get_json(silent=True) or {}
+        report = storage_janitor.run(dry_run=bool(data.get('dry_run')), only=(data.get('dir') or '').strip() or None)
+        return jsonify({'success': True, 'message': '存储清理完成', 'data': report})
+    except Exception as e:
+        log_error(f"存储清理失败: {e}")
+        return jsonify({'success': False, 'message': f'清理失败: {str(e)}'}), 500
+
+@automation_bp.route('/artifacts', methods=['GET'])
+def get_artifacts():
+    """查看产物存储中的截图/图片，可通过 ?execution_id=任务ID&kind=screenshot 过滤"""
+    try:
+        from utils.artifact_store import artifact_store
+        artifacts = artifact_store.list_artifacts(request.args.get('execution_id'), request.args.get('kind'))
+        for artifact in artifacts:
+            # 带内容指纹的URL可被浏览器长期缓存（执行历史中的截图缩略图不再重复下载）
+            artifact['url'] = f"/{artifact['path']}?v={artifact['sha256'][:16]}"
+            artifact['thumbnail_url'] = (f"/{artifact['path']}?thumb=1&v={artifact['thumb_sha256'][:16]}"
+                                         if artifact['thumb_sha256'] else None)
+        return jsonify({'success': True, 'data': artifacts, 'total': len(artifacts), 'stats': artifact_store.get_stats()})
+    except Exception as e:
+        log_error(f"获取产物列表失败: {e}")
+        return jsonify({'success': False, 'message': f'获取失败: {str(e)}'}), 500
+
 def generate_test_code(automation_id, data):
     """生成测试代码文件"""
     try:
@@ -2840,11 +3006,15 @@ def generate_single_test_file(filename, data, product_id):
                 else:
                     log_info(f"警告: 未找到产品 {product_id} 的地址信息")
         
+        # 步骤解释器模式：只生成加载步骤的精简测试文件
+        if UIConfig.uses_step_runner():
+            generate_step_runner_test_file(filename, data, [(product_id, product_address)])
+            return
+        
         # 生成代码内容
         code_content = '''
 import time
 import sys
-import pyautogui
 import numpy
 import pytest
 import asyncio
@@ -2873,9 +3043,9 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
         context = None
         page = None
         try:
-            # 启动独立的浏览器实例
-            browser = await p.chromium.launch(headless=False, args=browser_args)
-            context = await browser.new_context(no_viewport=True)
+            # 启动独立的浏览器实例（有头/无头/虚拟显示由执行模式决定）
+            browser = await p.chromium.launch(**screen_manager.get_launch_options(browser_args))
+            context = await browser.new_context(**screen_manager.get_context_options())
             page = await context.new_page()
                     
             # 创建UIOperations实例并使用混合图片识别机制，为每个任务创建独立实例
@@ -2960,7 +3130,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 # 公共断言方法，断言URL是否存在
                 with allure.step("测试步骤''' + str(i+1) + ''': 公共断言URL是否存在"):
                     await ui_operations.url_assert_exists("''' + tab_target_url + '''")
-                time.sleep(1)  # 等待页面加载
+                await ui_operations.wait_for_settle(timeout=1)  # 等待页面加载（非阻塞）
 '''
                 # 添加元素操作代码
                 code_content += '''                
@@ -3066,7 +3236,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 
                 code_content += '''
                 with allure.step("测试步骤''' + str(i+1) + ''': ''' + step_name + ''' - ''' + operation_event + ''' 操作 (''' + operation_params + ''')"):
-                    time.sleep(''' + str(pause_time) + ''')
+                    await asyncio.sleep(''' + str(pause_time) + ''')
                     
                 # 执行Web元素操作 ''' + str(operation_count) + ''' 次
                 for attempt in range(''' + str(operation_count) + '''):
@@ -3080,7 +3250,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                             log_info(f"执行第{attempt + 1}次操作: ''' + operation_event + ''' on ''' + operation_params + '''")
                             # 使用安全操作机制，带重试
                             ''' + operation_invoke + '''
-                            time.sleep(1)  # 每次操作后等待1秒
+                            await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
                         except Exception as e:
                             # 检查是否是浏览器关闭导致的异常
                             error_msg = str(e).lower()
@@ -3091,7 +3261,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                             if attempt == ''' + str(operation_count) + ''' - 1:  # 最后一次尝试失败
                                 log_info(f"所有操作均失败！")
                                 ''' + failure_screenshot_code + '''
-                time.sleep(1)  # 每次操作后等待1秒
+                await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 ''' + after_screenshot_code + '''
 '''
                 
@@ -3110,7 +3280,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 # 页面滚动子步骤
                 with allure.step(f"测试步骤''' + str(i+1) + ''': ''' + step_name + ''' - 页面滚动准备"):
                     # 需要等待1S后再操作滚动
-                    time.sleep(1)
+                    await asyncio.sleep(1)
                     # 游戏操作前先滚动页面确保图片可见
                     # 此功能需要由编写者确认需要滚动到的页面位置是什么，默认参数：delta_x=0, delta_y=1100
                     # 请根据实际的页面滚动进行调整到图片可见
@@ -3128,7 +3298,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                         
                         try:
                             log_info(f"[test_''' + product_id.replace("-", "_") + '''] 执行第{attempt + 1}次图片操作: ''' + operation_event + ''' on ''' + img_path + '''")
-                            time.sleep(''' + str(pause_time) + ''')
+                            await asyncio.sleep(''' + str(pause_time) + ''')
                         success = await ui_operations.click_image_with_fallback(
                                 "''' + img_path + '''", 
                                 confidence=0.7, 
@@ -3147,12 +3317,12 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                             if attempt == ''' + str(operation_count) + ''' - 1:  # 最后一次尝试失败
                                 log_info(f"[{task_id}] test_''' + product_id.replace("-", "_") + ''' 所有 ''' + str(operation_count) + ''' 次尝试都失败")
                             raise Exception(f"图片定位失败：无法找到图片 ''' + img_path + '''")
-                        time.sleep(1)  # 每次操作后等待1秒
+                        await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
             
 '''
         
         code_content += f'''            # 等待测试完成
-            time.sleep(2)
+            await asyncio.sleep(2)
             
             # 最终检查浏览器状态
             if await ui_operations.is_browser_closed():
@@ -3160,7 +3330,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 raise Exception("BROWSER_CLOSED_BY_USER")
             
             await ui_operations.page_screenshot(f"''' + product_id.replace("-", "_") + '''","over_test_test_step_''' + str(i+1) + '''")
-            time.sleep(2)
+            await asyncio.sleep(2)
             
             # 输出图片识别统计信息
             stats = ui_operations.get_image_stats()
@@ -3181,6 +3351,8 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 await context.close()
             if browser:
                 await browser.close()
+            # 释放该浏览器占用的虚拟显示
+            screen_manager.release_browser_args(browser_args)
 '''
         
         # 为单个测试案例生成并发执行函数
@@ -3236,11 +3408,15 @@ def update_single_test_file(filename, data, product_id):
                 else:
                     log_info(f"警告: 未找到产品 {product_id} 的地址信息")
         
+        # 步骤解释器模式：只生成加载步骤的精简测试文件
+        if UIConfig.uses_step_runner():
+            generate_step_runner_test_file(filename, data, [(product_id, product_address)])
+            return
+        
         # 生成代码内容（与generate_single_test_file相同的逻辑）
         code_content = f'''
 import time
 import sys
-import pyautogui
 import numpy
 import pytest
 import asyncio
@@ -3268,9 +3444,9 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
         context = None
         page = None
         try:
-            # 启动独立的浏览器实例
-            browser = await p.chromium.launch(headless=False, args=browser_args)
-            context = await browser.new_context(no_viewport=True)
+            # 启动独立的浏览器实例（有头/无头/虚拟显示由执行模式决定）
+            browser = await p.chromium.launch(**screen_manager.get_launch_options(browser_args))
+            context = await browser.new_context(**screen_manager.get_context_options())
             page = await context.new_page()
                     
             # 创建UIOperations实例并使用混合图片识别机制，为每个任务创建独立实例
@@ -3452,7 +3628,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 # 公共断言方法，断言URL是否存在
                 with allure.step("测试步骤{i+1}: 公共断言URL是否存在"):
                     await ui_operations.url_assert_exists("{tab_target_url}")
-                time.sleep(1)  # 等待页面加载
+                await ui_operations.wait_for_settle(timeout=1)  # 等待页面加载（非阻塞）
 '''
                 
                 # 添加元素操作代码
@@ -3472,7 +3648,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 
                 code_content += f'''
                 with allure.step("测试步骤{i+1}: {step_name} - {operation_event} 操作 ({operation_params})"):
-                    time.sleep({pause_time})
+                    await asyncio.sleep({pause_time})
                     
                     # 执行Web元素操作 {operation_count} 次
                     for attempt in range({operation_count}):
@@ -3486,7 +3662,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                             log_info(f"[{{task_id}}]  执行第{attempt + 1}次操作: {operation_event} on {operation_params}")
                             # 使用安全操作机制，带重试
                             ''' + operation_invoke + '''
-                            time.sleep(1)  # 每次操作后等待1秒
+                            await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
                         except Exception as e:
                             # 检查是否是浏览器关闭导致的异常
                             error_msg = str(e).lower()
@@ -3497,7 +3673,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                             if attempt == ''' + str(operation_count) + ''' - 1:  # 最后一次尝试失败
                                 log_info(f"所有操作均失败！")
                                 ''' + failure_screenshot_code + '''
-                time.sleep(1)  # 每次操作后等待1秒
+                await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 ''' + after_screenshot_code + '''
             
 '''
@@ -3572,7 +3748,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 # 页面滚动子步骤
                 with allure.step(f"测试步骤''' + str(i+1) + ''': ''' + step_name + ''' - 页面滚动准备"):
                     # 需要等待1S后再操作滚动
-                    time.sleep(1)
+                    await asyncio.sleep(1)
                     # 游戏操作前先滚动页面确保图片可见
                     # 此功能需要由编写者确认需要滚动到的页面位置是什么，默认参数：delta_x=0, delta_y=1100
                     # 请根据实际的页面滚动进行调整到图片可见
@@ -3589,7 +3765,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                             raise Exception("BROWSER_CLOSED_BY_USER")
                         
                         try:
-                            time.sleep(''' + str(pause_time) + ''')
+                            await asyncio.sleep(''' + str(pause_time) + ''')
                             success = await ui_operations.click_image_with_fallback(
                                 "''' + img_path + '''", 
                                 confidence=0.7, 
@@ -3610,12 +3786,12 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                                 log_info(f"所有 '''+ str(operation_count) + ''' 次尝试都失败")
                                 ''' + failure_screenshot_code + '''
                             raise Exception(f"图片定位失败：无法找到图片 '''+ img_path + '''")
-                time.sleep(1)  # 每次操作后等待1秒
+                await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 ''' + after_screenshot_code + '''
             
 '''
         code_content += f'''            # 等待测试完成
-            time.sleep(3)
+            await asyncio.sleep(3)
             
             # 最终检查浏览器状态
             if await ui_operations.is_browser_closed():
@@ -3623,7 +3799,7 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 raise Exception("BROWSER_CLOSED_BY_USER")
             
             await ui_operations.page_screenshot(f"''' + product_id.replace("-", "_") + '''","over_test_test_step_''' + str(i+1) + '''")
-            time.sleep(2)
+            await asyncio.sleep(2)
             
             # 输出图片识别统计信息
             stats = ui_operations.get_image_stats()
@@ -3644,6 +3820,8 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
                 await context.close()
             if browser:
                 await browser.close()
+            # 释放该浏览器占用的虚拟显示
+            screen_manager.release_browser_args(browser_args)
 
 '''
         # 为单个测试案例生成并发执行函数
@@ -3660,8 +3838,22 @@ async def test_''' + product_id.replace("-", "_") + '''(browser_args):
     except Exception as e:
         log_info(f"更新测试文件失败: {e}")
 
+def run_test_with_execution_log(project_id, start_time, execution_id, current_user, queued_at=None):
+    """后台执行线程入口：本线程和测试子进程的日志按执行ID写入独立的执行日志文件，与并发执行的其他测试互不混杂"""
+    from config.logger import execution_log
+    if queued_at is not None:
+        execution_queue_seconds.observe(time.monotonic() - queued_at)
+    started = time.monotonic()
+    status = None
+    with execution_log(execution_id):
+        try:
+            status = run_test_in_background(project_id, start_time, execution_id, current_user)
+        finally:
+            execution_run_seconds.observe(time.monotonic() - started, status=status or 'unknown')
+
 def run_test_in_background(project_id, start_time, execution_id, current_user):
-    """在后台运行测试"""
+    """在后台运行测试，返回执行的最终状态（passed/failed/cancelled）"""
+    final_status = None
     try:
         # 获取项目信息
         with get_db_connection_with_retry() as conn:
@@ -3725,6 +3917,7 @@ def run_test_in_background(project_id, start_time, execution_id, current_user):
         was_cancelled = project_id in running_tests and running_tests[project_id].get('cancelled', False)
         
         if was_cancelled:
+            final_status = 'cancelled'
             # 测试被取消，更新项目状态和执行记录
             with get_db_connection_with_retry() as conn:
                 query = adapt_query_placeholders('UPDATE automation_projects SET status=? WHERE id=?')
@@ -3737,6 +3930,7 @@ def run_test_in_background(project_id, start_time, execution_id, current_user):
         else:
             # 正常结束，更新状态
             status = 'passed' if result else 'failed'
+            final_status = status
             with get_db_connection_with_retry() as conn:
                 query = adapt_query_placeholders('UPDATE automation_projects SET status=? WHERE id=?')
                 execute_query(conn, query, (status, project_id))
@@ -3777,6 +3971,7 @@ def run_test_in_background(project_id, start_time, execution_id, current_user):
         error_msg = str(e)
         is_browser_closed = "BROWSER_CLOSED_BY_USER" in error_msg
         
+        final_status = 'cancelled' if is_browser_closed or was_cancelled else 'failed'
         if is_browser_closed:
             # 浏览器被用户关闭，标记为人工取消
             try:
@@ -3961,6 +4156,8 @@ def run_test_in_background(project_id, start_time, execution_id, current_user):
             if project_id in running_tests:
                 log_info(f"监控线程未及时清理，手动清理项目 {project_id} 的运行记录")
                 del running_tests[project_id]
+    
+    return final_status
 
 def check_process_status(project_id):
     """检查进程状态，如果进程异常退出则更新状态"""
@@ -4002,7 +4199,9 @@ def analyze_test_file(file_path):
             'test_methods': test_methods,
             'method_count': len(test_methods),
             'has_concurrent_method': has_concurrent_method,
-            'should_use_concurrent': len(test_methods) > 1 and has_concurrent_method
+            'should_use_concurrent': len(test_methods) > 1 and has_concurrent_method,
+            # 新版生成的并发方法会按 UI_SHARD_INDEX/UI_SHARD_COUNT 只执行分配给本进程的产品
+            'supports_sharding': has_concurrent_method and 'get_shard_indices' in content
         }
     except Exception as e:
         log_info(f"分析测试文件失败: {e}")
@@ -4010,7 +4209,8 @@ def analyze_test_file(file_path):
             'test_methods': [],
             'method_count': 0,
             'has_concurrent_method': False,
-            'should_use_concurrent': False
+            'should_use_concurrent': False,
+            'supports_sharding': False
         }
 
 def run_pytest_file(filename, project_id=None):
@@ -4046,6 +4246,13 @@ def run_pytest_file(filename, project_id=None):
         
         # 设置测试环境变量
         env = os.environ.copy()
+        # 子进程的日志写入本次执行的日志文件（见 config/logger.py 的 ExecutionLogHandler）
+        from config.logger import get_current_execution_id
+        current_execution_id = get_current_execution_id()
+        if current_execution_id:
+            env['UI_EXECUTION_ID'] = str(current_execution_id)
+        else:
+            env.pop('UI_EXECUTION_ID', None)
         if project_id:
             env['PROJECT_ID'] = str(project_id)
             log_info(f"设置环境变量 PROJECT_ID: {project_id}")
@@ -4069,13 +4276,24 @@ def run_pytest_file(filename, project_id=None):
                 env['PRODUCT_TYPE'] = 'unknown'
                 env['ENVIRONMENT'] = 'test'
         
+        # 计算分片数：多产品文件可拆分到多个pytest进程，每个进程拥有独立的事件循环和GIL
+        from utils.sharded_process import ShardedProcessGroup, plan_shards
+        shard_count = 1
+        if analysis['should_use_concurrent'] and analysis.get('supports_sharding'):
+            # 并发方法之外的测试方法即为各产品的测试方法
+            shard_count = plan_shards(analysis['method_count'] - 1)
+        
         # 执行pytest命令
         log_info(f"执行pytest命令: {' '.join(pytest_command)}")
-        process = subprocess.Popen(pytest_command, 
-                                 stdout=subprocess.PIPE, 
-                                 stderr=subprocess.PIPE, 
-                                 text=True,
-                                 env=env)
+        if shard_count > 1:
+            log_info(f"分片执行: {analysis['method_count'] - 1} 个产品拆分到 {shard_count} 个进程")
+            process = ShardedProcessGroup(pytest_command, shard_count, env=env)
+        else:
+            process = subprocess.Popen(pytest_command, 
+                                     stdout=subprocess.PIPE, 
+                                     stderr=subprocess.PIPE, 
+                                     text=True,
+                                     env=env)
         
         # 如果提供了project_id，将进程信息保存到running_tests
         if project_id:
@@ -4083,6 +4301,7 @@ def run_pytest_file(filename, project_id=None):
                 running_tests[project_id]['process'] = process
                 running_tests[project_id]['process_valid'] = True  # 标记进程对象有效
                 running_tests[project_id]['start_line_number'] = start_line_number  # 保存开始时的日志行数
+                run_registry.update(project_id, pid=process.pid)
                 log_info(f"进程已添加到running_tests，项目ID: {project_id}")
             else:
                 # 如果项目不在running_tests中，这不应该发生，因为execute_test函数应该已经创建了条目
@@ -4142,11 +4361,14 @@ def run_pytest_file(filename, project_id=None):
                         # 读取测试执行期间新增的日志内容（过滤系统日志）
                         end_line_number = get_log_file_line_count()
                         try:
-                            from config.logger import read_test_execution_logs
-                            if end_line_number > start_line_number:
-                                test_execution_log = read_test_execution_logs(start_line_number + 1, end_line_number)
-                            else:
-                                test_execution_log = "未检测到新的日志内容"
+                            from config.logger import read_test_execution_logs, read_execution_log
+                            # 优先读取本次执行的独立日志文件，没有时退回按行号截取 app.log
+                            test_execution_log = read_execution_log(execution_id)
+                            if test_execution_log is None:
+                                if end_line_number > start_line_number:
+                                    test_execution_log = read_test_execution_logs(start_line_number + 1, end_line_number)
+                                else:
+                                    test_execution_log = "未检测到新的日志内容"
                         except Exception as _:
                             test_execution_log = "读取日志失败"
                         # 合并已有详细日志内容
@@ -4260,9 +4482,12 @@ def run_pytest_file(filename, project_id=None):
             end_line_number = get_log_file_line_count()
             log_info(f"测试结束，当前日志文件行数: {end_line_number}")
             
-            # 读取测试执行期间新增的日志内容
-            from config.logger import read_test_execution_logs
-            if end_line_number > start_line_number:
+            # 读取测试执行期间的日志内容：优先使用本次执行的独立日志文件（并发执行时不会混入其他测试的日志）
+            from config.logger import read_test_execution_logs, read_execution_log
+            test_execution_log = read_execution_log(execution_id)
+            if test_execution_log is not None:
+                log_info(f"读取执行日志文件，执行ID: {execution_id}")
+            elif end_line_number > start_line_number:
                 # 读取从开始行数到结束行数的测试执行日志内容（过滤系统日志）
                 test_execution_log = read_test_execution_logs(start_line_number + 1, end_line_number)
                 log_info(f"抓取到测试执行期间的日志内容，行数范围: {start_line_number + 1}-{end_line_number}")
@@ -4522,6 +4747,9 @@ def monitor_running_processes():
                                     if execution_id:
                                         end_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
                                         log_message = f'测试执行{"成功" if return_code == 0 else "失败"} (返回码: {return_code})'
+                                        failed_shards = getattr(process, 'failed_shards', None)
+                                        if failed_shards:
+                                            log_message += f", 失败分片: {', '.join(map(str, failed_shards))}/{process.shard_count}"
                                         # 在监控线程中，不更新executed_by字段，保持原有值
                                         query2 = adapt_query_placeholders('''
                                             UPDATE automation_executions 
@@ -4537,9 +4765,17 @@ def monitor_running_processes():
                                             log_results = execute_query_with_results(conn, query3, (execution_id,))
                                             row = log_results[0] if log_results else None
                                             if row and not row[0]:  # 如果没有详细日志，尝试收集
+                                                # 优先读取本次执行的独立日志文件
+                                                from config.logger import read_execution_log
+                                                execution_log_text = read_execution_log(execution_id)
                                                 # 获取测试开始时的日志行数（从test_info中获取）
                                                 start_line_number = test_info.get('start_line_number')
-                                                if start_line_number:
+                                                if execution_log_text is not None:
+                                                    complete_detailed_log = f"=== 测试执行过程日志 ===\n{execution_log_text}\n\n=== 监控线程收集的日志 ==="
+                                                    query4 = adapt_query_placeholders('UPDATE automation_executions SET detailed_log = ? WHERE id = ?')
+                                                    execute_query(conn, query4, (complete_detailed_log, execution_id))
+                                                    log_info(f"监控线程已存储执行日志文件内容到执行记录 {execution_id}")
+                                                elif start_line_number:
                                                     from config.logger import get_log_file_line_count, read_test_execution_logs
                                                     end_line_number = get_log_file_line_count()
                                                     
@@ -4653,29 +4889,79 @@ def monitor_running_processes():
             log_info(f"进程监控异常: {e}")
             time.sleep(5)  # 异常时等待更长时间
 
+def _on_run_cancel_requested(project_id):
+    """其他 worker 写入的取消标志：同步到本 worker 的运行句柄，由 run_pytest_file 的轮询终止进程"""
+    test_info = running_tests.get(project_id)
+    if test_info is not None and not test_info.get('cancelled', False):
+        test_info['cancelled'] = True
+        log_info(f"收到项目 {project_id} 的取消请求，正在终止本 worker 上的测试进程")
+
+def _on_run_stale(run):
+    """监督者回收过期运行记录：所属 worker 已退出，把仍为running的执行记录和项目状态置为failed"""
+    try:
+        with get_db_connection_with_retry() as conn:
+            if run.get('execution_id'):
+                query = adapt_query_placeholders('''
+                    UPDATE automation_executions 
+                    SET status=?, end_time=?, log_message=?
+                    WHERE id=? AND status='running'
+                ''')
+                execute_query(conn, query, ('failed', datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                                            f"执行该测试的服务进程已退出（{run['owner']}）", run['execution_id']))
+            query2 = adapt_query_placeholders("UPDATE automation_projects SET status=? WHERE id=? AND status='running'")
+            execute_query(conn, query2, ('failed', run['project_id']))
+    except Exception as e:
+        log_info(f"修正过期运行 {run['project_id']} 的状态失败: {e}")
+
 # 启动监控线程（确保只有一个实例）
 _monitor_thread_started = False
 
 def start_monitor_thread():
-    """启动监控线程，确保只有一个实例"""
+    """
+    启动监控线程，确保每个 worker 只有一个实例（由 create_app 调用）
+
+    进程句柄只在创建它的 worker 内有效，monitor_running_processes 在每个 worker 中监控本地运行；
+    同时启动共享运行状态的心跳线程，跨 worker 的取消请求和过期运行的回收由它处理（回收只在监督者上执行）。
+    """
     global _monitor_thread_started
     if not _monitor_thread_started:
         monitor_thread = threading.Thread(target=monitor_running_processes, daemon=True)
         monitor_thread.start()
         _monitor_thread_started = True
+        run_registry.start(on_cancel=_on_run_cancel_requested, on_stale=_on_run_stale)
         log_info("监控线程已启动")
 
-# 启动监控线程
-start_monitor_thread()
-
 @automation_bp.route('/debug/running-tests', methods=['GET'])
 def debug_running_tests():
-    """调试：查看当前运行中的测试状态"""
+    """调试：查看当前运行中的测试状态（全部 worker）"""
     try:
         debug_info = {}
+        for run in run_registry.list_runs():
+            project_id = run['project_id']
+            test_info = running_tests.get(project_id) if run['local'] else None
+            process = test_info.get('process') if test_info else None
+            debug_info[project_id] = {
+                'worker': run['owner'],
+                'local': run['local'],
+                'stale': run['stale'],
+                'pid': run['pid'],
+                'has_process': process is not None if run['local'] else run['pid'] is not None,
+                'process_running': (process.poll() is None if process else False) if run['local'] else None,
+                'return_code': process.returncode if process else None,
+                'cancelled': run['cancelled'] or bool(test_info and test_info.get('cancelled', False)),
+                'execution_id': run['execution_id'],
+                'start_time': datetime.fromtimestamp(run['started_at']).strftime('%Y-%m-%d %H:%M:%S'),
+                'heartbeat_age': round(time.time() - run['heartbeat_at'], 1)
+            }
+        # 本 worker 中未登记到共享状态的句柄（如登记前的竞态）
         for project_id, test_info in running_tests.items():
+            if project_id in debug_info:
+                continue
             process = test_info.get('process')
             debug_info[project_id] = {
+                'worker': run_registry.worker_id,
+                'local': True,
+                'stale': False,
                 'has_process': process is not None,
                 'process_running': process.poll() is None if process else False,
                 'return_code': process.returncode if process else None,
@@ -4687,7 +4973,9 @@ def debug_running_tests():
         return jsonify({
             'success': True,
             'running_tests': debug_info,
-            'total_running': len(running_tests)
+            'total_running': len(debug_info),
+            'worker_id': run_registry.worker_id,
+            'is_supervisor': run_registry.is_supervisor
         })
     except Exception as e:
         return jsonify({
@@ -4699,7 +4987,12 @@ def debug_running_tests():
 def cleanup_running_tests():
     """清理可能存在的僵尸运行记录"""
     try:
-        cleaned_count = 0
+        # 所属 worker 已退出的共享运行记录
+        stale_runs = run_registry.reap_stale()
+        for run in stale_runs:
+            _on_run_stale(run)
+            log_info(f"清理过期运行记录: 项目 {run['project_id']}，worker {run['owner']}")
+        cleaned_count = len(stale_runs)
         for project_id in list(running_tests.keys()):
             test_info = running_tests[project_id]
             process = test_info.get('process')
@@ -4719,7 +5012,7 @@ def cleanup_running_tests():
         return jsonify({
             'success': True,
             'message': f'清理了 {cleaned_count} 个僵尸记录',
-            'remaining_count': len(running_tests)
+            'remaining_count': len(run_registry.list_runs())
         })
         
     except Exception as e:
@@ -4770,6 +5063,12 @@ def debug_force_cleanup():
             if project_id in running_tests:
                 del running_tests[project_id]
         
+        # 共享运行状态中心跳已过期的记录（所属 worker 已退出）
+        for run in run_registry.reap_stale():
+            _on_run_stale(run)
+            projects_to_remove.append(run['project_id'])
+            log_info(f"强制清理过期运行记录: 项目 {run['project_id']}，worker {run['owner']}")
+        
         after_count = len(running_tests)
         
         return jsonify({
@@ -5044,6 +5343,11 @@ def generate_multi_product_test_file(filename, data, product_addresses):
     try:
         file_path = os.path.join('Test_Case', filename)
         
+        # 步骤解释器模式：只生成加载步骤的精简测试文件
+        if UIConfig.uses_step_runner():
+            generate_step_runner_test_file(filename, data, product_addresses)
+            return
+        
         # 为同一地址创建账号使用计数器
         address_account_counters = {}
         
@@ -5051,7 +5355,6 @@ def generate_multi_product_test_file(filename, data, product_addresses):
         code_content = '''
 import time
 import sys
-import pyautogui
 import numpy
 import pytest
 import asyncio
@@ -5086,9 +5389,9 @@ from Base_ENV.config import *
         context = None
         page = None
         try:
-            # 启动独立的浏览器实例
-            browser = await p.chromium.launch(headless=False, args=browser_args)
-            context = await browser.new_context(no_viewport=True)
+            # 启动独立的浏览器实例（有头/无头/虚拟显示由执行模式决定）
+            browser = await p.chromium.launch(**screen_manager.get_launch_options(browser_args))
+            context = await browser.new_context(**screen_manager.get_context_options())
             page = await context.new_page()
                     
             # 创建UIOperations实例并使用混合图片识别机制，为每个任务创建独立实例
@@ -5213,7 +5516,7 @@ from Base_ENV.config import *
                 # 公共断言方法，断言URL是否存在
                 with allure.step("测试步骤{j+1}: 公共断言URL是否存在"):
                     await ui_operations.url_assert_exists("{tab_target_url}")
-                time.sleep(1)  # 等待页面加载
+                await ui_operations.wait_for_settle(timeout=1)  # 等待页面加载（非阻塞）
                 
                 # 公共断言方法，断言元素是否存在
                 with allure.step("测试步骤''' + str(j+1) + ''': 公共断言元素是否存在"):
@@ -5362,7 +5665,7 @@ from Base_ENV.config import *
                         operation_invoke = 'await ui_operations.elem_' + operation_event + '("' + operation_params + '")'
                     code_content += '''
                 with allure.step("测试步骤''' + str(j+1) + ''': ''' + step_name + ''' - ''' + operation_event + ''' 操作 (''' + operation_params + ''')"):
-                    time.sleep(''' + str(pause_time) + ''')
+                    await asyncio.sleep(''' + str(pause_time) + ''')
                     # 执行Web元素操作 ''' + str(operation_count) + ''' 次
                     for attempt in range(''' + str(operation_count) + '''):
                         # 检查浏览器是否已关闭
@@ -5373,7 +5676,7 @@ from Base_ENV.config import *
                             log_info(f"[{task_id}] 执行第{attempt + 1}次操作: ''' + operation_event + ''' on ''' + operation_params + '''")
                             # 使用安全操作机制，带重试
                             ''' + operation_invoke + '''
-                            time.sleep(1)  # 每次操作后等待1秒
+                            await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
                         except Exception as e:
                             # 检查是否是浏览器关闭导致的异常
                             error_msg = str(e).lower()
@@ -5384,7 +5687,7 @@ from Base_ENV.config import *
                             if attempt == ''' + str(operation_count - 1) + ''':  # 最后一次尝试失败
                                 log_info(f"所有操作均失败！")
                                 ''' + failure_screenshot_code + '''
-                time.sleep(1)  # 每次操作后等待1秒
+                await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 ''' + after_screenshot_code + '''
             
 '''
@@ -5399,7 +5702,7 @@ from Base_ENV.config import *
             # 测试步骤{j+1}: {step_name} (操作次数: {operation_count})
             with allure.step("{step_name} - 游戏图片{operation_event} 操作 ({img_path})"):
                 # 需要等待1S后再操作滚动
-                time.sleep(1)
+                await asyncio.sleep(1)
                 # 游戏操作前先滚动页面确保图片可见
                 # 此功能需要由编写者确认需要滚动到的页面位置是什么，默认参数：delta_x=0, delta_y=1100
                 # 请根据实际的页面滚动进行调整到图片可见
@@ -5412,7 +5715,7 @@ from Base_ENV.config import *
                         log_info(f"[{{task_id}}] 检测到浏览器已关闭，{function_name} 测试被用户中断")
                         raise Exception("BROWSER_CLOSED_BY_USER")
                     try:
-                        time.sleep({pause_time})
+                        await asyncio.sleep({pause_time})
                         success = await ui_operations.click_image_with_fallback(
                             "{img_path}",
                             confidence=0.7, 
@@ -5431,17 +5734,17 @@ from Base_ENV.config import *
                         if attempt == {operation_count - 1}:  # 最后一次尝试失败
                             log_info(f"[{{task_id}}]  所有 {operation_count} 次尝试都失败")
                         raise Exception(f"图片定位失败：无法找到图片 {img_path}")
-                    time.sleep(1)  # 每次操作后等待1秒
+                    await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 '''
             code_content += f'''            # 等待测试完成
-            time.sleep(3)
+            await asyncio.sleep(3)
             # 最终检查浏览器状态
             if await ui_operations.is_browser_closed():
                 log_info("检测到浏览器已关闭，''' + function_name + ''' 无法截图")
                 raise Exception("BROWSER_CLOSED_BY_USER")
             
             await ui_operations.page_screenshot("''' + function_name + '''","over_test_test_step_''' + str(j+1) + '''")
-            time.sleep(2)
+            await asyncio.sleep(2)
             
             # 输出图片识别统计信息
             stats = ui_operations.get_image_stats()
@@ -5461,6 +5764,8 @@ from Base_ENV.config import *
                 await context.close()
             if browser:
                 await browser.close()
+            # 释放该浏览器占用的虚拟显示
+            screen_manager.release_browser_args(browser_args)
             
 '''
         
@@ -5481,6 +5786,11 @@ def update_multi_product_test_file(filename, data, product_addresses):
     try:
         file_path = os.path.join('Test_Case', filename)
         
+        # 步骤解释器模式：只生成加载步骤的精简测试文件
+        if UIConfig.uses_step_runner():
+            generate_step_runner_test_file(filename, data, product_addresses)
+            return
+        
         # 为同一地址创建账号使用计数器
         address_account_counters = {}
         
@@ -5488,7 +5798,6 @@ def update_multi_product_test_file(filename, data, product_addresses):
         code_content = '''
 import time
 import sys
-import pyautogui
 import numpy
 import pytest
 import asyncio
@@ -5523,9 +5832,9 @@ from Base_ENV.config import *
         context = None
         page = None
         try:
-            # 启动独立的浏览器实例
-            browser = await p.chromium.launch(headless=False, args=browser_args)
-            context = await browser.new_context(no_viewport=True)
+            # 启动独立的浏览器实例（有头/无头/虚拟显示由执行模式决定）
+            browser = await p.chromium.launch(**screen_manager.get_launch_options(browser_args))
+            context = await browser.new_context(**screen_manager.get_context_options())
             page = await context.new_page()
                     
             # 创建UIOperations实例并使用混合图片识别机制，为每个任务创建独立实例
@@ -5641,7 +5950,7 @@ from Base_ENV.config import *
                     new_page = await ui_operations.open_new_tab_and_navigate("''' + tab_target_url + '''")
                     # 获取所有标签页信息并确保切换到正确的标签页
                     all_tabs = await ui_operations.get_all_tabs()
-                    time.sleep(1)  # 等待页面加载
+                    await ui_operations.wait_for_settle(timeout=1)  # 等待页面加载（非阻塞）
                 # URL断言子步骤
                 with allure.step("测试步骤''' + str(j+1) + ''': 公共断言URL是否存在"):
                     await ui_operations.url_assert_exists("''' + tab_target_url + '''")
@@ -5794,7 +6103,7 @@ from Base_ENV.config import *
                     code_content += '''
                 # 操作执行子步骤
                 with allure.step("测试步骤''' + str(j+1) + ''': ''' + step_name + ''' - ''' + operation_event + ''' 操作 (''' + operation_params + ''')"):
-                    time.sleep(''' + str(pause_time) + ''')
+                    await asyncio.sleep(''' + str(pause_time) + ''')
                     # 执行Web元素操作 ''' + str(operation_count) + ''' 次
                     for attempt in range(''' + str(operation_count) + '''):
                         # 检查浏览器是否已关闭
@@ -5805,7 +6114,7 @@ from Base_ENV.config import *
                             log_info(f"[{task_id}] 执行第{attempt + 1}次操作: ''' + operation_event + ''' on ''' + operation_params + '''")
                             # 使用安全操作机制，带重试
                             ''' + operation_invoke + '''
-                            time.sleep(1)  # 每次操作后等待1秒
+                            await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
                         except Exception as e:
                             # 检查是否是浏览器关闭导致的异常
                             error_msg = str(e).lower()
@@ -5816,7 +6125,7 @@ from Base_ENV.config import *
                             if attempt == ''' + str(operation_count) + ''' - 1:  # 最后一次尝试失败
                                 log_info(f"所有操作均失败！")
                                 ''' + failure_screenshot_code + '''
-                time.sleep(1)  # 每次操作后等待1秒
+                await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 ''' + after_screenshot_code + '''
             
 '''
@@ -5878,7 +6187,7 @@ from Base_ENV.config import *
                         code_content += '''
                 # 操作执行子步骤
                 with allure.step("测试步骤''' + str(j+1) + ''': ''' + step_name + ''' - ''' + operation_event + ''' 操作 (''' + operation_params + ''')"):
-                    time.sleep(''' + str(pause_time) + ''')
+                    await asyncio.sleep(''' + str(pause_time) + ''')
                     # 执行Web元素操作 ''' + str(operation_count) + ''' 次
                     for attempt in range(''' + str(operation_count) + '''):
                         # 检查浏览器是否已关闭
@@ -5889,7 +6198,7 @@ from Base_ENV.config import *
                             log_info(f"[{task_id}] 执行第{attempt + 1}次操作: ''' + operation_event + ''' on ''' + operation_params + '''")
                             # 使用安全操作机制，带重试
                             ''' + operation_invoke + '''
-                            time.sleep(1)  # 每次操作后等待1秒
+                            await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
                         except Exception as e:
                             # 检查是否是浏览器关闭导致的异常
                             error_msg = str(e).lower()
@@ -5900,7 +6209,7 @@ from Base_ENV.config import *
                             if attempt == ''' + str(operation_count) + ''' - 1:  # 最后一次尝试失败
                                 log_info(f"[{task_id}] 所有 '''+ str(operation_count) + ''' 次尝试都失败")
                                 ''' + failure_screenshot_code + '''
-                time.sleep(1)  # 每次操作后等待1秒
+                await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 ''' + after_screenshot_code + '''
             
 '''
@@ -5915,7 +6224,7 @@ from Base_ENV.config import *
             # 测试步骤{j+1}: {step_name} (操作次数: {operation_count})
             with allure.step("{step_name} - 游戏图片{operation_event} 操作 ({img_path})"):
                 # 需要等待1S后再操作滚动
-                time.sleep(1)
+                await asyncio.sleep(1)
                 # 游戏操作前先滚动页面确保图片可见
                 # 此功能需要由编写者确认需要滚动到的页面位置是什么，默认参数：delta_x=0, delta_y=1100
                 # 请根据实际的页面滚动进行调整到图片可见
@@ -5928,7 +6237,7 @@ from Base_ENV.config import *
                         log_info(f"[{{task_id}}] 检测到浏览器已关闭，{function_name} 测试被用户中断")
                         raise Exception("BROWSER_CLOSED_BY_USER")
                     try:
-                        time.sleep({pause_time})
+                        await asyncio.sleep({pause_time})
                         success = await ui_operations.click_image_with_fallback(
                             "{img_path}",
                             confidence=0.7, 
@@ -5947,17 +6256,17 @@ from Base_ENV.config import *
                         if attempt == {operation_count - 1}:  # 最后一次尝试失败
                             log_info(f"[{{task_id}}]  所有 {operation_count} 次尝试都失败")
                         raise Exception(f"图片定位失败：无法找到图片 {img_path}")
-                    time.sleep(1)  # 每次操作后等待1秒
+                    await ui_operations.wait_for_settle(timeout=1)  # 每次操作后等待页面稳定（最长1秒，非阻塞）
 '''
             code_content += f'''            # 等待测试完成
-            time.sleep(3)
+            await asyncio.sleep(3)
             # 最终检查浏览器状态
             if await ui_operations.is_browser_closed():
                 log_info("检测到浏览器已关闭，''' + function_name + ''' 无法截图")
                 raise Exception("BROWSER_CLOSED_BY_USER")
             
             await ui_operations.page_screenshot("''' + function_name + '''","over_test_test_step_''' + str(j+1) + '''")
-            time.sleep(2)
+            await asyncio.sleep(2)
             
             # 输出图片识别统计信息
             stats = ui_operations.get_image_stats()
@@ -5977,6 +6286,8 @@ from Base_ENV.config import *
                 await context.close()
             if browser:
                 await browser.close()
+            # 释放该浏览器占用的虚拟显示
+            screen_manager.release_browser_args(browser_args)
 '''
         
         # 生成动态并发执行函数
@@ -5990,18 +6301,83 @@ from Base_ENV.config import *
     except Exception as e:
         log_info(f"更新多产品测试文件失败: {e}")
 
-def generate_concurrent_execution_function(product_addresses):
-    """根据产品地址数量动态生成并发执行函数"""
-    function_calls = []
+def get_product_function_names(product_addresses):
+    """获取每个产品对应的测试函数名：多个产品时追加序号"""
     has_multiple_products = len(product_addresses) > 1
+    function_names = []
     for i, (product_id, _) in enumerate(product_addresses):
-        # 根据产品数量决定是否添加序号
         base_name = f"test_{product_id.replace('-', '_')}"
-        function_name = f"{base_name}_{i+1}" if has_multiple_products else base_name
-        function_calls.append(f"    task{i+1} = asyncio.create_task({function_name}(browser_args_list[{i}]))")
+        function_names.append(f"{base_name}_{i+1}" if has_multiple_products else base_name)
+    return function_names
+
+def generate_step_runner_test_file(filename, data, product_addresses):
+    """生成由步骤解释器执行的精简测试文件
+
+    文件中只保存一份测试步骤和产品地址，每个产品的测试函数委托给 utils/step_runner.py 执行，
+    不再为每个产品逐步展开代码；生成后仍可通过 /projects/<id>/code 手工编辑。
+    """
+    import copy
+    import pprint
+    
+    file_path = os.path.join('Test_Case', filename)
+    
+    # 图片断言中的上传图片需要先落盘，文件中只保留相对路径
+    test_steps = copy.deepcopy(data.get('test_steps', []) or [])
+    for step in test_steps:
+        assertion_config = step.get('assertion_config') or {}
+        image_assertions = assertion_config.get('image_assertions') or []
+        if image_assertions:
+            assertion_config['image_assertions'] = [
+                image_upload_manager.process_image_assertion_data(assertion) for assertion in image_assertions
+            ]
+    
+    product_addresses = [(product_id, product_address or '') for product_id, product_address in product_addresses]
+    function_names = get_product_function_names(product_addresses)
+    
+    code_content = '''
+import sys
+import pytest
+import asyncio
+import os
+# 添加项目根目录到Python路径
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if project_root not in sys.path:
+    sys.path.insert(0, project_root)
+import requests
+from config.logger import log_info
+from utils.screen_manager import screen_manager
+from utils.step_runner import build_step_runners
+
+# 测试步骤（由 utils/step_runner.py 解释执行，可直接修改）
+TEST_STEPS = ''' + pprint.pformat(test_steps, width=120, sort_dicts=False) + '''
+
+# 产品地址（顺序与并发执行函数中的浏览器序号一致）
+PRODUCT_ADDRESSES = ''' + pprint.pformat(product_addresses, width=120) + '''
+
+# 为每个产品预编译步骤解释器（任务ID与下方测试函数名一致）
+STEP_RUNNERS = build_step_runners(TEST_STEPS, PRODUCT_ADDRESSES, task_ids=''' + repr(function_names) + ''')
+
+'''
+    for i, ((product_id, product_address), function_name) in enumerate(zip(product_addresses, function_names)):
+        code_content += f'''
+async def {function_name}(browser_args):
+    """执行产品 {product_id} 的测试步骤: {product_address}"""
+    await STEP_RUNNERS[{i}].run(browser_args)
+'''
     
-    # 生成任务列表
-    task_list = ", ".join([f"task{i+1}" for i in range(len(product_addresses))])
+    code_content += generate_concurrent_execution_function(product_addresses)
+    
+    with open(file_path, 'w', encoding='utf-8') as f:
+        f.write(code_content)
+    log_info(f"生成步骤解释器测试文件: {file_path}, 产品数: {len(product_addresses)}, 步骤数: {len(test_steps)}")
+
+def generate_concurrent_execution_function(product_addresses):
+    """根据产品地址数量动态生成并发执行函数"""
+    # 根据产品数量决定是否添加序号
+    function_names = get_product_function_names(product_addresses)
+    
+    # 生成测试函数列表（按产品顺序，分片执行时按序号选取）
+    function_list = ", ".join(function_names)
     
     # 生成并发执行函数
     concurrent_code = f'''
@@ -6012,41 +6388,41 @@ async def test_concurrent_independent_browsers():
     并发执行 ''' + str(len(product_addresses)) + ''' 个完全独立的浏览器实例
     每个测试方法都会获得自己独立的浏览器进程
     """
-    # 存储所有创建的任务，用于清理
+    # 存储所有创建的任务和浏览器参数，用于清理
     tasks = []
+    browser_args_list = {}
     try:
         log_info("开始并发执行 ''' + str(len(product_addresses)) + ''' 个独立浏览器实例")
         log_info("=" * 60)
 
-        # 获取浏览器位置
+        # 获取浏览器位置（分片执行时仍按全部浏览器统一布局，保证各进程窗口互不重叠）
         browser_count = ''' + str(len(product_addresses)) + '''  # 当前有''' + str(len(product_addresses)) + '''个测试方法
         browser_positions = screen_manager.get_browser_positions(browser_count)
         
-        # 为每个位置生成浏览器参数
-        browser_args_list = []
-        for position in browser_positions:
-            browser_args = screen_manager.get_browser_args(position, browser_count)
-            browser_args_list.append(browser_args)
+        # 当前进程负责的浏览器序号（未分片时为全部）
+        shard_indices = screen_manager.get_shard_indices(browser_count)
+        
+        # 为当前进程负责的位置生成浏览器参数
+        for index in shard_indices:
+            browser_args_list[index] = screen_manager.get_browser_args(browser_positions[index], browser_count)
 
         # 打印布局信息
         screen_manager.print_layout_info(browser_count)
         
-        # 创建 ''' + str(len(product_addresses)) + ''' 个独立的浏览器实例任务
-        ''' + '\n        '.join([call.strip() for call in function_calls]) + '''
+        # 创建独立的浏览器实例任务
+        test_functions = [''' + function_list + ''']
+        tasks = [asyncio.create_task(test_functions[index](browser_args_list[index])) for index in shard_indices]
         
-        log_info("创建了 ''' + str(len(product_addresses)) + ''' 个独立浏览器实例的测试任务")
+        log_info(f"创建了 {len(tasks)}/{browser_count} 个独立浏览器实例的测试任务")
         log_info("开始并发执行...")
         
-        # 存储创建的任务
-        tasks = [''' + task_list + ''']
-        
         # 并发执行所有测试
         results = await asyncio.gather(*tasks, return_exceptions=True)
         
-        # 处理结果
+        # 处理结果（序号对应产品在文件中的顺序）
         success_count = 0
         failed_tests = []
-        for i, result in enumerate(results, 1):
+        for i, result in zip([index + 1 for index in shard_indices], results):
             if isinstance(result, Exception):
                 error_msg = str(result)
                 if "EPIPE" in error_msg:
@@ -6064,6 +6440,10 @@ async def test_concurrent_independent_browsers():
             log_info("所有测试都成功完成！")
         else:
             log_info("部分测试失败，请检查错误信息")
+            if int(os.environ.get('UI_SHARD_COUNT', '1')) > 1:
+                # 分片执行时不调用取消接口（会终止仍在运行的其他分片），以非0返回码退出，由父进程汇总各分片返回码决定最终状态
+                log_info("分片执行，跳过取消接口调用，由父进程汇总各分片结果")
+                raise Exception(f"并发测试失败: {', '.join(failed_tests)}")
             # 获取当前项目ID
             project_id = os.environ.get('PROJECT_ID')
             if not project_id:
@@ -6094,6 +6474,10 @@ async def test_concurrent_independent_browsers():
         # 如果有任何测试失败，抛出异常让pytest知道测试失败
     except Exception as e:
         raise Exception(f"并发测试失败: {', '.join(failed_tests)}")
+    finally:
+        # 兜底释放虚拟显示（任务未启动或清理中途出错时，各测试函数的释放不会执行；重复释放无副作用）
+        for browser_args in browser_args_list.values():
+            screen_manager.release_browser_args(browser_args)
     return results
 
 '''
@@ -6188,17 +6572,17 @@ def get_grouped_automation_projects():
                     'id': row[0],
                     'project_id': row[1],
                     'process_name': row[2],
-                    'product_ids': json.loads(row[3]) if row[3] else [],
+                    'product_ids': json_columns.decode(row[3], [], ('automation_projects', 'product_ids', row[0], row[12])),
                     'system': row[4],
                     'product_type': row[5],
                     'environment': row[6],
                     'product_address': row[7],
-                    'test_steps': json.loads(row[8]) if row[8] else [],
+                    'test_steps': json_columns.decode(row[8], [], ('automation_projects', 'test_steps', row[0], row[12])),
                     'status': row[9],
                     'created_by': row[10],
                     'created_at': row[11],
                     'updated_at': row[12],
-                    'product_package_names': json.loads(row[13]) if row[13] else [],
+                    'product_package_names': json_columns.decode(row[13], [], ('automation_projects', 'product_package_names', row[0], row[12])),
                     'execution_count': row[14],
                     'last_start_time': row[15],
                     'last_status': row[16]
@@ -6452,7 +6836,8 @@ def generate_auth_accounts():
         if not isinstance(addresses, list):
             return jsonify({'success': False, 'message': 'addresses 参数必须为数组'}), 400
         # 为所有地址逐项生成账号列表（保留重复与顺序）
-        accounts_list = generate_unique_accounts_list_for_addresses(addresses)
+        # 按当前用户租用：预览/重新生成时复用该用户尚未保存的账号，不会不断消耗账号池
+        accounts_list = generate_unique_accounts_list_for_addresses(addresses, owner=f"generate:{session.get('username') or request.remote_addr}")
         # 从列表派生按地址去重映射，确保与 accounts_list 一致（重复地址仅保留第一条）
         accounts_map = {}
         for addr, item in zip(addresses or [], accounts_list or []):
@@ -1,4 +1,5 @@
-from flask import Flask, redirect, url_for, send_file, Response, send_from_directory, render_template, session, request
+from flask import Flask, redirect, url_for, send_file, Response, render_template, session, request, abort
+from werkzeug.security import safe_join
 from flask_cors import CORS
 from api.version_management import version_bp
 from api.automation_management import automation_bp
@@ -32,9 +33,30 @@ def create_app():
     
     # 启用CORS支持前后端分离，但允许credentials
     CORS(app, supports_credentials=True)
-    
-    # 禁用静态文件缓存（解决304重定向问题）
-    app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
+
+    # 请求耗时指标（先注册的 after_request 后执行，耗时包含响应压缩）
+    from utils.metrics import metrics, start_request_timer, observe_request
+    app.before_request(start_request_timer)
+    app.after_request(observe_request)
+
+    # JSON响应：有orjson时用orjson序列化；超过阈值的JSON/HTML响应按 Accept-Encoding 压缩
+    from utils.fast_json import FastJSONProvider
+    from utils.response_compression import compress_response
+    app.json = FastJSONProvider(app)
+    app.after_request(compress_response)
+
+    # 静态资源按内容指纹缓存：/static/ 由 static_assets 返回（强ETag + 条件请求，带 ?v=指纹 时长期缓存）
+    from utils.static_assets import static_assets
+    static_assets.build_manifest()
+    app.view_functions['static'] = static_assets.send_static
+
+    @app.url_defaults
+    def static_fingerprint(endpoint, values):
+        # 模板中的 url_for('static', filename=...) 自动带上内容指纹
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            version = static_assets.version(values['filename'])
+            if version:
+                values['v'] = version
     
     # 配置上传文件夹
     app.config['UPLOAD_FOLDER'] = 'static/uploads'
@@ -60,6 +82,20 @@ def create_app():
     init_db()
     log_info("数据库初始化完成")
     
+    # 启动进程监控与共享运行状态心跳（每个 worker 一份；多 worker 时由选出的监督者回收已退出 worker 的运行）
+    from api.automation_management import start_monitor_thread
+    start_monitor_thread()
+    
+    # 运行指标：各进程定期写出快照，已退出进程（测试子进程、被回收的 worker）的快照由监督者归档
+    from utils.run_registry import run_registry
+    metrics.set_compactor(lambda: run_registry.is_supervisor)
+    
+    # 启动存储清理线程（截图、轮转日志、过期测试文件、上传图片按容量和保留天数定时清理；多 worker 时只在监督者上执行）
+    from config.ui_config import UIConfig
+    if UIConfig.JANITOR_ENABLED:
+        from utils.storage_janitor import storage_janitor
+        storage_janitor.start()
+    
     # 注册蓝图
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(version_bp, url_prefix='/api/version')
@@ -92,16 +128,29 @@ def create_app():
         log_info("访问注册页面")
         return render_template('register.html')
     
+    def send_image(directory, prefix, filename):
+        """返回图片：磁盘上有文件时直接返回，否则按原路径到内容寻址产物存储查找（?thumb=1 返回缩略图）
+        均带强ETag支持条件请求，?v=<内容指纹> 与内容一致时长期缓存"""
+        thumbnail = request.args.get('thumb') in ('1', 'true')
+        file_path = safe_join(directory, filename)
+        if file_path is None:
+            abort(404)
+        if not thumbnail and os.path.isfile(file_path):
+            return static_assets.send_image(file_path)
+        from utils.artifact_store import artifact_store
+        resolved = artifact_store.resolve(f"{prefix}/{filename}", thumbnail=thumbnail)
+        if resolved is None:
+            abort(404)
+        object_path, mimetype = resolved
+        # 对象文件名即内容的sha256，无需再计算指纹
+        digest = os.path.basename(object_path).split('.')[0][:16]
+        return static_assets.send_image(object_path, mimetype=mimetype, digest=digest)
+
     # 添加Game_Img静态文件路由
     @app.route('/Game_Img/<filename>')
     def game_img(filename):
         log_info(f"请求游戏图片: {filename}")
-        response = send_from_directory(GAME_IMG_DIR, filename)
-        # 禁用缓存
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+        return send_image(GAME_IMG_DIR, 'Game_Img', filename)
     
     # 添加Excel模板下载路由
     @app.route('/download/excel-template')
@@ -144,23 +193,18 @@ def create_app():
     @app.route('/IMG_LOGS/IMA_ASSERT/<filename>')
     def assertion_img(filename):
         log_info(f"请求断言图片: {filename}")
-        response = send_from_directory(IMG_ASSERT_DIR, filename)
-        # 禁用缓存
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+        return send_image(IMG_ASSERT_DIR, 'IMG_LOGS/IMA_ASSERT', filename)
     
     # 添加测试截图文件路由
     @app.route('/IMG_LOGS/<filename>')
     def screenshot_img(filename):
         log_info(f"请求测试截图: {filename}")
-        response = send_from_directory(IMG_LOGS_DIR, filename)
-        # 禁用缓存
-        response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-        response.headers['Pragma'] = 'no-cache'
-        response.headers['Expires'] = '0'
-        return response
+        return send_image(IMG_LOGS_DIR, 'IMG_LOGS', filename)
+    
+    # 运行指标（Prometheus 文本格式，汇总全部 worker 和测试子进程）
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
     
     # 添加favicon路由
     @app.route('/favicon.ico')
@@ -178,16 +222,6 @@ def create_app():
 </svg>'''
         return Response(svg_content, mimetype='image/svg+xml')
     
-    # 添加全局静态文件缓存控制
-    @app.after_request
-    def after_request(response):
-        # 对所有静态文件禁用缓存
-        if request.path.startswith('/static/'):
-            response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-            response.headers['Pragma'] = 'no-cache'
-            response.headers['Expires'] = '0'
-        return response
-    
     log_info("Flask应用创建完成")
     return app
 
@@ -211,6 +245,7 @@ if __name__ == '__main__':
     app = create_app()
     log_info("应用启动成功，监听地址: http://0.0.0.0:5000")
     log_info("💡 提示: 建议使用 python scripts/quick_start.py 启动应用")
+    log_info("💡 提示: 生产环境请使用 python scripts/serve.py（gunicorn/waitress 多 worker）")
     log_info("按 Ctrl+C 停止应用")
     log_info("-" * 50)
     
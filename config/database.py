@@ -6,6 +6,7 @@ from typing import Optional
 
 # 数据库配置
 from .database_config import get_database_path, get_current_db_config, DATABASE_TYPE, MYSQL_CONFIG
+from utils.metrics import timed_query
 
 # 获取数据库路径（SQLite用）
 DATABASE_PATH = get_database_path() or 'automation.db'
@@ -621,12 +622,14 @@ def _execute_query_with_results_internal(conn, query, params=None):
     
     if config['type'] == 'mysql':
         cursor = conn.cursor()
-        cursor.execute(query, params or ())
+        with timed_query(query):
+            cursor.execute(query, params or ())
         results = cursor.fetchall()
         cursor.close()
         return results
     else:
-        cursor = conn.execute(query, params or ())
+        with timed_query(query):
+            cursor = conn.execute(query, params or ())
         return cursor.fetchall()
 
 def execute_single_result(conn, query, params=None):
@@ -635,12 +638,14 @@ def execute_single_result(conn, query, params=None):
     
     if config['type'] == 'mysql':
         cursor = conn.cursor()
-        cursor.execute(query, params or ())
+        with timed_query(query):
+            cursor.execute(query, params or ())
         result = cursor.fetchone()
         cursor.close()
         return result
     else:
-        cursor = conn.execute(query, params or ())
+        with timed_query(query):
+            cursor = conn.execute(query, params or ())
         return cursor.fetchone()
 
 def execute_insert_query(conn, query, params=None):
@@ -649,12 +654,14 @@ def execute_insert_query(conn, query, params=None):
     
     if config['type'] == 'mysql':
         cursor = conn.cursor()
-        cursor.execute(query, params or ())
+        with timed_query(query):
+            cursor.execute(query, params or ())
         insert_id = cursor.lastrowid
         cursor.close()
         return insert_id
     else:
-        cursor = conn.execute(query, params or ())
+        with timed_query(query):
+            cursor = conn.execute(query, params or ())
         return cursor.lastrowid
 
 def execute_query_without_results(conn, query, params=None):
@@ -663,10 +670,12 @@ def execute_query_without_results(conn, query, params=None):
     
     if config['type'] == 'mysql':
         cursor = conn.cursor()
-        cursor.execute(query, params or ())
+        with timed_query(query):
+            cursor.execute(query, params or ())
         cursor.close()
     else:
-        conn.execute(query, params or ())
+        with timed_query(query):
+            conn.execute(query, params or ())
 
 # 自动管理连接的版本
 def execute_single_result_auto(query, params=None):
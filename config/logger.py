@@ -2,28 +2,56 @@
 """
 日志配置模块
 提供统一的日志功能，支持控制台和文件输出
+
+日志记录器只把记录放入队列（QueueHandler），控制台、文件、数据库和执行日志的写入由后台监听线程完成，
+调用方不再等待I/O；消息支持 %-style 延迟格式化（log_debug("匹配 %s", path)），低于级别的日志不会格式化。
+各模块可通过 get_module_logger 取得子记录器并单独设置级别（MODULE_LOG_LEVELS / 环境变量 UI_LOG_LEVELS）。
 """
 
+import atexit
+import contextvars
 import logging
 import os
+import queue
 import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
-from logging.handlers import RotatingFileHandler
+from typing import Dict, Optional
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 # 日志级别配置
 LOG_LEVEL = logging.INFO
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# 默认日志记录器名称，模块记录器为其子记录器（UiAutomationProject.<模块>）
+DEFAULT_LOGGER_NAME = 'UiAutomationProject'
+
+# 模块日志级别：未配置的模块继承 LOG_LEVEL；可用环境变量覆盖，如 UI_LOG_LEVELS="ImageRecognition=DEBUG,FeatureMatcher=DEBUG"
+MODULE_LOG_LEVELS: Dict[str, int] = {
+    'ImageRecognition': logging.INFO,  # 识别内部的逐帧/逐尺度/缓存日志为DEBUG，排查识别问题时改为DEBUG
+}
+
+# 重复日志限流：同一记录器、同一级别、同一消息模板在窗口内最多输出 BURST 条，其余丢弃并在下一窗口汇总条数
+# 只作用于不高于 LOG_RATE_LIMIT_LEVEL 的日志，警告和错误不限流
+LOG_RATE_LIMIT_LEVEL = logging.DEBUG
+LOG_RATE_LIMIT_BURST = 20
+LOG_RATE_LIMIT_WINDOW = 10.0  # 秒
+
 # 日志文件配置
 LOG_DIR = 'Logs'
 LOG_FILE = os.path.join(LOG_DIR, 'app.log')
 MAX_LOG_SIZE = 10 * 1024 * 1024  # 10MB
 BACKUP_COUNT = 5
 
-# 全局变量，用于存储当前执行ID
-current_execution_id = None
+# 每次执行的独立日志文件：Logs/executions/<执行ID>.log
+EXECUTION_LOG_DIR = os.path.join(LOG_DIR, 'executions')
+
+# 当前执行ID按上下文（线程/协程）保存，并发执行的测试互不影响；新线程不继承，需在线程入口用 execution_log 设置
+_current_execution_id = contextvars.ContextVar('current_execution_id', default=None)
+# 测试子进程由父进程通过环境变量 UI_EXECUTION_ID 传入执行ID，整个子进程的日志都属于该执行
+_process_execution_id = os.environ.get('UI_EXECUTION_ID') or None
 # 线程锁，用于保护数据库写入操作
 db_write_lock = threading.Lock()
 # 文件处理器锁，用于保护文件操作
@@ -73,20 +101,20 @@ class ThreadSafeRotatingFileHandler(RotatingFileHandler):
                 except:
                     pass
 
+def _record_execution_id(record):
+    """日志记录所属的执行ID：经队列传递的记录在产生日志的线程中已取出，直接调用处理器时取当前上下文"""
+    if hasattr(record, 'execution_id'):
+        return record.execution_id
+    return _current_execution_id.get()
+
 class DatabaseLogHandler(logging.Handler):
-    """自定义数据库日志处理器，用于实时写入日志到数据库"""
-    
-    def __init__(self, level=logging.NOTSET):
-        super().__init__(level)
-        self.execution_id = None
-    
-    def set_execution_id(self, execution_id):
-        """设置当前执行ID"""
-        self.execution_id = execution_id
+    """自定义数据库日志处理器，用于实时写入日志到数据库（写入日志所属的执行记录）"""
     
     def emit(self, record):
         """发送日志记录到数据库"""
-        if not self.execution_id:
+        # 只处理本进程中通过 execution_log 设置的执行；测试子进程的日志由执行日志文件收集
+        execution_id = _record_execution_id(record)
+        if not execution_id:
             return
         
         # 使用线程锁保护数据库写入操作
@@ -109,7 +137,7 @@ class DatabaseLogHandler(logging.Handler):
                         SELECT detailed_log FROM automation_executions 
                         WHERE id = ?
                     ''')
-                    row = execute_single_result(conn, select_sql, (self.execution_id,))
+                    row = execute_single_result(conn, select_sql, (execution_id,))
                     existing_log = (row[0] if row else '') or ''
                     updated_log = existing_log + log_entry + "\n"
                     
@@ -118,41 +146,137 @@ class DatabaseLogHandler(logging.Handler):
                         SET detailed_log = ?
                         WHERE id = ?
                     ''')
-                    execute_query_without_results(conn, update_sql, (updated_log, self.execution_id))
+                    execute_query_without_results(conn, update_sql, (updated_log, execution_id))
             except Exception as e:
                 # 避免在日志处理中产生新的日志循环
                 print(f"数据库日志处理器错误: {e}")
 
-def setup_logger(name='UiAutomationProject', level=LOG_LEVEL):
+def get_execution_log_path(execution_id) -> str:
+    """某次执行的独立日志文件路径"""
+    return os.path.join(EXECUTION_LOG_DIR, f"{execution_id}.log")
+
+class ExecutionLogHandler(logging.Handler):
+    """按执行ID分流日志：当前上下文属于某次执行时，日志同时追加到该执行的独立日志文件
+
+    并发执行的测试各写各的文件；测试子进程（含分片进程）通过 UI_EXECUTION_ID 写入同一文件，
+    执行结束后收集日志只需读取该文件，不再按行号截取共享的 app.log。
     """
-    设置日志记录器
     
-    Args:
-        name: 日志记录器名称
-        level: 日志级别
-        
-    Returns:
-        配置好的日志记录器
+    def __init__(self, level=logging.NOTSET):
+        super().__init__(level)
+        self._files = {}
+        self._files_lock = threading.Lock()
+    
+    def emit(self, record):
+        execution_id = _record_execution_id(record) or _process_execution_id
+        if not execution_id:
+            return
+        try:
+            line = self.format(record) + '\n'
+            with self._files_lock:
+                f = self._files.get(execution_id)
+                if f is None:
+                    os.makedirs(EXECUTION_LOG_DIR, exist_ok=True)
+                    f = open(get_execution_log_path(execution_id), 'a', encoding='utf-8')
+                    self._files[execution_id] = f
+                # 多个进程追加写同一文件，每行单独写入并立即刷新
+                f.write(line)
+                f.flush()
+        except Exception:
+            self.handleError(record)
+    
+    def close_execution(self, execution_id):
+        """执行结束，关闭该执行的日志文件"""
+        with self._files_lock:
+            f = self._files.pop(execution_id, None)
+        if f is not None:
+            f.close()
+    
+    def close(self):
+        with self._files_lock:
+            files, self._files = list(self._files.values()), {}
+        for f in files:
+            try:
+                f.close()
+            except Exception:
+                pass
+        super().close()
+
+# 全局执行日志分流处理器（所有日志记录器共用）
+execution_log_handler = ExecutionLogHandler()
+
+class RateLimitFilter(logging.Filter):
+    """重复日志限流：按 (记录器, 级别, 消息模板) 计数，窗口内超过 burst 条的记录丢弃
+
+    在产生日志的线程中执行，被丢弃的记录不会进入队列；下一窗口第一条记录附带上一窗口被丢弃的条数。
+    使用 %-style 参数时同一调用点的模板相同，参数不同的重复日志也会被限流。
     """
-    # 确保日志目录存在
-    os.makedirs(LOG_DIR, exist_ok=True)
     
-    # 创建日志记录器
-    logger = logging.getLogger(name)
-    logger.setLevel(level)
+    def __init__(self, burst: int = LOG_RATE_LIMIT_BURST, window: float = LOG_RATE_LIMIT_WINDOW,
+                 max_level: int = LOG_RATE_LIMIT_LEVEL):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.max_level = max_level
+        self._counters = {}
+        self._lock = threading.Lock()
     
-    # 避免重复添加处理器
-    if logger.handlers:
-        return logger
+    def filter(self, record):
+        if record.levelno > self.max_level or self.burst <= 0:
+            return True
+        key = (record.name, record.levelno, record.msg if isinstance(record.msg, str) else id(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.window:
+                suppressed = counter[2] if counter else 0
+                if len(self._counters) > 10000:
+                    self._counters.clear()
+                self._counters[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.msg}（上一窗口另有 {suppressed} 条相同日志被限流）"
+                return True
+            if counter[1] < self.burst:
+                counter[1] += 1
+                return True
+            counter[2] += 1
+            return False
+
+class ContextQueueHandler(QueueHandler):
+    """把日志记录放入队列：只在当前线程记下所属执行ID，格式化和I/O都由监听线程完成"""
     
-    # 创建格式化器
-    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+    def prepare(self, record):
+        record.execution_id = _current_execution_id.get()
+        return record
+
+class LogPipelineListener(QueueListener):
+    """日志监听线程：依次交给控制台、文件、数据库和执行日志处理器；处理刷新/关闭执行日志等控制记录"""
+    
+    def handle(self, record):
+        control = getattr(record, 'log_control', None)
+        if control is None:
+            super().handle(record)
+            return
+        action, argument = control
+        if action == 'flush':
+            argument.set()
+        elif action == 'close_execution':
+            execution_log_handler.close_execution(argument)
+
+# 日志队列与监听线程（进程内唯一，所有日志记录器共用同一组处理器）
+_log_queue = queue.SimpleQueue()
+_listener: Optional[LogPipelineListener] = None
+_listener_lock = threading.Lock()
+_module_levels_applied = False
+
+def _create_handlers(level, formatter):
+    """创建实际输出的处理器：控制台、文件、数据库、执行日志"""
+    handlers = []
     
     # 控制台处理器
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
     console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    handlers.append(console_handler)
     
     # 文件处理器（使用线程安全版本）
     with file_handler_lock:
@@ -163,21 +287,107 @@ def setup_logger(name='UiAutomationProject', level=LOG_LEVEL):
                 backupCount=BACKUP_COUNT,
                 encoding='utf-8'
             )
-            file_handler.setLevel(level)
             file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+            handlers.append(file_handler)
         except Exception as e:
             print(f"创建文件日志处理器失败: {e}")
             # 如果文件处理器创建失败，只使用控制台处理器
     
-    # 数据库处理器
+    # 数据库处理器（逐条读写数据库，模块开启DEBUG时也只写入 level 及以上的日志）
     db_handler = DatabaseLogHandler(level)
     db_handler.setFormatter(formatter)
-    logger.addHandler(db_handler)
+    handlers.append(db_handler)
+    
+    # 执行日志分流处理器
+    if execution_log_handler.formatter is None:
+        execution_log_handler.setFormatter(formatter)
+    handlers.append(execution_log_handler)
+    return handlers
+
+def _ensure_listener(level):
+    global _listener
+    if _listener is not None:
+        return
+    with _listener_lock:
+        if _listener is not None:
+            return
+        formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+        _listener = LogPipelineListener(_log_queue, *_create_handlers(level, formatter), respect_handler_level=True)
+        _listener.start()
+        _listener._thread.name = 'log-listener'
+        # 退出时先排空队列再由 logging.shutdown 关闭处理器
+        atexit.register(stop_logging)
+
+def stop_logging():
+    """停止监听线程（队列中的日志全部写出后返回）"""
+    global _listener
+    with _listener_lock:
+        listener, _listener = _listener, None
+    if listener is not None and listener._thread is not None:
+        listener.stop()
+
+def flush_logs(timeout: float = 5.0) -> bool:
+    """等待此前放入队列的日志全部写出"""
+    if _listener is None:
+        return True
+    done = threading.Event()
+    _log_queue.put(logging.makeLogRecord({'log_control': ('flush', done)}))
+    return done.wait(timeout)
+
+def _apply_module_levels():
+    """应用 MODULE_LOG_LEVELS 与环境变量 UI_LOG_LEVELS 中的模块级别"""
+    global _module_levels_applied
+    levels = dict(MODULE_LOG_LEVELS)
+    for item in os.environ.get('UI_LOG_LEVELS', '').split(','):
+        module, _, level_name = item.partition('=')
+        level = logging.getLevelName(level_name.strip().upper())
+        if module.strip() and isinstance(level, int):
+            levels[module.strip()] = level
+    for module, level in levels.items():
+        logging.getLogger(f"{DEFAULT_LOGGER_NAME}.{module}").setLevel(level)
+    _module_levels_applied = True
+
+def setup_logger(name=DEFAULT_LOGGER_NAME, level=LOG_LEVEL):
+    """
+    设置日志记录器
+    
+    Args:
+        name: 日志记录器名称
+        level: 日志级别
+        
+    Returns:
+        配置好的日志记录器（只挂一个队列处理器，实际输出由监听线程完成）
+    """
+    # 确保日志目录存在
+    os.makedirs(LOG_DIR, exist_ok=True)
+    
+    # 创建日志记录器
+    logger = logging.getLogger(name)
+    logger.setLevel(level)
+    
+    # 避免重复添加处理器
+    if logger.handlers:
+        return logger
+    
+    _ensure_listener(level)
+    queue_handler = ContextQueueHandler(_log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    logger.addHandler(queue_handler)
+    if not _module_levels_applied:
+        _apply_module_levels()
     
     return logger
 
-def get_logger(name='UiAutomationProject'):
+def get_module_logger(module: str) -> logging.Logger:
+    """
+    获取模块日志记录器（默认记录器的子记录器，级别见 MODULE_LOG_LEVELS）
+
+    热路径中请使用 %-style 参数而不是f-string，低于级别时不会格式化：
+        logger.debug("[%s] 使用缓存的模板: %s", task_id, path)
+    """
+    return logging.getLogger(f"{DEFAULT_LOGGER_NAME}.{module}")
+
+def get_logger(name=DEFAULT_LOGGER_NAME):
     """
     获取日志记录器
     
@@ -192,51 +402,78 @@ def get_logger(name='UiAutomationProject'):
 # 创建默认日志记录器
 default_logger = setup_logger()
 
-def log_info(message):
-    """记录信息日志"""
-    default_logger.info(message)
+def log_info(message, *args):
+    """记录信息日志（args 为 %-style 参数，延迟到输出时格式化）"""
+    default_logger.info(message, *args)
 
-def log_error(message):
+def log_error(message, *args):
     """记录错误日志"""
-    default_logger.error(message)
+    default_logger.error(message, *args)
 
-def log_warning(message):
+def log_warning(message, *args):
     """记录警告日志"""
-    default_logger.warning(message)
+    default_logger.warning(message, *args)
 
-def log_debug(message):
-    """记录调试日志"""
-    default_logger.debug(message)
+def log_debug(message, *args):
+    """记录调试日志（未开启DEBUG时不格式化、不入队）"""
+    default_logger.debug(message, *args)
 
-def log_critical(message):
+def log_critical(message, *args):
     """记录严重错误日志"""
-    default_logger.critical(message)
+    default_logger.critical(message, *args)
 
 def set_current_execution_id(execution_id):
-    """设置当前执行ID，用于数据库日志记录"""
-    global current_execution_id
-    current_execution_id = execution_id
-    
-    # 为所有处理器设置执行ID
-    logger = get_logger()
-    for handler in logger.handlers:
-        if isinstance(handler, DatabaseLogHandler):
-            handler.set_execution_id(execution_id)
+    """设置当前上下文（线程/协程）的执行ID，用于数据库日志和执行日志文件"""
+    _current_execution_id.set(execution_id)
 
 def get_current_execution_id():
-    """获取当前执行ID"""
-    return current_execution_id
+    """获取当前执行ID（未设置时为测试子进程从环境变量继承的执行ID）"""
+    return _current_execution_id.get() or _process_execution_id
 
 def clear_current_execution_id():
-    """清除当前执行ID"""
-    global current_execution_id
-    current_execution_id = None
-    
-    # 清除所有处理器的执行ID
-    logger = get_logger()
-    for handler in logger.handlers:
-        if isinstance(handler, DatabaseLogHandler):
-            handler.set_execution_id(None) 
+    """清除当前上下文的执行ID"""
+    _current_execution_id.set(None)
+
+@contextmanager
+def execution_log(execution_id):
+    """
+    在当前线程中记录指定执行的日志（后台执行线程的入口处使用）
+
+    期间本线程的日志写入该执行的数据库详细日志和独立日志文件，结束后恢复原执行ID并关闭日志文件。
+    """
+    token = _current_execution_id.set(execution_id)
+    try:
+        yield get_execution_log_path(execution_id)
+    finally:
+        _current_execution_id.reset(token)
+        # 关闭放在队列中，等该执行此前的日志都写出后再关闭文件
+        if _listener is not None:
+            _log_queue.put(logging.makeLogRecord({'log_control': ('close_execution', execution_id)}))
+        else:
+            execution_log_handler.close_execution(execution_id)
+
+def read_execution_log(execution_id, filter_system: bool = True) -> Optional[str]:
+    """
+    读取某次执行的独立日志文件
+
+    Args:
+        execution_id: 执行ID
+        filter_system: 是否过滤系统管理日志
+
+    Returns:
+        日志内容；该执行没有独立日志文件时返回None（调用方可退回按行号读取 app.log）
+    """
+    # 先等队列中本进程的日志写出
+    flush_logs(2.0)
+    log_path = get_execution_log_path(execution_id)
+    if not os.path.exists(log_path):
+        return None
+    try:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as f:
+            lines = f.readlines()
+    except Exception as e:
+        return f"读取执行日志失败: {str(e)}"
+    return ''.join(_filter_system_lines(lines)) if filter_system else ''.join(lines)
 
 def read_log_lines(start_line: int, end_line: int, log_file: str = None) -> str:
     """
@@ -301,52 +538,54 @@ def read_test_execution_logs(start_line: int, end_line: int, log_file: str = Non
         
         # 提取指定行数范围的内容
         selected_lines = lines[start_line - 1:end_line]
-        
-        # 过滤系统管理日志，只保留测试执行相关的日志
-        # 放宽过滤范围：在超时/失败场景下保留清理、超时等关键信息
-        filtered_lines = []
-        system_keywords = [
-            # 系统管理相关，需要过滤
-            '执行记录已创建',
-            '执行记录已更新',
-            '测试开始，当前日志文件行数',
-            '测试文件分析结果',
-            '检测到多个测试方法',
-            '执行pytest命令',
-            '进程已添加到running_tests',
-            # 以下关键词在问题定位时有价值，保留（不加入过滤列表）
-            # '准备更新项目',
-            # '项目状态已更新为',
-            # '项目已从运行列表中移除',
-            '进程正常结束',
-            # '详细日志已更新',
-            # '详细日志已存储到执行记录',
-            '监控线程已启动',
-            '星火自动化测试平台启动中',
-            '正在创建Flask应用',
-            '上传目录已创建',
-            'Game_Img目录已创建',
-            '正在初始化数据库',
-            '数据库初始化完成',
-            '所有蓝图已注册完成',
-            'Flask应用创建完成',
-            '应用启动成功',
-            '按 Ctrl+C 停止应用'
-        ]
-        
-        for line in selected_lines:
-            # 检查是否包含系统管理关键词
-            is_system_log = any(keyword in line for keyword in system_keywords)
-            
-            # 保留不包含系统关键词的日志行
-            if not is_system_log:
-                filtered_lines.append(line)
-        
-        return ''.join(filtered_lines)
+        return ''.join(_filter_system_lines(selected_lines))
         
     except Exception as e:
         return f"读取测试执行日志失败: {str(e)}"
 
+def _filter_system_lines(lines):
+    """过滤系统管理日志，只保留测试执行相关的日志"""
+    # 放宽过滤范围：在超时/失败场景下保留清理、超时等关键信息
+    filtered_lines = []
+    system_keywords = [
+        # 系统管理相关，需要过滤
+        '执行记录已创建',
+        '执行记录已更新',
+        '测试开始，当前日志文件行数',
+        '测试文件分析结果',
+        '检测到多个测试方法',
+        '执行pytest命令',
+        '进程已添加到running_tests',
+        # 以下关键词在问题定位时有价值，保留（不加入过滤列表）
+        # '准备更新项目',
+        # '项目状态已更新为',
+        # '项目已从运行列表中移除',
+        '进程正常结束',
+        # '详细日志已更新',
+        # '详细日志已存储到执行记录',
+        '监控线程已启动',
+        '星火自动化测试平台启动中',
+        '正在创建Flask应用',
+        '上传目录已创建',
+        'Game_Img目录已创建',
+        '正在初始化数据库',
+        '数据库初始化完成',
+        '所有蓝图已注册完成',
+        'Flask应用创建完成',
+        '应用启动成功',
+        '按 Ctrl+C 停止应用'
+    ]
+    
+    for line in lines:
+        # 检查是否包含系统管理关键词
+        is_system_log = any(keyword in line for keyword in system_keywords)
+        
+        # 保留不包含系统关键词的日志行
+        if not is_system_log:
+            filtered_lines.append(line)
+    
+    return filtered_lines
+
 def get_log_file_line_count(log_file: str = None) -> int:
     """
     获取日志文件的总行数
@@ -414,6 +653,18 @@ def reset_logger():
     try:
         logger = get_logger()
         
+        # 停止监听线程并关闭实际输出的处理器（重新设置时重新创建）
+        listener = _listener
+        stop_logging()
+        if listener is not None:
+            for handler in listener.handlers:
+                if handler is execution_log_handler:
+                    continue
+                try:
+                    handler.close()
+                except:
+                    pass
+        
         # 移除所有现有的处理器
         for handler in logger.handlers[:]:
             logger.removeHandler(handler)
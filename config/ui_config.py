@@ -1,3 +1,6 @@
+import os
+
+
 class UIConfig:
     """UI自动化配置管理"""
     
@@ -10,6 +13,35 @@ class UIConfig:
     WINDOW_MARGIN = 50
     MAX_CONCURRENT_BROWSERS = 4
     
+    # 执行模式配置（可通过环境变量 UI_EXECUTION_MODE 覆盖）
+    # headed: 真实桌面分屏（默认）；headless: 无头Chromium固定视口；xvfb: 每个浏览器独占一个Xvfb虚拟显示
+    EXECUTION_MODE = os.environ.get('UI_EXECUTION_MODE', 'headed').strip().lower()
+    HEADLESS_VIEWPORT = {'width': 1920, 'height': 1080}  # 无头模式下的固定视口（CSS像素）
+    HEADLESS_DEVICE_SCALE_FACTOR = 1  # 无头模式下的固定DPR，保证截图与模板尺度一致
+    VIRTUAL_DISPLAY_SIZE = (1920, 1080)  # 每个Xvfb虚拟显示的分辨率
+    VIRTUAL_DISPLAY_BASE = 99  # 虚拟显示编号起点（:99, :100, ...）
+    VIRTUAL_DISPLAY_MAX = 64  # 单机最多同时分配的虚拟显示数量
+    
+    # 分片执行配置（可通过环境变量 UI_SHARD_SIZE 覆盖）
+    # 多产品测试文件按每 SHARD_SIZE 个产品拆分到独立的pytest进程，各自拥有事件循环和GIL；0 表示不分片
+    SHARD_SIZE = int(os.environ.get('UI_SHARD_SIZE', '0') or 0)
+    MAX_SHARD_PROCESSES = os.cpu_count() or 1  # 单次执行最多启动的分片进程数
+    
+    # 登录会话复用配置（可通过环境变量 UI_SESSION_REUSE 关闭）：登录成功后保存storage_state，有效期内跳过登录/注册步骤
+    SESSION_REUSE_ENABLED = os.environ.get('UI_SESSION_REUSE', '1').strip().lower() not in ('0', 'false', 'no')
+    SESSION_VAULT_DIR = os.path.join('Auth_Data', 'sessions')  # 相对项目根目录
+    SESSION_TTL = 12 * 3600  # 会话有效期（秒）
+    SESSION_CHECK_TIMEOUT = 3.0  # 恢复会话后检查登录态的等待时间（秒）
+    
+    # 注册账号池配置（可通过环境变量 UI_ACCOUNT_POOL_TARGET_SIZE / UI_ACCOUNT_POOL_LEASE_TTL 覆盖）
+    ACCOUNT_POOL_TARGET_SIZE = int(os.environ.get('UI_ACCOUNT_POOL_TARGET_SIZE', '200') or 200)  # 补充后的空闲账号数
+    ACCOUNT_POOL_REFILL_THRESHOLD = 50  # 空闲账号低于该值时后台补充
+    ACCOUNT_POOL_LEASE_TTL = int(os.environ.get('UI_ACCOUNT_POOL_LEASE_TTL', '3600') or 3600)  # 租约有效期（秒）
+    
+    # 测试文件生成方式（可通过环境变量 UI_TEST_FILE_STYLE 覆盖）
+    # runner: 生成精简测试文件，由 utils/step_runner.py 直接解释执行 test_steps；unrolled: 逐步展开生成完整代码
+    TEST_FILE_STYLE = os.environ.get('UI_TEST_FILE_STYLE', 'runner').strip().lower()
+    
     # 性能配置
     SCREENSHOT_CACHE_TIMEOUT = 1.0
     TEMPLATE_CACHE_ENABLED = True
@@ -35,11 +67,146 @@ class UIConfig:
     MAX_RETRY_ATTEMPTS = 6  # 进一步增加重试次数，提升复杂加载场景下的成功率
     RETRY_DELAY = 0.8  # 略增基础间隔，结合退避策略防抖
     
+    # 图片查找预算配置：一次查找（含点击重试）共享同一个截止时间和截图帧数，不再逐层重试相乘
+    IMAGE_SEARCH_TIMEOUT = 20  # 未指定timeout时单次查找的总预算（秒）
+    IMAGE_SEARCH_MAX_FRAMES = 30  # 单次查找最多截图帧数
+    IMAGE_SEARCH_BACKOFF_BASE = 0.2  # 首次退避等待（秒）
+    IMAGE_SEARCH_BACKOFF_FACTOR = 1.5  # 退避倍数
+    IMAGE_SEARCH_BACKOFF_MAX = 2.0  # 单次退避等待上限（秒）
+    IMAGE_SEARCH_STABLE_WAIT_FRACTION = 0.25  # 点击重试轮中等待页面稳定最多占用剩余预算的比例（首轮等待不计入预算）
+    
+    # 视觉计算线程池配置（OpenCV计算会释放GIL，放到线程池中避免阻塞事件循环）
+    VISION_EXECUTOR_WORKERS = max(2, min(8, os.cpu_count() or 2))  # 线程池大小
+    VISION_PER_TASK_LIMIT = 2  # 单个任务同时占用的最大线程数，防止单个浏览器占满线程池
+    
+    # 匹配结果备忘配置：页面画面不变时复用模板匹配结果（命中/未命中都复用）
+    MATCH_MEMO_ENABLED = True
+    MATCH_MEMO_SIZE = 256  # 每个页面最多缓存的匹配结果条数
+    FRAME_FINGERPRINT_SIZE = (128, 72)  # 画面指纹的降采样尺寸 (宽, 高)
+
+    # DPR归一化配置：截图缩放到CSS像素、模板按上传时记录的源DPR换算到CSS像素，识别坐标直接为CSS坐标
+    DPR_NORMALIZE_ENABLED = True
+    TEMPLATE_META_FILE = os.path.join('Game_Img', 'template_meta.json')  # 模板源DPR/CSS尺寸记录
+    DPR_NORMALIZED_SCALE_FACTORS = [1.0]  # 已知源DPR的模板首次尝试只做单尺度匹配
+
+    # 模板预筛选配置：全分辨率匹配前先做颜色直方图和降采样粗匹配，快速排除不存在的模板
+    PREFILTER_QUICK_CHECK = True  # quick_check_presence（遮挡物检测、点击后消失检测）默认开启
+    PREFILTER_SMART_MATCH = False  # find_image 的多尺度匹配是否也启用预筛选
+    PREFILTER_DOWNSAMPLE = 4  # 粗匹配降采样倍数
+    PREFILTER_HIST_BINS = 8  # 颜色直方图每通道分箱数
+    PREFILTER_HIST_MIN_COVERAGE = 0.5  # 模板颜色在画面中的最低覆盖率
+    PREFILTER_COARSE_MARGIN = 0.2  # 粗匹配得分低于 (阈值 - 余量) 时判定不存在
+    PREFILTER_MIN_COARSE_SIZE = 6  # 降采样后模板边长小于该值时跳过预筛选
+    VISION_CORPUS_DIR = os.environ.get('UI_VISION_CORPUS_DIR', '')  # 非空时记录快速检测的基准语料
+
+    # 识别引擎配置：template（多尺度模板匹配）、feature（ORB/AKAZE特征匹配）、auto（先特征匹配，失败再模板匹配）
+    MATCH_ENGINE = os.environ.get('UI_MATCH_ENGINE', 'template').strip().lower()
+    TEMPLATE_MATCH_ENGINES = {}  # 按模板指定引擎，例如 {'Game_Img/xxx.png': 'feature'}
+    FEATURE_DETECTOR = 'orb'  # orb 或 akaze
+    FEATURE_MAX_FRAME_KEYPOINTS = 5000  # 每帧画面最多检测的关键点数（仅ORB生效）
+    FEATURE_MAX_TEMPLATE_KEYPOINTS = 500  # 每个模板最多保留的关键点数（仅ORB生效）
+    FEATURE_RATIO_TEST = 0.75  # Lowe比值测试阈值
+    FEATURE_MIN_INLIERS = 8  # 单应性内点数下限
+    FEATURE_RANSAC_THRESHOLD = 5.0  # RANSAC重投影误差阈值（像素）
+    FEATURE_MIN_SCALE = 0.3  # 估计缩放的合理范围
+    FEATURE_MAX_SCALE = 3.0
+    FEATURE_FRAME_CACHE_SIZE = 4  # 缓存最近几帧画面的特征
+
+    # 屏幕截取配置（pyautogui兜底识别共用）：同一节拍内的截屏请求合并为一次
+    SCREEN_GRAB_TICK = 0.05  # 请求合并窗口（秒）
+    SCREEN_GRAB_MAX_AGE = 0.15  # 刚截取的画面可直接复用的时长（秒）
+
+    # 图片断言参考图缓存配置：参考图的灰度图、SSIM均值/方差图、感知哈希只计算一次
+    REFERENCE_CACHE_MAX_MB = 256  # 参考图特征缓存的内存上限（MB），超出后按LRU淘汰
+    SSIM_DOWNSCALE = 1.0  # SSIM比较前的默认缩小比例，1.0表示按参考图原尺寸比较
+
+    # 感知哈希索引配置：历史截图与断言图按 dHash+pHash 建BK树，支持"是否见过该画面"查询和截图去重
+    PHASH_INDEX_FILE = os.path.join('IMG_LOGS', 'phash_index.jsonl')  # 相对项目根目录，追加写
+    PHASH_INDEX_SCREENSHOTS = True  # 步骤截图保存时写入索引
+    PHASH_DEDUP_SCREENSHOTS = False  # 画面与已有截图一致时硬链接到已有文件，不重复占用磁盘（开启产物存储时不生效）
+    PHASH_DEDUP_DISTANCE = 0  # 判定为同一画面的最大汉明距离（dHash+pHash 共128位）
+
+    # 内容寻址产物存储配置：截图、断言图和上传模板按sha256分片保存，相同内容只存一份
+    ARTIFACT_STORE_DIR = 'Artifacts'  # 相对项目根目录，objects/ 为对象文件，artifacts.db 为元数据表
+    ARTIFACT_STORE_SCREENSHOTS = True  # 步骤截图写入产物存储（不再在 IMG_LOGS 下生成文件，由路由按原路径查表返回；优先于 PHASH_DEDUP_SCREENSHOTS）
+    ARTIFACT_FORMAT = 'png'  # 截图存储格式：png / webp / jpeg
+    ARTIFACT_QUALITY = 90  # webp/jpeg 质量
+    ARTIFACT_THUMBNAIL_WIDTH = 320  # 缩略图宽度（像素），0表示不生成
+    ARTIFACT_ENCODE_WORKERS = 2  # 后台转码线程数
+    ARTIFACT_RESOLVE_TIMEOUT = 10.0  # 查询尚在转码中的截图时最多等待的时长（秒）
+
+    # 存储清理配置：后台定时按目录的容量和保留天数清理，活跃项目引用的文件和最近执行期间产生的文件不删除
+    JANITOR_ENABLED = True
+    JANITOR_INTERVAL = 3600  # 清理间隔（秒）
+    JANITOR_INDEX_FILE = os.path.join('Logs', 'janitor_index.json')  # 文件索引（大小、修改时间），目录未变化时不重新扫描
+    JANITOR_RECENT_EXECUTIONS = 20  # 最近N次执行开始后产生的文件一律保留
+    JANITOR_ARTIFACT_SCREENSHOT_DAYS = 14  # 产物存储中步骤截图的保留天数，None表示不清理
+    JANITOR_RULES = [  # max_mb / max_age_days 为 None 表示不限制
+        {'dir': 'IMG_LOGS', 'patterns': ['*.png', '*.jpg', '*.jpeg', '*.webp'], 'max_mb': 2048, 'max_age_days': 14},
+        {'dir': os.path.join('IMG_LOGS', 'IMA_ASSERT'), 'patterns': ['*.png', '*.jpg', '*.jpeg'], 'max_mb': 512, 'max_age_days': 90},
+        {'dir': 'Logs', 'patterns': ['*.log.*'], 'max_mb': 500, 'max_age_days': 30},  # 只清理轮转后的日志
+        {'dir': os.path.join('Logs', 'executions'), 'patterns': ['*.log'], 'max_mb': 500, 'max_age_days': 30},  # 每次执行的独立日志
+        # generated_only：只清理平台生成过的测试文件（project_files 中有记录），手写用例不动
+        {'dir': 'Test_Case', 'patterns': ['*.py'], 'max_mb': None, 'max_age_days': 60, 'generated_only': True},
+        {'dir': os.path.join('static', 'uploads'), 'patterns': ['*'], 'max_mb': 1024, 'max_age_days': 90},
+    ]
+
+    # 静态资源缓存配置：资源按内容指纹（?v=）长期缓存，图片与页面使用强ETag条件请求
+    STATIC_IMMUTABLE_MAX_AGE = 365 * 24 * 3600  # 带正确指纹的资源缓存时长（秒）
+    STATIC_PRECOMPRESSED = True  # 客户端接受时返回 scripts/compress_static.py 生成的 .br/.gz 文件
+
+    # API响应压缩配置：JSON/HTML响应超过阈值时按客户端支持选择 br/gzip
+    API_COMPRESSION_ENABLED = True
+    API_COMPRESSION_MIN_SIZE = 1024  # 小于该字节数的响应不压缩
+    API_GZIP_LEVEL = 6
+    API_BROTLI_QUALITY = 5  # 动态响应使用中等质量，兼顾压缩率与耗时
+
+    # 共享运行状态配置：多 worker 部署时各进程通过该 SQLite 文件共享运行中的测试、取消标志和监督者租约
+    RUN_STATE_DB = os.path.join('Logs', 'run_state.db')  # 相对项目根目录，所有 worker 须在同一主机上访问同一文件
+    RUN_STATE_HEARTBEAT_INTERVAL = 2  # 心跳间隔（秒），取消请求最迟在一个间隔后同步到执行该测试的 worker
+    RUN_STATE_STALE_SECONDS = 30  # 心跳超过该时长未刷新视为 worker 已退出，运行记录由监督者回收
+    RUN_SUPERVISOR_LEASE_SECONDS = 15  # 监督者租约时长（秒），持有者退出后其他 worker 在租约过期后接管
+
+    # 运行指标配置：服务 worker 和测试子进程各自累计指标并定期写出快照，/metrics 汇总全部进程后以 Prometheus 文本格式输出
+    METRICS_ENABLED = True
+    METRICS_DIR = os.path.join('Logs', 'metrics')  # 相对项目根目录，每个进程一个快照文件
+    METRICS_FLUSH_INTERVAL = 5  # 快照写出间隔（秒），测试子进程退出时也会写出一次
+    METRICS_STALE_SECONDS = 60  # 快照超过该时长未刷新视为进程已退出，由监督者并入归档
+
+    # 模板先验配置：按 (模板, 窗口尺寸+DPR) 统计历史命中的尺度和位置，优先尝试最可能的尺度和区域
+    TEMPLATE_PRIORS_ENABLED = True
+    TEMPLATE_PRIORS_FILE = os.path.join('Game_Img', 'template_priors.json')  # 相对项目根目录
+    TEMPLATE_PRIORS_MIN_HITS = 3  # 至少命中几次才启用先验
+    TEMPLATE_PRIORS_MAX_POSITIONS = 50  # 每个布局保留的最近命中位置数
+    TEMPLATE_PRIORS_LAYOUT_BUCKET = 20  # 窗口尺寸按该粒度（CSS像素）归类
+    TEMPLATE_PRIORS_REGION_MARGIN = 1.0  # 历史区域外扩的模板尺寸倍数
+    TEMPLATE_PRIORS_SAVE_INTERVAL = 5.0  # 统计写盘的最小间隔（秒）
+
     # 多尺度匹配配置
     MULTI_SCALE_ENABLED = True  # 启用多尺度匹配
     SCALE_FACTORS = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5]  # 支持缩放到50%
     CONFIDENCE_LEVELS = [0.8, 0.7, 0.6, 0.55, 0.5, 0.45, 0.4, 0.35, 0.3]  # 限制最低到0.3，降低误报
     
+    @classmethod
+    def is_headless(cls) -> bool:
+        """是否以无头模式启动浏览器"""
+        return cls.EXECUTION_MODE == 'headless'
+    
+    @classmethod
+    def uses_virtual_display(cls) -> bool:
+        """是否为每个浏览器分配独立的Xvfb虚拟显示"""
+        return cls.EXECUTION_MODE == 'xvfb'
+    
+    @classmethod
+    def uses_real_screen(cls) -> bool:
+        """浏览器是否绘制在测试进程可见的真实屏幕上（pyautogui兜底的前提）"""
+        return not (cls.is_headless() or cls.uses_virtual_display())
+    
+    @classmethod
+    def uses_step_runner(cls) -> bool:
+        """生成的测试文件是否交由步骤解释器执行"""
+        return cls.TEST_FILE_STYLE != 'unrolled'
+    
     @classmethod
     def get_image_recognition_config(cls):
         """获取图片识别配置"""
@@ -48,7 +215,8 @@ class UIConfig:
             'timeout': cls.IMAGE_WAIT_TIMEOUT,
             'check_interval': cls.IMAGE_CHECK_INTERVAL,
             'use_screenshot': cls.USE_SCREENSHOT_RECOGNITION,
-            'use_pyautogui_fallback': cls.PYTHONAUTOGUI_FALLBACK,
+            # 无头/虚拟显示模式下测试进程看不到浏览器窗口，关闭pyautogui兜底
+            'use_pyautogui_fallback': cls.PYTHONAUTOGUI_FALLBACK and cls.uses_real_screen(),
             'hybrid_enabled': cls.HYBRID_RECOGNITION_ENABLED,
             'screenshot_first': cls.SCREENSHOT_FIRST,
             'screenshot_cache_timeout': cls.SCREENSHOT_CACHE_TIMEOUT,
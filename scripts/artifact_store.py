@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址产物存储工具
+把 Game_Img、IMG_LOGS 下已有的图片按内容入库（Artifacts/objects），内容相同的副本共用一个对象，
+并支持查看存储统计、清理无引用的对象。
+
+用法:
+    python scripts/artifact_store.py import                       # 导入 Game_Img 与 IMG_LOGS/IMA_ASSERT，原路径改为硬链接
+    python scripts/artifact_store.py import --dir IMG_LOGS --kind screenshot --move   # 历史截图入库后删除原文件
+    python scripts/artifact_store.py stats
+    python scripts/artifact_store.py gc
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from utils.artifact_store import ArtifactStore
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg', '.webp'}
+DEFAULT_DIRS = [('Game_Img', 'template'), (os.path.join('IMG_LOGS', 'IMA_ASSERT'), 'assertion')]
+
+
+def _iter_images(directory: Path, recursive: bool):
+    pattern = directory.rglob('*') if recursive else directory.glob('*')
+    for image_path in sorted(pattern):
+        if image_path.suffix.lower() in IMAGE_SUFFIXES and image_path.is_file():
+            yield image_path
+
+
+def import_dir(store: ArtifactStore, directory: Path, kind: str, move: bool, recursive: bool):
+    start = time.perf_counter()
+    before = store.get_stats()
+    imported = failed = 0
+    for image_path in _iter_images(directory, recursive):
+        if store.import_file(str(image_path), kind=kind, materialize=not move) is None:
+            failed += 1
+            continue
+        if move:
+            os.remove(image_path)
+        imported += 1
+    after = store.get_stats()
+    print(f"{directory}: 导入 {imported} 张，失败 {failed} 张，新增对象 {after['objects'] - before['objects']} 个，"
+          f"耗时 {time.perf_counter() - start:.1f}s")
+
+
+def print_stats(store: ArtifactStore):
+    stats = store.get_stats()
+    print(f"对象 {stats['objects']} 个，共 {stats['bytes'] / 1024 / 1024:.1f}MB")
+    print(f"路径 {stats['links']} 个，其中 {stats['deduplicated']} 个与其他路径内容相同")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="内容寻址产物存储：导入已有图片、查看统计、清理无引用对象")
+    parser.add_argument('--root', default=None, help="存储目录，默认取 UIConfig.ARTIFACT_STORE_DIR")
+    sub = parser.add_subparsers(dest='command', required=True)
+    import_parser = sub.add_parser('import', help="按内容导入目录下的图片")
+    import_parser.add_argument('--dir', default=None, help="图片目录，默认导入 Game_Img 与 IMG_LOGS/IMA_ASSERT")
+    import_parser.add_argument('--kind', default='', help="产物类型（template / assertion / screenshot）")
+    import_parser.add_argument('--move', action='store_true',
+                               help="入库后删除原文件（只适用于截图，由路由按原路径查表返回）")
+    import_parser.add_argument('--recursive', action='store_true', help="递归导入子目录")
+    sub.add_parser('stats', help="查看存储统计")
+    sub.add_parser('gc', help="删除没有任何路径引用的对象")
+    args = parser.parse_args()
+
+    store = ArtifactStore(args.root)
+    if args.command == 'import':
+        targets = [(Path(args.dir), args.kind)] if args.dir else [(project_root / d, k) for d, k in DEFAULT_DIRS]
+        for directory, kind in targets:
+            import_dir(store, directory, kind, args.move, args.recursive)
+        print_stats(store)
+    elif args.command == 'stats':
+        print_stats(store)
+    else:
+        result = store.gc()
+        print(f"删除对象 {result['removed_objects']} 个，释放 {result['freed_bytes'] / 1024 / 1024:.1f}MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+账号存储导入/导出工具
+账号数据保存在 Auth_Data/auth_accounts.db（SQLite），首次使用时自动导入旧的 auth_accounts.yaml。
+本工具用于手动同步两者：导出为原YAML结构便于查看/备份，或将编辑后的YAML重新导入。
+
+用法:
+    python scripts/auth_accounts_store.py export                        # 导出到 Auth_Data/auth_accounts.yaml
+    python scripts/auth_accounts_store.py export --output backup.yaml --no-steps
+    python scripts/auth_accounts_store.py import                        # 合并导入（同一项目文件以YAML为准）
+    python scripts/auth_accounts_store.py import --input backup.yaml --replace
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+# 账号存储使用相对项目根目录的 Auth_Data
+os.chdir(project_root)
+
+from utils import auth_accounts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="账号存储（SQLite）与 auth_accounts.yaml 之间的导入/导出")
+    sub = parser.add_subparsers(dest='command', required=True)
+    export_parser = sub.add_parser('export', help="导出为YAML")
+    export_parser.add_argument('--output', default=auth_accounts._FILE_PATH, help="输出文件")
+    export_parser.add_argument('--no-steps', action='store_true', help="不导出 by_step 历史记录")
+    import_parser = sub.add_parser('import', help="从YAML导入")
+    import_parser.add_argument('--input', default=auth_accounts._FILE_PATH, help="输入文件")
+    import_parser.add_argument('--replace', action='store_true', help="导入前清空数据库")
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        count = auth_accounts.export_yaml(args.output, include_steps=not args.no_steps)
+        print(f"已导出 {count} 个项目文件到 {args.output}")
+    else:
+        if not os.path.exists(args.input):
+            print(f"文件不存在: {args.input}")
+            return
+        count = auth_accounts.import_yaml(args.input, replace=args.replace)
+        print(f"已从 {args.input} 导入 {count} 个项目文件")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+API响应序列化与压缩基准测试
+对比 标准库jsonify / orjson（FastJSONProvider） 以及 是否压缩 时，典型接口的 p50/p99 耗时和传输字节数。
+
+默认使用按 /executions、/executions/<id>、/report/generate、/projects/grouped 响应结构合成的数据，
+在进程内的 Flask 测试客户端上测量（不依赖数据库）；指定 --url 时改为请求正在运行的服务。
+
+用法:
+    python scripts/benchmark_api.py
+    python scripts/benchmark_api.py --rounds 500 --log-kb 64
+    python scripts/benchmark_api.py --url http://127.0.0.1:5000/api --rounds 50
+"""
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import time
+import urllib.request
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from flask import Flask, jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from config.ui_config import UIConfig
+from utils import fast_json
+from utils import response_compression
+from utils.fast_json import FastJSONProvider, json_columns
+from utils.response_compression import compress_response
+
+LIVE_ENDPOINTS = ['/executions?page_size=50', '/executions/{execution_id}', '/projects/grouped']
+
+
+def _log_text(size_kb: int) -> str:
+    lines = []
+    total = 0
+    step = 0
+    while total < size_kb * 1024:
+        step += 1
+        line = (f"[2024-05-01 10:{step // 60 % 60:02d}:{step % 60:02d}] INFO 步骤{step}: "
+                f"点击 Game_Img/button_{step % 37}.png 置信度 0.{random.randint(80, 99)} 位置 ({step * 7 % 1920}, {step * 13 % 1080})")
+        lines.append(line)
+        total += len(line.encode('utf-8')) + 1
+    return '\n'.join(lines)
+
+
+def build_payloads(log_kb: int):
+    """按接口的响应结构合成数据"""
+    random.seed(42)
+    start = datetime(2024, 5, 1, 10, 0, 0)
+    executions = []
+    for i in range(50):
+        executions.append({
+            'id': 1000 + i, 'project_id': i % 12, 'process_name': f'登录注册流程{i % 12}',
+            'product_ids': f'["P{i % 7:03d}", "P{(i + 3) % 7:03d}"]', 'system': 'android', 'product_type': '游戏',
+            'environment': 'test', 'product_address': f'https://game{i % 5}.example.com/play',
+            'status': random.choice(['completed', 'failed', 'running']),
+            'start_time': start + timedelta(minutes=i), 'end_time': start + timedelta(minutes=i, seconds=95),
+            'log_message': '执行完成', 'detailed_log': _log_text(log_kb // 8 or 1),
+            'executed_by': 'tester', 'cancel_type': None,
+        })
+    detail = dict(executions[0], detailed_log=_log_text(log_kb))
+
+    steps = [{'operation_type': 'click', 'operation_event': f'Game_Img/button_{n}.png', 'operation_params': '',
+              'operation_count': 1, 'pause_time': 1, 'is_assertion': n % 5 == 0} for n in range(40)]
+    projects_raw = []
+    for i in range(120):
+        projects_raw.append((i, f'PRJ{i:04d}', f'流程{i}', f'["P{i % 7:03d}"]', 'android', '游戏', 'test',
+                             f'https://game{i % 5}.example.com/play', json.dumps(steps, ensure_ascii=False),
+                             'active', 'tester', start, start + timedelta(days=i),
+                             f'["com.example.game{i % 9}"]'))
+
+    report = {
+        'summary': {'total': 320, 'passed': 288, 'failed': 32, 'pass_rate': 90.0},
+        'executions': [{k: v for k, v in e.items() if k != 'detailed_log'} for e in executions] * 6,
+        'failures': [{'execution_id': e['id'], 'step': n, 'message': '未找到目标图片', 'screenshot': f'/IMG_LOGS/{e["id"]}_{n}.png'}
+                     for e in executions for n in range(3)],
+    }
+    return executions, detail, projects_raw, report
+
+
+def build_app(payloads, use_orjson: bool, compress: bool) -> Flask:
+    executions, detail, projects_raw, report = payloads
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app) if use_orjson else DefaultJSONProvider(app)
+    if compress:
+        app.after_request(compress_response)
+
+    def decode(raw, row, column):
+        if use_orjson:
+            return json_columns.decode(raw, [], ('automation_projects', column, row[0], row[12]))
+        return json.loads(raw) if raw else []
+
+    @app.route('/executions')
+    def executions_view():
+        return jsonify({'success': True, 'data': {'executions': executions,
+                                                  'pagination': {'page': 1, 'page_size': 50, 'total_count': 500}}})
+
+    @app.route('/executions/1')
+    def execution_detail_view():
+        return jsonify({'success': True, 'data': detail})
+
+    @app.route('/report/generate')
+    def report_view():
+        return jsonify({'success': True, 'data': report})
+
+    @app.route('/projects/grouped')
+    def grouped_view():
+        groups = {}
+        for row in projects_raw:
+            project = {'id': row[0], 'project_id': row[1], 'process_name': row[2],
+                       'product_ids': decode(row[3], row, 'product_ids'), 'system': row[4],
+                       'test_steps': decode(row[8], row, 'test_steps'), 'updated_at': row[12],
+                       'product_package_names': decode(row[13], row, 'product_package_names')}
+            groups.setdefault(project['product_package_names'][0], []).append(project)
+        return jsonify({'success': True, 'data': groups})
+
+    return app
+
+
+def _percentiles(samples):
+    ordered = sorted(samples)
+    p99_index = min(len(ordered) - 1, int(round(len(ordered) * 0.99)) - 1)
+    return statistics.median(ordered) * 1000, ordered[max(0, p99_index)] * 1000
+
+
+def bench_local(args):
+    payloads = build_payloads(args.log_kb)
+    encoding = 'br, gzip' if response_compression.brotli is not None else 'gzip'
+    variants = [('stdlib', False, False), ('stdlib+压缩', False, True),
+                ('orjson', True, False), ('orjson+压缩', True, True)]
+    if fast_json.orjson is None:
+        print("未安装orjson，orjson 变体将退回标准库实现")
+    print(f"压缩阈值 {UIConfig.API_COMPRESSION_MIN_SIZE}B，gzip level {UIConfig.API_GZIP_LEVEL}，"
+          f"brotli {'quality ' + str(UIConfig.API_BROTLI_QUALITY) if response_compression.brotli else '未安装'}")
+    print(f"{'接口':<20}{'方案':<14}{'p50(ms)':>10}{'p99(ms)':>10}{'字节':>12}")
+    for path in ('/executions', '/executions/1', '/report/generate', '/projects/grouped'):
+        for name, use_orjson, compress in variants:
+            json_columns.clear()
+            client = build_app(payloads, use_orjson, compress).test_client()
+            headers = {'Accept-Encoding': encoding}
+            client.get(path, headers=headers)
+            samples = []
+            size = 0
+            for _ in range(args.rounds):
+                started = time.perf_counter()
+                response = client.get(path, headers=headers)
+                body = response.get_data()
+                samples.append(time.perf_counter() - started)
+                size = len(body)
+            p50, p99 = _percentiles(samples)
+            print(f"{path:<20}{name:<14}{p50:>10.2f}{p99:>10.2f}{size:>12}")
+
+
+def bench_live(args):
+    base = args.url.rstrip('/')
+    for path in LIVE_ENDPOINTS:
+        url = base + path.format(execution_id=args.execution_id)
+        for encoding in ('identity', 'gzip', 'br'):
+            samples = []
+            size = 0
+            for _ in range(args.rounds):
+                req = urllib.request.Request(url, headers={'Accept-Encoding': encoding})
+                started = time.perf_counter()
+                with urllib.request.urlopen(req) as response:
+                    body = response.read()
+                    served = response.headers.get('Content-Encoding', 'identity')
+                samples.append(time.perf_counter() - started)
+                size = len(body)
+            p50, p99 = _percentiles(samples)
+            print(f"{path:<28}请求{encoding:<9}返回{served:<9}p50 {p50:8.2f}ms  p99 {p99:8.2f}ms  {size:>10}B")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比JSON序列化方案和响应压缩的耗时与传输字节数")
+    parser.add_argument('--rounds', type=int, default=200, help="每个接口/方案的请求次数")
+    parser.add_argument('--log-kb', type=int, default=32, help="执行详情中 detailed_log 的大小（KB）")
+    parser.add_argument('--url', default=None, help="正在运行的服务的API前缀，如 http://127.0.0.1:5000/api")
+    parser.add_argument('--execution-id', type=int, default=1, help="--url 模式下请求详情的执行记录ID")
+    args = parser.parse_args()
+
+    if args.url:
+        bench_live(args)
+    else:
+        bench_local(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并发等待基准测试
+对比生成代码中 time.sleep（阻塞事件循环）与 await asyncio.sleep（非阻塞）
+在 asyncio.gather 并发执行多个产品流程时的总耗时。
+
+每个产品流程模拟生成测试的结构：每个步骤先做一次异步浏览器调用，
+再执行"操作前暂停"和"操作后等待"。
+
+用法:
+    python scripts/benchmark_concurrent_waits.py --products 4 --steps 5 --wait 0.2
+"""
+
+import argparse
+import asyncio
+import time
+
+
+async def _fake_browser_call(latency: float):
+    """模拟一次Playwright调用（纯异步I/O）"""
+    await asyncio.sleep(latency)
+
+
+async def _product_flow_blocking(steps: int, wait: float, latency: float):
+    for _ in range(steps):
+        time.sleep(wait)  # 操作前暂停
+        await _fake_browser_call(latency)
+        time.sleep(wait)  # 每次操作后等待
+
+
+async def _product_flow_non_blocking(steps: int, wait: float, latency: float):
+    for _ in range(steps):
+        await asyncio.sleep(wait)  # 操作前暂停
+        await _fake_browser_call(latency)
+        await asyncio.sleep(wait)  # 每次操作后等待
+
+
+async def _run_concurrently(flow, products: int, steps: int, wait: float, latency: float) -> float:
+    start = time.perf_counter()
+    await asyncio.gather(*(flow(steps, wait, latency) for _ in range(products)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比阻塞/非阻塞等待下的并发执行耗时")
+    parser.add_argument('--products', type=int, default=4, help="并发产品数量")
+    parser.add_argument('--steps', type=int, default=5, help="每个产品的步骤数")
+    parser.add_argument('--wait', type=float, default=0.2, help="每次等待时长（秒）")
+    parser.add_argument('--latency', type=float, default=0.05, help="模拟浏览器调用耗时（秒）")
+    args = parser.parse_args()
+
+    single = args.steps * (2 * args.wait + args.latency)
+    blocking = asyncio.run(_run_concurrently(_product_flow_blocking, args.products, args.steps, args.wait, args.latency))
+    non_blocking = asyncio.run(_run_concurrently(_product_flow_non_blocking, args.products, args.steps, args.wait, args.latency))
+
+    print(f"产品数: {args.products}, 步骤数: {args.steps}, 等待: {args.wait}s, 调用耗时: {args.latency}s")
+    print(f"单个产品理论耗时:         {single:.2f}s")
+    print(f"time.sleep（修改前）:     {blocking:.2f}s")
+    print(f"await asyncio.sleep（修改后）: {non_blocking:.2f}s")
+    print(f"加速比: {blocking / non_blocking:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志开销基准测试
+按一次 find_image 调用产生的日志（逐帧查找、截图/模板缓存、逐尺度匹配失败、预筛选排除，最后一条成功日志）模拟日志调用，
+对比三种方式下调用线程每次 find_image 花在日志上的时间：
+    sync-info    原方式：全部 INFO + f-string，在调用线程中同步写控制台和文件
+    queue-gated  队列 + 识别内部日志为DEBUG且未开启（默认）
+    queue-debug  队列 + 开启 ImageRecognition=DEBUG（含重复日志限流）
+
+控制台输出到空设备，文件写到临时目录；不包含数据库处理器（原方式下每条执行日志还要读写一次数据库）。
+
+用法:
+    python scripts/benchmark_logging.py
+    python scripts/benchmark_logging.py --calls 2000 --frames 3 --scales 6
+"""
+
+import argparse
+import logging
+import os
+import queue
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from config.logger import (LOG_FORMAT, LOG_DATE_FORMAT, ContextQueueHandler, LogPipelineListener,
+                           RateLimitFilter)
+
+TEMPLATE = 'Game_Img/button_start.png'
+SCALES = [1.0, 0.9, 0.8, 0.7, 0.6, 0.5]
+
+
+def _output_handlers(log_dir: str, name: str):
+    formatter = logging.Formatter(LOG_FORMAT, LOG_DATE_FORMAT)
+    console = logging.StreamHandler(open(os.devnull, 'w', encoding='utf-8'))
+    file_handler = RotatingFileHandler(os.path.join(log_dir, f'{name}.log'), maxBytes=50 * 1024 * 1024,
+                                       backupCount=1, encoding='utf-8')
+    for handler in (console, file_handler):
+        handler.setFormatter(formatter)
+    return [console, file_handler]
+
+
+def find_image_fstring(logger, task_id, frames, scales):
+    """原方式：识别内部日志全部为 INFO f-string"""
+    for attempt in range(frames):
+        logger.info(f"[{task_id}] 第{attempt + 1}帧查找图片: {TEMPLATE}")
+        logger.info(f"[{task_id}] 获取新的页面截图")
+        logger.info(f"[{task_id}] 截图已缓存")
+        logger.info(f"[{task_id}] 使用缓存的模板: {TEMPLATE}")
+        for scale in scales[:-2]:
+            logger.info(f"[{task_id}] 模板匹配失败: {TEMPLATE}, 置信度: {0.412:.3f}, 阈值: 0.8 (缩放: {scale:.1f})")
+        for scale in scales[-2:]:
+            logger.info(f"[{task_id}] 预筛选排除: {TEMPLATE}, 尺度: {scale:.2f}, 原因: 颜色直方图差异")
+    logger.info(f"[{task_id}] 图片查找成功: {TEMPLATE}, 位置: (640, 360)")
+
+
+def find_image_lazy(logger, module_logger, task_id, frames, scales):
+    """新方式：识别内部日志为 DEBUG + %-style 参数"""
+    for attempt in range(frames):
+        module_logger.debug("[%s] 第%d帧查找图片: %s", task_id, attempt + 1, TEMPLATE)
+        module_logger.debug("[%s] 获取新的页面截图", task_id)
+        module_logger.debug("[%s] 截图已缓存", task_id)
+        module_logger.debug("[%s] 使用缓存的模板: %s", task_id, TEMPLATE)
+        for scale in scales[:-2]:
+            module_logger.debug("[%s] 模板匹配失败: %s, 置信度: %.3f, 阈值: %s, 缩放: %.1f",
+                                task_id, TEMPLATE, 0.412, 0.8, scale)
+        for scale in scales[-2:]:
+            module_logger.debug("[%s] 预筛选排除: %s, 尺度: %.2f, 原因: %s", task_id, TEMPLATE, scale, '颜色直方图差异')
+    logger.info("[%s] 图片查找成功: %s, 位置: %s", task_id, TEMPLATE, (640, 360))
+
+
+def run_sync(log_dir, calls, frames, scales):
+    logger = logging.getLogger('bench.sync')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handlers = _output_handlers(log_dir, 'sync')
+    for handler in handlers:
+        logger.addHandler(handler)
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter()
+        find_image_fstring(logger, f'task_{i % 8}', frames, scales)
+        timings.append(time.perf_counter() - start)
+    for handler in handlers:
+        handler.close()
+    return timings, 0.0
+
+
+def run_queue(log_dir, calls, frames, scales, module_level, name):
+    log_queue = queue.SimpleQueue()
+    listener = LogPipelineListener(log_queue, *_output_handlers(log_dir, name), respect_handler_level=True)
+    listener.start()
+
+    logger = logging.getLogger(f'bench.{name}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter())
+    logger.addHandler(queue_handler)
+    module_logger = logging.getLogger(f'bench.{name}.ImageRecognition')
+    module_logger.setLevel(module_level)
+
+    timings = []
+    for i in range(calls):
+        start = time.perf_counter()
+        find_image_lazy(logger, module_logger, f'task_{i % 8}', frames, scales)
+        timings.append(time.perf_counter() - start)
+
+    # 等监听线程写完队列中的日志（不计入调用线程耗时）
+    drain_start = time.perf_counter()
+    done = threading.Event()
+    log_queue.put(logging.makeLogRecord({'log_control': ('flush', done)}))
+    done.wait(60)
+    drain = time.perf_counter() - drain_start
+    listener.stop()
+    for handler in listener.handlers:
+        handler.close()
+    return timings, drain
+
+
+def main():
+    parser = argparse.ArgumentParser(description="find_image 日志开销基准测试")
+    parser.add_argument('--calls', type=int, default=1000, help="模拟的 find_image 调用次数")
+    parser.add_argument('--frames', type=int, default=3, help="每次调用查找的帧数")
+    parser.add_argument('--scales', type=int, default=len(SCALES), help="每帧尝试的尺度数")
+    args = parser.parse_args()
+    scales = [1.0 - 0.1 * i for i in range(args.scales)]
+
+    per_call = args.frames * (4 + len(scales)) + 1
+    print(f"每次 find_image 约 {per_call} 条日志调用，{args.calls} 次调用")
+    print(f"{'方式':<14}{'p50(μs)':>10}{'p99(μs)':>10}{'平均(μs)':>10}{'后台写出(ms)':>14}")
+    with tempfile.TemporaryDirectory() as log_dir:
+        cases = [
+            ('sync-info', lambda: run_sync(log_dir, args.calls, args.frames, scales)),
+            ('queue-gated', lambda: run_queue(log_dir, args.calls, args.frames, scales, logging.INFO, 'gated')),
+            ('queue-debug', lambda: run_queue(log_dir, args.calls, args.frames, scales, logging.DEBUG, 'debug')),
+        ]
+        for name, case in cases:
+            timings, drain = case()
+            timings_us = sorted(t * 1e6 for t in timings)
+            p99 = timings_us[min(len(timings_us) - 1, int(len(timings_us) * 0.99))]
+            print(f"{name:<14}{statistics.median(timings_us):>10.1f}{p99:>10.1f}"
+                  f"{statistics.mean(timings_us):>10.1f}{drain * 1000:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+识别引擎基准测试
+对比多尺度模板匹配（template）与ORB/AKAZE特征匹配（feature）的命中率和耗时。
+
+两部分数据：
+1. 合成样本：从参考画面中裁剪区域作为模板，再对画面做缩放和小角度旋转，已知真实位置，统计命中率；
+2. 真实模板：Game_Img 下的模板在参考画面上分别用两种引擎匹配，统计两者结果是否一致及耗时。
+
+用法:
+    python scripts/benchmark_match_engines.py
+    python scripts/benchmark_match_engines.py --detector akaze --samples 20 --max-rotation 8
+"""
+
+import argparse
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import cv2
+import numpy as np
+
+from utils.image_recognition import ImageRecognition
+from utils.feature_matcher import FeatureMatcher
+
+
+def _run_engines(recognizer: ImageRecognition, frame: np.ndarray, template_path: str, confidence: float):
+    """分别用两种引擎匹配，返回 {引擎: (位置, 耗时)}"""
+    results = {}
+    start = time.perf_counter()
+    position = recognizer._smart_template_matching(frame, template_path, confidence, 0)
+    results['template'] = (position, time.perf_counter() - start)
+    # 每次匹配前清空画面特征缓存，耗时包含画面检测（真实使用中同一帧的多个模板会复用）
+    recognizer.feature_matcher.clear()
+    start = time.perf_counter()
+    position = recognizer._feature_match(frame, template_path)
+    results['feature'] = (position, time.perf_counter() - start)
+    return results
+
+
+def _synthetic_samples(frames, samples_per_frame: int, max_scale: float, max_rotation: float, out_dir: Path, rng):
+    """裁剪模板并变换画面，返回 (变换后画面, 模板路径, 真实中心坐标)"""
+    for frame_index, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        for sample_index in range(samples_per_frame):
+            tpl_w = rng.randint(max(24, w // 10), max(25, w // 4))
+            tpl_h = rng.randint(max(24, h // 10), max(25, h // 4))
+            x = rng.randint(0, max(0, w - tpl_w))
+            y = rng.randint(0, max(0, h - tpl_h))
+            template = frame[y:y + tpl_h, x:x + tpl_w]
+            if float(template.std()) < 10:  # 跳过纯色区域，两种引擎都无法可靠定位
+                continue
+            template_path = out_dir / f"tpl_{frame_index}_{sample_index}.png"
+            cv2.imwrite(str(template_path), template)
+
+            scale = rng.uniform(1.0 / max_scale, max_scale)
+            angle = rng.uniform(-max_rotation, max_rotation)
+            matrix = cv2.getRotationMatrix2D((w / 2.0, h / 2.0), angle, scale)
+            transformed = cv2.warpAffine(frame, matrix, (w, h), borderMode=cv2.BORDER_REPLICATE)
+            center = np.array([x + tpl_w / 2.0, y + tpl_h / 2.0, 1.0])
+            truth = matrix @ center
+            if not (0 <= truth[0] < w and 0 <= truth[1] < h):
+                continue
+            yield transformed, str(template_path), (float(truth[0]), float(truth[1])), scale, angle
+
+
+def main():
+    parser = argparse.ArgumentParser(description="对比模板匹配与特征匹配引擎的命中率和耗时")
+    parser.add_argument('--frames', default=str(project_root / 'Test_Data' / 'reference_images'), help="参考画面目录")
+    parser.add_argument('--templates', default=str(project_root / 'Game_Img'), help="真实模板目录")
+    parser.add_argument('--detector', choices=['orb', 'akaze'], default=None, help="特征检测器，默认取 UIConfig.FEATURE_DETECTOR")
+    parser.add_argument('--samples', type=int, default=10, help="每张参考画面生成的合成样本数")
+    parser.add_argument('--max-scale', type=float, default=1.25, help="合成样本的最大缩放倍数")
+    parser.add_argument('--max-rotation', type=float, default=5.0, help="合成样本的最大旋转角度")
+    parser.add_argument('--confidence', type=float, default=0.7, help="模板匹配置信度")
+    parser.add_argument('--tolerance', type=float, default=8.0, help="判定命中的最大位置误差（像素）")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    frame_paths = sorted(Path(args.frames).glob('*.png'))
+    frames = [frame for frame in (cv2.imread(str(p)) for p in frame_paths) if frame is not None]
+    if not frames:
+        print(f"未找到参考画面: {args.frames}")
+        return
+
+    recognizer = ImageRecognition(task_id='benchmark_engines')
+    recognizer._page_dpr = 1.0
+    recognizer._feature_matcher = FeatureMatcher(detector=args.detector, task_id=recognizer.task_id)
+    rng = random.Random(args.seed)
+
+    # 1. 合成样本
+    hits = {'template': 0, 'feature': 0}
+    times = {'template': 0.0, 'feature': 0.0}
+    total = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for frame, template_path, truth, _scale, _angle in _synthetic_samples(
+                frames, args.samples, args.max_scale, args.max_rotation, Path(tmp_dir), rng):
+            total += 1
+            for engine, (position, elapsed) in _run_engines(recognizer, frame, template_path, args.confidence).items():
+                times[engine] += elapsed
+                if position and ((position[0] - truth[0]) ** 2 + (position[1] - truth[1]) ** 2) ** 0.5 <= args.tolerance:
+                    hits[engine] += 1
+
+    print(f"参考画面: {len(frames)} 张, 特征检测器: {recognizer.feature_matcher.detector}")
+    print(f"合成样本: {total} 个（缩放 1/{args.max_scale}~{args.max_scale}，旋转 ±{args.max_rotation}°）")
+    for engine in ('template', 'feature'):
+        rate = hits[engine] / total if total else 0.0
+        avg_ms = times[engine] / total * 1000 if total else 0.0
+        print(f"  {engine:<8} 命中 {hits[engine]}/{total} ({rate:.1%}), 平均耗时 {avg_ms:.1f}ms")
+
+    # 2. 真实模板
+    template_paths = sorted(str(p) for p in Path(args.templates).glob('*.png'))
+    if not template_paths:
+        return
+    found = {'template': 0, 'feature': 0}
+    times = {'template': 0.0, 'feature': 0.0}
+    agree = pairs = 0
+    for frame in frames:
+        for template_path in template_paths:
+            pairs += 1
+            results = _run_engines(recognizer, frame, template_path, args.confidence)
+            for engine, (position, elapsed) in results.items():
+                times[engine] += elapsed
+                if position:
+                    found[engine] += 1
+            template_pos, feature_pos = results['template'][0], results['feature'][0]
+            if (template_pos is None) == (feature_pos is None) and (
+                    template_pos is None or
+                    ((template_pos[0] - feature_pos[0]) ** 2 + (template_pos[1] - feature_pos[1]) ** 2) ** 0.5 <= args.tolerance):
+                agree += 1
+
+    # 同一帧服务全部模板：只检测一次画面特征
+    batch_time = 0.0
+    for frame in frames:
+        recognizer.feature_matcher.clear()
+        start = time.perf_counter()
+        recognizer.feature_matcher.match_many(frame, template_paths, fingerprint='benchmark')
+        batch_time += time.perf_counter() - start
+
+    print(f"真实模板: {len(template_paths)} 个 x 参考画面 {len(frames)} 张 = {pairs} 组")
+    for engine in ('template', 'feature'):
+        print(f"  {engine:<8} 找到 {found[engine]}/{pairs}, 平均耗时 {times[engine] / pairs * 1000:.1f}ms")
+    print(f"  两种引擎结果一致: {agree}/{pairs}")
+    print(f"  特征引擎按帧批量匹配全部模板: 平均每帧 {batch_time / len(frames) * 1000:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
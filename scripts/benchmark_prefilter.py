@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+模板预筛选基准测试
+在录制的语料上对比"全分辨率匹配"与"预筛选 + 全分辨率匹配"的结果和耗时，统计预筛选的漏检率。
+
+语料录制：执行测试前设置环境变量 UI_VISION_CORPUS_DIR=<目录>，
+quick_check_presence 每次检测都会保存画面截图，并在 <目录>/manifest.jsonl 中追加模板和全量匹配结果。
+
+用法:
+    python scripts/benchmark_prefilter.py --corpus IMG_LOGS/vision_corpus
+    python scripts/benchmark_prefilter.py --corpus IMG_LOGS/vision_corpus --coverage 0.4 --margin 0.25
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import cv2
+
+from utils.image_recognition import ImageRecognition
+from utils.template_prefilter import TemplatePrefilter
+
+
+def load_samples(corpus_dir: Path, limit: int = None):
+    manifest = corpus_dir / 'manifest.jsonl'
+    samples = []
+    with open(manifest, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                samples.append(json.loads(line))
+    return samples[:limit] if limit else samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="统计模板预筛选在录制语料上的漏检率和加速比")
+    parser.add_argument('--corpus', required=True, help="语料目录（包含 manifest.jsonl 和 frames/）")
+    parser.add_argument('--coverage', type=float, default=None, help="覆盖 PREFILTER_HIST_MIN_COVERAGE")
+    parser.add_argument('--margin', type=float, default=None, help="覆盖 PREFILTER_COARSE_MARGIN")
+    parser.add_argument('--downsample', type=int, default=None, help="覆盖 PREFILTER_DOWNSAMPLE")
+    parser.add_argument('--dpr', type=float, default=1.0, help="录制时页面的DPR（用于换算未记录源DPR的模板）")
+    parser.add_argument('--limit', type=int, default=None, help="最多使用的样本数")
+    parser.add_argument('--show-misses', action='store_true', help="打印每条漏检样本")
+    args = parser.parse_args()
+
+    corpus_dir = Path(args.corpus)
+    samples = load_samples(corpus_dir, args.limit)
+    if not samples:
+        print(f"语料为空: {corpus_dir}")
+        return
+
+    recognizer = ImageRecognition(task_id='benchmark_prefilter')
+    recognizer._page_dpr = args.dpr
+    recognizer.prefilter = TemplatePrefilter(downsample=args.downsample, hist_min_coverage=args.coverage,
+                                             coarse_margin=args.margin)
+
+    frames = {}
+    positives = negatives = false_negatives = moved = false_positives = 0
+    full_time = filtered_time = 0.0
+    misses = []
+    for sample in samples:
+        frame_path = corpus_dir / sample['frame']
+        frame = frames.get(frame_path)
+        if frame is None:
+            frame = cv2.imread(str(frame_path))
+            if frame is None:
+                print(f"跳过无法读取的画面: {frame_path}")
+                continue
+            frames[frame_path] = frame
+        template_path = str(project_root / sample['template']) if not Path(sample['template']).is_absolute() else sample['template']
+        confidence = sample['confidence']
+        scales = sample.get('scales')
+
+        start = time.perf_counter()
+        truth = recognizer._quick_match(frame, template_path, confidence, scales, False)
+        full_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = recognizer._quick_match(frame, template_path, confidence, scales, True)
+        filtered_time += time.perf_counter() - start
+
+        if truth:
+            positives += 1
+            if result is None:
+                false_negatives += 1
+                misses.append(sample)
+            elif tuple(result) != tuple(truth):
+                moved += 1
+        else:
+            negatives += 1
+            if result is not None:
+                false_positives += 1
+
+    total = positives + negatives
+    stats = recognizer.get_prefilter_stats()
+    print(f"样本数: {total} (存在 {positives}, 不存在 {negatives}), 画面数: {len(frames)}")
+    print(f"预筛选参数: 降采样 {recognizer.prefilter.downsample}x, 直方图覆盖率 >= {recognizer.prefilter.hist_min_coverage}, "
+          f"粗匹配余量 {recognizer.prefilter.coarse_margin}")
+    print(f"漏检率: {false_negatives}/{positives} = {false_negatives / positives:.2%}" if positives else "漏检率: 无正样本")
+    print(f"位置不一致: {moved}, 误检: {false_positives}")
+    print(f"预筛选统计: 检查 {stats['checks']}, 直方图排除 {stats['hist_rejects']}, 粗匹配排除 {stats['coarse_rejects']}, "
+          f"跳过 {stats['skipped']}, 排除率 {stats['reject_rate']:.2%}")
+    print(f"全分辨率匹配耗时: {full_time:.3f}s, 预筛选后耗时: {filtered_time:.3f}s, "
+          f"加速比: {full_time / filtered_time:.2f}x" if filtered_time else "")
+    if args.show_misses:
+        for sample in misses:
+            print(f"  漏检: {sample['template']} @ {sample['frame']} 位置 {sample.get('position')}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静态资源预压缩工具
+为 static/ 下的 js/css/svg 等文本资源生成 .gz（以及安装了 Brotli 时的 .br）文件，
+客户端接受对应编码时由 utils/static_assets.py 直接返回压缩文件；源文件更新后压缩文件自动失效，重新运行即可。
+
+用法:
+    python scripts/compress_static.py
+    python scripts/compress_static.py --min-size 512 --clean
+"""
+
+import argparse
+import gzip
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_SUFFIXES = {'.js', '.css', '.svg', '.json', '.txt', '.map'}
+
+
+def _iter_assets(static_dir: Path):
+    for file_path in sorted(static_dir.rglob('*')):
+        if 'uploads' in file_path.relative_to(static_dir).parts:
+            continue
+        if file_path.suffix.lower() in COMPRESSIBLE_SUFFIXES and file_path.is_file():
+            yield file_path
+
+
+def _write_variant(source: Path, suffix: str, data: bytes) -> bool:
+    """压缩后更小时才写入，返回是否写入"""
+    variant = source.with_name(source.name + suffix)
+    if len(data) >= source.stat().st_size:
+        if variant.exists():
+            variant.unlink()
+        return False
+    tmp_path = variant.with_name(variant.name + '.tmp')
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, variant)
+    return True
+
+
+def compress(static_dir: Path, min_size: int):
+    original = gz_total = br_total = written = 0
+    for file_path in _iter_assets(static_dir):
+        size = file_path.stat().st_size
+        if size < min_size:
+            continue
+        content = file_path.read_bytes()
+        original += size
+        gz_data = gzip.compress(content, compresslevel=9, mtime=0)
+        if _write_variant(file_path, '.gz', gz_data):
+            gz_total += len(gz_data)
+            written += 1
+        if brotli is not None:
+            br_data = brotli.compress(content, quality=11)
+            if _write_variant(file_path, '.br', br_data):
+                br_total += len(br_data)
+                written += 1
+    print(f"压缩文件 {written} 个，原始 {original / 1024:.1f}KB，gzip {gz_total / 1024:.1f}KB"
+          + (f"，br {br_total / 1024:.1f}KB" if brotli is not None else "（未安装Brotli，跳过 .br）"))
+
+
+def clean(static_dir: Path):
+    removed = 0
+    for suffix in ('*.gz', '*.br'):
+        for file_path in static_dir.rglob(suffix):
+            file_path.unlink()
+            removed += 1
+    print(f"已删除预压缩文件 {removed} 个")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为静态资源生成 .gz/.br 预压缩文件")
+    parser.add_argument('--dir', default=str(project_root / 'static'), help="静态资源目录")
+    parser.add_argument('--min-size', type=int, default=1024, help="小于该字节数的文件不压缩")
+    parser.add_argument('--clean', action='store_true', help="只删除已生成的预压缩文件")
+    args = parser.parse_args()
+
+    static_dir = Path(args.dir)
+    if args.clean:
+        clean(static_dir)
+    else:
+        compress(static_dir, args.min_size)
+
+
+if __name__ == '__main__':
+    main()
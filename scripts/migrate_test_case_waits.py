@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试用例等待语句迁移脚本
+将 Test_Case/ 中已生成的测试文件里、位于 async def 内部的 time.sleep(...)
+改写为非阻塞等待，避免在 asyncio.gather 并发执行时冻结所有浏览器的事件循环。
+
+改写规则：
+- "time.sleep(1)  # 每次操作后等待1秒" / "# 等待页面加载"
+    -> await ui_operations.wait_for_settle(timeout=1)
+- 其余 time.sleep(x)
+    -> await asyncio.sleep(x)
+同步函数（def）中的 time.sleep 保持不变；改写后文件不再使用 time 时删除 import time。
+
+用法:
+    python scripts/migrate_test_case_waits.py            # 直接改写
+    python scripts/migrate_test_case_waits.py --dry-run  # 只打印将要修改的内容
+"""
+
+import argparse
+import ast
+import re
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+SETTLE_PATTERN = re.compile(r"(?<!await )time\.sleep\(1\)(\s*# (?:每次操作后等待1秒|等待页面加载))")
+SLEEP_PATTERN = re.compile(r"(?<!await )(?<![\w.])time\.sleep\(")
+
+
+def _async_function_lines(tree: ast.AST) -> set:
+    """收集所有 async def 函数体所在的行号（排除其中嵌套的同步函数）"""
+    async_lines = set()
+    sync_lines = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AsyncFunctionDef):
+            async_lines.update(range(node.lineno, node.end_lineno + 1))
+        elif isinstance(node, ast.FunctionDef):
+            sync_lines.update(range(node.lineno, node.end_lineno + 1))
+    # 同步函数若嵌套在async函数里，其行号不应改写；反之async嵌套在同步函数中仍需改写
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AsyncFunctionDef):
+            for child in ast.walk(node):
+                if isinstance(child, ast.FunctionDef):
+                    async_lines.difference_update(range(child.lineno, child.end_lineno + 1))
+    return async_lines
+
+
+def _uses_ui_operations(tree: ast.AST, lineno: int) -> bool:
+    """判断包含该行的 async 函数中是否存在 ui_operations 变量"""
+    for node in ast.walk(tree):
+        if isinstance(node, ast.AsyncFunctionDef) and node.lineno <= lineno <= node.end_lineno:
+            for child in ast.walk(node):
+                if isinstance(child, ast.Name) and child.id == 'ui_operations':
+                    return True
+    return False
+
+
+def _drop_unused_time_import(source: str) -> str:
+    """改写掉最后一处 time.sleep 后，删除不再使用的单独一行 import time"""
+    tree = ast.parse(source)
+    if any(isinstance(node, ast.Name) and node.id == 'time' for node in ast.walk(tree)):
+        return source
+    lines = source.splitlines(keepends=True)
+    for node in tree.body:
+        if (isinstance(node, ast.Import) and len(node.names) == 1
+                and node.names[0].name == 'time' and node.names[0].asname is None):
+            del lines[node.lineno - 1]
+            break
+    return ''.join(lines)
+
+
+def migrate_source(source: str):
+    """
+    改写源码中的阻塞等待
+
+    Returns:
+        (新源码, 改写的行号列表)
+    """
+    tree = ast.parse(source)
+    async_lines = _async_function_lines(tree)
+    lines = source.splitlines(keepends=True)
+    changed = []
+    for index, line in enumerate(lines):
+        lineno = index + 1
+        if lineno not in async_lines or 'time.sleep(' not in line:
+            continue
+        new_line = line
+        if _uses_ui_operations(tree, lineno):
+            new_line = SETTLE_PATTERN.sub(r"await ui_operations.wait_for_settle(timeout=1)\1", new_line)
+        new_line = SLEEP_PATTERN.sub("await asyncio.sleep(", new_line)
+        if new_line != line:
+            lines[index] = new_line
+            changed.append(lineno)
+
+    new_source = ''.join(lines)
+    if changed and not re.search(r"^import asyncio\b", new_source, re.MULTILINE):
+        new_source = "import asyncio\n" + new_source
+    if changed:
+        new_source = _drop_unused_time_import(new_source)
+    # 改写后必须仍是合法的Python代码
+    ast.parse(new_source)
+    return new_source, changed
+
+
+def migrate_directory(directory: Path, dry_run: bool = False) -> int:
+    """迁移目录下的所有测试文件，返回被修改的文件数量"""
+    modified_files = 0
+    for file_path in sorted(directory.glob('*.py')):
+        if file_path.name == '__init__.py':
+            continue
+        source = file_path.read_text(encoding='utf-8')
+        try:
+            new_source, changed = migrate_source(source)
+        except SyntaxError as e:
+            print(f"⚠️  跳过无法解析的文件: {file_path} ({e})")
+            continue
+        if not changed:
+            continue
+        modified_files += 1
+        print(f"{'[dry-run] ' if dry_run else ''}✅ {file_path}: 改写 {len(changed)} 处 (行 {', '.join(map(str, changed))})")
+        if not dry_run:
+            file_path.write_text(new_source, encoding='utf-8')
+    return modified_files
+
+
+def main():
+    parser = argparse.ArgumentParser(description="将Test_Case中async测试里的time.sleep改写为非阻塞等待")
+    parser.add_argument('--dir', default=str(project_root / 'Test_Case'), help="测试文件目录")
+    parser.add_argument('--dry-run', action='store_true', help="只打印修改，不写回文件")
+    args = parser.parse_args()
+
+    count = migrate_directory(Path(args.dir), dry_run=args.dry_run)
+    print(f"共修改 {count} 个文件")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+截图感知哈希索引工具
+对 IMG_LOGS 下的历史截图和断言图建立 dHash+pHash 索引（与步骤截图共用 UIConfig.PHASH_INDEX_FILE），
+并支持按图片检索相似画面、统计/合并重复截图。
+
+用法:
+    python scripts/phash_index.py build
+    python scripts/phash_index.py search path/to/screen.png --distance 6
+    python scripts/phash_index.py dups --distance 0
+    python scripts/phash_index.py dups --distance 0 --link    # 重复截图改为硬链接，释放磁盘（产物存储中的对象文件不改动）
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+import cv2
+
+from utils.artifact_store import artifact_store
+from utils.phash import ScreenshotIndex, screen_key
+
+IMAGE_SUFFIXES = {'.png', '.jpg', '.jpeg'}
+
+
+def _iter_images(directory: Path):
+    for image_path in sorted(directory.rglob('*')):
+        if image_path.suffix.lower() in IMAGE_SUFFIXES and image_path.is_file():
+            yield image_path
+
+
+def build(index: ScreenshotIndex, directory: Path):
+    start = time.perf_counter()
+    added = skipped = 0
+    known = set(index.entries())
+    for image_path in _iter_images(directory):
+        if index.path_key(str(image_path)) in known:
+            continue
+        image = cv2.imread(str(image_path), cv2.IMREAD_GRAYSCALE)
+        if image is None:
+            skipped += 1
+            continue
+        index.add(str(image_path), image)
+        added += 1
+    stats = index.get_stats()
+    print(f"新增 {added} 张，无法读取 {skipped} 张，索引共 {stats['indexed']} 张，耗时 {time.perf_counter() - start:.1f}s")
+
+
+def search(index: ScreenshotIndex, image_path: str, distance: int):
+    image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        print(f"无法读取图片: {image_path}")
+        return
+    key = screen_key(image)
+    start = time.perf_counter()
+    results = index.find(key, distance)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"距离 <= {distance} 的历史画面 {len(results)} 张（查询 {elapsed:.2f}ms）")
+    for dist, path_key in results[:50]:
+        print(f"  {dist:>3}  {path_key}")
+
+
+def dups(index: ScreenshotIndex, distance: int, link: bool):
+    groups = []
+    seen = set()
+    for path_key, key in sorted(index.entries().items()):
+        if path_key in seen or not os.path.exists(index.resolve(path_key)):
+            continue
+        members = [p for _d, p in index.find(key, distance) if p not in seen]
+        if len(members) > 1:
+            groups.append(members)
+        seen.update(members)
+
+    objects_dir = os.path.abspath(artifact_store.objects_dir)
+    reclaimed = 0
+    for members in groups:
+        keep = index.resolve(members[0])
+        print(f"{len(members)} 张相同画面: {members[0]}")
+        for path_key in members[1:]:
+            duplicate = index.resolve(path_key)
+            print(f"    {path_key}")
+            # 产物存储的对象文件按内容寻址，不能替换为其他画面的硬链接
+            in_store = os.path.abspath(duplicate).startswith(objects_dir + os.sep)
+            if link and not in_store and not os.path.samefile(keep, duplicate):
+                size = os.path.getsize(duplicate)
+                tmp_path = f"{duplicate}.tmp"
+                os.link(keep, tmp_path)
+                os.replace(tmp_path, duplicate)
+                reclaimed += size
+    print(f"重复画面 {len(groups)} 组，涉及 {sum(len(m) - 1 for m in groups)} 张冗余截图")
+    if link:
+        print(f"已改为硬链接，释放 {reclaimed / 1024 / 1024:.1f}MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="截图感知哈希索引：建立索引、检索相似画面、合并重复截图")
+    parser.add_argument('--index', default=None, help="索引文件，默认取 UIConfig.PHASH_INDEX_FILE")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build', help="为目录下的图片建立索引")
+    build_parser.add_argument('--dir', default=str(project_root / 'IMG_LOGS'), help="图片目录（递归）")
+    search_parser = sub.add_parser('search', help="检索相似的历史画面")
+    search_parser.add_argument('image', help="待检索的图片")
+    search_parser.add_argument('--distance', type=int, default=6, help="最大汉明距离（dHash+pHash 共128位）")
+    dups_parser = sub.add_parser('dups', help="统计重复截图")
+    dups_parser.add_argument('--distance', type=int, default=0, help="判定为同一画面的最大汉明距离")
+    dups_parser.add_argument('--link', action='store_true', help="将重复截图替换为指向首张的硬链接")
+    args = parser.parse_args()
+
+    index = ScreenshotIndex(args.index)
+    if args.command == 'build':
+        build(index, Path(args.dir))
+    elif args.command == 'search':
+        search(index, args.image, args.distance)
+    else:
+        dups(index, args.distance, args.link)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+生产环境启动脚本
+使用 gunicorn（Linux/macOS，多进程）或 waitress（Windows，单进程多线程）启动应用，替代 app.py 中的开发服务器。
+
+多个 worker 通过共享运行状态（UIConfig.RUN_STATE_DB）协作：任意 worker 都能查看和取消其他 worker 上运行的测试，
+进程监控中只需执行一份的任务（回收已退出 worker 的运行、定时存储清理）由选出的监督者执行。
+所有 worker 须运行在同一主机上（共享同一个运行状态文件，测试进程也在本机启动）。
+
+用法:
+    python scripts/serve.py
+    python scripts/serve.py --server gunicorn --workers 4 --threads 8 --port 5000
+    python scripts/serve.py --server waitress --threads 16
+"""
+
+import argparse
+import os
+import sys
+from pathlib import Path
+
+# 添加项目根目录到Python路径
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def serve_gunicorn(args):
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        print("未安装gunicorn，请先执行: pip install gunicorn（Windows 请使用 --server waitress）")
+        sys.exit(1)
+
+    class PlatformApplication(BaseApplication):
+        def __init__(self, options):
+            self.options = options
+            super().__init__()
+
+        def load_config(self):
+            for key, value in self.options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            # 每个 worker 各自创建应用，监控线程与心跳线程在 worker 内启动（不使用 preload，避免线程在 fork 后丢失）
+            from app import create_app
+            return create_app()
+
+    options = {
+        'bind': f"{args.host}:{args.port}",
+        'workers': args.workers,
+        # 测试在后台线程中执行，使用 gthread worker；请求超时只影响单个请求，不影响后台测试
+        'worker_class': 'gthread',
+        'threads': args.threads,
+        'timeout': args.timeout,
+        # worker 被回收时其上的测试会中断，因此不按请求数自动重启 worker
+        'max_requests': 0,
+        'graceful_timeout': 30,
+        'chdir': str(project_root),
+    }
+    print(f"gunicorn 启动: http://{args.host}:{args.port}，worker {args.workers} 个 × 线程 {args.threads}")
+    PlatformApplication(options).run()
+
+
+def serve_waitress(args):
+    try:
+        from waitress import serve
+    except ImportError:
+        print("未安装waitress，请先执行: pip install waitress")
+        sys.exit(1)
+
+    os.chdir(project_root)
+    from app import create_app
+    app = create_app()
+    print(f"waitress 启动: http://{args.host}:{args.port}，线程 {args.threads} 个")
+    # waitress 为单进程；需要多进程时可在不同端口各启动一个实例并由反向代理分发，运行状态同样共享
+    serve(app, host=args.host, port=args.port, threads=args.threads)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="以生产模式启动星火自动化测试平台")
+    parser.add_argument('--server', choices=['gunicorn', 'waitress'],
+                        default='waitress' if os.name == 'nt' else 'gunicorn', help="WSGI服务器")
+    parser.add_argument('--host', default='0.0.0.0', help="监听地址")
+    parser.add_argument('--port', type=int, default=5000, help="监听端口")
+    parser.add_argument('--workers', type=int, default=4, help="gunicorn worker 进程数")
+    parser.add_argument('--threads', type=int, default=8, help="每个 worker 的线程数")
+    parser.add_argument('--timeout', type=int, default=120, help="gunicorn 请求超时（秒）")
+    args = parser.parse_args()
+
+    if args.server == 'gunicorn':
+        serve_gunicorn(args)
+    else:
+        serve_waitress(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -8348,6 +8348,8 @@ class AutomationManagement {
     async uploadBlockerImage(file) {
         const formData = new FormData();
         formData.append('image', file);
+        // 记录截取模板时的DPR，后端据此将模板换算到CSS像素
+        formData.append('dpr', window.devicePixelRatio || 1);
         const resp = await fetch('/api/automation/upload-image', {
             method: 'POST',
             body: formData
@@ -8477,10 +8479,12 @@ class AutomationManagement {
         const passwordSelectorInput = document.getElementById('auth-password-selector');
         const repeatPasswordSelectorInput = document.getElementById('auth-repeat-password-selector');
         const submitSelectorInput = document.getElementById('auth-submit-selector');
+        const loggedInSelectorInput = document.getElementById('auth-logged-in-selector');
         if (emailSelectorInput) emailSelectorInput.value = config.email_selector || '';
         if (passwordSelectorInput) passwordSelectorInput.value = config.password_selector || '';
         if (repeatPasswordSelectorInput) repeatPasswordSelectorInput.value = config.repeat_password_selector || '';
         if (submitSelectorInput) submitSelectorInput.value = config.submit_selector || '';
+        if (loggedInSelectorInput) loggedInSelectorInput.value = config.logged_in_selector || '';
 
         // 渲染地址与账号列表（注册：需要为每个地址生成唯一账号；登录：尝试读取历史账号）
         if ((step.operation_event || '') === 'register') {
@@ -9102,6 +9106,8 @@ class AutomationManagement {
         const passwordSelector = passwordSelectorInput ? passwordSelectorInput.value.trim() : '';
         const repeatPasswordSelector = repeatPasswordSelectorInput ? repeatPasswordSelectorInput.value.trim() : '';
         const submitSelector = submitSelectorInput ? submitSelectorInput.value.trim() : '';
+        const loggedInSelectorInput = document.getElementById('auth-logged-in-selector');
+        const loggedInSelector = loggedInSelectorInput ? loggedInSelectorInput.value.trim() : '';
 
         if (!emailSelector || !passwordSelector || !submitSelector) {
             this.showErrorMessage('请填写邮箱/账号、密码与提交按钮的元素定位参数');
@@ -9130,6 +9136,7 @@ class AutomationManagement {
             password_selector: passwordSelector,
             repeat_password_selector: repeatPasswordSelector,
             submit_selector: submitSelector,
+            logged_in_selector: loggedInSelector,
             address_credentials: addressCredentials,
             address_credentials_list: credentialsList,
             credentials_source: (step.operation_event || '') === 'register' ? 'register' : 'login'
@@ -9907,6 +9914,7 @@ class AutomationManagement {
                         try {
                             const uploadFormData = new FormData();
                             uploadFormData.append('image', cachedFile);
+                            uploadFormData.append('dpr', window.devicePixelRatio || 1);
                             
                             const uploadResponse = await fetch('/api/automation/upload-image', {
                                 method: 'POST',
@@ -0,0 +1,29 @@
+"""
+内容寻址产物存储测试
+"""
+from utils.artifact_store import ArtifactStore
+
+
+def test_identical_content_shares_one_object(tmp_path):
+    store = ArtifactStore(str(tmp_path / 'Artifacts'))
+    first = store.store('IMG_LOGS/a.png', b'same-bytes', kind='screenshot', execution_id='task_1', fmt='original')
+    second = store.store('IMG_LOGS/b.png', b'same-bytes', kind='screenshot', execution_id='task_2', fmt='original')
+
+    assert first == second
+    stats = store.get_stats()
+    assert (stats['objects'], stats['links'], stats['deduplicated']) == (1, 2, 1)
+    object_path, mimetype = store.resolve('/IMG_LOGS/a.png')
+    assert mimetype == 'image/png'
+    with open(object_path, 'rb') as f:
+        assert f.read() == b'same-bytes'
+    assert [row['path'] for row in store.list_artifacts(execution_id='task_2')] == ['IMG_LOGS/b.png']
+    assert store.resolve('IMG_LOGS/missing.png') is None
+
+
+def test_gc_removes_unreferenced_objects(tmp_path):
+    store = ArtifactStore(str(tmp_path / 'Artifacts'))
+    store.store('Game_Img/t.png', b'old', fmt='original')
+    store.store('Game_Img/t.png', b'new', fmt='original')
+
+    assert store.gc()['removed_objects'] == 1
+    assert store.get_stats()['objects'] == 1
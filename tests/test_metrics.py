@@ -0,0 +1,59 @@
+"""
+运行指标测试
+"""
+import os
+import time
+
+from config.ui_config import UIConfig
+from utils.metrics import MetricsRegistry, statement_label
+
+
+class _ChildProcess(MetricsRegistry):
+    """模拟测试子进程：快照写到另一个文件"""
+
+    @property
+    def spool_file(self):
+        return os.path.join(self.spool_dir, 'child.json')
+
+
+def _build(registry):
+    return (registry.histogram('ui_test_seconds', '耗时', ('result',), (0.1, 1.0)),
+            registry.counter('ui_test_total', '次数', ('event',)))
+
+
+def test_snapshots_from_other_processes_are_merged(tmp_path):
+    server, child = MetricsRegistry(str(tmp_path)), _ChildProcess(str(tmp_path))
+    server_seconds, _ = _build(server)
+    child_seconds, child_total = _build(child)
+
+    server_seconds.observe(0.05, result='found')
+    child_seconds.observe(0.5, result='found')
+    child_seconds.observe(3, result='not_found')
+    child_total.inc(event='screenshot_success')
+    child.flush()
+
+    text = server.render()
+    assert 'ui_test_seconds_bucket{result="found",le="0.1"} 1' in text
+    assert 'ui_test_seconds_bucket{result="found",le="1.0"} 2' in text
+    assert 'ui_test_seconds_bucket{result="not_found",le="+Inf"} 1' in text
+    assert 'ui_test_seconds_count{result="found"} 2' in text
+    assert 'ui_test_total{event="screenshot_success"} 1' in text
+
+
+def test_stale_snapshots_are_archived(tmp_path, monkeypatch):
+    server, child = MetricsRegistry(str(tmp_path)), _ChildProcess(str(tmp_path))
+    _, child_total = _build(child)
+    child_total.inc(2, event='total_attempts')
+    child.flush()
+
+    monkeypatch.setattr(UIConfig, 'METRICS_STALE_SECONDS', -1)
+    time.sleep(0.01)
+    assert server.compact() == 1
+    assert not os.path.exists(child.spool_file)
+    assert 'ui_test_total{event="total_attempts"} 2' in server.render()
+
+
+def test_statement_label():
+    assert statement_label('SELECT id FROM automation_projects WHERE id=?') == 'SELECT automation_projects'
+    assert statement_label('  update `test_executions` SET status=%s') == 'UPDATE test_executions'
+    assert statement_label('INSERT OR IGNORE INTO users (a) VALUES (?)') == 'INSERT users'
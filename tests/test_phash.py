@@ -0,0 +1,47 @@
+"""
+感知哈希与BK树索引测试
+"""
+import pytest
+
+np = pytest.importorskip('numpy')
+cv2 = pytest.importorskip('cv2')
+
+from utils.phash import BKTree, ScreenshotIndex, ahash, dhash, phash, hamming, screen_key
+
+
+def _gradient(width=64, height=48, shift=0):
+    row = (np.arange(width) * 255 // width).astype(np.uint8)
+    return np.roll(np.tile(row, (height, 1)), shift, axis=1)
+
+
+def test_hashes_are_64bit_and_stable():
+    image = _gradient()
+    for func in (ahash, dhash, phash):
+        value = func(image)
+        assert 0 <= value < 1 << 64
+        assert func(image.copy()) == value
+    assert hamming(dhash(image), dhash(255 - image)) > 32
+
+
+def test_bktree_radius_search():
+    tree = BKTree()
+    keys = [0b0000, 0b0001, 0b0011, 0b0111, 0b1111, 0b0001]
+    for i, key in enumerate(keys):
+        tree.add(key, i)
+
+    assert len(tree) == len(keys)
+    assert [item for _d, item in tree.search(0b0001, 0)] == [1, 5]
+    assert sorted(item for _d, item in tree.search(0b0000, 2)) == [0, 1, 2, 5]
+
+
+def test_screenshot_index_persists_and_finds(tmp_path):
+    index_file = tmp_path / 'index.jsonl'
+    image_path = tmp_path / 'shot.png'
+    image = _gradient()
+    index = ScreenshotIndex(str(index_file))
+    index.save_screenshot(str(image_path), cv2.imencode('.png', image)[1].tobytes())
+
+    reloaded = ScreenshotIndex(str(index_file))
+    results = reloaded.find(screen_key(image), 0)
+    assert [path for _d, path in results] == [index.path_key(str(image_path))]
+    assert reloaded.seen_before(_gradient(shift=32), max_distance=0) is None
@@ -0,0 +1,40 @@
+"""
+共享运行状态测试
+"""
+from config.ui_config import UIConfig
+from utils.run_registry import RunRegistry
+
+
+class _OtherWorker(RunRegistry):
+    worker_id = 'other-host:1'
+
+
+def test_claim_and_cancel_across_workers(tmp_path):
+    db_path = str(tmp_path / 'run_state.db')
+    local, other = RunRegistry(db_path), _OtherWorker(db_path)
+
+    assert local.claim(7, executed_by='tester')
+    assert not other.claim(7)
+    local.update(7, execution_id=42, pid=1234)
+
+    run = other.request_cancel(7, 'stop')
+    assert (run['execution_id'], run['cancel_type'], run['local']) == (42, 'stop', False)
+    assert local.heartbeat() == {7}
+    assert not other.release(7)
+    assert local.release(7)
+    assert other.get(7) is None
+
+
+def test_stale_run_is_reaped_and_lease_moves(tmp_path, monkeypatch):
+    db_path = str(tmp_path / 'run_state.db')
+    local, other = RunRegistry(db_path), _OtherWorker(db_path)
+    assert other.acquire_lease('supervisor', ttl=60)
+    assert not local.acquire_lease('supervisor', ttl=60)
+    other.claim(3)
+
+    monkeypatch.setattr(UIConfig, 'RUN_STATE_STALE_SECONDS', -1)
+    assert [run['project_id'] for run in local.reap_stale()] == [3]
+
+    other.release_lease('supervisor')
+    assert local.acquire_lease('supervisor', ttl=60)
+    assert local.claim(3)
@@ -0,0 +1,56 @@
+"""
+屏幕截取服务测试
+在Xvfb虚拟显示中验证同一节拍内的截屏请求合并为一次，并按区域裁剪返回
+"""
+import asyncio
+import shutil
+
+import pytest
+
+pytest.importorskip('mss')
+if shutil.which('Xvfb') is None:
+    pytest.skip('未安装Xvfb', allow_module_level=True)
+
+from utils.screen_capture import ScreenCaptureService, union_region
+from utils.virtual_display import VirtualDisplayAllocator
+
+
+@pytest.fixture
+def display():
+    """独立的Xvfb显示"""
+    allocator = VirtualDisplayAllocator(size=(800, 600))
+    display = allocator.acquire()
+    yield display
+    allocator.release(display)
+
+
+def test_union_region():
+    assert union_region([(10, 20, 100, 50), (50, 0, 100, 30)]) == (10, 0, 140, 70)
+    assert union_region([(10, 20, 100, 50), None]) is None
+
+
+async def test_concurrent_grabs_are_coalesced(display):
+    service = ScreenCaptureService(tick=0.05, max_age=0)
+    regions = [(0, 0, 200, 100), (300, 200, 100, 150), (100, 50, 50, 50)]
+
+    results = await asyncio.gather(*(service.grab(region, display=display) for region in regions))
+
+    assert service.stats['grabs'] == 1
+    assert service.stats['coalesced'] == len(regions) - 1
+    for (image, origin), region in zip(results, regions):
+        assert origin == (region[0], region[1])
+        assert image.shape == (region[3], region[2], 3)
+
+
+async def test_recent_grab_is_reused(display):
+    service = ScreenCaptureService(tick=0.01, max_age=5)
+
+    full_image, origin = await service.grab(None, display=display)
+    cropped, cropped_origin = await service.grab((10, 10, 40, 30), display=display)
+
+    assert full_image.shape[:2] == (600, 800)
+    assert origin == (0, 0)
+    assert cropped.shape == (30, 40, 3)
+    assert cropped_origin == (10, 10)
+    assert service.stats['grabs'] == 1
+    assert service.stats['reused'] == 1
@@ -0,0 +1,123 @@
+"""
+步骤解释器测试
+用桩 UIOperations 执行预编译的步骤，确认 operation_count 为操作次数（与生成代码一致）
+"""
+import asyncio
+
+import pytest
+
+pytest.importorskip('cv2')
+pytest.importorskip('playwright')
+
+from utils import step_runner
+from utils.step_runner import StepRunner
+
+
+class _StubOperations:
+    """记录调用的 UIOperations 替身；click_results 依次作为图片点击结果"""
+
+    def __init__(self, click_results=None, visible=False):
+        self.calls = []
+        self.click_results = list(click_results or [])
+        self.visible = visible
+        self.page = None
+
+    async def click_image_with_fallback(self, img_path, **kwargs):
+        self.calls.append(('click_image', img_path))
+        return self.click_results.pop(0) if self.click_results else True
+
+    async def elem_click(self, selector):
+        self.calls.append(('elem_click', selector))
+
+    async def elem_login(self, *args):
+        self.calls.append(('elem_login', args[-2]))
+
+    async def elem_is_visible(self, selector, timeout=3.0):
+        return self.visible
+
+    async def is_browser_closed(self):
+        return False
+
+    async def page_mouse_scroll(self, **kwargs):
+        pass
+
+    async def elem_assert_exists(self, selector):
+        pass
+
+    async def wait_for_settle(self, timeout=1):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    async def sleep(_seconds):
+        return None
+    monkeypatch.setattr(step_runner.asyncio, 'sleep', sleep)
+    monkeypatch.setattr(step_runner, 'allure', None)
+
+
+def _run(steps, operations, runner=None):
+    runner = runner or StepRunner(steps, 'https://example.com', task_id='test_runner')
+    asyncio.run(runner.run_steps(operations))
+
+
+def _login_step(**auth_config):
+    return {'operation_type': 'web', 'operation_event': 'login', 'operation_count': 1, 'pause_time': 0,
+            'auth_config': {'email_selector': '#email', 'password_selector': '#password',
+                            'submit_selector': '#submit', **auth_config}}
+
+
+def _login_runner(step, monkeypatch):
+    runner = StepRunner([step], 'https://example.com', task_id='test_runner', credentials={0: ('a@b.c', 'pw')})
+    saved = []
+
+    async def save_session(_ui_operations, email):
+        saved.append(email)
+    monkeypatch.setattr(runner, '_save_session', save_session)
+    return runner, saved
+
+
+def test_game_step_clicks_operation_count_times():
+    operations = _StubOperations()
+    _run([{'operation_type': 'game', 'operation_params': 'Game_Img/start.png', 'operation_count': 3,
+           'pause_time': 0}], operations)
+    assert operations.calls == [('click_image', 'Game_Img/start.png')] * 3
+
+
+def test_game_step_fails_on_first_miss():
+    operations = _StubOperations(click_results=[True, False, True])
+    with pytest.raises(Exception, match='图片定位失败'):
+        _run([{'operation_type': 'game', 'operation_params': 'Game_Img/start.png', 'operation_count': 3,
+               'pause_time': 0}], operations)
+    assert len(operations.calls) == 2
+
+
+def test_web_step_runs_operation_count_times(monkeypatch):
+    # Web步骤在预编译时按类取 UIOperations.elem_<事件> 方法
+    monkeypatch.setattr(step_runner.UIOperations, 'elem_click', _StubOperations.elem_click)
+    operations = _StubOperations()
+    _run([{'operation_type': 'web', 'operation_event': 'click', 'operation_params': '#submit',
+           'operation_count': 2, 'pause_time': 0}], operations)
+    assert operations.calls == [('elem_click', '#submit')] * 2
+
+
+def test_session_without_logged_in_selector_is_never_reused(monkeypatch):
+    runner, saved = _login_runner(_login_step(), monkeypatch)
+    assert runner._session_email == ''
+    runner._session_restored = True
+    operations = _StubOperations(visible=True)
+    _run(None, operations, runner)
+    assert operations.calls == [('elem_login', 'a@b.c')]
+    assert saved == []
+
+
+def test_session_saved_only_after_logged_in_check(monkeypatch):
+    runner, saved = _login_runner(_login_step(logged_in_selector='#avatar'), monkeypatch)
+    operations = _StubOperations(visible=False)
+    _run(None, operations, runner)
+    assert operations.calls == [('elem_login', 'a@b.c')]
+    assert saved == []
+
+    operations = _StubOperations(visible=True)
+    _run(None, operations, runner)
+    assert saved == ['a@b.c']
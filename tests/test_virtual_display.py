@@ -0,0 +1,76 @@
+"""
+虚拟显示回收测试
+用 sleep 进程代替 Xvfb，确认按浏览器释放和子进程被 SIGTERM 取消时都会回收
+"""
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from utils import virtual_display
+from utils.screen_manager import screen_manager
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith('linux'), reason="依赖 /proc 与 POSIX 信号")
+
+
+class _FakeAllocator(virtual_display.VirtualDisplayAllocator):
+    """不启动真实Xvfb，用 sleep 进程占位"""
+
+    def _display_in_use(self, number):
+        return False
+
+    def _start_xvfb(self, number, startup_timeout=5.0):
+        return subprocess.Popen(['sleep', '60'])
+
+
+def _alive(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rsplit(')', 1)[1].split()[0] != 'Z'
+    except FileNotFoundError:
+        return False
+
+
+def test_release_browser_args_releases_display(monkeypatch):
+    allocator = _FakeAllocator(base=200, max_displays=2)
+    monkeypatch.setattr(virtual_display, 'virtual_display_allocator', allocator)
+    display = allocator.acquire()
+    process = allocator._displays[int(display[1:])]
+
+    screen_manager.release_browser_args([f'--display={display}', '--no-first-run'])
+    assert allocator.active_displays() == []
+    assert process.poll() is not None
+    # 重复释放、非虚拟显示参数均无副作用
+    screen_manager.release_browser_args([f'--display={display}'])
+    screen_manager.release_browser_args(None)
+
+
+def test_sigterm_releases_displays():
+    child = textwrap.dedent('''
+        import subprocess, sys, time
+        from utils.virtual_display import VirtualDisplayAllocator
+
+        class Allocator(VirtualDisplayAllocator):
+            def _display_in_use(self, number):
+                return False
+
+            def _start_xvfb(self, number, startup_timeout=5.0):
+                return subprocess.Popen(['sleep', '60'])
+
+        allocator = Allocator(base=200, max_displays=2)
+        allocator.acquire()
+        print(allocator._displays[200].pid, flush=True)
+        time.sleep(60)
+    ''')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    process = subprocess.Popen([sys.executable, '-c', child], cwd=root, stdout=subprocess.PIPE, text=True,
+                               env=dict(os.environ, PYTHONPATH=root))
+    xvfb_pid = int(process.stdout.readline())
+    assert _alive(xvfb_pid)
+
+    process.terminate()
+    assert process.wait(timeout=10) == -15
+    process.stdout.close()
+    assert not _alive(xvfb_pid)
@@ -0,0 +1,423 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+try:
+    import cv2
+    import numpy as np
+except ImportError:  # 未安装OpenCV时按原始字节保存，不转码、不生成缩略图
+    cv2 = None
+    np = None
+
+
+_MIME_TYPES = {
+    'png': 'image/png',
+    'webp': 'image/webp',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'bmp': 'image/bmp',
+}
+
+# artifacts：每个内容一条（sha256 为存储内容的哈希，source_sha256 为原始图片的哈希，用于跳过重复转码）
+# artifact_links：逻辑路径（如 IMG_LOGS/xxx.png、Game_Img/xxx.png）到内容的映射，记录所属执行和步骤
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    sha256 TEXT PRIMARY KEY,
+    source_sha256 TEXT NOT NULL,
+    ext TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    thumb_sha256 TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_source ON artifacts (source_sha256, ext);
+CREATE TABLE IF NOT EXISTS artifact_links (
+    path TEXT PRIMARY KEY,
+    sha256 TEXT NOT NULL,
+    kind TEXT NOT NULL DEFAULT '',
+    execution_id TEXT NOT NULL DEFAULT '',
+    step TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_artifact_links_sha ON artifact_links (sha256);
+CREATE INDEX IF NOT EXISTS idx_artifact_links_execution ON artifact_links (execution_id);
+"""
+
+
+def _ext_of(path: str) -> str:
+    ext = os.path.splitext(path)[1].lower().lstrip('.')
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+class ArtifactStore:
+    """内容寻址产物存储 - 截图、断言图和上传模板按内容 sha256 分片保存
+
+    对象文件保存在 Artifacts/objects/<前两位>/<sha256>.<扩展名>，相同内容只存一份；
+    元数据表（Artifacts/artifacts.db）把原来的逻辑路径映射到对象，并记录执行ID、步骤和缩略图。
+    步骤截图交给后台线程池转码（png/webp/jpeg）和生成缩略图，不阻塞测试步骤；
+    /IMG_LOGS/... 与 /Game_Img/... 路由在磁盘上找不到文件时按逻辑路径查表返回对象。
+    上传的模板和断言图仍需以原路径被识别代码直接读取，因此以硬链接方式放回原路径，内容相同的副本共用一个对象。
+    """
+
+    def __init__(self, root: str = None, workers: int = None):
+        self.root = root or os.path.join(BASE_DIR, UIConfig.ARTIFACT_STORE_DIR)
+        self.objects_dir = os.path.join(self.root, 'objects')
+        self.db_path = os.path.join(self.root, 'artifacts.db')
+        self._workers = workers or UIConfig.ARTIFACT_ENCODE_WORKERS
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    # ------------------------------------------------------------------
+    # 元数据库
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_db(self):
+        if self._initialized and os.path.exists(self.db_path):
+            return
+        with self._lock:
+            os.makedirs(self.objects_dir, exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @contextmanager
+    def _reader(self):
+        self._ensure_db()
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._ensure_db()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # 路径
+    # ------------------------------------------------------------------
+    @staticmethod
+    def logical_path(file_path: str) -> str:
+        """逻辑路径：相对项目根目录、正斜杠；项目外的 /IMG_LOGS/... 这类URL路径去掉开头的 /"""
+        file_path = str(file_path)
+        if os.path.isabs(file_path):
+            try:
+                if os.path.commonpath([os.path.abspath(file_path), BASE_DIR]) == os.path.abspath(BASE_DIR):
+                    file_path = os.path.relpath(file_path, BASE_DIR)
+            except ValueError:
+                pass
+        return os.path.normpath(file_path.lstrip('/\\')).replace('\\', '/')
+
+    def object_path(self, sha256: str, ext: str) -> str:
+        return os.path.join(self.objects_dir, sha256[:2], f"{sha256}.{ext}")
+
+    def _write_object(self, data: bytes, ext: str) -> Tuple[str, str]:
+        """写入对象文件（已存在时跳过），返回 (sha256, 对象路径)"""
+        sha256 = hashlib.sha256(data).hexdigest()
+        file_path = self.object_path(sha256, ext)
+        if not os.path.exists(file_path):
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+        return sha256, file_path
+
+    # ------------------------------------------------------------------
+    # 转码
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _encode_params(fmt: str, quality: int) -> Tuple[str, list]:
+        if fmt == 'webp':
+            return '.webp', [cv2.IMWRITE_WEBP_QUALITY, int(quality)]
+        if fmt == 'jpg':
+            return '.jpg', [cv2.IMWRITE_JPEG_QUALITY, int(quality)]
+        return '.png', [cv2.IMWRITE_PNG_COMPRESSION, 3]
+
+    def _encode(self, data: bytes, source_ext: str, fmt: str, quality: int):
+        """
+        按目标格式转码并生成缩略图
+
+        Returns:
+            (存储内容, 扩展名, 宽, 高, 缩略图内容或None)
+        """
+        fmt = 'jpg' if fmt == 'jpeg' else fmt
+        if cv2 is None or fmt == 'original':
+            return data, source_ext, None, None, None
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            return data, source_ext, None, None, None
+        height, width = image.shape[:2]
+        if fmt == source_ext or fmt not in ('png', 'webp', 'jpg'):
+            encoded, ext = data, source_ext
+        else:
+            suffix, params = self._encode_params(fmt, quality)
+            ok, buffer = cv2.imencode(suffix, image, params)
+            encoded, ext = (buffer.tobytes(), fmt) if ok else (data, source_ext)
+        thumbnail = None
+        thumb_width = UIConfig.ARTIFACT_THUMBNAIL_WIDTH
+        if thumb_width and width > thumb_width:
+            thumb_height = max(1, round(height * thumb_width / width))
+            small = cv2.resize(image, (thumb_width, thumb_height), interpolation=cv2.INTER_AREA)
+            suffix, params = self._encode_params('webp' if fmt == 'webp' else 'jpg', 75)
+            ok, buffer = cv2.imencode(suffix, small, params)
+            if ok:
+                thumbnail = (buffer.tobytes(), suffix.lstrip('.'))
+        return encoded, ext, width, height, thumbnail
+
+    # ------------------------------------------------------------------
+    # 写入
+    # ------------------------------------------------------------------
+    def store(self, file_path: str, data: bytes, kind: str = '', execution_id: str = '', step: str = '',
+              fmt: str = None, quality: int = None, materialize: bool = False) -> str:
+        """
+        保存图片并把逻辑路径指向它（同步）
+
+        Args:
+            file_path: 原来的保存路径（绝对路径或相对项目根目录），作为逻辑路径
+            data: 图片内容
+            kind: 产物类型（screenshot / assertion / template）
+            execution_id: 所属执行ID（automation_executions.id）
+            step: 所属步骤
+            fmt: png / webp / jpeg / original，默认取 UIConfig.ARTIFACT_FORMAT
+            quality: webp/jpeg 质量，默认取 UIConfig.ARTIFACT_QUALITY
+            materialize: 是否在原路径放置指向对象的硬链接（识别代码需要直接读取文件时使用）
+
+        Returns:
+            str: 存储内容的 sha256
+        """
+        fmt = (fmt or UIConfig.ARTIFACT_FORMAT).lower()
+        quality = UIConfig.ARTIFACT_QUALITY if quality is None else quality
+        logical = self.logical_path(file_path)
+        source_ext = _ext_of(logical) or 'png'
+        source_sha256 = hashlib.sha256(data).hexdigest()
+        target_ext = source_ext if fmt == 'original' else ('jpg' if fmt == 'jpeg' else fmt)
+
+        with self._reader() as conn:
+            row = conn.execute("SELECT sha256, ext FROM artifacts WHERE source_sha256 = ? AND ext = ?",
+                               (source_sha256, target_ext)).fetchone()
+        if row is not None and os.path.exists(self.object_path(row['sha256'], row['ext'])):
+            sha256, object_file = row['sha256'], self.object_path(row['sha256'], row['ext'])
+        else:
+            encoded, ext, width, height, thumbnail = self._encode(data, source_ext, fmt, quality)
+            sha256, object_file = self._write_object(encoded, ext)
+            thumb_sha256 = self._write_object(*thumbnail)[0] if thumbnail else None
+            with self._transaction() as conn:
+                conn.execute(
+                    "INSERT OR IGNORE INTO artifacts (sha256, source_sha256, ext, size, width, height, thumb_sha256, "
+                    "created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (sha256, source_sha256, ext, len(encoded), width, height, thumb_sha256, time.time()))
+                if thumbnail:
+                    conn.execute(
+                        "INSERT OR IGNORE INTO artifacts (sha256, source_sha256, ext, size, created_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (thumb_sha256, thumb_sha256, thumbnail[1], len(thumbnail[0]), time.time()))
+
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO artifact_links (path, sha256, kind, execution_id, step, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (logical, sha256, kind or '', execution_id or '', step or '', time.time()))
+        if materialize:
+            self._link_into_place(object_file, os.path.join(BASE_DIR, logical))
+        return sha256
+
+    @staticmethod
+    def _link_into_place(object_file: str, target: str):
+        """原路径替换为指向对象的硬链接（不支持硬链接时复制）"""
+        try:
+            if os.path.exists(target) and os.path.samefile(object_file, target):
+                return
+        except OSError:
+            pass
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp_path = f"{target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.link(object_file, tmp_path)
+        except OSError:
+            import shutil
+            shutil.copyfile(object_file, tmp_path)
+        os.replace(tmp_path, target)
+
+    def import_file(self, file_path: str, kind: str = '', materialize: bool = True) -> Optional[str]:
+        """已有文件按原始内容入库（不转码），默认原路径改为硬链接，内容相同的文件共用一个对象"""
+        try:
+            with open(file_path, 'rb') as f:
+                data = f.read()
+            return self.store(file_path, data, kind=kind, fmt='original', materialize=materialize)
+        except Exception as e:
+            log_info(f"图片入库失败: {file_path}, {e}")
+            return None
+
+    def submit(self, file_path: str, data: bytes, **kwargs) -> Future:
+        """后台线程池转码入库；入库完成前按该路径查询会等待其完成"""
+        logical = self.logical_path(file_path)
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='artifact-encode')
+            future = self._executor.submit(self.store, logical, data, **kwargs)
+            self._pending[logical] = future
+        future.add_done_callback(lambda done, key=logical: self._finish(key, done))
+        return future
+
+    def _finish(self, logical: str, future: Future):
+        with self._lock:
+            if self._pending.get(logical) is future:
+                del self._pending[logical]
+        error = future.exception()
+        if error is not None:
+            log_info(f"截图入库失败: {logical}, {error}")
+
+    def flush(self, timeout: float = None):
+        """等待所有后台入库任务完成"""
+        with self._lock:
+            futures = list(self._pending.values())
+        for future in futures:
+            try:
+                future.result(timeout=timeout)
+            except Exception:
+                pass
+
+    # ------------------------------------------------------------------
+    # 查询
+    # ------------------------------------------------------------------
+    def resolve(self, file_path: str, thumbnail: bool = False) -> Optional[Tuple[str, str]]:
+        """
+        按逻辑路径查找对象文件
+
+        Returns:
+            (对象文件路径, MIME类型)，未入库时返回None；请求缩略图但没有缩略图时返回原图
+        """
+        logical = self.logical_path(file_path)
+        with self._lock:
+            pending = self._pending.get(logical)
+        if pending is not None:
+            try:
+                pending.result(timeout=UIConfig.ARTIFACT_RESOLVE_TIMEOUT)
+            except Exception:
+                pass
+        if not os.path.exists(self.db_path):
+            return None
+        with self._reader() as conn:
+            row = conn.execute(
+                "SELECT a.sha256, a.ext, t.sha256 AS thumb_sha256, t.ext AS thumb_ext FROM artifact_links l "
+                "JOIN artifacts a ON a.sha256 = l.sha256 LEFT JOIN artifacts t ON t.sha256 = a.thumb_sha256 "
+                "WHERE l.path = ?", (logical,)).fetchone()
+        if row is None:
+            return None
+        if thumbnail and row['thumb_sha256']:
+            sha256, ext = row['thumb_sha256'], row['thumb_ext']
+        else:
+            sha256, ext = row['sha256'], row['ext']
+        object_file = self.object_path(sha256, ext)
+        if not os.path.exists(object_file):
+            return None
+        return object_file, _MIME_TYPES.get(ext, 'application/octet-stream')
+
+    def list_artifacts(self, execution_id: str = None, kind: str = None) -> List[Dict[str, Any]]:
+        """列出产物链接，可按执行ID或类型过滤"""
+        if not os.path.exists(self.db_path):
+            return []
+        clauses, params = [], []
+        if execution_id:
+            clauses.append("l.execution_id = ?")
+            params.append(execution_id)
+        if kind:
+            clauses.append("l.kind = ?")
+            params.append(kind)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT l.path, l.sha256, l.kind, l.execution_id, l.step, l.created_at, a.ext, a.size, a.width, "
+                f"a.height, a.thumb_sha256 FROM artifact_links l JOIN artifacts a ON a.sha256 = l.sha256 {where} "
+                "ORDER BY l.created_at", params).fetchall()
+        return [dict(row) for row in rows]
+
+    def forget(self, file_paths: List[str]) -> int:
+        """删除逻辑路径的映射（原文件已被清理时调用），对象由 gc 回收"""
+        logical = [(self.logical_path(p),) for p in file_paths or []]
+        if not logical or not os.path.exists(self.db_path):
+            return 0
+        with self._transaction() as conn:
+            before = conn.total_changes
+            conn.executemany("DELETE FROM artifact_links WHERE path = ?", logical)
+            return conn.total_changes - before
+
+    def expire(self, kind: str, before: float, keep_after: float = None) -> int:
+        """删除早于 before 的某类产物映射；keep_after 之后创建的一律保留"""
+        if not os.path.exists(self.db_path):
+            return 0
+        cutoff = before if keep_after is None else min(before, keep_after)
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM artifact_links WHERE kind = ? AND created_at < ?",
+                                (kind, cutoff)).rowcount
+
+    def gc(self) -> Dict[str, int]:
+        """删除没有任何逻辑路径引用的对象（及其缩略图）"""
+        removed = freed = 0
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT sha256, ext, size FROM artifacts a WHERE NOT EXISTS "
+                "(SELECT 1 FROM artifact_links l WHERE l.sha256 = a.sha256) AND NOT EXISTS "
+                "(SELECT 1 FROM artifacts p JOIN artifact_links l ON l.sha256 = p.sha256 "
+                "WHERE p.thumb_sha256 = a.sha256)").fetchall()
+            for row in rows:
+                try:
+                    os.remove(self.object_path(row['sha256'], row['ext']))
+                except OSError:
+                    pass
+                removed += 1
+                freed += row['size']
+            conn.executemany("DELETE FROM artifacts WHERE sha256 = ?", [(row['sha256'],) for row in rows])
+        return {'removed_objects': removed, 'freed_bytes': freed}
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        if not os.path.exists(self.db_path):
+            return {'objects': 0, 'bytes': 0, 'links': 0, 'deduplicated': 0, 'pending': pending}
+        with self._reader() as conn:
+            objects, total = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM artifacts").fetchone()
+            links, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT sha256) FROM artifact_links").fetchone()
+        return {
+            'objects': objects,
+            'bytes': total,
+            'links': links,
+            'deduplicated': links - distinct,
+            'pending': pending,
+            'root': self.root,
+        }
+
+
+# 全局产物存储实例
+artifact_store = ArtifactStore()
@@ -1,40 +1,232 @@
 # -*- coding: utf-8 -*-
 import os
+import time
+import sqlite3
+import threading
 import yaml
+from contextlib import contextmanager
 from config.logger import log_info
-from typing import Dict, Any, List, Optional, Set
+from config.ui_config import UIConfig
+from typing import Dict, Any, List, Optional, Set, Tuple
 from faker import Faker
 
 
 _BASE_DIR = 'Auth_Data'
 _FILE_NAME = 'auth_accounts.yaml'
+_DB_NAME = 'auth_accounts.db'
 
 os.makedirs(_BASE_DIR, exist_ok=True)
 _FILE_PATH = os.path.join(_BASE_DIR, _FILE_NAME)
+_DB_PATH = os.path.join(_BASE_DIR, _DB_NAME)
 
 faker = Faker()
 
-
-def _load_yaml() -> Dict[str, Any]:
-    if not os.path.exists(_FILE_PATH):
+# 账号存储：SQLite（Auth_Data/auth_accounts.db），按 项目/文件 -> 类型(address/order/slot/product_slot) -> 地址/槽位 建索引
+# step_id 为0表示当前账号，>0 表示 by_step 历史记录（只追加，不参与查询）
+# 首次使用时自动导入旧的 auth_accounts.yaml；export_yaml 可导出为原YAML结构
+# account_pool 为预生成注册账号池（free / leased / consumed / expired）
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS account_nodes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    project TEXT NOT NULL,
+    file TEXT NOT NULL,
+    UNIQUE (project, file)
+);
+CREATE TABLE IF NOT EXISTS account_steps (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    node_id INTEGER NOT NULL,
+    step_index INTEGER NOT NULL,
+    step_name TEXT NOT NULL DEFAULT '',
+    operation_event TEXT NOT NULL DEFAULT '',
+    created_at TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS account_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    node_id INTEGER NOT NULL,
+    step_id INTEGER NOT NULL DEFAULT 0,
+    kind TEXT NOT NULL,
+    position INTEGER NOT NULL DEFAULT 0,
+    slot TEXT NOT NULL DEFAULT '',
+    address TEXT NOT NULL DEFAULT '',
+    email TEXT NOT NULL DEFAULT '',
+    password TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_account_entries_node ON account_entries (node_id, step_id, kind);
+CREATE INDEX IF NOT EXISTS idx_account_entries_address ON account_entries (address, step_id, kind);
+CREATE INDEX IF NOT EXISTS idx_account_entries_email ON account_entries (email);
+CREATE TABLE IF NOT EXISTS account_pool (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    email TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    password TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'free',
+    lease_owner TEXT NOT NULL DEFAULT '',
+    lease_expires REAL NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_account_pool_status ON account_pool (status, id);
+CREATE TABLE IF NOT EXISTS account_meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_init_lock = threading.Lock()
+_initialized = False
+
+
+def _load_yaml(file_path: str = None) -> Dict[str, Any]:
+    file_path = file_path or _FILE_PATH
+    if not os.path.exists(file_path):
         return {}
-    with open(_FILE_PATH, 'r', encoding='utf-8') as f:
+    with open(file_path, 'r', encoding='utf-8') as f:
         data = yaml.safe_load(f) or {}
     return data
 
 
-def _save_yaml(data: Dict[str, Any]) -> None:
-    with open(_FILE_PATH, 'w', encoding='utf-8') as f:
+def _save_yaml(data: Dict[str, Any], file_path: str = None) -> None:
+    file_path = file_path or _FILE_PATH
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
         yaml.safe_dump(data, f, allow_unicode=True, sort_keys=False)
+    os.replace(tmp_path, file_path)
+
+
+def _connect() -> sqlite3.Connection:
+    # 每次操作独立连接：Flask多线程与多个执行进程都可安全访问，写入由SQLite文件锁串行化
+    conn = sqlite3.connect(_DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _ensure_db() -> None:
+    """建表，首次使用时导入旧YAML"""
+    global _initialized
+    if _initialized and os.path.exists(_DB_PATH):
+        return
+    with _init_lock:
+        conn = _connect()
+        try:
+            conn.executescript(_SCHEMA)
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                imported = conn.execute("SELECT value FROM account_meta WHERE key = 'yaml_imported'").fetchone()
+                if imported is None:
+                    if os.path.exists(_FILE_PATH):
+                        count = _import_data(conn, _load_yaml())
+                        log_info(f"账号数据已从 {_FILE_PATH} 导入 {_DB_PATH}，共 {count} 个项目文件")
+                    conn.execute("INSERT OR REPLACE INTO account_meta (key, value) VALUES ('yaml_imported', ?)",
+                                 (time.strftime('%Y-%m-%d %H:%M:%S'),))
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+        _initialized = True
+
+
+@contextmanager
+def _reader():
+    _ensure_db()
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def _transaction(invalidate_index: bool = True):
+    """写事务：BEGIN IMMEDIATE 先取得写锁，避免并发写入互相覆盖"""
+    _ensure_db()
+    conn = _connect()
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+    finally:
+        conn.close()
+        if invalidate_index:
+            _address_index.invalidate()
+
+
+def _node_id(conn: sqlite3.Connection, project_name: str, file_name: str, create: bool = False) -> Optional[int]:
+    row = conn.execute("SELECT id FROM account_nodes WHERE project = ? AND file = ?",
+                       (project_name, file_name)).fetchone()
+    if row is not None:
+        return row['id']
+    if not create:
+        return None
+    return conn.execute("INSERT INTO account_nodes (project, file) VALUES (?, ?)",
+                        (project_name, file_name)).lastrowid
+
+
+def _credential(info: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    return (info or {}).get('email', '') or '', (info or {}).get('password', '') or ''
+
+
+def _insert_entries(conn: sqlite3.Connection, node_id: int, step_id: int, kind: str,
+                    rows: List[Tuple[int, str, str, str, str]]) -> None:
+    """批量写入 (position, slot, address, email, password)"""
+    conn.executemany(
+        "INSERT INTO account_entries (node_id, step_id, kind, position, slot, address, email, password) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [(node_id, step_id, kind) + tuple(row) for row in rows])
+
+
+def _replace_entries(conn: sqlite3.Connection, node_id: int, kind: str,
+                     rows: List[Tuple[int, str, str, str, str]]) -> None:
+    conn.execute("DELETE FROM account_entries WHERE node_id = ? AND step_id = 0 AND kind = ?", (node_id, kind))
+    _insert_entries(conn, node_id, 0, kind, rows)
+
+
+def _order_rows(accounts_list: Optional[List[Dict[str, str]]]) -> List[Tuple[int, str, str, str, str]]:
+    rows = []
+    for item in accounts_list or []:
+        if not isinstance(item, dict):
+            continue
+        email, password = _credential(item)
+        rows.append((len(rows), '', (item.get('address') or '').strip(), email, password))
+    return rows
+
+
+def _slot_rows(accounts_slots: Optional[Dict[str, Dict[str, str]]]) -> List[Tuple[int, str, str, str, str]]:
+    rows = []
+    for slot_key, info in (accounts_slots or {}).items():
+        if not slot_key:
+            continue
+        email, password = _credential(info)
+        rows.append((len(rows), str(slot_key), (info or {}).get('address', '') or '', email, password))
+    return rows
+
+
+def _product_slot_rows(product_address_slots: Optional[Dict[str, str]]) -> List[Tuple[int, str, str, str, str]]:
+    rows = []
+    for slot_key, addr in (product_address_slots or {}).items():
+        if not slot_key:
+            continue
+        rows.append((len(rows), str(slot_key), (addr or '').strip(), '', ''))
+    return rows
+
+
+def _select_entries(conn: sqlite3.Connection, node_id: int, kind: str, step_id: int = 0) -> List[sqlite3.Row]:
+    return conn.execute(
+        "SELECT slot, address, email, password FROM account_entries "
+        "WHERE node_id = ? AND step_id = ? AND kind = ? ORDER BY position, id",
+        (node_id, step_id, kind)).fetchall()
 
 
 def read_accounts(project_name: str, file_name: str) -> Dict[str, Dict[str, str]]:
-    data = _load_yaml()
-    entry = data.get(project_name, {}).get(file_name, {})
-    # 兼容：如果是新结构，读取 by_address；如果是旧结构，直接返回字典
-    if isinstance(entry, dict) and 'by_address' in entry:
-        return entry.get('by_address', {}) or {}
-    return entry or {}
+    with _reader() as conn:
+        node_id = _node_id(conn, project_name, file_name)
+        if node_id is None:
+            return {}
+        return {row['address']: {'email': row['email'], 'password': row['password']}
+                for row in _select_entries(conn, node_id, 'address')}
 
 
 def write_accounts(
@@ -45,261 +237,342 @@ def write_accounts(
     accounts_slots: Optional[Dict[str, Dict[str, str]]] = None,
     product_address_slots: Optional[Dict[str, str]] = None,
 ) -> None:
-    data = _load_yaml()
-    if project_name not in data:
-        data[project_name] = {}
-    if file_name not in data[project_name]:
-        data[project_name][file_name] = {}
+    with _transaction() as conn:
+        node_id = _node_id(conn, project_name, file_name, create=True)
 
-    # 新结构节点
-    if not isinstance(data[project_name][file_name], dict):
-        data[project_name][file_name] = {}
+        # 合并 by_address（后写覆盖同地址，保留原顺序）
+        for addr, info in (accounts or {}).items():
+            email, password = _credential(info)
+            updated = conn.execute(
+                "UPDATE account_entries SET email = ?, password = ? "
+                "WHERE node_id = ? AND step_id = 0 AND kind = 'address' AND address = ?",
+                (email, password, node_id, addr)).rowcount
+            if not updated:
+                _insert_entries(conn, node_id, 0, 'address', [(0, '', addr, email, password)])
 
-    node = data[project_name][file_name]
+        # 覆盖 by_order（按当前保存覆盖，保留重复与顺序）
+        if accounts_list is not None:
+            _replace_entries(conn, node_id, 'order', _order_rows(accounts_list))
 
-    # 合并 by_address（后写覆盖同地址）
-    if 'by_address' not in node or not isinstance(node['by_address'], dict):
-        node['by_address'] = {}
-    for addr, info in (accounts or {}).items():
-        node['by_address'][addr] = {
-            'email': (info or {}).get('email', ''),
-            'password': (info or {}).get('password', '')
-        }
+        # 覆盖 by_slot（SCS_1, SCS_2 ...）
+        if accounts_slots is not None:
+            _replace_entries(conn, node_id, 'slot', _slot_rows(accounts_slots))
 
-    # 覆盖 by_order（按当前保存覆盖，保留重复与顺序）
-    if accounts_list is not None:
-        safe_list: List[Dict[str, str]] = []
-        for item in accounts_list:
-            if not isinstance(item, dict):
-                continue
-            safe_list.append({
-                'address': (item.get('address') or '').strip(),
-                'email': item.get('email', ''),
-                'password': item.get('password', '')
-            })
-        node['by_order'] = safe_list
+        # 保存产品地址的槽位映射（便于调试/回显）
+        if product_address_slots is not None:
+            _replace_entries(conn, node_id, 'product_slot', _product_slot_rows(product_address_slots))
 
-    # 覆盖 by_slot（SCS_1, SCS_2 ...）
-    if accounts_slots is not None:
-        safe_slots: Dict[str, Dict[str, str]] = {}
-        for slot_key, info in (accounts_slots or {}).items():
-            if not slot_key:
-                continue
-            safe_slots[str(slot_key)] = {
-                'address': (info or {}).get('address', ''),
-                'email': (info or {}).get('email', ''),
-                'password': (info or {}).get('password', '')
-            }
-        node['by_slot'] = safe_slots
-
-    # 保存产品地址的槽位映射（便于调试/回显）
-    if product_address_slots is not None:
-        safe_pa: Dict[str, str] = {}
-        for slot_key, addr in (product_address_slots or {}).items():
-            if not slot_key:
-                continue
-            safe_pa[str(slot_key)] = (addr or '').strip()
-        node['product_address_slots'] = safe_pa
-
-    data[project_name][file_name] = node
-    _save_yaml(data)
+        _consume_pool_accounts(conn, accounts, accounts_list, accounts_slots)
 
 
 def read_accounts_list(project_name: str, file_name: str) -> List[Dict[str, str]]:
     """读取按顺序保存的账号列表（包含重复）。
     如果不存在，则返回空列表。
-    兼容旧结构：旧结构没有该字段。
     """
-    data = _load_yaml()
-    entry = data.get(project_name, {}).get(file_name, {})
-    if isinstance(entry, dict):
-        lst = entry.get('by_order')
-        if isinstance(lst, list):
-            # 归一化字段
-            normalized: List[Dict[str, str]] = []
-            for item in lst:
-                if not isinstance(item, dict):
-                    continue
-                normalized.append({
-                    'address': (item.get('address') or '').strip(),
-                    'email': item.get('email', ''),
-                    'password': item.get('password', '')
-                })
-            return normalized
-    return []
+    with _reader() as conn:
+        node_id = _node_id(conn, project_name, file_name)
+        if node_id is None:
+            return []
+        return [{'address': row['address'], 'email': row['email'], 'password': row['password']}
+                for row in _select_entries(conn, node_id, 'order')]
 
 
 def read_accounts_slots(project_name: str, file_name: str) -> Dict[str, Dict[str, str]]:
     """读取基于槽位（SCS_1..N）的账号映射。"""
-    data = _load_yaml()
-    entry = data.get(project_name, {}).get(file_name, {})
-    if isinstance(entry, dict):
-        slots = entry.get('by_slot')
-        if isinstance(slots, dict):
-            normalized: Dict[str, Dict[str, str]] = {}
-            for k, v in slots.items():
-                normalized[str(k)] = {
-                    'address': (v or {}).get('address', ''),
-                    'email': (v or {}).get('email', ''),
-                    'password': (v or {}).get('password', '')
-                }
-            return normalized
-    return {}
+    with _reader() as conn:
+        node_id = _node_id(conn, project_name, file_name)
+        if node_id is None:
+            return {}
+        return {row['slot']: {'address': row['address'], 'email': row['email'], 'password': row['password']}
+                for row in _select_entries(conn, node_id, 'slot')}
 
 
 def read_product_address_slots(project_name: str, file_name: str) -> Dict[str, str]:
     """读取保存的产品地址槽位映射（SCS_1..N -> 地址）。"""
-    data = _load_yaml()
-    entry = data.get(project_name, {}).get(file_name, {})
-    if isinstance(entry, dict):
-        pa = entry.get('product_address_slots')
-        if isinstance(pa, dict):
-            normalized: Dict[str, str] = {}
-            for k, v in pa.items():
-                normalized[str(k)] = (v or '').strip()
-            return normalized
-    return {}
-
-
-def generate_unique_accounts_for_addresses(addresses: List[str]) -> Dict[str, Dict[str, str]]:
-    """为给定地址列表生成唯一的邮箱与密码。
-    - 邮箱：使用 Faker.unique.email 保证本次调用内唯一性，必要时退化到 username+随机数 方案
-    - 密码：固定 '123456789'（与前端兼容）
-    返回按地址去重后的映射；重复地址只保留一个账号。
-    """
-    unique_accounts: Dict[str, Dict[str, str]] = {}
-    used_emails = set()
+    with _reader() as conn:
+        node_id = _node_id(conn, project_name, file_name)
+        if node_id is None:
+            return {}
+        return {row['slot']: row['address'] for row in _select_entries(conn, node_id, 'product_slot')}
 
-    # 确保每次调用的唯一池被重置
-    try:
-        faker.unique.clear()
-    except Exception:
-        pass
 
-    for addr in addresses or []:
-        addr_str = (addr or '').strip()
-        if not addr_str:
-            continue
-        if addr_str in unique_accounts:
-            continue
+# =============================================================================
+# 预生成账号池
+# =============================================================================
+_DEFAULT_PASSWORD = '123456789'  # 与前端兼容
 
-        # 生成唯一邮箱
-        email_value = ''
-        for _ in range(5):
-            try:
-                candidate = faker.unique.email()
-            except Exception:
-                candidate = f"{faker.user_name()}.{faker.random_int(min=1000, max=999999)}@{faker.free_email_domain()}"
-            if candidate not in used_emails:
-                email_value = candidate
-                used_emails.add(candidate)
-                break
-        if not email_value:
-            email_value = f"user{faker.random_number(digits=8)}@example.com"
-
-        password_value = '123456789'
-
-        unique_accounts[addr_str] = {
-            'email': email_value,
-            'password': password_value
-        }
+_faker_lock = threading.Lock()
 
-    return unique_accounts
 
+class AccountPool:
+    """预生成注册账号池
 
-def generate_unique_accounts_list_for_addresses(addresses: List[str]) -> List[Dict[str, str]]:
-    """为地址列表逐项生成账号（保留顺序与重复）。
-    返回长度与输入一致的列表，每项包含 {email, password}。
+    后台预先生成与整个账号库（已保存账号和池内账号）都不重复的邮箱，生成接口按租约发放：
+    取空闲队列头部（状态索引上的单次查询），BEGIN IMMEDIATE 保证多个进程/线程不会拿到同一账号。
+    同一租用方再次租用时优先复用其未保存的租约（预览/重新生成不会不断消耗新账号），多出的归还空闲队列。
+    账号保存到账号库（write_accounts / write_step_accounts）时标记为已使用；
+    租约到期仍未保存的账号可能已在站点注册过，直接作废而不回收，并在补充时清理。池状态保存在账号库的 account_pool 表中。
     """
-    accounts_list: List[Dict[str, str]] = []
 
-    # 每次调用重置 unique 池，避免邮箱重复
-    try:
-        faker.unique.clear()
-    except Exception:
-        pass
+    def __init__(self, target_size: int = None, refill_threshold: int = None, lease_ttl: float = None):
+        self.target_size = UIConfig.ACCOUNT_POOL_TARGET_SIZE if target_size is None else target_size
+        self.refill_threshold = UIConfig.ACCOUNT_POOL_REFILL_THRESHOLD if refill_threshold is None else refill_threshold
+        self.lease_ttl = UIConfig.ACCOUNT_POOL_LEASE_TTL if lease_ttl is None else lease_ttl
+        self._refill_lock = threading.Lock()
+        self._refill_thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def _generate_emails(conn: sqlite3.Connection, count: int) -> List[str]:
+        """生成与账号库、账号池都不重复的邮箱（调用方持有写事务）"""
+        existing: Set[str] = {row[0].lower() for row in conn.execute("SELECT email FROM account_pool")}
+        existing.update(row[0].lower() for row in conn.execute(
+            "SELECT DISTINCT email FROM account_entries WHERE email != ''"))
+        emails: List[str] = []
+        with _faker_lock:
+            for _ in range(count * 20):
+                if len(emails) >= count:
+                    break
+                try:
+                    candidate = faker.email()
+                except Exception:
+                    candidate = ''
+                if not candidate or candidate.lower() in existing:
+                    candidate = f"{faker.user_name()}.{faker.random_int(min=1000, max=999999)}@{faker.free_email_domain()}"
+                if candidate.lower() in existing:
+                    continue
+                existing.add(candidate.lower())
+                emails.append(candidate)
+        return emails
+
+    def lease(self, count: int, owner: str = '', ttl: float = None) -> List[Dict[str, str]]:
+        """
+        租用 count 个账号，池中不足时当场生成补齐
+
+        Args:
+            count: 账号数量
+            owner: 租用方标识；非空时先复用该租用方尚未保存的租约，多出的租约归还空闲队列
+            ttl: 租约有效期（秒），默认取 lease_ttl
+
+        Returns:
+            List[Dict[str, str]]: [{email, password}, ...]，长度与 count 一致
+
+        Raises:
+            RuntimeError: 无法生成足够的唯一邮箱
+        """
+        if count <= 0:
+            return []
+        now = time.time()
+        expires = now + (self.lease_ttl if ttl is None else ttl)
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        with _transaction(invalidate_index=False) as conn:
+            conn.execute("UPDATE account_pool SET status = 'expired' WHERE status = 'leased' AND lease_expires < ?", (now,))
+            rows = []
+            if owner:
+                owned = conn.execute(
+                    "SELECT id, email, password FROM account_pool WHERE status = 'leased' AND lease_owner = ? ORDER BY id",
+                    (owner,)).fetchall()
+                rows, surplus = owned[:count], owned[count:]
+                conn.executemany(
+                    "UPDATE account_pool SET status = 'free', lease_owner = '', lease_expires = 0 WHERE id = ?",
+                    [(row['id'],) for row in surplus])
+            if len(rows) < count:
+                rows += conn.execute(
+                    "SELECT id, email, password FROM account_pool WHERE status = 'free' ORDER BY id LIMIT ?",
+                    (count - len(rows),)).fetchall()
+            conn.executemany(
+                "UPDATE account_pool SET status = 'leased', lease_owner = ?, lease_expires = ? WHERE id = ?",
+                [(owner, expires, row['id']) for row in rows])
+            accounts = [{'email': row['email'], 'password': row['password']} for row in rows]
+            if len(accounts) < count:
+                emails = self._generate_emails(conn, count - len(accounts))
+                conn.executemany(
+                    "INSERT INTO account_pool (email, password, status, lease_owner, lease_expires, created_at) "
+                    "VALUES (?, ?, 'leased', ?, ?, ?)",
+                    [(email, _DEFAULT_PASSWORD, owner, expires, created_at) for email in emails])
+                accounts.extend({'email': email, 'password': _DEFAULT_PASSWORD} for email in emails)
+                log_info(f"账号池空闲不足，当场生成 {len(emails)} 个账号")
+            if len(accounts) < count:
+                # 抛出异常回滚本次租用，避免调用方拿到比地址少的账号
+                raise RuntimeError(f"无法生成足够的唯一注册账号：需要 {count} 个，仅得到 {len(accounts)} 个")
+        self.ensure_refill()
+        return accounts
+
+    def release(self, emails: List[str]) -> int:
+        """归还未使用的租约账号"""
+        emails = [email for email in emails or [] if email]
+        if not emails:
+            return 0
+        with _transaction(invalidate_index=False) as conn:
+            return conn.execute(
+                f"UPDATE account_pool SET status = 'free', lease_owner = '', lease_expires = 0 "
+                f"WHERE status = 'leased' AND email IN ({','.join('?' * len(emails))})", emails).rowcount
+
+    def refill(self) -> int:
+        """清理已作废的账号，并补充空闲账号到 target_size，返回新增数量"""
+        created_at = time.strftime('%Y-%m-%d %H:%M:%S')
+        with _transaction(invalidate_index=False) as conn:
+            conn.execute("UPDATE account_pool SET status = 'expired' WHERE status = 'leased' AND lease_expires < ?",
+                         (time.time(),))
+            pruned = conn.execute("DELETE FROM account_pool WHERE status = 'expired'").rowcount
+            if pruned:
+                log_info(f"账号池已清理 {pruned} 个过期租约账号")
+            free = conn.execute("SELECT COUNT(*) FROM account_pool WHERE status = 'free'").fetchone()[0]
+            need = self.target_size - free
+            if need <= 0:
+                return 0
+            emails = self._generate_emails(conn, need)
+            conn.executemany(
+                "INSERT OR IGNORE INTO account_pool (email, password, created_at) VALUES (?, ?, ?)",
+                [(email, _DEFAULT_PASSWORD, created_at) for email in emails])
+        log_info(f"账号池已补充 {len(emails)} 个账号")
+        return len(emails)
+
+    def ensure_refill(self) -> None:
+        """空闲账号低于阈值时启动后台补充线程"""
+        with _reader() as conn:
+            free = conn.execute("SELECT COUNT(*) FROM account_pool WHERE status = 'free'").fetchone()[0]
+        if free >= self.refill_threshold:
+            return
+        with self._refill_lock:
+            if self._refill_thread is not None and self._refill_thread.is_alive():
+                return
+            self._refill_thread = threading.Thread(target=self._refill_quietly, name='account-pool-refill', daemon=True)
+            self._refill_thread.start()
+
+    def _refill_quietly(self) -> None:
+        try:
+            self.refill()
+        except Exception as e:
+            log_info(f"账号池补充失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with _reader() as conn:
+            counts = {row['status']: row['total'] for row in conn.execute(
+                "SELECT status, COUNT(*) AS total FROM account_pool GROUP BY status")}
+        return {
+            'free': counts.get('free', 0),
+            'leased': counts.get('leased', 0),
+            'consumed': counts.get('consumed', 0),
+            'expired': counts.get('expired', 0),
+            'target_size': self.target_size,
+            'refill_threshold': self.refill_threshold,
+            'lease_ttl': self.lease_ttl,
+        }
 
-    used_emails = set()
 
-    for _ in addresses or []:
-        # 生成唯一邮箱
-        email_value = ''
-        for _try in range(5):
-            try:
-                candidate = faker.unique.email()
-            except Exception:
-                candidate = f"{faker.user_name()}.{faker.random_int(min=1000, max=999999)}@{faker.free_email_domain()}"
-            if candidate not in used_emails:
-                email_value = candidate
-                used_emails.add(candidate)
-                break
-        if not email_value:
-            email_value = f"user{faker.random_number(digits=8)}@example.com"
+def _consume_pool_accounts(conn: sqlite3.Connection, *collections) -> None:
+    """账号保存到账号库时，将其中来自账号池的邮箱标记为已使用"""
+    emails = set()
+    for collection in collections:
+        items = collection.values() if isinstance(collection, dict) else (collection or [])
+        for info in items:
+            email = (info or {}).get('email', '') if isinstance(info, dict) else ''
+            if email:
+                emails.add(email)
+    if emails:
+        emails = list(emails)
+        conn.execute(f"UPDATE account_pool SET status = 'consumed' WHERE status != 'consumed' "
+                     f"AND email IN ({','.join('?' * len(emails))})", emails)
+
+
+account_pool = AccountPool()
 
-        password_value = '123456789'
 
-        accounts_list.append({
-            'email': email_value,
-            'password': password_value
-        })
+def generate_unique_accounts_for_addresses(addresses: List[str], owner: str = 'generate') -> Dict[str, Dict[str, str]]:
+    """为给定地址列表分配唯一的邮箱与密码（从预生成账号池租用）。
+    - 邮箱：与账号库中已保存的账号和池内账号都不重复
+    - 密码：固定 '123456789'（与前端兼容）
+    返回按地址去重后的映射；重复地址只保留一个账号。同一 owner 再次生成时复用其未保存的账号。
+    无法为每个地址分配账号时抛出 RuntimeError。
+    """
+    unique_addresses = list(dict.fromkeys(addr.strip() for addr in (a or '' for a in addresses or []) if addr.strip()))
+    leased = account_pool.lease(len(unique_addresses), owner=owner)
+    return {addr: {'email': account['email'], 'password': account['password']}
+            for addr, account in zip(unique_addresses, leased)}
 
-    return accounts_list
 
+def generate_unique_accounts_list_for_addresses(addresses: List[str], owner: str = 'generate') -> List[Dict[str, str]]:
+    """为地址列表逐项分配账号（保留顺序与重复，从预生成账号池租用）。
+    返回长度与输入一致的列表，每项包含 {email, password}；同一 owner 再次生成时复用其未保存的账号。
+    无法分配足够账号时抛出 RuntimeError。
+    """
+    return account_pool.lease(len(addresses or []), owner=owner)
+
+
+class _AddressIndex:
+    """全局按地址聚合的内存索引，数据库文件修改（mtime/大小变化）或本进程写入后重建"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._signature = None
+        self._flattened: Dict[str, Dict[str, str]] = {}
+        self._grouped: Dict[str, List[Dict[str, str]]] = {}
+
+    @staticmethod
+    def _db_signature() -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(_DB_PATH)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._signature = None
+
+    def get(self) -> Tuple[Dict[str, Dict[str, str]], Dict[str, List[Dict[str, str]]]]:
+        _ensure_db()
+        signature = self._db_signature()
+        with self._lock:
+            if signature is not None and signature == self._signature:
+                return self._flattened, self._grouped
+        flattened, grouped = self._build()
+        with self._lock:
+            self._signature = signature
+            self._flattened, self._grouped = flattened, grouped
+        return flattened, grouped
+
+    @staticmethod
+    def _build() -> Tuple[Dict[str, Dict[str, str]], Dict[str, List[Dict[str, str]]]]:
+        # 顺序与原YAML遍历一致：项目按首次出现顺序，项目内文件按创建顺序
+        with _reader() as conn:
+            rows = conn.execute(
+                "SELECT e.kind, e.address, e.email, e.password FROM account_entries e "
+                "JOIN account_nodes n ON n.id = e.node_id "
+                "WHERE e.step_id = 0 AND e.kind IN ('address', 'order') "
+                "ORDER BY (SELECT MIN(p.id) FROM account_nodes p WHERE p.project = n.project), n.id, e.position, e.id"
+            ).fetchall()
+
+        flattened: Dict[str, Dict[str, str]] = {}
+        grouped: Dict[str, List[Dict[str, str]]] = {}
+        # 先聚合 by_address（优先），再用 by_order 填补缺失地址（仅取第一条出现的地址）
+        for kind in ('address', 'order'):
+            for row in rows:
+                if row['kind'] != kind:
+                    continue
+                addr = (row['address'] or '').strip()
+                email_value, password_value = row['email'], row['password']
+                if not addr or not ((email_value and email_value.strip()) or (password_value and password_value.strip())):
+                    continue
+                if addr not in flattened:
+                    flattened[addr] = {'email': email_value, 'password': password_value}
+                if kind == 'order':
+                    grouped.setdefault(addr, []).append({'email': email_value, 'password': password_value})
+        return flattened, grouped
 
-def read_all_accounts_by_address() -> Dict[str, Dict[str, str]]:
-    """扫描全局 YAML，聚合所有项目下 by_address 与 by_order 的账号，按地址取第一条非空。"""
-    data = _load_yaml()
-    result: Dict[str, Dict[str, str]] = {}
 
-    # 先聚合 by_address（优先）
-    for project_name, files in (data or {}).items():
-        if not isinstance(files, dict):
-            continue
-        for file_name, node in (files or {}).items():
-            if not isinstance(node, dict):
-                continue
-            by_addr = node.get('by_address')
-            if isinstance(by_addr, dict):
-                for addr_key, info in by_addr.items():
-                    addr = (addr_key or '').strip()
-                    if not addr or addr in result:
-                        continue
-                    email_value = (info or {}).get('email', '')
-                    password_value = (info or {}).get('password', '')
-                    if (email_value and email_value.strip()) or (password_value and password_value.strip()):
-                        result[addr] = {
-                            'email': email_value,
-                            'password': password_value
-                        }
-
-    # 再尝试 by_order 填补缺失地址（仅取第一条出现的地址）
-    for project_name, files in (data or {}).items():
-        if not isinstance(files, dict):
-            continue
-        for file_name, node in (files or {}).items():
-            if not isinstance(node, dict):
-                continue
-            by_order = node.get('by_order')
-            if isinstance(by_order, list):
-                for item in by_order:
-                    if not isinstance(item, dict):
-                        continue
-                    addr = (item.get('address') or '').strip()
-                    if not addr or addr in result:
-                        continue
-                    email_value = item.get('email', '')
-                    password_value = item.get('password', '')
-                    if (email_value and email_value.strip()) or (password_value and password_value.strip()):
-                        result[addr] = {
-                            'email': email_value,
-                            'password': password_value
-                        }
-    return result
+_address_index = _AddressIndex()
+
+
+def read_all_accounts_by_address() -> Dict[str, Dict[str, str]]:
+    """聚合所有项目下 by_address 与 by_order 的账号，按地址取第一条非空。"""
+    flattened, _grouped = _address_index.get()
+    return {addr: dict(info) for addr, info in flattened.items()}
 
 
 def read_accounts_by_addresses(addresses: List[str]) -> Dict[str, Dict[str, str]]:
     """根据地址列表返回对应的账号（全局聚合后按地址匹配）。"""
-    flattened = read_all_accounts_by_address()
+    flattened, _grouped = _address_index.get()
     resolved: Dict[str, Dict[str, str]] = {}
     for addr in addresses or []:
         key = (addr or '').strip()
@@ -314,36 +587,11 @@ def read_accounts_by_addresses(addresses: List[str]) -> Dict[str, Dict[str, str]
 
 
 def _build_grouped_accounts_by_address_from_all_projects() -> Dict[str, List[Dict[str, str]]]:
-    """扫描全局 YAML，按 address 分组聚合所有项目/文件的 by_order 条目，保持原始出现顺序。
+    """按 address 分组聚合所有项目/文件的 by_order 条目，保持原始出现顺序。
     返回：address -> [{email,password}, ...]
     """
-    data = _load_yaml()
-    grouped: Dict[str, List[Dict[str, str]]] = {}
-    for _project, files in (data or {}).items():
-        if not isinstance(files, dict):
-            continue
-        for _file, node in (files or {}).items():
-            if not isinstance(node, dict):
-                continue
-            by_order = node.get('by_order')
-            if not isinstance(by_order, list):
-                continue
-            for item in by_order:
-                if not isinstance(item, dict):
-                    continue
-                addr = (item.get('address') or '').strip()
-                if not addr:
-                    continue
-                email_value = item.get('email', '')
-                password_value = item.get('password', '')
-                if (email_value and email_value.strip()) or (password_value and password_value.strip()):
-                    if addr not in grouped:
-                        grouped[addr] = []
-                    grouped[addr].append({
-                        'email': email_value,
-                        'password': password_value
-                    })
-    return grouped
+    _flattened, grouped = _address_index.get()
+    return {addr: [dict(item) for item in items] for addr, items in grouped.items()}
 
 
 def lookup_accounts_for_addresses(addresses: List[str]) -> Dict[str, Any]:
@@ -459,68 +707,121 @@ def write_step_accounts(
     accounts_slots: Optional[Dict[str, Dict[str, str]]] = None,
     product_address_slots: Optional[Dict[str, str]] = None,
 ) -> None:
-    data = _load_yaml()
-    if project_name not in data:
-        data[project_name] = {}
-    if file_name not in data[project_name]:
-        data[project_name][file_name] = {}
-
-    # 确保节点为 dict
-    if not isinstance(data[project_name][file_name], dict):
-        data[project_name][file_name] = {}
-
-    node = data[project_name][file_name]
-
-    # 初始化 by_step 列表
-    if 'by_step' not in node or not isinstance(node['by_step'], list):
-        node['by_step'] = []
-
-    # 规整各子结构
-    safe_by_address: Dict[str, Dict[str, str]] = {}
+    with _transaction() as conn:
+        node_id = _node_id(conn, project_name, file_name, create=True)
+        _append_step(conn, node_id, step_index, step_name, operation_event,
+                     accounts, accounts_list, accounts_slots, product_address_slots)
+        _consume_pool_accounts(conn, accounts, accounts_list, accounts_slots)
+
+
+def _append_step(conn: sqlite3.Connection, node_id: int, step_index: int, step_name: str, operation_event: str,
+                 accounts, accounts_list, accounts_slots, product_address_slots, created_at: str = None) -> None:
+    step_id = conn.execute(
+        "INSERT INTO account_steps (node_id, step_index, step_name, operation_event, created_at) VALUES (?, ?, ?, ?, ?)",
+        (node_id, int(step_index), step_name or f'step_{int(step_index)}', operation_event or '',
+         created_at or time.strftime('%Y-%m-%d %H:%M:%S'))).lastrowid
+    address_rows = []
     for addr, info in (accounts or {}).items():
         if not addr:
             continue
-        safe_by_address[addr] = {
-            'email': (info or {}).get('email', ''),
-            'password': (info or {}).get('password', '')
-        }
-
-    safe_by_order: List[Dict[str, str]] = []
-    for item in (accounts_list or []):
-        if not isinstance(item, dict):
-            continue
-        safe_by_order.append({
-            'address': (item.get('address') or '').strip(),
-            'email': item.get('email', ''),
-            'password': item.get('password', '')
-        })
-
-    safe_by_slot: Dict[str, Dict[str, str]] = {}
-    for slot_key, info in (accounts_slots or {}).items():
-        if not slot_key:
-            continue
-        safe_by_slot[str(slot_key)] = {
-            'address': (info or {}).get('address', ''),
-            'email': (info or {}).get('email', ''),
-            'password': (info or {}).get('password', '')
-        }
-
-    safe_pa: Dict[str, str] = {}
-    for slot_key, addr in (product_address_slots or {}).items():
-        if not slot_key:
+        email, password = _credential(info)
+        address_rows.append((len(address_rows), '', addr, email, password))
+    _insert_entries(conn, node_id, step_id, 'address', address_rows)
+    _insert_entries(conn, node_id, step_id, 'order', _order_rows(accounts_list))
+    _insert_entries(conn, node_id, step_id, 'slot', _slot_rows(accounts_slots))
+    _insert_entries(conn, node_id, step_id, 'product_slot', _product_slot_rows(product_address_slots))
+
+
+# =============================================================================
+# YAML 导入/导出
+# =============================================================================
+def _import_data(conn: sqlite3.Connection, data: Dict[str, Any]) -> int:
+    """将YAML结构写入数据库（调用方负责事务），返回导入的项目文件数"""
+    count = 0
+    for project_name, files in (data or {}).items():
+        if not isinstance(files, dict):
             continue
-        safe_pa[str(slot_key)] = (addr or '').strip()
-
-    # 追加记录
-    node['by_step'].append({
-        'step_index': int(step_index),
-        'step_name': step_name or f'step_{int(step_index)}',
-        'operation_event': operation_event or '',
-        'by_address': safe_by_address,
-        'by_order': safe_by_order,
-        'by_slot': safe_by_slot,
-        'product_address_slots': safe_pa
-    })
-
-    data[project_name][file_name] = node
-    _save_yaml(data)
\ No newline at end of file
+        for file_name, node in (files or {}).items():
+            if not isinstance(node, dict):
+                continue
+            node_id = _node_id(conn, str(project_name), str(file_name), create=True)
+            known_keys = {'by_address', 'by_order', 'by_slot', 'product_address_slots', 'by_step'}
+            if node and not (set(node) & known_keys):
+                # 旧结构：地址 -> 账号
+                node = {'by_address': node}
+            by_address = node.get('by_address') if isinstance(node.get('by_address'), dict) else {}
+            _replace_entries(conn, node_id, 'address', [
+                (i, '', addr, *_credential(info)) for i, (addr, info) in enumerate(by_address.items())])
+            if isinstance(node.get('by_order'), list):
+                _replace_entries(conn, node_id, 'order', _order_rows(node['by_order']))
+            if isinstance(node.get('by_slot'), dict):
+                _replace_entries(conn, node_id, 'slot', _slot_rows(node['by_slot']))
+            if isinstance(node.get('product_address_slots'), dict):
+                _replace_entries(conn, node_id, 'product_slot', _product_slot_rows(node['product_address_slots']))
+            for step in node.get('by_step', []) or []:
+                if not isinstance(step, dict):
+                    continue
+                _append_step(conn, node_id, step.get('step_index', 0) or 0, step.get('step_name', ''),
+                             step.get('operation_event', ''), step.get('by_address'), step.get('by_order'),
+                             step.get('by_slot'), step.get('product_address_slots'), created_at='')
+            count += 1
+    return count
+
+
+def import_yaml(file_path: str = None, replace: bool = False) -> int:
+    """从YAML导入账号；replace=True 时先清空数据库。返回导入的项目文件数"""
+    data = _load_yaml(file_path)
+    with _transaction() as conn:
+        if replace:
+            conn.execute("DELETE FROM account_entries")
+            conn.execute("DELETE FROM account_steps")
+            conn.execute("DELETE FROM account_nodes")
+        elif data:
+            # 合并导入时同一项目文件的 by_step 以YAML为准，避免重复追加
+            for project_name, files in data.items():
+                for file_name in (files or {}) if isinstance(files, dict) else {}:
+                    node_id = _node_id(conn, str(project_name), str(file_name))
+                    if node_id is not None:
+                        conn.execute("DELETE FROM account_entries WHERE node_id = ? AND step_id > 0", (node_id,))
+                        conn.execute("DELETE FROM account_steps WHERE node_id = ?", (node_id,))
+        return _import_data(conn, data)
+
+
+def _entries_by_kind(rows: List[sqlite3.Row]) -> Dict[str, Any]:
+    node: Dict[str, Any] = {'by_address': {}, 'by_order': [], 'by_slot': {}, 'product_address_slots': {}}
+    for row in rows:
+        kind = row['kind']
+        if kind == 'address':
+            node['by_address'][row['address']] = {'email': row['email'], 'password': row['password']}
+        elif kind == 'order':
+            node['by_order'].append({'address': row['address'], 'email': row['email'], 'password': row['password']})
+        elif kind == 'slot':
+            node['by_slot'][row['slot']] = {'address': row['address'], 'email': row['email'], 'password': row['password']}
+        elif kind == 'product_slot':
+            node['product_address_slots'][row['slot']] = row['address']
+    return node
+
+
+def export_yaml(file_path: str = None, include_steps: bool = True) -> int:
+    """导出为原 auth_accounts.yaml 结构（原子替换），返回导出的项目文件数"""
+    data: Dict[str, Any] = {}
+    with _reader() as conn:
+        nodes = conn.execute(
+            "SELECT n.id, n.project, n.file FROM account_nodes n "
+            "ORDER BY (SELECT MIN(p.id) FROM account_nodes p WHERE p.project = n.project), n.id").fetchall()
+        for node_row in nodes:
+            rows = conn.execute(
+                "SELECT step_id, kind, slot, address, email, password FROM account_entries "
+                "WHERE node_id = ? ORDER BY step_id, position, id", (node_row['id'],)).fetchall()
+            node = _entries_by_kind([row for row in rows if row['step_id'] == 0])
+            if include_steps:
+                node['by_step'] = []
+                for step in conn.execute("SELECT * FROM account_steps WHERE node_id = ? ORDER BY id",
+                                         (node_row['id'],)).fetchall():
+                    entry = {'step_index': step['step_index'], 'step_name': step['step_name'],
+                             'operation_event': step['operation_event']}
+                    entry.update(_entries_by_kind([row for row in rows if row['step_id'] == step['id']]))
+                    node['by_step'].append(entry)
+            data.setdefault(node_row['project'], {})[node_row['file']] = node
+    _save_yaml(data, file_path)
+    return len(nodes)
@@ -3,6 +3,7 @@
 处理MySQL和SQLite之间的差异
 """
 from config.database import get_current_db_config
+from utils.metrics import timed_query
 
 def get_placeholder():
     """根据数据库类型返回占位符"""
@@ -12,10 +13,11 @@ def get_placeholder():
 def execute_query(conn, query, params=None):
     """执行查询并返回结果"""
     cursor = conn.cursor()
-    if params:
-        cursor.execute(query, params)
-    else:
-        cursor.execute(query)
+    with timed_query(query):
+        if params:
+            cursor.execute(query, params)
+        else:
+            cursor.execute(query)
     return cursor
 
 def execute_query_with_results(conn, query, params=None):
@@ -0,0 +1,106 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时退回标准库json
+    orjson = None
+
+# 与 Flask 默认输出保持一致：键排序、日期按 HTTP 日期格式（交给 default 处理）、允许非字符串键
+_ORJSON_OPTIONS = 0
+if orjson is not None:
+    _ORJSON_OPTIONS = (orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS |
+                       orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS)
+
+
+def loads(data) -> Any:
+    """解析JSON（有orjson时使用orjson）"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider - 有orjson时用orjson序列化 jsonify 的响应
+
+    输出与默认provider等价（键排序、datetime/Decimal/UUID 等仍走 Flask 的 default 转换），
+    区别是中文直接以UTF-8输出而不是 \\uXXXX 转义；orjson 不支持的数据（如超过64位的整数）自动退回标准库。
+    """
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS).decode('utf-8')
+        except (TypeError, orjson.JSONEncodeError):
+            return super().dumps(obj)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, default=self.default, option=_ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        except (TypeError, orjson.JSONEncodeError):
+            return super().response(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class JSONColumnCache:
+    """数据库JSON列解码缓存 - 按 (表, 列, 行ID, 行版本) 缓存解码结果
+
+    行版本一般取 updated_at；命中时还会比对原始文本，行内容变化但版本未变时也不会返回旧值。
+    返回的对象在多次请求间共享，调用方只能读取（序列化输出），需要修改时请自行复制。
+    """
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._cache: 'OrderedDict[Hashable, Tuple[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def decode(self, raw, default: Any = None, row_key: Optional[Tuple] = None) -> Any:
+        """
+        解码JSON列
+
+        Args:
+            raw: 列的原始值（字符串/字节；已是 list/dict 时原样返回）
+            default: 值为空时的返回值
+            row_key: (表, 列, 行ID, 行版本)，为空时不缓存
+        """
+        if not raw:
+            return default
+        if not isinstance(raw, (str, bytes, bytearray)):
+            return raw
+        if row_key is None:
+            return loads(raw)
+        with self._lock:
+            cached = self._cache.get(row_key)
+            if cached is not None and cached[0] == raw:
+                self._cache.move_to_end(row_key)
+                self.stats['hits'] += 1
+                return cached[1]
+        value = loads(raw)
+        with self._lock:
+            self.stats['misses'] += 1
+            self._cache[row_key] = (raw, value)
+            self._cache.move_to_end(row_key)
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+# 全局JSON列缓存实例
+json_columns = JSONColumnCache()
@@ -0,0 +1,219 @@
+import os
+import threading
+import cv2
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+
+
+class TemplateFeatures:
+    """模板的关键点坐标与描述子（关键点对象不可序列化，只保存坐标）"""
+
+    def __init__(self, points: np.ndarray, descriptors: Optional[np.ndarray], shape: Tuple[int, int]):
+        self.points = points
+        self.descriptors = descriptors
+        self.shape = shape  # (高, 宽)
+
+    def __len__(self):
+        return 0 if self.descriptors is None else len(self.descriptors)
+
+
+# 模板特征进程内缓存：{(规范化路径, 检测器): (源文件签名, TemplateFeatures)}，所有识别器共享
+_template_features: Dict[Tuple[str, str], Tuple[Tuple[float, int], TemplateFeatures]] = {}
+_template_lock = threading.Lock()
+
+
+def create_detector(detector: str, max_features: int):
+    """创建特征检测器：orb 或 akaze（两者都是二进制描述子，使用汉明距离匹配）"""
+    if detector == 'akaze':
+        return cv2.AKAZE_create()
+    return cv2.ORB_create(nfeatures=max_features)
+
+
+class FeatureMatcher:
+    """特征匹配引擎 - ORB/AKAZE 关键点 + 单应性校验
+
+    模板特征只计算一次并缓存到PNG旁的 .npz 文件；每帧画面只做一次检测，
+    所有模板复用同一份画面特征。对轻微旋转、宽高比变化和任意缩放都有效，
+    不需要多尺度金字塔。
+    """
+
+    def __init__(self, detector: str = None, task_id: str = ''):
+        self.detector = (detector or UIConfig.FEATURE_DETECTOR).lower()
+        self.task_id = task_id
+        self.ratio = UIConfig.FEATURE_RATIO_TEST
+        self.min_inliers = UIConfig.FEATURE_MIN_INLIERS
+        self.ransac_threshold = UIConfig.FEATURE_RANSAC_THRESHOLD
+        # 画面特征缓存：{画面指纹: (关键点坐标, 描述子)}，只保留最近几帧
+        self._frame_features: "OrderedDict[str, Tuple[np.ndarray, Optional[np.ndarray]]]" = OrderedDict()
+        self._frame_lock = threading.Lock()
+        self.stats = {'frames_detected': 0, 'frame_cache_hits': 0, 'matches': 0, 'found': 0}
+
+    # =============================================================================
+    # 模板特征（磁盘缓存）
+    # =============================================================================
+    def _cache_path(self, template_path: str) -> str:
+        return f"{template_path}.{self.detector}.npz"
+
+    def get_template_features(self, template_path: str) -> Optional[TemplateFeatures]:
+        """获取模板特征：进程内缓存 -> 磁盘缓存 -> 重新计算，源文件修改后自动失效"""
+        normalized_path = os.path.normpath(template_path)
+        try:
+            stat = os.stat(normalized_path)
+        except OSError:
+            log_info(f"[{self.task_id}] 模板不存在: {normalized_path}")
+            return None
+        source_sig = (stat.st_mtime, stat.st_size)
+        key = (normalized_path, self.detector)
+        with _template_lock:
+            cached = _template_features.get(key)
+        if cached and cached[0] == source_sig:
+            return cached[1]
+
+        features = self._load_disk_cache(normalized_path, source_sig)
+        if features is None:
+            features = self._compute_template_features(normalized_path)
+            if features is None:
+                return None
+            self._save_disk_cache(normalized_path, source_sig, features)
+        with _template_lock:
+            _template_features[key] = (source_sig, features)
+        return features
+
+    def _compute_template_features(self, template_path: str) -> Optional[TemplateFeatures]:
+        template = cv2.imread(template_path, cv2.IMREAD_GRAYSCALE)
+        if template is None:
+            log_info(f"[{self.task_id}] 无法加载模板: {template_path}")
+            return None
+        detector = create_detector(self.detector, UIConfig.FEATURE_MAX_TEMPLATE_KEYPOINTS)
+        keypoints, descriptors = detector.detectAndCompute(template, None)
+        points = np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2)
+        log_info(f"[{self.task_id}] 计算模板特征: {template_path}, {self.detector} 关键点 {len(points)} 个")
+        return TemplateFeatures(points, descriptors, template.shape[:2])
+
+    def _load_disk_cache(self, template_path: str, source_sig: Tuple[float, int]) -> Optional[TemplateFeatures]:
+        cache_path = self._cache_path(template_path)
+        if not os.path.exists(cache_path):
+            return None
+        try:
+            with np.load(cache_path, allow_pickle=False) as data:
+                if (float(data['src_mtime']), int(data['src_size'])) != source_sig:
+                    return None
+                descriptors = data['descriptors'] if data['descriptors'].size else None
+                return TemplateFeatures(data['points'], descriptors, tuple(int(v) for v in data['shape']))
+        except Exception as e:
+            log_info(f"[{self.task_id}] 读取模板特征缓存失败，重新计算: {cache_path}, {e}")
+            return None
+
+    def _save_disk_cache(self, template_path: str, source_sig: Tuple[float, int], features: TemplateFeatures):
+        cache_path = self._cache_path(template_path)
+        tmp_path = f"{cache_path}.tmp.npz"
+        try:
+            descriptors = features.descriptors if features.descriptors is not None else np.zeros((0, 0), dtype=np.uint8)
+            np.savez(tmp_path, points=features.points, descriptors=descriptors,
+                     shape=np.array(features.shape), src_mtime=np.array(source_sig[0]), src_size=np.array(source_sig[1]))
+            os.replace(tmp_path, cache_path)
+        except Exception as e:
+            log_info(f"[{self.task_id}] 保存模板特征缓存失败: {cache_path}, {e}")
+
+    # =============================================================================
+    # 画面特征
+    # =============================================================================
+    def get_frame_features(self, frame: np.ndarray, fingerprint: Optional[str] = None) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """检测画面特征，同一画面指纹只检测一次"""
+        if fingerprint:
+            with self._frame_lock:
+                cached = self._frame_features.get(fingerprint)
+                if cached is not None:
+                    self._frame_features.move_to_end(fingerprint)
+                    self.stats['frame_cache_hits'] += 1
+                    return cached
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        detector = create_detector(self.detector, UIConfig.FEATURE_MAX_FRAME_KEYPOINTS)
+        keypoints, descriptors = detector.detectAndCompute(gray, None)
+        features = (np.array([kp.pt for kp in keypoints], dtype=np.float32).reshape(-1, 2), descriptors)
+        self.stats['frames_detected'] += 1
+        if fingerprint:
+            with self._frame_lock:
+                self._frame_features[fingerprint] = features
+                while len(self._frame_features) > UIConfig.FEATURE_FRAME_CACHE_SIZE:
+                    self._frame_features.popitem(last=False)
+        return features
+
+    # =============================================================================
+    # 匹配
+    # =============================================================================
+    def match(self, frame: np.ndarray, template_path: str,
+              fingerprint: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        在画面中匹配单个模板
+
+        Returns:
+            Optional[Dict]: {'position': 中心坐标, 'score': 内点比例, 'inliers': 内点数, 'scale': 估计缩放}；未找到返回None
+        """
+        template_features = self.get_template_features(template_path)
+        if template_features is None or len(template_features) < self.min_inliers:
+            return None
+        frame_points, frame_descriptors = self.get_frame_features(frame, fingerprint)
+        if frame_descriptors is None or len(frame_descriptors) < self.min_inliers:
+            return None
+        return self._match_features(template_features, frame_points, frame_descriptors, template_path)
+
+    def match_many(self, frame: np.ndarray, template_paths: Iterable[str],
+                   fingerprint: Optional[str] = None) -> Dict[str, Optional[Dict[str, Any]]]:
+        """一次画面检测服务多个模板"""
+        return {path: self.match(frame, path, fingerprint) for path in template_paths}
+
+    def _match_features(self, template_features: TemplateFeatures, frame_points: np.ndarray,
+                        frame_descriptors: np.ndarray, template_path: str) -> Optional[Dict[str, Any]]:
+        self.stats['matches'] += 1
+        matcher = cv2.BFMatcher(cv2.NORM_HAMMING)
+        knn_matches = matcher.knnMatch(template_features.descriptors, frame_descriptors, k=2)
+        # Lowe比值测试过滤歧义匹配
+        good = [pair[0] for pair in knn_matches
+                if len(pair) == 2 and pair[0].distance < self.ratio * pair[1].distance]
+        if len(good) < self.min_inliers:
+            log_info(f"[{self.task_id}] 特征匹配失败: {template_path}, 有效匹配 {len(good)} 个")
+            return None
+
+        src = template_features.points[[m.queryIdx for m in good]].reshape(-1, 1, 2)
+        dst = frame_points[[m.trainIdx for m in good]].reshape(-1, 1, 2)
+        homography, mask = cv2.findHomography(src, dst, cv2.RANSAC, self.ransac_threshold)
+        if homography is None or mask is None:
+            return None
+        inliers = int(mask.sum())
+        if inliers < self.min_inliers:
+            log_info(f"[{self.task_id}] 特征匹配失败: {template_path}, 单应性内点 {inliers} 个")
+            return None
+
+        # 校验投影后的模板四边形：必须是凸四边形且缩放在合理范围内
+        h, w = template_features.shape
+        corners = np.float32([[0, 0], [w, 0], [w, h], [0, h]]).reshape(-1, 1, 2)
+        quad = cv2.perspectiveTransform(corners, homography)
+        if not cv2.isContourConvex(quad.astype(np.int32)):
+            log_info(f"[{self.task_id}] 特征匹配失败: {template_path}, 投影区域非凸")
+            return None
+        scale = float(np.sqrt(abs(cv2.contourArea(quad)) / float(w * h)))
+        if not (UIConfig.FEATURE_MIN_SCALE <= scale <= UIConfig.FEATURE_MAX_SCALE):
+            log_info(f"[{self.task_id}] 特征匹配失败: {template_path}, 估计缩放 {scale:.2f} 超出范围")
+            return None
+
+        center = cv2.perspectiveTransform(np.float32([[[w / 2.0, h / 2.0]]]), homography)[0][0]
+        score = inliers / float(len(good))
+        self.stats['found'] += 1
+        log_info(f"[{self.task_id}] 特征匹配成功: {template_path}, 内点 {inliers}/{len(good)}, 缩放 {scale:.2f}")
+        return {
+            'position': (int(round(center[0])), int(round(center[1]))),
+            'score': score,
+            'inliers': inliers,
+            'scale': scale,
+        }
+
+    def clear(self):
+        with self._frame_lock:
+            self._frame_features.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats, detector=self.detector, frame_cache_size=len(self._frame_features))
@@ -1,10 +1,18 @@
-import pyautogui
+try:
+    import pyautogui
+except Exception:
+    # 无头/无显示环境下pyautogui不可用，相关兜底路径会被配置关闭
+    pyautogui = None
 import time
 import asyncio
 from typing import Optional, Tuple, Dict, Any
 from config.ui_config import UIConfig
 from config.logger import log_info
 from utils.image_recognition import ImageRecognition
+from utils.search_budget import SearchBudget
+from utils.screen_capture import screen_capture
+from utils.vision_executor import vision_executor
+from utils.metrics import image_manager_events, observe_image_search
 from Base_ENV.config import BASE_DIR
 import os
 
@@ -26,107 +34,110 @@ class HybridImageManager:
             'total_failures': 0,
             'task_id': self.task_id
         }
+        # 最近一次独立调用的预算使用情况
+        self.last_search_report: Dict[str, Any] = {}
         # 为每个实例创建独立的锁，避免并发冲突
         self._lock = asyncio.Lock()
         log_info(f"创建HybridImageManager实例: {self.task_id}")
     
     async def find_image(self, page, image_path: str, confidence: float = None, 
-                        timeout: int = None, use_hybrid: bool = True) -> Optional[Tuple[int, int]]:
+                        timeout: int = None, use_hybrid: bool = True,
+                        budget: SearchBudget = None, engine: str = None) -> Optional[Tuple[int, int]]:
         """
         混合图片识别 - 优先使用截图识别，失败时回退到pyautogui
-        使用任务隔离和锁机制确保并发安全，支持重试机制
+        使用任务隔离和锁机制确保并发安全，所有尝试共享同一个查找预算
         
         Args:
             page: Playwright页面对象
             image_path: 图片路径
             confidence: 匹配置信度
-            timeout: 超时时间
+            timeout: 超时时间（秒），仅在未传入budget时用于创建预算
             use_hybrid: 是否使用混合模式
+            budget: 上层传入的查找预算；传入时本层只执行一轮识别，由上层决定是否重试
+            engine: 截图识别使用的引擎 template/feature/auto，为空时按模板配置选择
             
         Returns:
             Optional[Tuple[int, int]]: 图片中心坐标 (x, y)，未找到返回None
         """
         if confidence is None:
             confidence = self.config['confidence']
-        if timeout is None:
-            timeout = self.config['timeout']
-        
-        max_attempts = self.config.get('max_retry_attempts', 5)
-        retry_delay = self.config.get('retry_delay', 3.0)
+        owns_budget = budget is None
+        if owns_budget:
+            budget = SearchBudget.from_config(timeout, label=image_path)
+        use_pyautogui = use_hybrid and self.config['use_pyautogui_fallback']
         
         # 使用锁机制确保并发安全
         async with self._lock:
-            for attempt in range(max_attempts):
-                try:
-                    log_info(f"[{self.task_id}] 第{attempt + 1}次混合图片识别尝试: {image_path}")
-                    self.stats['total_attempts'] += 1
+            position = None
+            try:
+                while budget.can_continue():
+                    round_no = budget.frames_used + 1
+                    log_info(f"[{self.task_id}] 混合图片识别（第{round_no}帧起）: {image_path}")
+                    self._count('total_attempts')
                     
-                    # 方法1: 优先使用截图识别
-                    if self.config['use_screenshot'] and self.config['screenshot_first']:
-                        try:
-                            position = await self.image_recognition.find_image(
-                                page, image_path, confidence, timeout
-                            )
-                            if position:
-                                self.stats['screenshot_success'] += 1
-                                log_info(f"[{self.task_id}] 截图识别成功: {image_path}, 位置: {position}")
-                                return position
-                        except Exception as e:
-                            log_info(f"[{self.task_id}] 截图识别失败: {e}")
-                            self.stats['screenshot_failures'] += 1
+                    # 方法1: 截图识别（截图优先时先执行）
+                    if self.config['use_screenshot'] and (self.config['screenshot_first'] or not use_pyautogui):
+                        position = await self._find_with_screenshot(page, image_path, confidence, budget, engine)
+                        if position:
+                            return position
                     
-                    # 方法2: 使用pyautogui作为备选（限定到当前页面窗口区域）
-                    if self.config['use_pyautogui_fallback']:
+                    # 方法2: 使用pyautogui作为备选（限定到当前页面窗口区域），同样占用一帧预算
+                    if use_pyautogui and budget.consume_frame():
                         try:
                             # 统一构建图片路径，避免相对路径在pyautogui下查找失败
                             img_path_full = self._build_image_path(image_path)
                             region = await self._get_window_region(page)
-                            position = self._find_with_pyautogui(img_path_full, confidence, region)
+                            position = await self.find_on_screen(img_path_full, confidence, region, page)
                             if position:
-                                self.stats['pyautogui_success'] += 1
+                                self._count('pyautogui_success')
                                 log_info(f"[{self.task_id}] pyautogui识别成功: {image_path}, 位置: {position}")
                                 return position
                         except Exception as e:
                             log_info(f"[{self.task_id}] pyautogui识别失败: {e}")
-                            self.stats['pyautogui_failures'] += 1
+                            self._count('pyautogui_failures')
                     
-                    # 方法3: 如果截图优先但失败，再次尝试Playwright截图识别
-                    if (self.config['use_screenshot'] and not self.config['screenshot_first'] and 
-                        self.config['use_pyautogui_fallback']):
-                        try:
-                            position = await self.image_recognition.find_image(
-                                page, image_path, confidence, timeout
-                            )
-                            if position:
-                                self.stats['screenshot_success'] += 1
-                                log_info(f"[{self.task_id}] 截图识别成功: {image_path}, 位置: {position}")
-                                return position
-                        except Exception as e:
-                            log_info(f"[{self.task_id}] 截图识别失败: {e}")
-                            self.stats['screenshot_failures'] += 1
+                    # 方法3: pyautogui优先时，再尝试Playwright截图识别
+                    if self.config['use_screenshot'] and not self.config['screenshot_first'] and use_pyautogui:
+                        position = await self._find_with_screenshot(page, image_path, confidence, budget, engine)
+                        if position:
+                            return position
                     
-                    # 如果还有重试机会，等待后重试
-                    if attempt < max_attempts - 1:
-                        log_info(f"[{self.task_id}] 第{attempt + 1}次尝试失败，等待{retry_delay}秒后重试")
-                        await asyncio.sleep(retry_delay)
-                        # 清除缓存，强制重新识别
-                        self.image_recognition.clear_cache()
-                    else:
-                        log_info(f"[{self.task_id}] 所有{max_attempts}次尝试都失败，无法找到图片: {image_path}")
-                        self.stats['total_failures'] += 1
-                        
-                except Exception as e:
-                    log_info(f"[{self.task_id}] 第{attempt + 1}次混合识别时发生错误: {e}")
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(retry_delay)
-                        continue
-                    else:
-                        log_info(f"[{self.task_id}] 所有重试都失败，返回None")
-                        self.stats['total_failures'] += 1
-                        return None
-            
+                    # 外层传入预算时只执行一轮，由外层决定退避
+                    if not owns_budget or not await budget.backoff():
+                        break
+                    # 清除缓存，强制重新识别
+                    self.image_recognition.clear_cache()
+                
+                if owns_budget:
+                    log_info(f"[{self.task_id}] 无法找到图片: {image_path}, {budget.summary()}")
+                    self._count('total_failures')
+                return None
+            finally:
+                if owns_budget:
+                    self.last_search_report = budget.report()
+                    observe_image_search(self.last_search_report, bool(position))
+    
+    async def _find_with_screenshot(self, page, image_path: str, confidence: float,
+                                    budget: SearchBudget, engine: str = None) -> Optional[Tuple[int, int]]:
+        """在预算内执行一帧Playwright截图识别"""
+        try:
+            position = await self.image_recognition.find_image(
+                page, image_path, confidence, budget=budget, engine=engine
+            )
+            if position:
+                self._count('screenshot_success')
+                log_info(f"[{self.task_id}] 截图识别成功: {image_path}, 位置: {position}")
+            return position
+        except Exception as e:
+            log_info(f"[{self.task_id}] 截图识别失败: {e}")
+            self._count('screenshot_failures')
             return None
     
+    def _count(self, key: str):
+        """累加实例统计，同时计入运行指标（跨实例、跨进程汇总）"""
+        self.stats[key] += 1
+        image_manager_events.inc(event=key)
+    
     # async def click_image(self, page, image_path: str, confidence: float = None,
     #                      timeout: int = None) -> bool:
     #     """点击图片，使用任务隔离确保并发安全"""
@@ -157,7 +168,15 @@ class HybridImageManager:
             'screenshot_success': self.stats['screenshot_success'],
             'pyautogui_success': self.stats['pyautogui_success'],
             'total_attempts': total_attempts,
-            'success_rate': success_rate
+            'success_rate': success_rate,
+            # 画面未变化时复用匹配结果的命中情况（按页面共享）
+            'match_memo': self.image_recognition.get_memo_stats(),
+            # 模板预筛选的排除情况
+            'prefilter': self.image_recognition.get_prefilter_stats(),
+            # 特征匹配引擎的检测与命中情况
+            'feature_engine': self.image_recognition.get_feature_stats(),
+            # 共享屏幕截取服务的请求合并情况（全局）
+            'screen_capture': screen_capture.get_stats()
         }
     
     def reset_stats(self):
@@ -184,26 +203,38 @@ class HybridImageManager:
     #         log_info(f"[{self.task_id}] 截图识别发生错误: {e}")
     #         return None
     
-    def _find_with_pyautogui(self, image_path: str, confidence: float, region: Optional[Tuple[int, int, int, int]] = None) -> Optional[Tuple[int, int]]:
-        """使用pyautogui查找图片（可限定区域）"""
+    async def find_on_screen(self, image_path: str, confidence: float,
+                             region: Optional[Tuple[int, int, int, int]] = None, page=None) -> Optional[Tuple[int, int]]:
+        """
+        在屏幕上查找图片（可限定区域），返回屏幕坐标
+
+        截屏由共享的 screen_capture 服务完成（多个任务同一节拍内只截一次），
+        匹配复用 ImageRecognition 的模板缓存和OpenCV匹配，不再每次由pyscreeze截全屏并重新读取模板。
+        """
         try:
             # 规范化路径：统一路径分隔符，避免混用正斜杠和反斜杠
             normalized_path = os.path.normpath(image_path)
             
             # 使用任务特定的日志标识
-            log_info(f"[{self.task_id}] 使用pyautogui查找图片: {normalized_path}, 区域: {region}")
-            if region:
-                position = pyautogui.locateCenterOnScreen(normalized_path, confidence=confidence, region=region)
-            else:
-                position = pyautogui.locateCenterOnScreen(normalized_path, confidence=confidence)
-            if position:
-                log_info(f"[{self.task_id}] pyautogui找到图片: {normalized_path} at {position}")
-                return (position.x, position.y)
-            else:
-                log_info(f"[{self.task_id}] pyautogui未找到图片: {normalized_path}")
+            log_info(f"[{self.task_id}] 屏幕查找图片: {normalized_path}, 区域: {region}")
+            grab = await screen_capture.grab(region)
+            if grab is None:
+                log_info(f"[{self.task_id}] 屏幕截取不可用: {normalized_path}")
                 return None
+            image, (left, top) = grab
+            screen_dpr = await self.image_recognition._get_page_dpr(page) if page is not None else None
+            position = await vision_executor.run(
+                self.image_recognition.match_screen_image, image, normalized_path, confidence, screen_dpr,
+                task_id=self.task_id
+            )
+            if position:
+                position = (left + position[0], top + position[1])
+                log_info(f"[{self.task_id}] 屏幕找到图片: {normalized_path} at {position}")
+                return position
+            log_info(f"[{self.task_id}] 屏幕未找到图片: {normalized_path}")
+            return None
         except Exception as e:
-            log_info(f"[{self.task_id}] pyautogui查找图片时发生错误: {e}")
+            log_info(f"[{self.task_id}] 屏幕查找图片时发生错误: {e}")
             return None
     
     def _build_image_path(self, image_path: str) -> str:
@@ -2,11 +2,24 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
 import time
 import asyncio
+import hashlib
 from typing import Optional, Tuple, Dict, Any, List
 from config.ui_config import UIConfig
-from config.logger import log_info
+from config.logger import log_info, get_module_logger
+from utils.vision_executor import vision_executor
+from utils.search_budget import SearchBudget
+from utils.match_memo import MISS, get_page_memo, make_memo_key
+from utils.template_priors import template_priors
+from utils.image_upload_manager import image_upload_manager
+from utils.template_prefilter import TemplatePrefilter, record_corpus_sample
+from utils.feature_matcher import FeatureMatcher
+from utils.metrics import observe_image_search
+
+# 识别内部（逐帧、逐尺度、缓存命中）的日志为DEBUG，默认不输出；排查识别问题时设置 UI_LOG_LEVELS="ImageRecognition=DEBUG"
+_logger = get_module_logger('ImageRecognition')
 
 class ImageRecognition:
     """图片识别核心模块 - 基于Playwright截图的图片识别，支持任务隔离和多尺度匹配"""
@@ -26,6 +39,20 @@ class ImageRecognition:
         self.scale_factors = getattr(UIConfig, 'SCALE_FACTORS', [1.0, 0.9, 0.8, 0.7, 0.6, 0.5])
         self.confidence_levels = getattr(UIConfig, 'CONFIDENCE_LEVELS', [0.7, 0.6, 0.5, 0.4, 0.3, 0.25, 0.2])
         self.absolute_min_confidence = getattr(UIConfig, 'MIN_ABSOLUTE_CONFIDENCE', 0.6)
+        # 所在页面共享的匹配结果备忘（首次识别时按页面获取）
+        self.memo = None
+        # 当前帧整屏匹配尝试过的尺度数，每帧结束后累加到查找预算
+        self._scales_tried = 0
+        # 页面DPR（首次识别时获取），用于截图归一化到CSS像素，并与窗口尺寸一起作为模板先验的布局键
+        self._page_dpr: Optional[float] = None
+        # 截图与模板是否统一换算到CSS像素（开启时识别坐标即为CSS坐标）
+        self.normalize_dpr = UIConfig.DPR_NORMALIZE_ENABLED
+        # 模板预筛选（直方图+降采样粗匹配），排除明显不存在的模板
+        self.prefilter = TemplatePrefilter()
+        # 特征匹配引擎（按需创建）
+        self._feature_matcher: Optional[FeatureMatcher] = None
+        # 最近一次独立调用的预算使用情况
+        self.last_search_report: Dict[str, Any] = {}
         # 最近一次匹配信息（用于点击后再验证是否消失/移动）
         self.last_match_info: Dict[str, Any] = {
             'path': None,
@@ -39,7 +66,8 @@ class ImageRecognition:
         log_info(f"创建ImageRecognition实例: {self.task_id}")
     
     async def find_image(self, page, template_path: str, confidence: float = None, 
-                        timeout: int = None, use_cache: bool = True) -> Optional[Tuple[int, int]]:
+                        timeout: int = None, use_cache: bool = True,
+                        budget: SearchBudget = None, engine: str = None) -> Optional[Tuple[int, int]]:
         """
         在页面中查找图片，支持多尺度匹配和动态置信度调整
         
@@ -47,152 +75,303 @@ class ImageRecognition:
             page: Playwright页面对象
             template_path: 模板图片路径
             confidence: 匹配置信度，如果为None则使用配置中的默认值
-            timeout: 超时时间，如果为None则使用配置中的默认值
+            timeout: 超时时间（秒），仅在未传入budget时用于创建预算
             use_cache: 是否使用缓存
+            budget: 上层传入的查找预算；传入时只在该预算内取帧，不再自行重试计时
+            engine: 识别引擎 template/feature/auto，为空时按 get_match_engine 选择
             
         Returns:
             Optional[Tuple[int, int]]: 图片中心坐标 (x, y)，未找到返回None
         """
         if confidence is None:
             confidence = self.config['confidence']
-        if timeout is None:
-            timeout = self.config['timeout']
-        
-        max_attempts = self.config.get('max_retry_attempts', 5)
-        retry_delay = self.config.get('retry_delay', 3.0)
+        engine = self.get_match_engine(template_path, engine)
+        owns_budget = budget is None
+        if owns_budget:
+            budget = SearchBudget.from_config(timeout, label=template_path)
         
         # 使用锁机制确保并发安全
         async with self._lock:
-            for attempt in range(max_attempts):
-                try:
-                    log_info(f"[{self.task_id}] 第{attempt + 1}次尝试查找图片: {template_path}")
-                    
-                    # 获取页面截图
-                    screenshot = await self._get_page_screenshot(page, use_cache)
-                    if screenshot is None:
-                        log_info(f"[{self.task_id}] 获取页面截图失败，尝试重试")
-                        if attempt < max_attempts - 1:
-                            await asyncio.sleep(retry_delay)
-                            continue
-                        return None
-                    
-                    # 智能多尺度匹配
-                    position = self._smart_template_matching(screenshot, template_path, confidence, attempt)
-                    if position:
-                        log_info(f"[{self.task_id}] 图片查找成功: {template_path}, 位置: {position}")
-                        return position
-                    
-                    # 如果还有重试机会，等待后重试
-                    if attempt < max_attempts - 1:
-                        log_info(f"[{self.task_id}] 第{attempt + 1}次尝试失败，等待{retry_delay}秒后重试")
-                        await asyncio.sleep(retry_delay)
-                        # 清除截图缓存，强制获取新截图
-                        self.screenshot_cache.clear()
-                        self.last_screenshot_time = 0
-                    else:
-                        log_info(f"[{self.task_id}] 所有{max_attempts}次尝试都失败，无法找到图片: {template_path}")
+            position = None
+            try:
+                while budget.consume_frame():
+                    # 置信度策略按整个预算内已用的帧数递进，跨层共享
+                    attempt = budget.frames_used - 1
+                    self._scales_tried = 0
+                    try:
+                        _logger.debug("[%s] 第%d帧查找图片: %s", self.task_id, attempt + 1, template_path)
                         
-                except Exception as e:
-                    log_info(f"[{self.task_id}] 第{attempt + 1}次尝试时发生错误: {e}")
-                    if attempt < max_attempts - 1:
-                        await asyncio.sleep(retry_delay)
-                        continue
-                    else:
-                        log_info(f"[{self.task_id}] 所有重试都失败，返回None")
-                        return None
-            
-            return None
+                        # 获取页面截图及画面指纹
+                        screenshot, fingerprint = await self._get_page_frame(page, use_cache and attempt == 0)
+                        if screenshot is None:
+                            log_info(f"[{self.task_id}] 获取页面截图失败")
+                        else:
+                            position = None
+                            if engine in ('feature', 'auto'):
+                                method = ('feature', self.feature_matcher.detector)
+                                position = await self._memoized_match(
+                                    page, fingerprint, template_path, method,
+                                    self._feature_match, screenshot, template_path, fingerprint
+                                )
+                            if position is None and engine in ('template', 'auto'):
+                                layout = await self._get_layout_key(page)
+                                # 置信度策略只区分前两次和之后的尝试，画面不变时复用同档位的匹配结果
+                                method = ('smart', float(confidence), min(attempt, 2), tuple(self.scale_factors), layout)
+                                position = await self._memoized_match(
+                                    page, fingerprint, template_path, method,
+                                    self._smart_template_matching, screenshot, template_path, confidence, attempt, layout
+                                )
+                                budget.scales_tried += self._scales_tried
+                            if position:
+                                log_info(f"[{self.task_id}] 图片查找成功: {template_path}, 位置: {position}")
+                                return position
+                    except Exception as e:
+                        log_info(f"[{self.task_id}] 第{attempt + 1}帧查找时发生错误: {e}")
+                    
+                    # 外层预算只让本层取一帧，由外层决定退避和下一轮
+                    if not owns_budget or not await budget.backoff():
+                        break
+                    # 清除截图缓存，强制获取新截图
+                    self.screenshot_cache.clear()
+                    self.last_screenshot_time = 0
+                
+                if owns_budget:
+                    log_info(f"[{self.task_id}] 未找到图片: {template_path}, {budget.summary()}")
+                return None
+            finally:
+                if owns_budget:
+                    self.last_search_report = budget.report()
+                    observe_image_search(self.last_search_report, bool(position))
 
     async def quick_check_presence(self, page, template_path: str, confidence: float = None,
-                                   scales: Optional[List[float]] = None) -> Optional[Tuple[int, int]]:
+                                   scales: Optional[List[float]] = None,
+                                   prefilter: bool = None) -> Optional[Tuple[int, int]]:
         """
         快速检测模板是否存在：单次截图，少量尺度，严格阈值。
         仅用于点击后验证/遮挡物检测，避免重试和复杂退避。
+        默认先经过预筛选（UIConfig.PREFILTER_QUICK_CHECK），多数"不存在"的情况无需全分辨率匹配。
         """
         try:
             if confidence is None:
                 confidence = self.config.get('confidence', 0.6)
             confidence = max(float(confidence), float(self.absolute_min_confidence))
+            if prefilter is None:
+                prefilter = UIConfig.PREFILTER_QUICK_CHECK
 
-            screenshot = await self._get_page_screenshot(page, use_cache=False)
+            screenshot, fingerprint = await self._get_page_frame(page, use_cache=False)
             if screenshot is None:
                 return None
-            template = self._load_template(template_path)
-            if template is None:
-                return None
-            template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
-            screenshot_gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+            method = ('quick', float(confidence), tuple(scales) if scales else None, bool(prefilter))
+            position = await self._memoized_match(
+                page, fingerprint, template_path, method,
+                self._quick_match, screenshot, template_path, confidence, scales, prefilter
+            )
+            if UIConfig.VISION_CORPUS_DIR:
+                # 语料记录全量匹配结果，作为预筛选漏检率的基准
+                truth = position if not prefilter else await vision_executor.run(
+                    self._quick_match, screenshot, template_path, confidence, scales, False, task_id=self.task_id
+                )
+                await vision_executor.run(record_corpus_sample, UIConfig.VISION_CORPUS_DIR, screenshot, fingerprint,
+                                          template_path, confidence, scales, truth, task_id=self.task_id)
+            return position
+        except Exception as e:
+            log_info(f"[{self.task_id}] 快速存在性检测失败: {e}")
+            return None
 
-            if not scales:
-                scales = [1.0, 0.9, 0.8]
-
-            for scale_factor in scales:
-                # 尺度调整
-                if scale_factor != 1.0:
-                    h, w = template_gray.shape[:2]
-                    new_h, new_w = int(h * scale_factor), int(w * scale_factor)
-                    if new_h < 10 or new_w < 10:
-                        continue
-                    scaled_template = cv2.resize(template_gray, (new_w, new_h))
-                else:
-                    scaled_template = template_gray
+    def _quick_match(self, screenshot: np.ndarray, template_path: str, confidence: float,
+                     scales: Optional[List[float]] = None, prefilter: bool = False) -> Optional[Tuple[int, int]]:
+        """快速检测的同步匹配部分（在视觉线程池中执行）"""
+        template = self._load_template(template_path)
+        if template is None:
+            return None
+        template_gray = cv2.cvtColor(template, cv2.COLOR_BGR2GRAY)
+        screenshot_gray = cv2.cvtColor(screenshot, cv2.COLOR_BGR2GRAY)
+        frame_sig = self.prefilter.frame_signature(screenshot) if prefilter else None
+
+        if not scales:
+            scales = [1.0, 0.9, 0.8]
 
-                # 模板尺寸校验
-                img_h, img_w = screenshot_gray.shape[:2]
-                tpl_h, tpl_w = scaled_template.shape[:2]
-                if tpl_h > img_h or tpl_w > img_w:
+        for scale_factor in scales:
+            if frame_sig is not None and not self._passes_prefilter(frame_sig, template, template_path,
+                                                                     scale_factor, confidence):
+                continue
+            # 尺度调整
+            if scale_factor != 1.0:
+                h, w = template_gray.shape[:2]
+                new_h, new_w = int(h * scale_factor), int(w * scale_factor)
+                if new_h < 10 or new_w < 10:
                     continue
+                scaled_template = cv2.resize(template_gray, (new_w, new_h))
+            else:
+                scaled_template = template_gray
 
-                result = cv2.matchTemplate(screenshot_gray, scaled_template, cv2.TM_CCOEFF_NORMED)
-                _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
-                if max_val >= confidence:
-                    center_x = max_loc[0] + tpl_w // 2
-                    center_y = max_loc[1] + tpl_h // 2
-                    return (int(center_x), int(center_y))
+            # 模板尺寸校验
+            img_h, img_w = screenshot_gray.shape[:2]
+            tpl_h, tpl_w = scaled_template.shape[:2]
+            if tpl_h > img_h or tpl_w > img_w:
+                continue
+
+            result = cv2.matchTemplate(screenshot_gray, scaled_template, cv2.TM_CCOEFF_NORMED)
+            _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
+            if max_val >= confidence:
+                center_x = max_loc[0] + tpl_w // 2
+                center_y = max_loc[1] + tpl_h // 2
+                return (int(center_x), int(center_y))
+        return None
+    
+    async def _memoized_match(self, page, fingerprint: Optional[str], template_path: str, method: Tuple,
+                              match_func, *args, roi: Optional[Tuple[int, int, int, int]] = None):
+        """
+        带画面指纹备忘的模板匹配：同一画面、同一模板、同一匹配参数只计算一次
+
+        Args:
+            page: Playwright页面对象（备忘按页面共享）
+            fingerprint: 当前画面指纹，为空时不使用备忘
+            template_path: 模板图片路径
+            method: 匹配方式及影响结果的参数
+            match_func: 同步匹配函数（在视觉线程池中执行）
+            roi: 搜索区域，当前整页匹配时为None
+        """
+        if self.memo is None:
+            self.memo = get_page_memo(page, name=self.task_id)
+        memo = self.memo
+        key = None
+        if memo is not None and fingerprint:
+            key = make_memo_key(fingerprint, os.path.normpath(template_path), method, roi)
+            cached = memo.get(key)
+            if cached is not MISS:
+                position, match_info = cached
+                if match_info:
+                    self.last_match_info.update(match_info, ts=time.time())
+                _logger.debug("[%s] 画面未变化，复用匹配结果: %s, 位置: %s", self.task_id, template_path, position)
+                return position
+
+        position = await vision_executor.run(match_func, *args, task_id=self.task_id)
+        if key is not None:
+            match_info = dict(self.last_match_info) if position and self.last_match_info.get('path') == template_path else None
+            memo.put(key, (position, match_info))
+        return position
+
+    async def _get_page_dpr(self, page) -> float:
+        """获取页面devicePixelRatio（每个实例只查询一次）"""
+        if self._page_dpr is None:
+            try:
+                self._page_dpr = float(await page.evaluate('window.devicePixelRatio') or 1.0)
+            except Exception as e:
+                log_info(f"[{self.task_id}] 获取页面DPR失败，按1.0处理: {e}")
+                return 1.0
+        return self._page_dpr
+
+    async def get_coordinate_scale(self, page) -> float:
+        """识别坐标换算为CSS坐标需要除以的倍数：截图已归一化时为1.0，否则为页面DPR"""
+        if self.normalize_dpr:
+            return 1.0
+        return await self._get_page_dpr(page)
+
+    async def _get_layout_key(self, page) -> Optional[str]:
+        """获取页面布局键（窗口尺寸+DPR），用于按布局区分模板先验"""
+        if not UIConfig.TEMPLATE_PRIORS_ENABLED:
             return None
+        try:
+            viewport = page.viewport_size
+            dpr = await self._get_page_dpr(page)
+            if not viewport:
+                viewport = await page.evaluate('({width: window.innerWidth, height: window.innerHeight})')
+            # 归一化前后坐标空间不同，先验分开统计
+            space = 'css' if self.normalize_dpr else 'device'
+            return template_priors.layout_key(viewport['width'], viewport['height'], dpr, space)
         except Exception as e:
-            log_info(f"[{self.task_id}] 快速存在性检测失败: {e}")
+            log_info(f"[{self.task_id}] 获取页面布局失败，不使用模板先验: {e}")
             return None
-    
+
+    def get_memo_stats(self) -> Dict[str, Any]:
+        """获取匹配结果备忘的命中统计"""
+        if self.memo is None:
+            return {'size': 0, 'hits': 0, 'misses': 0, 'hit_rate': 0.0, 'evictions': 0, 'invalidations': 0}
+        return self.memo.get_stats()
+
     async def _get_page_screenshot(self, page, use_cache: bool = True) -> Optional[np.ndarray]:
         """获取页面截图，使用任务隔离的缓存"""
+        screenshot, _fingerprint = await self._get_page_frame(page, use_cache)
+        return screenshot
+
+    async def _get_page_frame(self, page, use_cache: bool = True) -> Tuple[Optional[np.ndarray], Optional[str]]:
+        """获取页面截图及其画面指纹，使用任务隔离的缓存"""
         try:
             current_time = time.time()
             
             # 检查缓存
             if use_cache and current_time - self.last_screenshot_time < self.config['screenshot_cache_timeout']:
                 if 'last_screenshot' in self.screenshot_cache:
-                    log_info(f"[{self.task_id}] 使用缓存的截图")
-                    return self.screenshot_cache['last_screenshot']
+                    _logger.debug("[%s] 使用缓存的截图", self.task_id)
+                    return self.screenshot_cache['last_screenshot'], self.screenshot_cache.get('last_fingerprint')
             
             # 获取新截图
-            log_info(f"[{self.task_id}] 获取新的页面截图")
+            _logger.debug("[%s] 获取新的页面截图", self.task_id)
             screenshot_bytes = await page.screenshot()
-            screenshot_array = np.array(Image.open(io.BytesIO(screenshot_bytes)))
-            screenshot_cv = cv2.cvtColor(screenshot_array, cv2.COLOR_RGB2BGR)
+            frame_dpr = await self._get_page_dpr(page) if self.normalize_dpr else 1.0
+            screenshot_cv, fingerprint = await vision_executor.run(self._decode_frame, screenshot_bytes, frame_dpr,
+                                                                   task_id=self.task_id)
             
             # 更新缓存
             if use_cache:
                 self.screenshot_cache['last_screenshot'] = screenshot_cv
+                self.screenshot_cache['last_fingerprint'] = fingerprint
                 self.last_screenshot_time = current_time
-                log_info(f"[{self.task_id}] 截图已缓存")
+                _logger.debug("[%s] 截图已缓存", self.task_id)
             
-            return screenshot_cv
+            return screenshot_cv, fingerprint
             
         except Exception as e:
             log_info(f"[{self.task_id}] 获取页面截图失败: {e}")
-            return None
+            return None, None
+    
+    @staticmethod
+    def _decode_screenshot(screenshot_bytes: bytes) -> np.ndarray:
+        """将PNG截图解码为OpenCV BGR数组（在视觉线程池中执行）"""
+        screenshot_array = np.array(Image.open(io.BytesIO(screenshot_bytes)).convert('RGB'))
+        return cv2.cvtColor(screenshot_array, cv2.COLOR_RGB2BGR)
+
+    @staticmethod
+    def _frame_fingerprint(frame: np.ndarray) -> str:
+        """
+        计算画面指纹：降采样灰度图的快速哈希
+
+        降采样到 UIConfig.FRAME_FINGERPRINT_SIZE 后逐像素求哈希，足以区分按钮出现/消失等变化，
+        计算耗时远小于一次多尺度 matchTemplate。
+        """
+        width, height = UIConfig.FRAME_FINGERPRINT_SIZE
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        small = cv2.resize(gray, (width, height), interpolation=cv2.INTER_AREA)
+        digest = hashlib.blake2b(small.tobytes(), digest_size=8)
+        digest.update(str(frame.shape).encode())
+        return digest.hexdigest()
+
+    @classmethod
+    def _decode_frame(cls, screenshot_bytes: bytes, dpr: float = 1.0) -> Tuple[np.ndarray, str]:
+        """解码截图（按DPR缩放到CSS像素）并计算画面指纹（在视觉线程池中执行）"""
+        frame = cls._decode_screenshot(screenshot_bytes)
+        if dpr and abs(dpr - 1.0) > 1e-3:
+            h, w = frame.shape[:2]
+            frame = cv2.resize(frame, (max(1, round(w / dpr)), max(1, round(h / dpr))),
+                               interpolation=cv2.INTER_AREA if dpr > 1.0 else cv2.INTER_LINEAR)
+        return frame, cls._frame_fingerprint(frame)
     
     def _smart_template_matching(self, screenshot: np.ndarray, template_path: str, 
-                                base_confidence: float, attempt: int) -> Optional[Tuple[int, int]]:
+                                base_confidence: float, attempt: int,
+                                layout: Optional[str] = None) -> Optional[Tuple[int, int]]:
         """
         智能模板匹配 - 结合多尺度匹配和动态置信度调整
         
+        有模板先验时先在历史命中区域内按最常命中的尺度匹配，再按先验排好的尺度做整屏匹配；
+        首次尝试只保留先验尺度及其相邻尺度，后续尝试才补齐全部尺度。
+        
         Args:
             screenshot: 页面截图
             template_path: 模板图片路径
             base_confidence: 基础置信度
             attempt: 当前尝试次数
+            layout: 页面布局键（窗口尺寸+DPR），为空时不使用先验
             
         Returns:
             Optional[Tuple[int, int]]: 匹配位置，未找到返回None
@@ -210,23 +389,40 @@ class ImageRecognition:
             if not confidence_strategy:
                 confidence_strategy = [self.absolute_min_confidence]
             
+            # 已知源DPR的模板已换算到CSS像素，首次尝试只做单尺度匹配
+            candidate_scales = self.scale_factors
+            if attempt == 0 and self._has_source_dpr(template_path):
+                candidate_scales = UIConfig.DPR_NORMALIZED_SCALE_FACTORS
+            prior = template_priors.get_prior(template_path, layout) if layout else None
+            scale_factors = template_priors.order_scales(prior, candidate_scales, attempt)
+            if prior:
+                _logger.debug("[%s] 使用模板先验: %s, 布局: %s, 尺度顺序: %s", self.task_id, template_path, layout, scale_factors)
+                # 先在历史命中区域内用首选尺度匹配
+                if prior['region']:
+                    position = self._match_in_prior_region(screenshot, template_gray, template_path,
+                                                           prior, confidence_strategy)
+                    if position:
+                        self._record_prior(template_path, layout)
+                        return position
+            
+            frame_sig = self.prefilter.frame_signature(screenshot) if UIConfig.PREFILTER_SMART_MATCH else None
+            
             # 多尺度匹配
-            for scale_factor in self.scale_factors:
-                # 缩放模板
-                if scale_factor != 1.0:
-                    h, w = template_gray.shape[:2]
-                    new_h, new_w = int(h * scale_factor), int(w * scale_factor)
-                    if new_h < 10 or new_w < 10:  # 避免模板过小
-                        continue
-                    scaled_template = cv2.resize(template_gray, (new_w, new_h))
-                else:
-                    scaled_template = template_gray
+            for scale_factor in scale_factors:
+                scaled_template = self._scale_template(template_gray, scale_factor)
+                if scaled_template is None:
+                    continue
+                if frame_sig is not None and not self._passes_prefilter(frame_sig, template, template_path,
+                                                                         scale_factor, min(confidence_strategy)):
+                    continue
+                self._scales_tried += 1
                 
                 # 使用不同置信度级别进行匹配
                 for confidence_level in confidence_strategy:
                     position = self._find_template_at_scale(screenshot, scaled_template, 
                                                          template_path, confidence_level, scale_factor)
                     if position:
+                        self._record_prior(template_path, layout)
                         return position
             
             return None
@@ -234,6 +430,135 @@ class ImageRecognition:
         except Exception as e:
             log_info(f"[{self.task_id}] 智能模板匹配过程中发生错误: {e}")
             return None
+
+    @staticmethod
+    def get_match_engine(template_path: str, engine: str = None) -> str:
+        """确定识别引擎：调用方（步骤）指定 > 按模板配置 > 全局默认"""
+        if not engine:
+            normalized = os.path.normpath(template_path).replace('\\', '/')
+            engine = UIConfig.TEMPLATE_MATCH_ENGINES.get(normalized) or UIConfig.MATCH_ENGINE
+        engine = str(engine).strip().lower()
+        return engine if engine in ('template', 'feature', 'auto') else 'template'
+
+    @property
+    def feature_matcher(self) -> FeatureMatcher:
+        if self._feature_matcher is None:
+            self._feature_matcher = FeatureMatcher(task_id=self.task_id)
+        return self._feature_matcher
+
+    def _feature_match(self, screenshot: np.ndarray, template_path: str,
+                       fingerprint: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """特征匹配引擎的同步部分（在视觉线程池中执行），成功时更新最近一次匹配信息"""
+        try:
+            result = self.feature_matcher.match(screenshot, template_path, fingerprint)
+        except Exception as e:
+            log_info(f"[{self.task_id}] 特征匹配过程中发生错误: {e}")
+            return None
+        if not result:
+            return None
+        self.last_match_info.update({
+            'path': template_path,
+            'position': result['position'],
+            'score': float(result['score']),
+            'scale': float(result['scale']),
+            'threshold': float(self.feature_matcher.min_inliers),
+            'ts': time.time(),
+        })
+        return result['position']
+
+    async def match_features_many(self, page, template_paths: List[str]) -> Dict[str, Optional[Tuple[int, int]]]:
+        """特征引擎批量匹配：一次截图、一次画面特征检测，返回每个模板的位置"""
+        screenshot, fingerprint = await self._get_page_frame(page, use_cache=True)
+        if screenshot is None:
+            return {path: None for path in template_paths}
+        results = await vision_executor.run(self.feature_matcher.match_many, screenshot, template_paths,
+                                            fingerprint, task_id=self.task_id)
+        return {path: (result['position'] if result else None) for path, result in results.items()}
+
+    def match_screen_image(self, image: np.ndarray, template_path: str, confidence: float,
+                           screen_dpr: float = None) -> Optional[Tuple[int, int]]:
+        """
+        在屏幕截取图像中匹配模板（pyautogui兜底路径使用，在视觉线程池中执行）
+
+        屏幕截图为设备像素，模板按 screen_dpr 换算；复用模板缓存和OpenCV匹配，替代pyscreeze逐次读盘。
+
+        Returns:
+            Optional[Tuple[int, int]]: 模板中心在图像中的坐标，未找到返回None
+        """
+        template = self._load_template(template_path, target_dpr=screen_dpr or self._page_dpr or 1.0)
+        if template is None:
+            return None
+        img_h, img_w = image.shape[:2]
+        tpl_h, tpl_w = template.shape[:2]
+        if tpl_h > img_h or tpl_w > img_w:
+            return None
+        result = cv2.matchTemplate(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY),
+                                   cv2.cvtColor(template, cv2.COLOR_BGR2GRAY), cv2.TM_CCOEFF_NORMED)
+        _min_val, max_val, _min_loc, max_loc = cv2.minMaxLoc(result)
+        if max_val < confidence:
+            _logger.debug("[%s] 屏幕匹配失败: %s, 置信度: %.3f, 阈值: %s", self.task_id, template_path, max_val, confidence)
+            return None
+        log_info(f"[{self.task_id}] 屏幕匹配成功: {template_path}, 置信度: {max_val:.3f}")
+        return (int(max_loc[0] + tpl_w // 2), int(max_loc[1] + tpl_h // 2))
+
+    def _passes_prefilter(self, frame_sig, template: np.ndarray, template_path: str,
+                          scale_factor: float, confidence: float) -> bool:
+        """预筛选：返回False表示该尺度下模板不可能出现，可跳过全分辨率匹配"""
+        template_key = f"{os.path.normpath(template_path)}@{template.shape[1]}x{template.shape[0]}"
+        passed, reason, _score = self.prefilter.check(frame_sig, template, template_key, scale_factor, confidence)
+        if not passed:
+            _logger.debug("[%s] 预筛选排除: %s, 尺度: %.2f, 原因: %s", self.task_id, template_path, scale_factor, reason)
+        return passed
+
+    @staticmethod
+    def _scale_template(template_gray: np.ndarray, scale_factor: float) -> Optional[np.ndarray]:
+        """按尺度缩放模板，缩放后过小时返回None"""
+        if scale_factor == 1.0:
+            return template_gray
+        h, w = template_gray.shape[:2]
+        new_h, new_w = int(h * scale_factor), int(w * scale_factor)
+        if new_h < 10 or new_w < 10:  # 避免模板过小
+            return None
+        return cv2.resize(template_gray, (new_w, new_h))
+
+    def _match_in_prior_region(self, screenshot: np.ndarray, template_gray: np.ndarray, template_path: str,
+                               prior: Dict[str, Any], confidence_strategy: List[float]) -> Optional[Tuple[int, int]]:
+        """在历史命中位置的包围盒（按模板尺寸外扩）内，用最常命中的尺度匹配"""
+        scale_factor = prior['scales'][0]
+        scaled_template = self._scale_template(template_gray, scale_factor)
+        if scaled_template is None:
+            return None
+        tpl_h, tpl_w = scaled_template.shape[:2]
+        img_h, img_w = screenshot.shape[:2]
+        margin = UIConfig.TEMPLATE_PRIORS_REGION_MARGIN
+        x1, y1, x2, y2 = prior['region']
+        left = max(0, int(x1 - tpl_w // 2 - tpl_w * margin))
+        top = max(0, int(y1 - tpl_h // 2 - tpl_h * margin))
+        right = min(img_w, int(x2 + tpl_w // 2 + tpl_w * margin) + 1)
+        bottom = min(img_h, int(y2 + tpl_h // 2 + tpl_h * margin) + 1)
+        if right - left < tpl_w or bottom - top < tpl_h:
+            return None
+        region = screenshot[top:bottom, left:right]
+        for confidence_level in confidence_strategy:
+            position = self._find_template_at_scale(region, scaled_template, template_path,
+                                                    confidence_level, scale_factor)
+            if position:
+                # 区域内坐标换算回整屏坐标
+                position = (position[0] + left, position[1] + top)
+                self.last_match_info['position'] = position
+                log_info(f"[{self.task_id}] 先验区域内匹配成功: {template_path}, 区域: ({left}, {top}, {right}, {bottom})")
+                return position
+        return None
+
+    def _record_prior(self, template_path: str, layout: Optional[str]):
+        """将本次成功匹配的尺度、置信度和位置记入模板先验"""
+        if not layout or self.last_match_info.get('path') != template_path:
+            return
+        try:
+            template_priors.record(template_path, layout, self.last_match_info['scale'],
+                                   self.last_match_info['score'], self.last_match_info['position'])
+        except Exception as e:
+            log_info(f"[{self.task_id}] 记录模板先验失败: {e}")
     
     def _get_confidence_strategy(self, base_confidence: float, attempt: int) -> List[float]:
         """
@@ -280,8 +605,7 @@ class ImageRecognition:
             img_h, img_w = screenshot_gray.shape[:2]
             tpl_h, tpl_w = template.shape[:2]
             if tpl_h > img_h or tpl_w > img_w:
-                scale_info = f" (缩放: {scale_factor:.1f})" if scale_factor != 1.0 else ""
-                log_info(f"[{self.task_id}] 跳过该尺度，模板尺寸大于截图: 模板=({tpl_w}x{tpl_h}), 截图=({img_w}x{img_h}){scale_info}")
+                _logger.debug("[%s] 跳过该尺度，模板尺寸大于截图: 模板=(%dx%d), 截图=(%dx%d), 缩放: %.1f", self.task_id, tpl_w, tpl_h, img_w, img_h, scale_factor)
                 return None
             # 模板匹配
             result = cv2.matchTemplate(screenshot_gray, template, cv2.TM_CCOEFF_NORMED)
@@ -313,32 +637,57 @@ class ImageRecognition:
                 })
                 return (int(center_x), int(center_y))
             else:
-                scale_info = f" (缩放: {scale_factor:.1f})" if scale_factor != 1.0 else ""
-                log_info(f"[{self.task_id}] 模板匹配失败: {template_path}, 置信度: {max_val:.3f}, 阈值: {confidence}{scale_info}")
+                _logger.debug("[%s] 模板匹配失败: %s, 置信度: %.3f, 阈值: %s, 缩放: %.1f", self.task_id, template_path, max_val, confidence, scale_factor)
                 return None
                 
         except Exception as e:
             log_info(f"[{self.task_id}] 指定尺度模板匹配过程中发生错误: {e}")
             return None
     
-    def _load_template(self, template_path: str) -> Optional[np.ndarray]:
-        """加载模板图片，使用任务隔离的缓存"""
+    def _has_source_dpr(self, template_path: str) -> bool:
+        """模板是否记录了上传时的源DPR（可直接按CSS像素单尺度匹配）"""
+        return self.normalize_dpr and image_upload_manager.get_template_meta(template_path) is not None
+
+    def _template_dpr_ratio(self, template_path: str, target_dpr: float = None) -> float:
+        """
+        模板换算到目标坐标空间的缩放倍数
+
+        target_dpr 为空时目标为页面截图：归一化开启时截图为CSS像素（DPR 1.0），否则保持模板原尺寸。
+        有源DPR记录的模板按 目标DPR/源DPR 缩放；历史模板按"与当前页面同DPR截取"处理，
+        与归一化前1.0尺度的匹配效果一致。
+        """
+        if target_dpr is None:
+            if not self.normalize_dpr:
+                return 1.0
+            target_dpr = 1.0
+        meta = image_upload_manager.get_template_meta(template_path)
+        source_dpr = float(meta.get('source_dpr') or 1.0) if meta else (self._page_dpr or 1.0)
+        return target_dpr / source_dpr if source_dpr > 0 else 1.0
+
+    def _load_template(self, template_path: str, target_dpr: float = None) -> Optional[np.ndarray]:
+        """加载模板图片（按DPR换算到目标坐标空间，见 _template_dpr_ratio），使用任务隔离的缓存"""
         try:
             # 规范化路径，避免路径分隔符混用导致cv2.imread失败
-            import os
             normalized_path = os.path.normpath(template_path)
+            ratio = self._template_dpr_ratio(template_path, target_dpr)
+            cache_key = (normalized_path, round(ratio, 4))
             
-            # 检查缓存（使用规范化路径作为key）
-            if normalized_path in self.template_cache:
-                log_info(f"[{self.task_id}] 使用缓存的模板: {normalized_path}")
-                return self.template_cache[normalized_path]
+            # 检查缓存（使用规范化路径和换算倍数作为key）
+            if cache_key in self.template_cache:
+                _logger.debug("[%s] 使用缓存的模板: %s", self.task_id, normalized_path)
+                return self.template_cache[cache_key]
             
             # 加载新模板
-            log_info(f"[{self.task_id}] 加载新模板: {normalized_path}")
+            _logger.debug("[%s] 加载新模板: %s", self.task_id, normalized_path)
             template = cv2.imread(normalized_path)
             if template is not None:
-                self.template_cache[normalized_path] = template
-                log_info(f"[{self.task_id}] 模板已缓存: {normalized_path}")
+                if abs(ratio - 1.0) > 1e-3:
+                    h, w = template.shape[:2]
+                    template = cv2.resize(template, (max(1, round(w * ratio)), max(1, round(h * ratio))),
+                                          interpolation=cv2.INTER_AREA if ratio < 1.0 else cv2.INTER_LINEAR)
+                    _logger.debug("[%s] 模板按DPR换算到CSS像素: %s, 倍数: %.3f", self.task_id, normalized_path, ratio)
+                self.template_cache[cache_key] = template
+                _logger.debug("[%s] 模板已缓存: %s", self.task_id, normalized_path)
                 return template
             else:
                 log_info(f"[{self.task_id}] 无法加载模板: {normalized_path}")
@@ -348,9 +697,20 @@ class ImageRecognition:
             log_info(f"[{self.task_id}] 加载模板时发生错误: {e}")
             return None
     
+    def get_feature_stats(self) -> Dict[str, Any]:
+        """获取特征匹配引擎统计（未使用时为空）"""
+        return self._feature_matcher.get_stats() if self._feature_matcher is not None else {}
+
+    def get_prefilter_stats(self) -> Dict[str, Any]:
+        """获取预筛选统计（检查次数、各级排除次数、排除率）"""
+        return self.prefilter.get_stats()
+
     def clear_cache(self):
         """清理缓存"""
         self.template_cache.clear()
+        self.prefilter.clear()
+        if self._feature_matcher is not None:
+            self._feature_matcher.clear()
         self.screenshot_cache.clear()
         self.last_screenshot_time = 0
         log_info(f"[{self.task_id}] 缓存已清理")
@@ -3,12 +3,15 @@
 专门处理图片断言相关的图片上传、存储和管理功能
 """
 import os
+import json
 import shutil
 import uuid
 import base64
+import threading
 from pathlib import Path
 from typing import Optional, Dict, Any
 from config.logger import log_info, log_error
+from config.ui_config import UIConfig
 
 
 class ImageUploadManager:
@@ -18,6 +21,85 @@ class ImageUploadManager:
         """初始化图片上传管理器"""
         self.base_dir = Path("IMG_LOGS/IMA_ASSERT")
         self.base_dir.mkdir(parents=True, exist_ok=True)
+        # 模板元数据（上传时的源DPR与CSS尺寸），按文件修改时间懒加载
+        self.template_meta_file = Path(UIConfig.TEMPLATE_META_FILE)
+        self._template_meta: Dict[str, Dict[str, Any]] = {}
+        self._template_meta_mtime = None
+        self._template_meta_lock = threading.Lock()
+
+    @staticmethod
+    def _template_key(template_path: str) -> str:
+        """模板元数据键：统一为相对路径、正斜杠，去掉开头的 /"""
+        normalized = os.path.normpath(str(template_path).lstrip('/\\'))
+        if os.path.isabs(normalized):
+            try:
+                normalized = os.path.relpath(normalized, os.getcwd())
+            except ValueError:
+                pass
+        return normalized.replace('\\', '/')
+
+    def _load_template_meta_locked(self):
+        try:
+            mtime = self.template_meta_file.stat().st_mtime
+        except OSError:
+            self._template_meta = {}
+            self._template_meta_mtime = None
+            return
+        if mtime == self._template_meta_mtime:
+            return
+        try:
+            with open(self.template_meta_file, 'r', encoding='utf-8') as f:
+                self._template_meta = json.load(f)
+            self._template_meta_mtime = mtime
+        except Exception as e:
+            log_error(f"读取模板元数据失败: {e}")
+
+    def record_template_meta(self, template_path: str, source_dpr: float,
+                             css_width: Optional[int] = None, css_height: Optional[int] = None) -> Dict[str, Any]:
+        """
+        记录模板的源DPR和CSS尺寸，识别时据此把模板统一换算到CSS像素
+        
+        Args:
+            template_path: 模板图片路径（如 Game_Img/1761050313_start.png）
+            source_dpr: 截取模板时页面的 devicePixelRatio
+            css_width: 模板的CSS宽度，为空时按像素宽度/DPR计算
+            css_height: 模板的CSS高度，为空时按像素高度/DPR计算
+            
+        Returns:
+            记录的元数据
+        """
+        source_dpr = float(source_dpr) if source_dpr and float(source_dpr) > 0 else 1.0
+        width = height = None
+        try:
+            from PIL import Image
+            with Image.open(template_path) as img:
+                width, height = img.size
+        except Exception as e:
+            log_info(f"读取模板尺寸失败: {template_path}, {e}")
+        meta = {
+            'source_dpr': source_dpr,
+            'width': width,
+            'height': height,
+            'css_width': int(css_width) if css_width else (round(width / source_dpr) if width else None),
+            'css_height': int(css_height) if css_height else (round(height / source_dpr) if height else None),
+        }
+        with self._template_meta_lock:
+            self._load_template_meta_locked()
+            self._template_meta[self._template_key(template_path)] = meta
+            self.template_meta_file.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.template_meta_file.with_name(self.template_meta_file.name + '.tmp')
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._template_meta, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.template_meta_file)
+            self._template_meta_mtime = self.template_meta_file.stat().st_mtime
+        log_info(f"模板元数据已记录: {template_path}, {meta}")
+        return meta
+
+    def get_template_meta(self, template_path: str) -> Optional[Dict[str, Any]]:
+        """获取模板元数据，未记录（历史模板）时返回None"""
+        with self._template_meta_lock:
+            self._load_template_meta_locked()
+            return self._template_meta.get(self._template_key(template_path))
         
     def save_image_assertion_file(self, image_data: Any, filename: Optional[str] = None) -> Optional[str]:
         """
@@ -41,6 +123,9 @@ class ImageUploadManager:
                 filename += '.png'
             
             file_path = self.base_dir / filename
+            if file_path.exists():
+                # 已有同名文件可能是产物存储对象的硬链接，先删除再写，避免改写共享对象
+                file_path.unlink()
             
             # 处理不同类型的图片数据
             if isinstance(image_data, str):
@@ -67,6 +152,9 @@ class ImageUploadManager:
                         f.write(image_data)
             
             log_info(f"图片断言文件保存成功: {file_path}")
+            # 入库并以硬链接放回原路径，内容相同的断言图只占一份磁盘
+            from utils.artifact_store import artifact_store
+            artifact_store.import_file(str(file_path), kind='assertion')
             # 返回绝对路径（以/开头），确保从任何页面都能正确访问
             # 确保使用绝对路径进行相对路径计算
             absolute_file_path = file_path.resolve()
@@ -0,0 +1,100 @@
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+
+# 未命中时 get 返回的哨兵，区分"缓存的未找到(None)"与"没有缓存"
+MISS = object()
+
+
+class MatchMemo:
+    """模板匹配结果备忘 - 页面画面不变时复用 matchTemplate 的结果（包括未找到）
+
+    键由 (画面指纹, 模板, 匹配方式与参数, ROI) 组成，画面一旦变化指纹随之变化，旧结果自然失效；
+    页面发生导航时整体清空。容量有限，按最近最少使用淘汰。
+    """
+
+    def __init__(self, max_entries: int = None, name: str = ''):
+        self.max_entries = max_entries or UIConfig.MATCH_MEMO_SIZE
+        self.name = name
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Any:
+        """查询缓存结果，未缓存时返回 MISS"""
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return MISS
+
+    def put(self, key: Hashable, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, reason: str = ''):
+        """清空全部结果（导航等画面整体变化时调用）"""
+        if self._entries:
+            log_info(f"[{self.name}] 匹配结果缓存失效: {reason}, 清除 {len(self._entries)} 条")
+        self._entries.clear()
+        self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
+
+
+# 每个页面共享一个备忘：同一页面上的多个识别器、点击验证和遮挡处理复用同一份结果
+_page_memos: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def get_page_memo(page, name: str = '') -> Optional[MatchMemo]:
+    """
+    获取页面对应的匹配结果备忘，首次获取时注册导航失效监听
+
+    Returns:
+        Optional[MatchMemo]: 未启用备忘或页面对象不支持弱引用时返回None
+    """
+    if not UIConfig.MATCH_MEMO_ENABLED or page is None:
+        return None
+    try:
+        memo = _page_memos.get(page)
+    except TypeError:
+        return None
+    if memo is not None:
+        return memo
+
+    memo = MatchMemo(name=name)
+    _page_memos[page] = memo
+
+    def _on_frame_navigated(frame):
+        # 只在主框架导航时失效，iframe内部跳转不影响整页截图之外的缓存判断
+        if getattr(frame, 'parent_frame', None) is None:
+            memo.invalidate('navigation')
+
+    try:
+        page.on('framenavigated', _on_frame_navigated)
+    except Exception as e:
+        log_info(f"[{name}] 注册导航监听失败，仅依赖画面指纹失效: {e}")
+    return memo
+
+
+def make_memo_key(fingerprint: str, template_path: str, method: Tuple, roi: Optional[Tuple[int, int, int, int]] = None) -> Tuple:
+    """构建备忘键：画面指纹 + 模板 + 匹配方式及参数 + ROI"""
+    return (fingerprint, template_path, method, roi)
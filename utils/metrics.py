@@ -0,0 +1,392 @@
+"""
+运行指标模块
+进程内的计数器/直方图注册表，以 Prometheus 文本格式从 /metrics 导出。
+
+服务 worker 与 pytest 测试子进程都在本进程内累计指标，由后台线程每隔 METRICS_FLUSH_INTERVAL 秒把累计值写到
+METRICS_DIR/<进程号>.json；/metrics 把本进程的实时值与目录中其他进程的文件合并后输出，多 worker 部署时
+任意 worker 返回的都是全部进程的汇总。超过 METRICS_STALE_SECONDS 未刷新的文件（进程已退出）由监督者并入
+_archive.json，计数在进程退出后仍然保留。
+"""
+import atexit
+import glob
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ARCHIVE_FILE = '_archive.json'
+
+
+class _Metric:
+    """单个指标：按标签值组合保存各序列"""
+
+    kind = ''
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, '')) for name in self.labelnames)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {'type': self.kind, 'help': self.documentation, 'labelnames': list(self.labelnames),
+                'series': [[list(key), value] for key, value in self.series.items()]}
+
+
+class Counter(_Metric):
+    """只增计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        if not UIConfig.METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        with self.registry._lock:
+            self.series[key] = self.series.get(key, 0) + amount
+            self.registry._dirty = True
+        self.registry._ensure_started()
+
+
+class Histogram(_Metric):
+    """直方图：各分桶计数（非累计，输出时累加）、总和、次数"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets: Sequence[float]):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, **labels):
+        if not UIConfig.METRICS_ENABLED:
+            return
+        key = self._key(labels)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.registry._lock:
+            data = self.series.get(key)
+            if data is None:
+                data = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            data[0][index] += 1
+            data[1] += value
+            data[2] += 1
+            self.registry._dirty = True
+        self.registry._ensure_started()
+
+    @contextmanager
+    def time(self, **labels):
+        """记录代码块耗时（秒）"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data['buckets'] = list(self.buckets)
+        data['series'] = [[list(key), [list(value[0]), value[1], value[2]]] for key, value in self.series.items()]
+        return data
+
+
+def merge_snapshot(target: Dict[str, Any], snapshot: Dict[str, Any]):
+    """把一个进程的指标快照累加到 target（同名同标签的序列相加）"""
+    for name, metric in snapshot.items():
+        existing = target.get(name)
+        if existing is None:
+            target[name] = existing = {key: value for key, value in metric.items() if key != 'series'}
+            existing['series'] = {}
+        elif existing['type'] != metric['type'] or existing.get('buckets') != metric.get('buckets'):
+            # 指标定义变化（升级前后的旧文件），不合并
+            continue
+        series = existing['series']
+        for labels, value in metric['series']:
+            key = tuple(labels)
+            if metric['type'] == 'histogram':
+                current = series.get(key)
+                if current is None:
+                    series[key] = [list(value[0]), value[1], value[2]]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], value[0])]
+                    current[1] += value[1]
+                    current[2] += value[2]
+            else:
+                series[key] = series.get(key, 0) + value
+
+
+def _freeze(merged: Dict[str, Any]) -> Dict[str, Any]:
+    """merge_snapshot 的结果转回可写入JSON的快照格式"""
+    return {name: dict(metric, series=[[list(key), value] for key, value in metric['series'].items()])
+            for name, metric in merged.items()}
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labelnames: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_text(merged: Dict[str, Any]) -> str:
+    """按 Prometheus 文本格式（0.0.4）输出合并后的指标"""
+    lines = []
+    for name in sorted(merged):
+        metric = merged[name]
+        labelnames = metric['labelnames']
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for key in sorted(metric['series']):
+            value = metric['series'][key]
+            if metric['type'] == 'histogram':
+                counts, total, count = value
+                cumulative = 0
+                for bound, bucket_count in zip(list(metric['buckets']) + [float('inf')], counts):
+                    cumulative += bucket_count
+                    le = f'le="{_format_value(bound)}"'
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(float(total))}")
+                lines.append(f"{name}_count{_format_labels(labelnames, key)} {count}")
+            else:
+                lines.append(f"{name}{_format_labels(labelnames, key)} {_format_value(value)}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsRegistry:
+    """指标注册表 - 进程内累计，定期写出本进程的快照文件供 /metrics 汇总"""
+
+    def __init__(self, spool_dir: str = None):
+        self.spool_dir = spool_dir or os.path.join(BASE_DIR, UIConfig.METRICS_DIR)
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._compactor: Optional[Callable[[], bool]] = None
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """本进程的累计值"""
+        with self._lock:
+            return {name: metric.snapshot() for name, metric in self._metrics.items() if metric.series}
+
+    @property
+    def spool_file(self) -> str:
+        # 每次按当前进程号计算，fork 出的子进程写各自的文件
+        return os.path.join(self.spool_dir, f"{os.getpid()}.json")
+
+    def _read(self, path: str) -> Dict[str, Any]:
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write(self, path: str, snapshot: Dict[str, Any]):
+        os.makedirs(self.spool_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def flush(self):
+        """写出本进程的快照；没有新数据时只刷新文件时间，表示进程仍存活"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, False
+        if dirty:
+            self._write(self.spool_file, self.snapshot())
+        elif os.path.exists(self.spool_file):
+            os.utime(self.spool_file)
+
+    def collect(self) -> Dict[str, Any]:
+        """合并本进程实时值、其他进程的快照文件和已退出进程的归档"""
+        merged: Dict[str, Any] = {}
+        merge_snapshot(merged, self.snapshot())
+        own_file = os.path.abspath(self.spool_file)
+        for path in glob.glob(os.path.join(self.spool_dir, '*.json')):
+            if os.path.abspath(path) != own_file:
+                merge_snapshot(merged, self._read(path))
+        return merged
+
+    def render(self) -> str:
+        return render_text(self.collect())
+
+    def compact(self) -> int:
+        """把超过 METRICS_STALE_SECONDS 未刷新的进程快照并入归档文件（只应由一个进程执行）"""
+        archive_path = os.path.join(self.spool_dir, ARCHIVE_FILE)
+        cutoff = time.time() - UIConfig.METRICS_STALE_SECONDS
+        stale = []
+        for path in glob.glob(os.path.join(self.spool_dir, '*.json')):
+            if os.path.basename(path) == ARCHIVE_FILE or os.path.abspath(path) == os.path.abspath(self.spool_file):
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    stale.append(path)
+            except OSError:
+                continue
+        if not stale:
+            return 0
+        merged: Dict[str, Any] = {}
+        merge_snapshot(merged, self._read(archive_path))
+        for path in stale:
+            merge_snapshot(merged, self._read(path))
+        self._write(archive_path, _freeze(merged))
+        for path in stale:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        return len(stale)
+
+    def set_compactor(self, should_compact: Callable[[], bool]):
+        """设置是否由本进程归档已退出进程的快照（多 worker 时只由监督者执行）"""
+        self._compactor = should_compact
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='metrics-flusher', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """停止写出线程并写出最后一次快照（测试子进程退出时调用）"""
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            log_info(f"写出运行指标失败: {e}")
+
+    def _loop(self):
+        while not self._stop.wait(UIConfig.METRICS_FLUSH_INTERVAL):
+            try:
+                self.flush()
+                if self._compactor is not None and self._compactor():
+                    self.compact()
+            except Exception as e:
+                log_info(f"写出运行指标失败: {e}")
+
+
+@lru_cache(maxsize=2048)
+def statement_label(query: str) -> str:
+    """把SQL语句归类为 "动词 表名"（如 "SELECT automation_projects"），作为低基数的标签值"""
+    text = query.strip()
+    verb = text.split(None, 1)[0].upper() if text else ''
+    match = re.search(r'\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+[`"\[]?(\w+)', text, re.I)
+    return f"{verb} {match.group(1)}" if match else verb
+
+
+# 全局指标注册表实例
+metrics = MetricsRegistry()
+
+# 服务端指标
+db_query_seconds = metrics.histogram(
+    'ui_db_query_seconds', '数据库语句耗时（秒），按语句类型和表归类', ('statement',),
+    (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5))
+http_request_seconds = metrics.histogram(
+    'ui_http_request_seconds', 'HTTP请求处理耗时（秒）', ('method', 'endpoint', 'status'))
+execution_queue_seconds = metrics.histogram(
+    'ui_execution_queue_seconds', '执行请求到后台执行线程开始运行的等待时间（秒）', (),
+    (0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 15.0, 60.0))
+execution_run_seconds = metrics.histogram(
+    'ui_execution_run_seconds', '测试执行总耗时（秒），按结束状态', ('status',),
+    (5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1200.0, 1800.0, 3600.0))
+
+# 测试运行时指标（在 pytest 子进程中累计，写入快照文件后由 /metrics 汇总）
+find_image_seconds = metrics.histogram(
+    'ui_find_image_seconds', '一次图片查找（共享同一预算）的耗时（秒）', ('result',),
+    (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0))
+find_image_scales = metrics.histogram(
+    'ui_find_image_scales_tried', '一次图片查找中做了整屏模板匹配的尺度数', ('result',),
+    (0, 1, 2, 3, 4, 6, 8, 12, 16, 24, 32))
+find_image_frames = metrics.histogram(
+    'ui_find_image_frames', '一次图片查找截取的帧数', ('result',), (1, 2, 3, 4, 5, 6, 8, 10, 15, 20))
+page_stable_seconds = metrics.histogram(
+    'ui_page_stable_seconds', 'wait_for_page_stable 耗时（秒），按是否等到稳定', ('result',),
+    (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0))
+click_verifications = metrics.counter(
+    'ui_click_verifications_total', '点击效果验证结果', ('result', 'reason'))
+browser_launch_seconds = metrics.histogram(
+    'ui_browser_launch_seconds', '浏览器启动耗时（秒）', (), (0.25, 0.5, 1.0, 2.0, 3.0, 5.0, 10.0, 20.0))
+image_manager_events = metrics.counter(
+    'ui_image_manager_events_total', 'HybridImageManager 识别统计（截图/pyautogui 成功与失败、识别轮数）', ('event',))
+
+
+@contextmanager
+def timed_query(query: str):
+    """记录一条SQL语句的执行耗时（失败的语句也记录）"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        db_query_seconds.observe(time.perf_counter() - started, statement=statement_label(query))
+
+
+def observe_image_search(report: Dict[str, Any], success: bool):
+    """记录一次图片查找：report 为 SearchBudget.report() 的结果"""
+    result = 'found' if success else 'not_found'
+    find_image_seconds.observe(report.get('elapsed', 0.0), result=result)
+    find_image_frames.observe(report.get('frames_used', 0), result=result)
+    find_image_scales.observe(report.get('scales_tried', 0), result=result)
+
+
+def start_request_timer():
+    """before_request 钩子：记录请求开始时间"""
+    from flask import g
+    g.metrics_started = time.perf_counter()
+
+
+def observe_request(response):
+    """after_request 钩子：按路由规则（而不是实际路径）记录请求耗时"""
+    from flask import g, request
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        http_request_seconds.observe(time.perf_counter() - started, method=request.method,
+                                     endpoint=endpoint, status=str(response.status_code))
+    return response
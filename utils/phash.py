@@ -0,0 +1,280 @@
+import os
+import json
+import time
+import threading
+import cv2
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+HASH_BITS = 64
+
+_popcount = getattr(int, 'bit_count', None) or (lambda value: bin(value).count('1'))
+
+
+# =============================================================================
+# 感知哈希（打包为64位整数）
+# =============================================================================
+def _to_gray(image: np.ndarray) -> np.ndarray:
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), 'big')
+
+
+def ahash(image: np.ndarray) -> int:
+    """均值哈希：8x8灰度图与均值比较"""
+    small = cv2.resize(_to_gray(image), (8, 8), interpolation=cv2.INTER_AREA).astype(np.float32)
+    return _pack(small > small.mean())
+
+
+def dhash(image: np.ndarray) -> int:
+    """差值哈希：9x8灰度图相邻像素比较，对整体亮度变化不敏感"""
+    small = cv2.resize(_to_gray(image), (9, 8), interpolation=cv2.INTER_AREA)
+    return _pack(small[:, 1:] > small[:, :-1])
+
+
+def phash(image: np.ndarray) -> int:
+    """DCT哈希：32x32灰度图做DCT，取左上8x8低频系数与中位数比较（不含直流分量）"""
+    small = cv2.resize(_to_gray(image), (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8]
+    return _pack(low > np.median(low.flatten()[1:]))
+
+
+HASH_FUNCTIONS: Dict[str, Callable[[np.ndarray], int]] = {'ahash': ahash, 'dhash': dhash, 'phash': phash}
+
+
+def hash_image(image: np.ndarray, kind: str = 'ahash') -> int:
+    return HASH_FUNCTIONS[kind](image)
+
+
+def decode_png(png_bytes: bytes) -> np.ndarray:
+    """解码截图字节为灰度图"""
+    image = cv2.imdecode(np.frombuffer(png_bytes, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("无法解码图片数据")
+    return image
+
+
+def hash_png(png_bytes: bytes, kind: str = 'ahash') -> int:
+    return hash_image(decode_png(png_bytes), kind)
+
+
+def hamming(hash1: int, hash2: int) -> int:
+    """汉明距离（异或后popcount）"""
+    return _popcount(hash1 ^ hash2)
+
+
+def screen_key(image: np.ndarray) -> int:
+    """画面键：dHash与pHash拼接的128位整数，汉明距离为两者距离之和"""
+    gray = _to_gray(image)
+    return (dhash(gray) << HASH_BITS) | phash(gray)
+
+
+# =============================================================================
+# BK树
+# =============================================================================
+class BKTree:
+    """BK树 - 按汉明距离（满足三角不等式）组织哈希，半径查询只访问少量节点
+
+    节点为 [键, 条目列表, {距离: 子节点}]，键相同的条目合并到同一节点。
+    """
+
+    def __init__(self, distance: Callable[[int, int], int] = hamming):
+        self.distance = distance
+        self._root: Optional[list] = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key: int, item: Any):
+        self._size += 1
+        if self._root is None:
+            self._root = [key, [item], {}]
+            return
+        node = self._root
+        while True:
+            dist = self.distance(key, node[0])
+            if dist == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(dist)
+            if child is None:
+                node[2][dist] = [key, [item], {}]
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> List[Tuple[int, Any]]:
+        """返回距离不超过 radius 的 (距离, 条目)，按距离升序"""
+        if self._root is None:
+            return []
+        results = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            dist = self.distance(key, node[0])
+            if dist <= radius:
+                results.extend((dist, item) for item in node[1])
+            for child_dist, child in node[2].items():
+                if dist - radius <= child_dist <= dist + radius:
+                    stack.append(child)
+        results.sort(key=lambda result: result[0])
+        return results
+
+
+# =============================================================================
+# 截图索引
+# =============================================================================
+class ScreenshotIndex:
+    """历史截图/断言图的感知哈希索引
+
+    索引以追加写的JSONL文件保存（每行一张图片：路径、dHash、pHash、时间），
+    多个分片进程可同时追加；每次查询前增量读取其他进程新追加的行，
+    在内存中维护以 screen_key 为键的BK树，支持"是否见过该画面"查询、截图去重和跨运行的视觉回归检索。
+    """
+
+    def __init__(self, file_path: str = None):
+        self.file_path = file_path or os.path.join(BASE_DIR, UIConfig.PHASH_INDEX_FILE)
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self._paths: Dict[str, int] = {}
+        self._offset = 0
+        self.stats = {'lookups': 0, 'hits': 0, 'added': 0, 'deduplicated': 0}
+
+    @staticmethod
+    def path_key(image_path: str) -> str:
+        """路径键：相对项目根目录、统一为正斜杠"""
+        normalized = os.path.normpath(image_path)
+        if os.path.isabs(normalized):
+            try:
+                normalized = os.path.relpath(normalized, BASE_DIR)
+            except ValueError:
+                pass
+        return normalized.replace('\\', '/')
+
+    @staticmethod
+    def resolve(path_key: str) -> str:
+        return path_key if os.path.isabs(path_key) else os.path.join(BASE_DIR, path_key)
+
+    def _refresh_locked(self):
+        """读取索引文件中新追加的行"""
+        try:
+            size = os.path.getsize(self.file_path)
+        except OSError:
+            return
+        if size < self._offset:
+            # 文件被重写（清理/压缩），整体重建
+            self._tree, self._paths, self._offset = BKTree(), {}, 0
+        if size == self._offset:
+            return
+        with open(self.file_path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        end = chunk.rfind(b'\n') + 1  # 只处理完整的行，半行留到下次
+        for line in chunk[:end].splitlines():
+            try:
+                record = json.loads(line)
+                key = (int(record['dhash'], 16) << HASH_BITS) | int(record['phash'], 16)
+            except Exception:
+                continue
+            if record['path'] not in self._paths:
+                self._paths[record['path']] = key
+                self._tree.add(key, record['path'])
+        self._offset += end
+
+    def add(self, image_path: str, image: np.ndarray = None, key: int = None) -> int:
+        """将图片加入索引，返回画面键"""
+        if key is None:
+            if image is None:
+                image = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+                if image is None:
+                    raise ValueError(f"无法读取图片: {image_path}")
+            key = screen_key(image)
+        path_key = self.path_key(image_path)
+        record = {
+            'path': path_key,
+            'dhash': f"{key >> HASH_BITS:016x}",
+            'phash': f"{key & ((1 << HASH_BITS) - 1):016x}",
+            'ts': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with self._lock:
+            self._refresh_locked()
+            if path_key in self._paths:
+                return key
+            directory = os.path.dirname(self.file_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            # 追加写单行（O_APPEND），多进程并发追加不会互相覆盖
+            with open(self.file_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            self._refresh_locked()
+            self.stats['added'] += 1
+        return key
+
+    def find(self, key: int, max_distance: int = 0, existing_only: bool = True) -> List[Tuple[int, str]]:
+        """查找画面键距离不超过 max_distance 的图片，返回 (距离, 路径键)"""
+        with self._lock:
+            self._refresh_locked()
+            results = self._tree.search(key, max_distance)
+            self.stats['lookups'] += 1
+        if existing_only:
+            results = [result for result in results if os.path.exists(self.resolve(result[1]))]
+        if results:
+            self.stats['hits'] += 1
+        return results
+
+    def seen_before(self, image: np.ndarray, max_distance: int = None) -> Optional[str]:
+        """是否见过该画面，返回最相近的历史图片路径键"""
+        distance = UIConfig.PHASH_DEDUP_DISTANCE if max_distance is None else max_distance
+        results = self.find(screen_key(image), distance)
+        return results[0][1] if results else None
+
+    def save_screenshot(self, screenshot_path: str, png_bytes: bytes, dedup: bool = None) -> str:
+        """
+        保存截图并写入索引
+
+        开启去重时，与已有截图的画面键距离不超过 PHASH_DEDUP_DISTANCE 的截图以硬链接指向已有文件，
+        文件名保持不变但不重复占用磁盘。
+
+        Returns:
+            str: 截图路径
+        """
+        dedup = UIConfig.PHASH_DEDUP_SCREENSHOTS if dedup is None else dedup
+        key = screen_key(decode_png(png_bytes))
+        if dedup:
+            results = self.find(key, UIConfig.PHASH_DEDUP_DISTANCE)
+            if results:
+                try:
+                    os.link(self.resolve(results[0][1]), screenshot_path)
+                    self.stats['deduplicated'] += 1
+                    self.add(screenshot_path, key=key)
+                    return screenshot_path
+                except OSError as e:
+                    log_info(f"截图去重硬链接失败，改为写入文件: {screenshot_path}, {e}")
+        with open(screenshot_path, 'wb') as f:
+            f.write(png_bytes)
+        self.add(screenshot_path, key=key)
+        return screenshot_path
+
+    def entries(self) -> Dict[str, int]:
+        """已索引的 {路径键: 画面键}"""
+        with self._lock:
+            self._refresh_locked()
+            return dict(self._paths)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._refresh_locked()
+            return dict(self.stats, indexed=len(self._tree), file=self.file_path)
+
+
+# 全局截图索引实例
+screenshot_index = ScreenshotIndex()
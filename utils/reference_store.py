@@ -0,0 +1,230 @@
+import os
+import threading
+import cv2
+import numpy as np
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from utils.phash import ahash, hamming
+
+# SSIM参数（与原实现一致：11x11高斯窗口，σ=1.5）
+SSIM_WINDOW = (11, 11)
+SSIM_SIGMA = 1.5
+SSIM_C1 = (0.01 * 255) ** 2
+SSIM_C2 = (0.03 * 255) ** 2
+SSIM_MARGIN = SSIM_WINDOW[0] // 2  # ROI外扩的像素数，保证ROI内的高斯窗口与整图计算一致
+
+
+def _blur(image: np.ndarray) -> np.ndarray:
+    return cv2.GaussianBlur(image, SSIM_WINDOW, SSIM_SIGMA)
+
+
+class SSIMMaps:
+    """参考图在某个比较尺寸下的SSIM统计量（float32）"""
+
+    def __init__(self, gray: np.ndarray):
+        self.gray = gray.astype(np.float32)
+        self.mu = _blur(self.gray)
+        self.mu_sq = self.mu * self.mu
+        self.sigma_sq = _blur(self.gray * self.gray) - self.mu_sq
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.gray.shape[1], self.gray.shape[0]
+
+    @property
+    def nbytes(self) -> int:
+        return self.gray.nbytes + self.mu.nbytes + self.mu_sq.nbytes + self.sigma_sq.nbytes
+
+
+class ReferenceImage:
+    """一张参考图及其按需计算的特征：BGR原图、灰度图、平均哈希、各缩放比例下的SSIM统计量"""
+
+    def __init__(self, path: str, image: np.ndarray):
+        self.path = path
+        self.image = image
+        self._gray: Optional[np.ndarray] = None
+        self._hash: Optional[int] = None
+        self._ssim: Dict[float, SSIMMaps] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(宽, 高)"""
+        return self.image.shape[1], self.image.shape[0]
+
+    @property
+    def gray(self) -> np.ndarray:
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.image, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    @property
+    def hash(self) -> int:
+        if self._hash is None:
+            self._hash = ahash(self.gray)
+        return self._hash
+
+    def ssim_maps(self, downscale: float) -> SSIMMaps:
+        with self._lock:
+            maps = self._ssim.get(downscale)
+            if maps is None:
+                maps = self._ssim[downscale] = SSIMMaps(_downscale(self.gray, downscale))
+            return maps
+
+    @property
+    def nbytes(self) -> int:
+        total = self.image.nbytes + (self._gray.nbytes if self._gray is not None else 0)
+        return total + sum(maps.nbytes for maps in list(self._ssim.values()))
+
+
+def _downscale(image: np.ndarray, factor: float) -> np.ndarray:
+    if factor >= 1.0:
+        return image
+    width = max(1, int(round(image.shape[1] * factor)))
+    height = max(1, int(round(image.shape[0] * factor)))
+    return cv2.resize(image, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def _clip_roi(roi: Optional[Dict[str, Any]], size: Tuple[int, int], factor: float) -> Optional[Tuple[int, int, int, int]]:
+    """将参考图坐标系下的ROI换算到比较尺寸并裁剪到图内，返回 (x1, y1, x2, y2)"""
+    if not roi:
+        return None
+    width, height = size
+    x1 = max(0, min(width, int(float(roi.get('x', 0)) * factor)))
+    y1 = max(0, min(height, int(float(roi.get('y', 0)) * factor)))
+    x2 = max(x1, min(width, int(round((float(roi.get('x', 0)) + float(roi.get('width', 0))) * factor))))
+    y2 = max(y1, min(height, int(round((float(roi.get('y', 0)) + float(roi.get('height', 0))) * factor))))
+    if x2 <= x1 or y2 <= y1:
+        raise ValueError(f"ROI不在参考图范围内: {roi}")
+    return x1, y1, x2, y2
+
+
+class ReferenceImageStore:
+    """参考图特征缓存 - 图片断言（MSE/SSIM/感知哈希）共享
+
+    每张参考图只解码一次，灰度图、平均哈希、SSIM所需的均值/方差图按需计算后缓存，
+    源文件修改后自动失效。循环中或多个产品重复断言同一参考图时，每次断言只需处理当前截图一帧。
+    缓存按总字节数做LRU淘汰（REFERENCE_CACHE_MAX_MB）。
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = UIConfig.REFERENCE_CACHE_MAX_MB * 1024 * 1024 if max_bytes is None else max_bytes
+        # {规范化路径: (源文件签名, ReferenceImage)}
+        self._entries: "OrderedDict[str, Tuple[Tuple[float, int], ReferenceImage]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'loads': 0, 'evictions': 0}
+
+    def get(self, reference_path: str) -> ReferenceImage:
+        """获取参考图，读取失败时抛出 FileNotFoundError"""
+        normalized_path = os.path.normpath(reference_path)
+        try:
+            stat = os.stat(normalized_path)
+        except OSError:
+            raise FileNotFoundError(f"无法读取参考图片: {reference_path}")
+        source_sig = (stat.st_mtime, stat.st_size)
+        with self._lock:
+            cached = self._entries.get(normalized_path)
+            if cached and cached[0] == source_sig:
+                self._entries.move_to_end(normalized_path)
+                self.stats['hits'] += 1
+                return cached[1]
+
+        image = cv2.imread(normalized_path)
+        if image is None:
+            raise FileNotFoundError(f"无法读取参考图片: {reference_path}")
+        reference = ReferenceImage(normalized_path, image)
+        with self._lock:
+            self._entries[normalized_path] = (source_sig, reference)
+            self._entries.move_to_end(normalized_path)
+            self.stats['loads'] += 1
+        log_info(f"加载参考图: {normalized_path}, 尺寸 {reference.size[0]}x{reference.size[1]}")
+        return reference
+
+    def _evict(self):
+        with self._lock:
+            total = sum(entry[1].nbytes for entry in self._entries.values())
+            # 至少保留最近使用的一张
+            while total > self.max_bytes and len(self._entries) > 1:
+                _path, (_sig, reference) = self._entries.popitem(last=False)
+                total -= reference.nbytes
+                self.stats['evictions'] += 1
+
+    # =============================================================================
+    # 比较
+    # =============================================================================
+    def mse(self, reference_path: str, frame: np.ndarray) -> float:
+        """均方误差，截图先缩放到参考图尺寸"""
+        reference = self.get(reference_path)
+        if (frame.shape[1], frame.shape[0]) != reference.size:
+            frame = cv2.resize(frame, reference.size)
+        mse = cv2.norm(frame, reference.image, cv2.NORM_L2SQR) / reference.image.size
+        self._evict()
+        return float(mse)
+
+    def ssim(self, reference_path: str, frame: np.ndarray, downscale: float = None,
+             roi: Optional[Dict[str, Any]] = None) -> float:
+        """
+        结构相似性指数（float32）
+
+        Args:
+            reference_path: 参考图路径
+            frame: 当前截图（BGR或灰度），先缩放到参考图尺寸
+            downscale: 比较前的缩小比例 (0, 1]，默认取 UIConfig.SSIM_DOWNSCALE
+            roi: 只评估该区域 {"x", "y", "width", "height"}（参考图像素坐标）
+        """
+        factor = UIConfig.SSIM_DOWNSCALE if downscale is None else float(downscale)
+        factor = min(1.0, max(0.05, factor))
+        reference = self.get(reference_path)
+        maps = reference.ssim_maps(factor)
+
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        if (gray.shape[1], gray.shape[0]) != reference.size:
+            gray = cv2.resize(gray, reference.size)
+        gray = _downscale(gray, factor)
+
+        bounds = _clip_roi(roi, maps.size, factor)
+        if bounds is None:
+            x1, y1, x2, y2 = 0, 0, maps.size[0], maps.size[1]
+            ox1, oy1, ox2, oy2 = x1, y1, x2, y2
+        else:
+            x1, y1, x2, y2 = bounds
+            # 截图按ROI外扩一个窗口半径后再模糊，ROI内结果与整图计算一致
+            ox1, oy1 = max(0, x1 - SSIM_MARGIN), max(0, y1 - SSIM_MARGIN)
+            ox2, oy2 = min(maps.size[0], x2 + SSIM_MARGIN), min(maps.size[1], y2 + SSIM_MARGIN)
+
+        img1 = gray[oy1:oy2, ox1:ox2].astype(np.float32)
+        img2 = maps.gray[oy1:oy2, ox1:ox2]
+        inner = (slice(y1 - oy1, y2 - oy1), slice(x1 - ox1, x2 - ox1))
+        mu1 = _blur(img1)
+        sigma1_sq = (_blur(img1 * img1) - mu1 * mu1)[inner]
+        sigma12 = _blur(img1 * img2)[inner]
+        mu1 = mu1[inner]
+        mu2 = maps.mu[y1:y2, x1:x2]
+        mu1_mu2 = mu1 * mu2
+        sigma12 -= mu1_mu2
+
+        ssim_map = ((2 * mu1_mu2 + SSIM_C1) * (2 * sigma12 + SSIM_C2)) / \
+                   ((mu1 * mu1 + maps.mu_sq[y1:y2, x1:x2] + SSIM_C1) *
+                    (sigma1_sq + maps.sigma_sq[y1:y2, x1:x2] + SSIM_C2))
+        self._evict()
+        return float(ssim_map.mean())
+
+    def hash_distance(self, reference_path: str, frame: np.ndarray) -> int:
+        """平均哈希的汉明距离"""
+        reference = self.get(reference_path)
+        return hamming(ahash(frame), reference.hash)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries),
+                        bytes=sum(entry[1].nbytes for entry in self._entries.values()))
+
+
+# 全局参考图缓存实例
+reference_store = ReferenceImageStore()
@@ -0,0 +1,75 @@
+import gzip
+from flask import request
+from config.ui_config import UIConfig
+
+try:
+    import brotli
+except ImportError:  # 未安装Brotli时只使用gzip
+    brotli = None
+
+# 需要压缩的动态响应类型（静态资源由 static_assets 返回预压缩文件）
+_COMPRESSIBLE_MIMETYPES = {'application/json', 'text/html', 'text/plain', 'text/csv', 'application/javascript'}
+
+
+def _accepted_encodings(header: str) -> dict:
+    """解析 Accept-Encoding，返回 {编码: q值}"""
+    accepted = {}
+    for part in header.split(','):
+        fields = part.strip().split(';')
+        name = fields[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for field in fields[1:]:
+            key, _, value = field.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[name] = quality
+    return accepted
+
+
+def choose_encoding(header: str):
+    """按客户端偏好选择 br/gzip，都不接受时返回None"""
+    accepted = _accepted_encodings(header or '')
+    candidates = ['br', 'gzip'] if brotli is not None else ['gzip']
+    best, best_quality = None, 0.0
+    for encoding in candidates:
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress_response(response):
+    """
+    压缩API响应（after_request钩子）
+
+    只处理超过 API_COMPRESSION_MIN_SIZE 的JSON/HTML等文本响应；文件流（send_file）、已编码、
+    304/206 等响应原样返回。
+    """
+    response.vary.add('Accept-Encoding')
+    if (not UIConfig.API_COMPRESSION_ENABLED or response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 206, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in _COMPRESSIBLE_MIMETYPES):
+        return response
+    data = response.get_data()
+    if len(data) < UIConfig.API_COMPRESSION_MIN_SIZE:
+        return response
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=UIConfig.API_BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        compressed = gzip.compress(data, compresslevel=UIConfig.API_GZIP_LEVEL, mtime=0)
+    else:
+        return response
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    # 压缩后字节与原表示不同，强ETag降为弱ETag（If-None-Match 按弱比较，304 不受影响）
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
@@ -0,0 +1,299 @@
+import os
+import time
+import atexit
+import socket
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Set
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+
+# runs：每个运行中的项目一条，owner 为执行该测试的 worker（主机名:进程号），heartbeat_at 由 owner 定期刷新
+# leases：监督者等单实例任务的租约，过期后由其他 worker 接管
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    project_id INTEGER PRIMARY KEY,
+    execution_id INTEGER,
+    owner TEXT NOT NULL,
+    pid INTEGER,
+    executed_by TEXT NOT NULL DEFAULT '',
+    started_at REAL NOT NULL,
+    heartbeat_at REAL NOT NULL,
+    cancelled INTEGER NOT NULL DEFAULT 0,
+    cancel_type TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS idx_runs_owner ON runs (owner);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+SUPERVISOR_LEASE = 'supervisor'
+
+
+class RunRegistry:
+    """共享运行状态 - 多个 worker 进程通过同一个 SQLite 文件看到全部运行中的测试
+
+    执行测试的 worker 以 claim 登记项目（同一项目同时只能有一个运行），并由心跳线程定期刷新；
+    取消/停止请求可以落在任意 worker 上，只需写入取消标志，所属 worker 在下一次心跳时同步到本地运行句柄并终止进程。
+    心跳超过 RUN_STATE_STALE_SECONDS 未刷新的记录视为所属 worker 已退出，由持有监督者租约的 worker 回收。
+    线程、进程对象只能在创建它的 worker 内使用，仍保存在各 worker 的 running_tests 中。
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.path.join(BASE_DIR, UIConfig.RUN_STATE_DB)
+        self._lock = threading.Lock()
+        self._initialized = False
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._supervisor = False
+
+    @property
+    def worker_id(self) -> str:
+        # 每次按当前进程号计算，gunicorn 预加载后 fork 出的 worker 也有各自的标识
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    # ------------------------------------------------------------------
+    # 数据库
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _ensure_db(self):
+        if self._initialized and os.path.exists(self.db_path):
+            return
+        with self._lock:
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            conn = self._connect()
+            try:
+                conn.execute('PRAGMA journal_mode=WAL')
+                conn.executescript(_SCHEMA)
+            finally:
+                conn.close()
+            self._initialized = True
+
+    @contextmanager
+    def _reader(self):
+        self._ensure_db()
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        self._ensure_db()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+                conn.execute('COMMIT')
+            except Exception:
+                conn.execute('ROLLBACK')
+                raise
+        finally:
+            conn.close()
+
+    def _to_dict(self, row: sqlite3.Row, now: float) -> Dict[str, Any]:
+        run = dict(row)
+        run['cancelled'] = bool(run['cancelled'])
+        run['local'] = run['owner'] == self.worker_id
+        run['stale'] = now - run['heartbeat_at'] > UIConfig.RUN_STATE_STALE_SECONDS
+        return run
+
+    # ------------------------------------------------------------------
+    # 运行记录
+    # ------------------------------------------------------------------
+    def claim(self, project_id: int, executed_by: str = '') -> bool:
+        """登记本 worker 开始执行项目；项目已在其他 worker（心跳未过期）中运行时返回False"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT owner, heartbeat_at FROM runs WHERE project_id = ?', (project_id,)).fetchone()
+            if row is not None and now - row['heartbeat_at'] <= UIConfig.RUN_STATE_STALE_SECONDS:
+                return False
+            if row is not None:
+                log_info(f"项目 {project_id} 的运行记录已过期（worker {row['owner']}），由 {self.worker_id} 接管")
+            conn.execute('INSERT OR REPLACE INTO runs (project_id, owner, executed_by, started_at, heartbeat_at) '
+                         'VALUES (?, ?, ?, ?, ?)', (project_id, self.worker_id, executed_by or '', now, now))
+        return True
+
+    def update(self, project_id: int, execution_id: int = None, pid: int = None):
+        """补充执行ID / 测试进程号"""
+        fields, params = [], []
+        if execution_id is not None:
+            fields.append('execution_id = ?')
+            params.append(execution_id)
+        if pid is not None:
+            fields.append('pid = ?')
+            params.append(pid)
+        if not fields:
+            return
+        with self._transaction() as conn:
+            conn.execute(f"UPDATE runs SET {', '.join(fields)} WHERE project_id = ? AND owner = ?",
+                         (*params, project_id, self.worker_id))
+
+    def release(self, project_id: int, force: bool = False) -> bool:
+        """删除运行记录；默认只删除本 worker 的记录，避免误删其他 worker 接管后的新运行"""
+        with self._transaction() as conn:
+            if force:
+                cursor = conn.execute('DELETE FROM runs WHERE project_id = ?', (project_id,))
+            else:
+                cursor = conn.execute('DELETE FROM runs WHERE project_id = ? AND owner = ?', (project_id, self.worker_id))
+            return cursor.rowcount > 0
+
+    def get(self, project_id: int) -> Optional[Dict[str, Any]]:
+        with self._reader() as conn:
+            row = conn.execute('SELECT * FROM runs WHERE project_id = ?', (project_id,)).fetchone()
+        return self._to_dict(row, time.time()) if row is not None else None
+
+    def list_runs(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._reader() as conn:
+            rows = conn.execute('SELECT * FROM runs ORDER BY started_at').fetchall()
+        return [self._to_dict(row, now) for row in rows]
+
+    def request_cancel(self, project_id: int, cancel_type: str = 'cancel') -> Optional[Dict[str, Any]]:
+        """写入取消标志，返回运行记录；项目不在运行中时返回None"""
+        with self._transaction() as conn:
+            cursor = conn.execute('UPDATE runs SET cancelled = 1, cancel_type = ? WHERE project_id = ?',
+                                  (cancel_type or 'cancel', project_id))
+            if cursor.rowcount == 0:
+                return None
+            row = conn.execute('SELECT * FROM runs WHERE project_id = ?', (project_id,)).fetchone()
+        return self._to_dict(row, time.time())
+
+    def is_cancelled(self, project_id: int) -> bool:
+        with self._reader() as conn:
+            row = conn.execute('SELECT cancelled FROM runs WHERE project_id = ?', (project_id,)).fetchone()
+        return bool(row and row['cancelled'])
+
+    def heartbeat(self) -> Set[int]:
+        """刷新本 worker 全部运行记录的心跳，返回其中已被请求取消的项目ID"""
+        with self._transaction() as conn:
+            conn.execute('UPDATE runs SET heartbeat_at = ? WHERE owner = ?', (time.time(), self.worker_id))
+            rows = conn.execute('SELECT project_id FROM runs WHERE owner = ? AND cancelled = 1',
+                                (self.worker_id,)).fetchall()
+        return {row['project_id'] for row in rows}
+
+    def reap_stale(self) -> List[Dict[str, Any]]:
+        """删除心跳过期（所属 worker 已退出）的运行记录并返回，由调用方修正执行记录状态"""
+        now = time.time()
+        with self._transaction() as conn:
+            rows = conn.execute('SELECT * FROM runs WHERE heartbeat_at < ?',
+                                (now - UIConfig.RUN_STATE_STALE_SECONDS,)).fetchall()
+            for row in rows:
+                conn.execute('DELETE FROM runs WHERE project_id = ? AND heartbeat_at = ?',
+                             (row['project_id'], row['heartbeat_at']))
+        return [self._to_dict(row, now) for row in rows]
+
+    # ------------------------------------------------------------------
+    # 租约（监督者选举）
+    # ------------------------------------------------------------------
+    def acquire_lease(self, name: str, ttl: float) -> bool:
+        """获取或续租；租约被其他 worker 持有且未过期时返回False"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (name,)).fetchone()
+            if row is not None and row['owner'] != self.worker_id and row['expires_at'] > now:
+                return False
+            conn.execute('INSERT OR REPLACE INTO leases (name, owner, expires_at) VALUES (?, ?, ?)',
+                         (name, self.worker_id, now + ttl))
+        return True
+
+    def release_lease(self, name: str):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, self.worker_id))
+
+    @property
+    def is_supervisor(self) -> bool:
+        """本 worker 是否持有监督者租约（只执行一份的后台任务据此判断）"""
+        return self._supervisor
+
+    def get_status(self) -> Dict[str, Any]:
+        with self._reader() as conn:
+            lease = conn.execute('SELECT owner, expires_at FROM leases WHERE name = ?', (SUPERVISOR_LEASE,)).fetchone()
+        return {
+            'worker_id': self.worker_id,
+            'is_supervisor': self._supervisor,
+            'supervisor': dict(lease) if lease is not None else None,
+            'runs': self.list_runs(),
+        }
+
+    # ------------------------------------------------------------------
+    # 心跳线程
+    # ------------------------------------------------------------------
+    def start(self, on_cancel: Callable[[int], None] = None,
+              on_stale: Callable[[Dict[str, Any]], None] = None, interval: float = None):
+        """
+        启动心跳线程（每个 worker 一个，重复调用只启动一个）
+
+        Args:
+            on_cancel: 本 worker 的运行被（任意 worker）请求取消时回调，参数为项目ID
+            on_stale: 作为监督者回收过期运行记录时回调，参数为运行记录
+            interval: 心跳间隔（秒），默认 RUN_STATE_HEARTBEAT_INTERVAL
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        interval = UIConfig.RUN_STATE_HEARTBEAT_INTERVAL if interval is None else interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(on_cancel, on_stale, interval),
+                                        name='run-registry', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        log_info(f"运行状态心跳线程已启动: {self.worker_id}")
+
+    def stop(self):
+        """停止心跳并交出监督者租约，其他 worker 下一次心跳即可接管"""
+        self._stop.set()
+        if self._supervisor:
+            self._supervisor = False
+            try:
+                self.release_lease(SUPERVISOR_LEASE)
+            except Exception:
+                pass
+
+    def _loop(self, on_cancel, on_stale, interval: float):
+        while not self._stop.is_set():
+            try:
+                for project_id in self.heartbeat():
+                    if on_cancel:
+                        on_cancel(project_id)
+                was_supervisor = self._supervisor
+                self._supervisor = self.acquire_lease(SUPERVISOR_LEASE, UIConfig.RUN_SUPERVISOR_LEASE_SECONDS)
+                if self._supervisor and not was_supervisor:
+                    log_info(f"worker {self.worker_id} 成为监督者")
+                if self._supervisor:
+                    for run in self.reap_stale():
+                        log_info(f"回收过期运行记录: 项目 {run['project_id']}，worker {run['owner']}")
+                        if on_stale:
+                            on_stale(run)
+            except Exception as e:
+                log_info(f"运行状态心跳失败: {e}")
+            self._stop.wait(interval)
+
+
+class LocalRunTable(dict):
+    """本 worker 的运行句柄表（project_id -> 线程、进程对象等）
+
+    句柄只在本进程有效；删除记录即表示本 worker 上的运行结束，同时释放共享运行状态中的记录。
+    """
+
+    def __delitem__(self, project_id):
+        super().__delitem__(project_id)
+        try:
+            run_registry.release(project_id)
+        except Exception as e:
+            log_info(f"释放项目 {project_id} 的运行记录失败: {e}")
+
+
+# 全局运行状态实例
+run_registry = RunRegistry()
@@ -0,0 +1,182 @@
+try:
+    import mss
+except Exception:
+    # 未安装mss时退回pyautogui截屏
+    mss = None
+try:
+    import pyautogui
+except Exception:
+    # 无头/无显示环境下pyautogui不可用，相关兜底路径会被配置关闭
+    pyautogui = None
+import os
+import sys
+import time
+import asyncio
+import threading
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from utils.vision_executor import vision_executor
+
+Region = Tuple[int, int, int, int]  # (left, top, width, height)，与pyautogui的region一致
+
+
+class ScreenGrab:
+    """一次屏幕截取结果（BGR），记录其在屏幕坐标系中的位置"""
+
+    def __init__(self, image: np.ndarray, left: int, top: int, full: bool):
+        self.image = image
+        self.left = left
+        self.top = top
+        self.full = full
+        self.ts = time.monotonic()
+
+    def crop(self, region: Optional[Region]) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """
+        从本次截取中裁出请求区域
+
+        Returns:
+            Optional[Tuple]: (区域图像, 区域左上角屏幕坐标)；区域不完全在本次截取范围内时返回None
+        """
+        if region is None:
+            return (self.image, (self.left, self.top)) if self.full else None
+        left, top, width, height = region
+        x1, y1 = left - self.left, top - self.top
+        img_h, img_w = self.image.shape[:2]
+        if x1 < 0 or y1 < 0 or x1 + width > img_w or y1 + height > img_h:
+            return None
+        return self.image[y1:y1 + height, x1:x1 + width], (left, top)
+
+
+def union_region(regions: List[Optional[Region]]) -> Optional[Region]:
+    """多个区域的外接矩形，任一请求为全屏时返回None"""
+    if not regions or any(region is None for region in regions):
+        return None
+    left = min(region[0] for region in regions)
+    top = min(region[1] for region in regions)
+    right = max(region[0] + region[2] for region in regions)
+    bottom = max(region[1] + region[3] for region in regions)
+    return (left, top, right - left, bottom - top)
+
+
+class ScreenCaptureService:
+    """屏幕截取服务 - pyautogui兜底识别共用的截屏后端
+
+    同一节拍（SCREEN_GRAB_TICK）内多个任务的截屏请求合并为一次，
+    按所有请求区域的外接矩形截取后分别裁剪返回；刚截取的画面在 SCREEN_GRAB_MAX_AGE 内可直接复用。
+    优先使用mss（Linux下为XShm/XGetImage，可在Xvfb中运行），未安装时退回pyautogui截屏。
+    """
+
+    def __init__(self, tick: float = None, max_age: float = None):
+        self.tick = UIConfig.SCREEN_GRAB_TICK if tick is None else tick
+        self.max_age = UIConfig.SCREEN_GRAB_MAX_AGE if max_age is None else max_age
+        # mss实例不能跨线程使用，每个线程按显示各建一个
+        self._local = threading.local()
+        # 待合并的请求：{(显示, 事件循环): [(区域, future)]}
+        self._pending: Dict[Tuple[str, int], List[Tuple[Optional[Region], asyncio.Future]]] = {}
+        self._last: Dict[str, ScreenGrab] = {}
+        self.stats = {'requests': 0, 'grabs': 0, 'coalesced': 0, 'reused': 0, 'failures': 0}
+
+    @property
+    def backend(self) -> Optional[str]:
+        if mss is not None:
+            return 'mss'
+        if pyautogui is not None:
+            return 'pyautogui'
+        return None
+
+    def available(self) -> bool:
+        return self.backend is not None
+
+    async def grab(self, region: Optional[Region] = None,
+                   display: str = None) -> Optional[Tuple[np.ndarray, Tuple[int, int]]]:
+        """
+        截取屏幕区域
+
+        Args:
+            region: (left, top, width, height)，为空时截取全屏
+            display: X显示（如 :99），为空时使用当前 DISPLAY 环境变量
+
+        Returns:
+            Optional[Tuple]: (区域图像BGR, 区域左上角屏幕坐标)，截屏不可用时返回None
+        """
+        if not self.available():
+            return None
+        display = display if display is not None else os.environ.get('DISPLAY', '')
+        self.stats['requests'] += 1
+
+        last = self._last.get(display)
+        if last is not None and time.monotonic() - last.ts <= self.max_age:
+            cropped = last.crop(region)
+            if cropped is not None:
+                self.stats['reused'] += 1
+                return cropped
+
+        loop = asyncio.get_running_loop()
+        key = (display, id(loop))
+        future = loop.create_future()
+        pending = self._pending.setdefault(key, [])
+        pending.append((region, future))
+        if len(pending) == 1:
+            loop.call_later(self.tick, lambda: asyncio.ensure_future(self._flush(key)))
+        else:
+            self.stats['coalesced'] += 1
+        return await future
+
+    async def _flush(self, key: Tuple[str, int]):
+        pending = self._pending.pop(key, [])
+        if not pending:
+            return
+        display = key[0]
+        region = union_region([item[0] for item in pending])
+        try:
+            grab = await vision_executor.run(self._grab_sync, region, display, task_id='screen_capture')
+            self._last[display] = grab
+            self.stats['grabs'] += 1
+            for requested, future in pending:
+                if not future.done():
+                    future.set_result(grab.crop(requested))
+        except Exception as e:
+            self.stats['failures'] += 1
+            log_info(f"屏幕截取失败: 显示={display or '默认'}, 区域={region}, {e}")
+            for _requested, future in pending:
+                if not future.done():
+                    future.set_result(None)
+
+    def _get_mss(self, display: str):
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+        sct = instances.get(display)
+        if sct is None:
+            if sys.platform.startswith('linux') and display:
+                sct = mss.mss(display=display)
+            else:
+                sct = mss.mss()
+            instances[display] = sct
+        return sct
+
+    def _grab_sync(self, region: Optional[Region], display: str) -> ScreenGrab:
+        """同步截屏（在视觉线程池中执行）"""
+        if mss is not None:
+            sct = self._get_mss(display)
+            if region is None:
+                monitor = sct.monitors[0]  # 所有显示器的外接区域
+            else:
+                monitor = {'left': region[0], 'top': region[1], 'width': region[2], 'height': region[3]}
+            shot = sct.grab(monitor)
+            image = np.ascontiguousarray(np.asarray(shot)[:, :, :3])  # BGRA -> BGR
+            return ScreenGrab(image, monitor['left'], monitor['top'], region is None)
+
+        shot = pyautogui.screenshot(region=region) if region else pyautogui.screenshot()
+        image = np.ascontiguousarray(np.asarray(shot.convert('RGB'))[:, :, ::-1])
+        left, top = (region[0], region[1]) if region else (0, 0)
+        return ScreenGrab(image, left, top, region is None)
+
+    def get_stats(self) -> Dict[str, int]:
+        return dict(self.stats, backend=self.backend)
+
+
+# 全局屏幕截取服务实例
+screen_capture = ScreenCaptureService()
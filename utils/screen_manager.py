@@ -1,9 +1,15 @@
-import pyautogui
 from typing import Tuple, List, Dict
 import asyncio
 import math
+import os
 import platform
 import ctypes
+from config.ui_config import UIConfig
+try:
+    import pyautogui
+except Exception:
+    # 无头/无显示环境（如未设置DISPLAY的Linux）下pyautogui不可用
+    pyautogui = None
 
 class ScreenManager:
     """屏幕管理器 - 负责检测显示器尺寸和分配浏览器位置"""
@@ -38,6 +44,15 @@ class ScreenManager:
     
     def _init_screen_info(self):
         """初始化屏幕信息"""
+        if not UIConfig.uses_real_screen():
+            # 无头/虚拟显示模式：布局基于固定视口或虚拟显示尺寸，不探测物理屏幕
+            if UIConfig.is_headless():
+                self.screen_width = int(UIConfig.HEADLESS_VIEWPORT['width'])
+                self.screen_height = int(UIConfig.HEADLESS_VIEWPORT['height'])
+            else:
+                self.screen_width, self.screen_height = (int(v) for v in UIConfig.VIRTUAL_DISPLAY_SIZE)
+            print(f"📺 执行模式 {UIConfig.EXECUTION_MODE}，使用虚拟屏幕尺寸: {self.screen_width} x {self.screen_height}")
+            return
         try:
             # 使进程DPI感知，优先使用每显示器感知V2；失败则退化
             if platform.system() == 'Windows':
@@ -100,7 +115,7 @@ class ScreenManager:
     def _init_monitors(self):
         """枚举所有显示器，并提取主显示器的工作区域（不含任务栏）。"""
         self.monitors = []
-        if platform.system() != 'Windows':
+        if platform.system() != 'Windows' or not UIConfig.uses_real_screen():
             # 非Windows：仅使用单主屏的工作区等于全屏
             self.primary_work_left = 0
             self.primary_work_top = 0
@@ -181,7 +196,7 @@ class ScreenManager:
     
     def _update_frame_compensation_from_system_metrics(self):
         """通过系统度量自动推算窗口边框与标题栏占用像素，确保网格步长准确。仅在Windows生效。"""
-        if platform.system() != 'Windows':
+        if platform.system() != 'Windows' or not UIConfig.uses_real_screen():
             return
         user32 = ctypes.windll.user32
         try:
@@ -288,6 +303,10 @@ class ScreenManager:
         if browser_count <= 0:
             raise ValueError("浏览器数量必须为正整数")
         
+        # 无头/虚拟显示模式：每个浏览器独占整块（虚拟）屏幕，不做分屏
+        if not UIConfig.uses_real_screen():
+            return [(0, 0)] * browser_count
+        
         positions = []
         
         # 主显示器基准
@@ -316,6 +335,32 @@ class ScreenManager:
         
         return positions
     
+    def get_shard_indices(self, browser_count: int) -> List[int]:
+        """
+        获取当前进程负责的浏览器序号（分片执行）
+        
+        分片进程由调度器通过环境变量 UI_SHARD_INDEX / UI_SHARD_COUNT 指定，
+        按连续区间均分全部浏览器；未分片时返回全部序号。
+        窗口位置仍按全部浏览器数量统一布局，保证不同分片进程的窗口互不重叠。
+        
+        Args:
+            browser_count: 测试文件中的浏览器总数
+            
+        Returns:
+            List[int]: 当前进程需要执行的浏览器序号（从0开始）
+        """
+        try:
+            shard_count = int(os.environ.get('UI_SHARD_COUNT', '1'))
+            shard_index = int(os.environ.get('UI_SHARD_INDEX', '0'))
+        except ValueError:
+            shard_count, shard_index = 1, 0
+        if shard_count <= 1 or not 0 <= shard_index < shard_count:
+            return list(range(browser_count))
+        base, extra = divmod(browser_count, shard_count)
+        start = shard_index * base + min(shard_index, extra)
+        end = start + base + (1 if shard_index < extra else 0)
+        return list(range(start, end))
+    
     def get_browser_args(self, position: Tuple[int, int], browser_count: int) -> List[str]:
         """
         根据位置和浏览器数量生成浏览器启动参数
@@ -336,6 +381,22 @@ class ScreenManager:
             "--no-first-run",
             "--no-default-browser-check"
         ]
+        if UIConfig.is_headless():
+            # 无头模式：窗口尺寸与固定视口一致，无需定位
+            return [
+                f"--window-size={self.screen_width},{self.screen_height}",
+                *common_args,
+            ]
+        if UIConfig.uses_virtual_display():
+            # 虚拟显示模式：为该浏览器分配独立的Xvfb显示并铺满
+            from utils.virtual_display import virtual_display_allocator
+            display = virtual_display_allocator.acquire()
+            return [
+                f"--display={display}",
+                "--window-position=0,0",
+                f"--window-size={self.screen_width},{self.screen_height}",
+                *common_args,
+            ]
         if browser_count == 1:
             return [
                 "--start-maximized",
@@ -352,8 +413,52 @@ class ScreenManager:
                 *common_args,
             ]
     
+    def release_browser_args(self, browser_args: List[str]):
+        """
+        回收 get_browser_args 为该浏览器占用的资源（虚拟显示模式下释放其Xvfb显示）
+
+        浏览器关闭后调用；非虚拟显示模式或重复调用时不做任何事。
+        """
+        for arg in browser_args or []:
+            if arg.startswith("--display="):
+                from utils.virtual_display import virtual_display_allocator
+                virtual_display_allocator.release(arg.split("=", 1)[1])
+    
+    def get_launch_options(self, browser_args: List[str]) -> Dict:
+        """
+        根据执行模式生成 chromium.launch 的参数
+        
+        Args:
+            browser_args: get_browser_args 生成的浏览器启动参数
+            
+        Returns:
+            Dict: 可直接解包传给 p.chromium.launch(**options) 的参数
+        """
+        return {
+            'headless': UIConfig.is_headless(),
+            'args': list(browser_args or []),
+        }
+    
+    def get_context_options(self) -> Dict:
+        """
+        根据执行模式生成 browser.new_context 的参数
+        
+        无头模式使用固定视口和DPR，保证截图尺寸与模板尺度稳定；
+        其余模式沿用窗口尺寸作为视口。
+        """
+        if UIConfig.is_headless():
+            return {
+                'viewport': dict(UIConfig.HEADLESS_VIEWPORT),
+                'device_scale_factor': UIConfig.HEADLESS_DEVICE_SCALE_FACTOR,
+            }
+        return {'no_viewport': True}
+    
     def print_layout_info(self, browser_count: int):
         """打印布局信息"""
+        if not UIConfig.uses_real_screen():
+            print(f"\n📐 执行模式 {UIConfig.EXECUTION_MODE}: {browser_count} 个浏览器实例各自独占 "
+                  f"{self.screen_width}x{self.screen_height} 的{'视口' if UIConfig.is_headless() else '虚拟显示'}")
+            return
         positions = self.get_browser_positions(browser_count)
         print(f"\n📐 浏览器布局信息 (共 {browser_count} 个实例):")
         print("=" * 50)
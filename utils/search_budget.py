@@ -0,0 +1,115 @@
+import time
+import asyncio
+from typing import Any, Dict, Optional
+from config.ui_config import UIConfig
+
+
+class SearchBudget:
+    """图片查找预算 - 由最外层调用创建一次，并逐层传给 HybridImageManager 和 ImageRecognition
+
+    预算包含截止时间、最大截图帧数和退避策略。各层不再各自重试和睡眠，
+    只在同一份预算内取帧、匹配、退避；截止时间一到立即返回，不会出现多层重试相乘的情况。
+    """
+
+    def __init__(self, timeout: float, max_frames: int = None, base_delay: float = None,
+                 max_delay: float = None, backoff_factor: float = None, label: str = ''):
+        self.timeout = max(0.0, float(timeout))
+        self.max_frames = max_frames if max_frames is not None else UIConfig.IMAGE_SEARCH_MAX_FRAMES
+        self.base_delay = base_delay if base_delay is not None else UIConfig.IMAGE_SEARCH_BACKOFF_BASE
+        self.max_delay = max_delay if max_delay is not None else UIConfig.IMAGE_SEARCH_BACKOFF_MAX
+        self.backoff_factor = backoff_factor if backoff_factor is not None else UIConfig.IMAGE_SEARCH_BACKOFF_FACTOR
+        self.label = label
+        self.started = time.monotonic()
+        self.deadline = self.started + self.timeout
+        self.frames_used = 0
+        self.backoffs = 0
+        self.sleep_time = 0.0
+        # 整屏模板匹配尝试过的尺度数（由 ImageRecognition 累计，用于运行指标）
+        self.scales_tried = 0
+
+    @classmethod
+    def from_config(cls, timeout: float = None, label: str = '') -> 'SearchBudget':
+        """按配置创建预算，timeout 为空时使用 UIConfig.IMAGE_SEARCH_TIMEOUT"""
+        return cls(timeout if timeout is not None else UIConfig.IMAGE_SEARCH_TIMEOUT, label=label)
+
+    def remaining(self) -> float:
+        """剩余时间（秒）"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.deadline
+
+    def frames_left(self) -> bool:
+        return self.max_frames is None or self.frames_used < self.max_frames
+
+    def can_continue(self) -> bool:
+        """是否还能继续取帧匹配"""
+        return not self.expired() and self.frames_left()
+
+    def consume_frame(self) -> bool:
+        """
+        占用一帧截图配额
+
+        Returns:
+            bool: 预算内返回True；已超时或帧数用尽返回False，调用方应立即放弃
+        """
+        if not self.can_continue():
+            return False
+        self.frames_used += 1
+        return True
+
+    def cap(self, seconds: float) -> float:
+        """将某个子操作的超时时间限制在剩余预算之内"""
+        return max(0.0, min(float(seconds), self.remaining()))
+
+    async def backoff(self) -> bool:
+        """
+        按退避策略等待下一次尝试，等待时间不会超过截止时间
+
+        Returns:
+            bool: 等待后仍可继续返回True，否则返回False
+        """
+        if not self.can_continue():
+            return False
+        delay = min(self.max_delay, self.base_delay * (self.backoff_factor ** self.backoffs))
+        delay = self.cap(delay)
+        self.backoffs += 1
+        if delay > 0:
+            await asyncio.sleep(delay)
+            self.sleep_time += delay
+        return self.can_continue()
+
+    def exhausted_reason(self) -> Optional[str]:
+        if self.expired():
+            return 'deadline'
+        if not self.frames_left():
+            return 'max_frames'
+        return None
+
+    def report(self) -> Dict[str, Any]:
+        """本次调用的预算使用情况"""
+        elapsed = self.elapsed()
+        return {
+            'label': self.label,
+            'timeout': self.timeout,
+            'elapsed': round(elapsed, 3),
+            'used_ratio': round(elapsed / self.timeout, 3) if self.timeout else 1.0,
+            'frames_used': self.frames_used,
+            'max_frames': self.max_frames,
+            'backoffs': self.backoffs,
+            'sleep_time': round(self.sleep_time, 3),
+            'scales_tried': self.scales_tried,
+            'exhausted': self.exhausted_reason(),
+        }
+
+    def summary(self) -> str:
+        """用于日志的简短描述"""
+        report = self.report()
+        text = (f"耗时 {report['elapsed']:.2f}s/{report['timeout']:.2f}s, "
+                f"截图 {report['frames_used']}/{report['max_frames']} 帧, 退避 {report['backoffs']} 次")
+        if report['exhausted']:
+            text += f", 预算耗尽({report['exhausted']})"
+        return text
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+
+class SessionVault:
+    """登录会话保管库 - 按 (产品地址, 账号) 保存登录成功后的 Playwright storage_state
+
+    每个会话一个JSON文件（Auth_Data/sessions/<键>.json），包含地址、账号、保存/过期时间和 storage_state。
+    步骤解释器创建浏览器上下文时带上未过期的会话并跳过登录/注册步骤，会话失效时自动回退到真实登录。
+    会话文件包含Cookie等登录凭据，不纳入版本控制。
+    """
+
+    def __init__(self, directory: str = None):
+        self.directory = directory or os.path.join(BASE_DIR, UIConfig.SESSION_VAULT_DIR)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def session_key(address: str, email: str) -> str:
+        raw = f"{(address or '').strip()}|{(email or '').strip().lower()}"
+        return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+    def _path(self, address: str, email: str) -> str:
+        return os.path.join(self.directory, f"{self.session_key(address, email)}.json")
+
+    def _read(self, file_path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else None
+        except (OSError, ValueError):
+            return None
+
+    def load(self, address: str, email: str) -> Optional[Dict[str, Any]]:
+        """读取未过期的会话，返回 storage_state；不存在或已过期时返回None"""
+        if not email:
+            return None
+        file_path = self._path(address, email)
+        data = self._read(file_path)
+        if not data or not isinstance(data.get('storage_state'), dict):
+            return None
+        if float(data.get('expires_at', 0)) <= time.time():
+            log_info(f"登录会话已过期: {address} / {email}")
+            self._remove(file_path)
+            return None
+        return data['storage_state']
+
+    def save(self, address: str, email: str, storage_state: Dict[str, Any], ttl: float = None):
+        """保存会话（原子替换），ttl 默认取 UIConfig.SESSION_TTL（秒）"""
+        if not email or not isinstance(storage_state, dict):
+            return
+        ttl = UIConfig.SESSION_TTL if ttl is None else ttl
+        now = time.time()
+        record = {
+            'address': (address or '').strip(),
+            'email': (email or '').strip(),
+            'saved_at': now,
+            'expires_at': now + float(ttl),
+            'storage_state': storage_state,
+        }
+        file_path = self._path(address, email)
+        tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f, ensure_ascii=False)
+            os.replace(tmp_path, file_path)
+
+    def invalidate(self, address: str, email: str):
+        """会话失效（登录态被服务端清除等）时删除"""
+        self._remove(self._path(address, email))
+
+    def _remove(self, file_path: str):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+    def list_sessions(self) -> List[Dict[str, Any]]:
+        """列出全部会话（不含 storage_state 内容）"""
+        sessions = []
+        if not os.path.isdir(self.directory):
+            return sessions
+        now = time.time()
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith('.json'):
+                continue
+            data = self._read(os.path.join(self.directory, name))
+            if not data:
+                continue
+            state = data.get('storage_state') or {}
+            sessions.append({
+                'address': data.get('address', ''),
+                'email': data.get('email', ''),
+                'saved_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(float(data.get('saved_at', 0)))),
+                'expires_in': max(0, int(float(data.get('expires_at', 0)) - now)),
+                'cookies': len(state.get('cookies', []) or []),
+                'origins': len(state.get('origins', []) or []),
+            })
+        return sessions
+
+    def clear(self, address: str = None, email: str = None) -> int:
+        """删除会话：同时指定地址和账号时只删除该会话，只指定地址时删除该地址下全部会话，否则全部删除"""
+        if address and email:
+            file_path = self._path(address, email)
+            existed = os.path.exists(file_path)
+            self._remove(file_path)
+            return int(existed)
+        removed = 0
+        if not os.path.isdir(self.directory):
+            return removed
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            file_path = os.path.join(self.directory, name)
+            if address:
+                data = self._read(file_path) or {}
+                if data.get('address', '') != address.strip():
+                    continue
+            self._remove(file_path)
+            removed += 1
+        return removed
+
+
+# 全局会话保管库实例
+session_vault = SessionVault()
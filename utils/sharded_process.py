@@ -0,0 +1,115 @@
+import os
+import subprocess
+import tempfile
+from typing import Dict, List, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+
+
+def plan_shards(product_count: int, shard_size: int = None, max_processes: int = None) -> int:
+    """
+    根据产品数量计算分片进程数
+
+    Args:
+        product_count: 测试文件中的产品（浏览器）数量
+        shard_size: 每个进程负责的产品数，默认取 UIConfig.SHARD_SIZE，<=0 表示不分片
+        max_processes: 最多启动的进程数，默认取 UIConfig.MAX_SHARD_PROCESSES
+
+    Returns:
+        int: 分片进程数，1 表示不分片
+    """
+    shard_size = UIConfig.SHARD_SIZE if shard_size is None else shard_size
+    max_processes = UIConfig.MAX_SHARD_PROCESSES if max_processes is None else max_processes
+    if shard_size <= 0 or product_count <= shard_size:
+        return 1
+    shard_count = -(-product_count // shard_size)  # 向上取整
+    return max(1, min(shard_count, max_processes))
+
+
+class ShardedProcessGroup:
+    """分片进程组 - 将多个分片pytest进程包装为与 subprocess.Popen 兼容的单个对象
+
+    running_tests 中的监控、取消、超时逻辑只依赖 poll/wait/terminate/kill/returncode/pid，
+    用本对象替换单个进程后无需改动这些逻辑。各分片的输出写入临时文件，
+    避免多个管道同时写满导致的死锁，结束后由 communicate 按分片顺序合并。
+    """
+
+    def __init__(self, command: List[str], shard_count: int, env: Dict[str, str] = None):
+        self.shard_count = shard_count
+        self.processes: List[subprocess.Popen] = []
+        self._outputs: List[Tuple] = []
+        base_env = dict(env if env is not None else os.environ)
+        for shard_index in range(shard_count):
+            shard_env = dict(base_env)
+            shard_env['UI_SHARD_INDEX'] = str(shard_index)
+            shard_env['UI_SHARD_COUNT'] = str(shard_count)
+            stdout_file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+            stderr_file = tempfile.TemporaryFile(mode='w+', encoding='utf-8')
+            process = subprocess.Popen(command, stdout=stdout_file, stderr=stderr_file, text=True, env=shard_env)
+            self.processes.append(process)
+            self._outputs.append((stdout_file, stderr_file))
+            log_info(f"启动分片进程 {shard_index + 1}/{shard_count}, PID: {process.pid}")
+
+    @property
+    def pid(self) -> Optional[int]:
+        """返回第一个仍在运行的分片进程PID（全部结束时返回第一个进程PID）"""
+        for process in self.processes:
+            if process.poll() is None:
+                return process.pid
+        return self.processes[0].pid if self.processes else None
+
+    @property
+    def returncode(self) -> Optional[int]:
+        """全部分片结束后返回合并的返回码：全部成功为0，否则为第一个非0返回码"""
+        codes = [process.returncode for process in self.processes]
+        if any(code is None for code in codes):
+            return None
+        return next((code for code in codes if code != 0), 0)
+
+    @property
+    def failed_shards(self) -> List[int]:
+        """返回码非0的分片序号（从1开始），用于父进程汇总最终状态"""
+        return [shard_index + 1 for shard_index, process in enumerate(self.processes)
+                if process.returncode not in (None, 0)]
+
+    def poll(self) -> Optional[int]:
+        for process in self.processes:
+            process.poll()
+        return self.returncode
+
+    def wait(self, timeout: float = None) -> int:
+        for process in self.processes:
+            process.wait(timeout=timeout)
+        return self.returncode
+
+    def send_signal(self, sig):
+        for process in self.processes:
+            if process.poll() is None:
+                process.send_signal(sig)
+
+    def terminate(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.terminate()
+
+    def kill(self):
+        for process in self.processes:
+            if process.poll() is None:
+                process.kill()
+
+    def communicate(self, timeout: float = None) -> Tuple[str, str]:
+        """等待全部分片结束并按分片顺序合并输出"""
+        self.wait(timeout=timeout)
+        stdout_parts, stderr_parts = [], []
+        for shard_index, (process, (stdout_file, stderr_file)) in enumerate(zip(self.processes, self._outputs)):
+            header = f"=== 分片 {shard_index + 1}/{self.shard_count} (PID {process.pid}, 返回码 {process.returncode}) ==="
+            stdout_file.seek(0)
+            stderr_file.seek(0)
+            stdout_parts.append(f"{header}\n{stdout_file.read()}")
+            stderr = stderr_file.read()
+            if stderr:
+                stderr_parts.append(f"{header}\n{stderr}")
+            stdout_file.close()
+            stderr_file.close()
+        self._outputs = []
+        return '\n'.join(stdout_parts), '\n'.join(stderr_parts)
@@ -0,0 +1,186 @@
+import os
+import re
+import hashlib
+import mimetypes
+import threading
+from typing import Dict, Optional, Tuple
+from flask import request, send_file, make_response, abort
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+# 页面中引用本地静态资源的 src/href（外链、data:、模板表达式不处理）
+_ASSET_REF_PATTERN = re.compile(
+    r'''(?P<prefix>\b(?:src|href)=)(?P<quote>["'])(?P<url>(?!https?:|//|data:|\{\{)[^"'?#\s]+'''
+    r'''\.(?:js|css|png|jpe?g|gif|svg|ico|webp|woff2?))(?P=quote)''', re.IGNORECASE)
+
+# Windows注册表可能把 .js/.css 映射为 text/plain，固定为标准类型
+mimetypes.add_type('application/javascript', '.js')
+mimetypes.add_type('text/css', '.css')
+
+# 预压缩文件后缀，按优先级排列
+_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class StaticAssets:
+    """静态资源与图片的缓存控制 - 内容指纹、强ETag与条件请求、预压缩文件
+
+    启动时为 static/ 下的资源计算内容指纹（sha256前16位），页面中引用的 css/js/图片改写为 ?v=<指纹>，
+    模板中的 url_for('static') 也自动带上指纹；带正确指纹的请求返回一年的 immutable 缓存，
+    其余请求（页面本身、不带指纹的资源和截图/模板图片）返回 no-cache + 强ETag，浏览器每次以条件请求校验，
+    内容未变时得到304。存在更新的 .br/.gz 预压缩文件且客户端接受时直接返回压缩文件（见 scripts/compress_static.py）。
+    指纹按文件的修改时间和大小缓存，文件变化后自动重新计算。
+    """
+
+    def __init__(self, static_dir: str = None):
+        self.static_dir = static_dir or os.path.join(BASE_DIR, 'static')
+        self._digests: Dict[str, Tuple[int, int, str]] = {}
+        self._pages: Dict[str, Tuple[Tuple[int, int], str]] = {}
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # 内容指纹
+    # ------------------------------------------------------------------
+    def digest(self, file_path: str) -> Optional[str]:
+        """文件内容指纹，文件不存在时返回None"""
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        cached = self._digests.get(file_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+        sha256 = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                sha256.update(chunk)
+        value = sha256.hexdigest()[:16]
+        with self._lock:
+            self._digests[file_path] = (stat.st_mtime_ns, stat.st_size, value)
+        return value
+
+    def _static_path(self, filename: str) -> Optional[str]:
+        file_path = os.path.normpath(os.path.join(self.static_dir, filename))
+        if os.path.commonpath([file_path, os.path.normpath(self.static_dir)]) != os.path.normpath(self.static_dir):
+            return None
+        return file_path
+
+    def version(self, filename: str) -> Optional[str]:
+        """static/ 下资源的指纹（filename 相对 static/）"""
+        file_path = self._static_path(filename)
+        return self.digest(file_path) if file_path else None
+
+    def build_manifest(self) -> int:
+        """启动时预先计算全部静态资源的指纹（上传目录与预压缩文件除外），返回资源数"""
+        count = 0
+        for root, dirs, files in os.walk(self.static_dir):
+            dirs[:] = [d for d in dirs if d != 'uploads']
+            for name in files:
+                if name.endswith(('.br', '.gz')):
+                    continue
+                self.digest(os.path.join(root, name))
+                count += 1
+        log_info(f"静态资源指纹已生成: {count} 个文件")
+        return count
+
+    # ------------------------------------------------------------------
+    # 页面改写
+    # ------------------------------------------------------------------
+    def render_page(self, filename: str) -> Tuple[bytes, str]:
+        """读取 static/ 下的页面，资源引用加上 ?v=<指纹>，返回 (内容, ETag)"""
+        file_path = self._static_path(filename)
+        stat = os.stat(file_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._pages.get(file_path)
+        if cached and cached[0] == signature:
+            source = cached[1]
+        else:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                source = f.read()
+            with self._lock:
+                self._pages[file_path] = (signature, source)
+        base_dir = os.path.dirname(filename)
+
+        def add_version(match):
+            url = match.group('url')
+            if url.startswith('/static/'):
+                relative = url[len('/static/'):]
+            elif url.startswith('/'):
+                return match.group(0)
+            else:
+                relative = os.path.join(base_dir, url)
+            version = self.version(relative)
+            if not version:
+                return match.group(0)
+            quote = match.group('quote')
+            return f"{match.group('prefix')}{quote}{url}?v={version}{quote}"
+
+        # 引用的资源变化时页面内容随之变化，ETag按改写结果计算
+        rendered = _ASSET_REF_PATTERN.sub(add_version, source).encode('utf-8')
+        return rendered, hashlib.sha256(rendered).hexdigest()[:16]
+
+    # ------------------------------------------------------------------
+    # 响应
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _cache_headers(response, digest: Optional[str]):
+        if digest and request.args.get('v') == digest:
+            response.headers['Cache-Control'] = f'public, max-age={UIConfig.STATIC_IMMUTABLE_MAX_AGE}, immutable'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        response.headers.pop('Expires', None)
+        response.headers.pop('Pragma', None)
+        return response
+
+    @staticmethod
+    def _accepted_encodings():
+        header = request.headers.get('Accept-Encoding', '')
+        return {part.split(';')[0].strip().lower() for part in header.split(',') if part.strip()}
+
+    def send_static(self, filename: str):
+        """/static/<filename> 视图"""
+        file_path = self._static_path(filename)
+        if not file_path or not os.path.isfile(file_path):
+            abort(404)
+        if filename.lower().endswith('.html'):
+            rendered, etag = self.render_page(filename)
+            response = make_response(rendered)
+            response.mimetype = 'text/html'
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+
+        digest = self.digest(file_path)
+        mimetype = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        if UIConfig.STATIC_PRECOMPRESSED:
+            accepted = self._accepted_encodings()
+            mtime = os.path.getmtime(file_path)
+            for encoding, suffix in _ENCODINGS:
+                variant = file_path + suffix
+                if encoding in accepted and os.path.isfile(variant) and os.path.getmtime(variant) >= mtime:
+                    response = send_file(variant, mimetype=mimetype, etag=f"{digest}-{encoding}", conditional=True)
+                    response.headers['Content-Encoding'] = encoding
+                    response.vary.add('Accept-Encoding')
+                    return self._cache_headers(response, digest)
+        response = send_file(file_path, mimetype=mimetype, etag=digest, conditional=True)
+        if UIConfig.STATIC_PRECOMPRESSED:
+            response.vary.add('Accept-Encoding')
+        return self._cache_headers(response, digest)
+
+    def send_image(self, file_path: str, mimetype: str = None, digest: str = None):
+        """
+        返回图片：强ETag + 条件请求；带 ?v=<指纹> 且与内容一致时返回 immutable 缓存
+
+        Args:
+            file_path: 图片文件路径
+            mimetype: MIME类型，为空时按扩展名推断
+            digest: 已知的内容指纹（如产物存储对象的sha256），为空时按内容计算
+        """
+        digest = digest or self.digest(file_path)
+        mimetype = mimetype or mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
+        response = send_file(file_path, mimetype=mimetype, etag=digest, conditional=True)
+        return self._cache_headers(response, digest)
+
+
+# 全局静态资源实例
+static_assets = StaticAssets()
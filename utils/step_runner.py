@@ -0,0 +1,507 @@
+import asyncio
+import contextlib
+import textwrap
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from playwright.async_api import async_playwright
+from config.logger import log_info
+from config.ui_config import UIConfig
+from utils.screen_manager import screen_manager
+from utils.session_vault import session_vault
+from utils.metrics import browser_launch_seconds
+from utils.ui_operations import UIOperations
+try:
+    import allure
+except Exception:
+    # 未安装allure时只执行步骤，不生成报告步骤
+    allure = None
+
+# 浏览器被用户关闭时统一抛出的异常信息，调度器据此区分用户中断与测试失败
+BROWSER_CLOSED_ERROR = "BROWSER_CLOSED_BY_USER"
+BROWSER_CLOSED_KEYWORDS = ['target closed', 'browser has been closed', 'disconnected', 'session closed']
+
+# 需要额外参数（input_value）的Web操作事件
+VALUE_EVENTS = {'input', 'select_option', 'press_key', 'drag_and_drop'}
+
+# UI断言类型 -> (UIOperations方法名, 是否需要期望值, 期望值转换)
+UI_ASSERTIONS = {
+    'exists': ('elem_assert_exists', False, None),
+    'visible': ('elem_assert_visible', False, None),
+    'text_contains': ('elem_assert_text_contains', True, None),
+    'attribute_match': ('elem_assert_attribute_match', True, lambda v: v if ':' in v else None),
+    'element_count': ('elem_assert_count', True, lambda v: int(v) if v.isdigit() else None),
+}
+
+# 图片断言类型 -> (UIOperations方法名, 阈值参数名, 默认值, 显示名称)
+IMAGE_ASSERTIONS = {
+    'template_match': ('image_assert_template_match', 'confidence', 0.8, '模板匹配'),
+    'mse': ('image_assert_mse', 'threshold', 100.0, 'MSE比较'),
+    'ssim': ('image_assert_ssim', 'threshold', 0.8, 'SSIM比较'),
+    'perceptual_hash': ('image_assert_perceptual_hash', 'threshold', 10.0, '感知哈希比较'),
+}
+
+StepAction = Callable[[UIOperations], Awaitable[Any]]
+
+
+def _allure_step(title: str):
+    """allure步骤上下文，未安装allure时退化为空上下文"""
+    return allure.step(title) if allure else contextlib.nullcontext()
+
+
+def _is_browser_closed_error(error: Exception) -> bool:
+    error_msg = str(error).lower()
+    return any(keyword in error_msg for keyword in BROWSER_CLOSED_KEYWORDS)
+
+
+def _safe_int(value, default: int, minimum: int) -> int:
+    try:
+        return max(minimum, int(value))
+    except (ValueError, TypeError):
+        return default
+
+
+def resolve_step_credentials(test_steps: List[Dict], product_addresses: List[Tuple[str, str]]) -> List[Dict[int, Tuple[str, str]]]:
+    """
+    为每个产品的登录/注册步骤分配账号
+
+    与生成代码的规则一致：按地址收集 accounts / address_credentials / address_credentials_list
+    中匹配的账号，同一地址出现多次时轮询分配；没有匹配时使用 address_credentials_list 的第一个。
+    结果只由步骤和产品顺序决定，分片执行时各进程分配到的账号相同。
+
+    Returns:
+        List[Dict[int, Tuple[str, str]]]: 每个产品一个字典，步骤序号 -> (email, password)
+    """
+    address_account_counters: Dict[str, int] = {}
+    all_credentials = []
+    for _, product_address in product_addresses:
+        current_addr = (product_address or '').strip()
+        credentials = {}
+        for index, step in enumerate(test_steps):
+            if step.get('operation_type', 'web') != 'web' or step.get('operation_event') not in ('login', 'register'):
+                continue
+            auth_cfg = step.get('auth_config', {}) or {}
+            address_account_counters.setdefault(current_addr, 0)
+
+            all_matching_accounts = []
+            for acc in auth_cfg.get('accounts', []) or []:
+                addr = (acc.get('address') or '').strip()
+                if addr and current_addr.startswith(addr):
+                    all_matching_accounts.append(acc)
+            if isinstance(auth_cfg.get('address_credentials'), dict):
+                for key, value in auth_cfg.get('address_credentials', {}).items():
+                    key = (key or '').strip()
+                    if key and current_addr.startswith(key):
+                        all_matching_accounts.append({'address': key, **(value or {})})
+            addr_list = auth_cfg.get('address_credentials_list', []) or []
+            for addr_cred in addr_list:
+                addr_cred_address = ((addr_cred or {}).get('address') or '').strip()
+                if addr_cred_address and current_addr.startswith(addr_cred_address):
+                    all_matching_accounts.append(addr_cred)
+
+            email, password = '', ''
+            if all_matching_accounts:
+                account_index = address_account_counters[current_addr] % len(all_matching_accounts)
+                selected_account = all_matching_accounts[account_index]
+                email = selected_account.get('email', '')
+                password = selected_account.get('password', '')
+                address_account_counters[current_addr] += 1
+            elif isinstance(addr_list, list) and addr_list:
+                email = (addr_list[0] or {}).get('email', '')
+                password = (addr_list[0] or {}).get('password', '')
+
+            if step.get('operation_event') == 'login':
+                # 登录步骤上显式填写的账号优先
+                email = step.get('email', '') or email
+                password = step.get('password', '') or password
+            credentials[index] = (email, password)
+        all_credentials.append(credentials)
+    return all_credentials
+
+
+class StepRunner:
+    """步骤解释器 - 直接执行项目保存的 test_steps JSON，替代逐步展开生成的测试代码
+
+    构造时把每个步骤预编译为一个异步动作（参数解析、方法分派、断言和截图计划都在此完成），
+    运行时只依次调用这些动作；多个产品共享同一份步骤定义，只各自持有账号等差异参数。
+    """
+
+    def __init__(self, test_steps: List[Dict], product_address: str = '', task_id: str = 'step_runner',
+                 credentials: Dict[int, Tuple[str, str]] = None):
+        self.task_id = task_id
+        self.product_address = product_address or ''
+        self.test_steps = list(test_steps or [])
+        self._credentials = credentials or {}
+        # 会话复用：以第一个带账号且配置了 logged_in_selector 的登录/注册步骤的账号作为本产品的会话账号
+        # （没有登录后元素就无法确认登录态，这类步骤始终执行真实登录）
+        self._session_email = next((email for index, (email, _password) in sorted(self._credentials.items())
+                                    if email and self._logged_in_selector(index)), '')
+        self._session_restored = False
+        self._session_verified = False
+        self._actions: List[StepAction] = [self._compile_step(i, step) for i, step in enumerate(self.test_steps)]
+        log_info(f"[{self.task_id}] 步骤预编译完成，共 {len(self._actions)} 个步骤")
+
+    # =============================================================================
+    # 预编译
+    # =============================================================================
+    def _compile_step(self, index: int, step: Dict) -> StepAction:
+        operation_type = step.get('operation_type', 'web')
+        if operation_type == 'web':
+            return self._compile_web_step(index, step)
+        if operation_type == 'game':
+            return self._compile_game_step(index, step)
+
+        async def skip(_ui_operations):
+            log_info(f"[{self.task_id}] 跳过不支持的操作类型: {operation_type}")
+        return skip
+
+    def _logged_in_selector(self, index: int) -> str:
+        """登录/注册步骤配置的登录后元素定位参数（auth_config.logged_in_selector）"""
+        if index >= len(self.test_steps):
+            return ''
+        auth_cfg = self.test_steps[index].get('auth_config', {}) or {}
+        return (auth_cfg.get('logged_in_selector', '') or '').strip()
+
+    def _compile_operation(self, index: int, step: Dict, operation_params: str) -> StepAction:
+        """根据操作事件解析出具体的 UIOperations 方法与参数"""
+        operation_event = step.get('operation_event', 'click')
+        auth_cfg = step.get('auth_config', {}) or {}
+        email, password = self._credentials.get(index, ('', ''))
+
+        if operation_event == 'login':
+            args = (auth_cfg.get('email_selector', ''), auth_cfg.get('password_selector', ''),
+                    auth_cfg.get('submit_selector', ''), email, password)
+            return lambda ui_operations: ui_operations.elem_login(*args)
+        if operation_event == 'register':
+            kwargs = {
+                'email_selector': auth_cfg.get('email_selector', ''),
+                'password_selector': auth_cfg.get('password_selector', ''),
+                'repeat_password_selector': auth_cfg.get('repeat_password_selector', ''),
+                'submit_selector': auth_cfg.get('submit_selector', ''),
+                'email': email,
+                'password': password,
+            }
+            return lambda ui_operations: ui_operations.elem_register(**kwargs)
+
+        method = getattr(UIOperations, f"elem_{operation_event}", None)
+        if method is None:
+            raise ValueError(f"步骤{index + 1} 不支持的操作事件: {operation_event}")
+        if operation_event in VALUE_EVENTS:
+            input_value = step.get('input_value', '')
+            return lambda ui_operations: method(ui_operations, operation_params, input_value)
+        return lambda ui_operations: method(ui_operations, operation_params)
+
+    def _compile_assertions(self, index: int, step: Dict) -> List[Tuple[str, StepAction]]:
+        """预编译步骤的UI断言、图片断言和自定义断言"""
+        if step.get('assertion_enabled', 'no') != 'yes':
+            return []
+        step_no = index + 1
+        assertion_config = step.get('assertion_config', {}) or {}
+        compiled = []
+
+        for assertion in assertion_config.get('ui_assertions', []) or []:
+            spec = UI_ASSERTIONS.get(assertion.get('type', ''))
+            target_element = assertion.get('target_element', '')
+            if not spec or not target_element:
+                continue
+            method_name, needs_value, convert = spec
+            args = [target_element]
+            if needs_value:
+                expected_value = assertion.get('expected_value', '')
+                expected_value = convert(expected_value) if (convert and expected_value) else expected_value
+                if expected_value in ('', None):
+                    continue
+                args.append(expected_value)
+            method = getattr(UIOperations, method_name)
+            compiled.append((f"测试步骤{step_no}: UI断言 - {assertion.get('type')}",
+                             lambda ui_operations, m=method, a=tuple(args): m(ui_operations, *a)))
+
+        for assertion in assertion_config.get('image_assertions', []) or []:
+            spec = IMAGE_ASSERTIONS.get(assertion.get('method', ''))
+            image_path = (assertion.get('image_path', '') or '').lstrip('/')
+            if not spec or not image_path:
+                continue
+            method_name, value_name, default_value, label = spec
+            raw_value = assertion.get(value_name, '')
+            kwargs = {value_name: float(raw_value) if raw_value else default_value}
+            if assertion.get('screenshot_area') and value_name == 'threshold':
+                kwargs['screenshot_area'] = assertion.get('screenshot_area')
+            if method_name == 'image_assert_ssim':
+                if assertion.get('downscale'):
+                    kwargs['downscale'] = float(assertion.get('downscale'))
+                if assertion.get('roi'):
+                    kwargs['roi'] = assertion.get('roi')
+            method = getattr(UIOperations, method_name)
+            compiled.append((f"测试步骤{step_no}: 图片断言 - {label}",
+                             lambda ui_operations, m=method, p=image_path, k=kwargs: m(ui_operations, p, **k)))
+
+        for assertion in assertion_config.get('custom_assertions', []) or []:
+            assertion_name = assertion.get('name', '')
+            target_element = assertion.get('target_element', '')
+            expected_result = assertion.get('expected_result', '')
+            snippet = assertion.get('code', '') or ''
+            title = f"测试步骤{step_no}: 自定义断言 - {assertion_name}"
+            if target_element and expected_result:
+                compiled.append((title, lambda ui_operations, t=target_element, e=expected_result:
+                                 ui_operations.elem_custom_assert(t, e)))
+            elif snippet.strip():
+                compiled.append((title, self._compile_custom_snippet(step_no, snippet)))
+        return compiled
+
+    def _compile_custom_snippet(self, step_no: int, snippet: str) -> StepAction:
+        """将自定义断言脚本编译为异步函数，脚本中可使用 ui_operations / page / task_id"""
+        source = "async def _custom_assertion(ui_operations, page, task_id):\n" + \
+                 textwrap.indent(textwrap.dedent(snippet), '    ') + "\n    return None\n"
+        namespace = {'asyncio': asyncio, 'log_info': log_info}
+        exec(compile(source, f"<custom_assertion step {step_no}>", 'exec'), namespace)
+        custom_assertion = namespace['_custom_assertion']
+        return lambda ui_operations: custom_assertion(ui_operations, ui_operations.page, self.task_id)
+
+    def _compile_web_step(self, index: int, step: Dict) -> StepAction:
+        step_no = index + 1
+        step_name = step.get('step_name', f'step_{step_no}')
+        operation_event = step.get('operation_event', 'click')
+        auth_cfg = step.get('auth_config', {}) or {}
+        operation_params = (step.get('operation_params', '') or auth_cfg.get('email_selector', '') or
+                            auth_cfg.get('password_selector', '') or auth_cfg.get('submit_selector', ''))
+        operation_count = _safe_int(step.get('operation_count', 1), 1, 1)
+        pause_time = _safe_int(step.get('pause_time', 1), 1, 0)
+        tab_target_url = (step.get('tab_target_url', '') or '').strip()
+        tab_switch = step.get('tab_switch_enabled', 'no') == 'yes' and bool(tab_target_url)
+        is_auth = operation_event in ('login', 'register')
+        auth_email = self._credentials.get(index, ('', ''))[0] if is_auth else ''
+        logged_in_selector = self._logged_in_selector(index) if is_auth else ''
+
+        screenshot_enabled = str(step.get('screenshot_enabled', 'NO')).upper() == 'YES'
+        screenshot_timing = (step.get('screenshot_config') or {}).get('timing') or 'after'
+        shot_before = screenshot_enabled and screenshot_timing in ('before', 'both')
+        shot_after = screenshot_enabled and screenshot_timing in ('after', 'both')
+        shot_failure = screenshot_enabled and screenshot_timing == 'on_failure'
+
+        operation = self._compile_operation(index, step, operation_params)
+        assertions = self._compile_assertions(index, step)
+        task_id = self.task_id
+
+        async def run(ui_operations: UIOperations):
+            with _allure_step(f"测试步骤{step_no}: {step_name}"):
+                log_info(f"开始测试步骤{step_no} {step_name} 的操作==============")
+
+                if tab_switch:
+                    log_info(f"[{task_id}] 正在打开新标签页: {tab_target_url}")
+                    await ui_operations.open_new_tab_and_navigate(tab_target_url)
+                    await ui_operations.get_all_tabs()
+                    with _allure_step(f"测试步骤{step_no}: 公共断言URL是否存在"):
+                        await ui_operations.url_assert_exists(tab_target_url)
+                    await ui_operations.wait_for_settle(timeout=1)
+
+                if is_auth and await self._reuse_session(ui_operations, logged_in_selector, auth_email):
+                    log_info(f"[{task_id}] 登录会话有效，跳过{operation_event}步骤: {auth_email}")
+                    return
+
+                # 公共断言方法，断言元素是否存在
+                with _allure_step(f"测试步骤{step_no}: 公共断言元素是否存在"):
+                    await ui_operations.elem_assert_exists(operation_params)
+
+                for title, assertion in assertions:
+                    with _allure_step(title):
+                        await assertion(ui_operations)
+
+                if shot_before:
+                    with _allure_step(f"测试步骤{step_no}: 步骤前截图"):
+                        await ui_operations.page_screenshot(task_id, f"test_step_{step_no}_before")
+
+                with _allure_step(f"测试步骤{step_no}: {step_name} - {operation_event} 操作 ({operation_params})"):
+                    await asyncio.sleep(pause_time)
+
+                succeeded = False
+                for attempt in range(operation_count):
+                    if await ui_operations.is_browser_closed():
+                        log_info("检测到浏览器已关闭，测试被用户中断")
+                        raise Exception(BROWSER_CLOSED_ERROR)
+                    try:
+                        log_info(f"[{task_id}] 执行第{attempt + 1}次操作: {operation_event} on {operation_params}")
+                        await operation(ui_operations)
+                        await ui_operations.wait_for_settle(timeout=1)
+                        succeeded = True
+                    except Exception as e:
+                        if _is_browser_closed_error(e):
+                            log_info("检测到浏览器连接异常，可能被用户关闭")
+                            raise Exception(BROWSER_CLOSED_ERROR)
+                        log_info(f"[{task_id}]第{attempt + 1}次操作失败")
+                        if attempt == operation_count - 1:
+                            log_info("所有操作均失败！")
+                            if shot_failure:
+                                with _allure_step(f"测试步骤{step_no}: 操作失败截图"):
+                                    await ui_operations.page_screenshot(task_id, f"test_step_{step_no}_failure")
+                await ui_operations.wait_for_settle(timeout=1)
+
+                if is_auth and succeeded and logged_in_selector:
+                    # 提交后确认登录后元素可见才保存会话，避免把未登录的状态当作会话保存
+                    if await ui_operations.elem_is_visible(logged_in_selector, UIConfig.SESSION_CHECK_TIMEOUT):
+                        self._session_verified = auth_email == self._session_email
+                        await self._save_session(ui_operations, auth_email)
+                    else:
+                        log_info(f"[{task_id}] {operation_event}后未出现登录后元素，不保存会话: {auth_email}")
+
+                if shot_after:
+                    with _allure_step(f"测试步骤{step_no}: 步骤后截图"):
+                        await ui_operations.page_screenshot(task_id, f"test_step_{step_no}_after")
+        return run
+
+    def _compile_game_step(self, index: int, step: Dict) -> StepAction:
+        step_no = index + 1
+        step_name = step.get('step_name', f'step_{step_no}')
+        operation_event = step.get('operation_event', 'click')
+        img_path = (step.get('operation_params', '') or '').replace('\\', '/')
+        operation_count = _safe_int(step.get('operation_count', 1), 1, 1)
+        pause_time = _safe_int(step.get('pause_time', 1), 1, 0)
+        is_open = step.get('blocker_enabled') == 'yes'
+        # 步骤可单独指定识别引擎（template/feature/auto），为空时按模板配置选择
+        engine = step.get('match_engine') or None
+        task_id = self.task_id
+
+        async def run(ui_operations: UIOperations):
+            with _allure_step(f"{step_name} - 游戏图片{operation_event} 操作 ({img_path})"):
+                await asyncio.sleep(1)
+                # 游戏操作前先滚动页面确保图片可见
+                await ui_operations.page_mouse_scroll(delta_x=0, delta_y=1500)
+                await asyncio.sleep(7)
+                # 执行游戏图片操作 operation_count 次（每次都点击，任意一次未找到图片即失败）
+                for attempt in range(operation_count):
+                    if await ui_operations.is_browser_closed():
+                        log_info(f"[{task_id}] 检测到浏览器已关闭，{task_id} 测试被用户中断")
+                        raise Exception(BROWSER_CLOSED_ERROR)
+                    log_info(f"[{task_id}] 执行第{attempt + 1}次图片操作: {operation_event} on {img_path}")
+                    await asyncio.sleep(pause_time)
+                    success = await ui_operations.click_image_with_fallback(
+                        img_path, confidence=0.7, timeout=10, is_open=is_open, engine=engine)
+                    if not success:
+                        log_info(f"[{task_id}] 第{attempt + 1}次尝试：没有找到图片 {img_path}")
+                        raise Exception(f"图片定位失败：无法找到图片 {img_path}")
+                    log_info(f"[{task_id}] 第{attempt + 1}次操作完成")
+                    await ui_operations.wait_for_settle(timeout=1)
+        return run
+
+    # =============================================================================
+    # 登录会话复用
+    # =============================================================================
+    def _load_session(self) -> Optional[Dict]:
+        """读取本产品会话账号未过期的 storage_state，用于创建浏览器上下文"""
+        self._session_restored = False
+        self._session_verified = False
+        if not UIConfig.SESSION_REUSE_ENABLED or not self._session_email:
+            return None
+        storage_state = session_vault.load(self.product_address, self._session_email)
+        if storage_state is not None:
+            self._session_restored = True
+            log_info(f"[{self.task_id}] 恢复登录会话: {self.product_address} / {self._session_email}")
+        return storage_state
+
+    async def _reuse_session(self, ui_operations: UIOperations, logged_in_selector: str, email: str) -> bool:
+        """
+        已恢复会话时检查登录态：有效则跳过登录/注册步骤，失效则删除会话并回退到真实登录
+
+        只有 auth_config.logged_in_selector（仅登录后可见的元素）在 SESSION_CHECK_TIMEOUT 内可见才视为有效；
+        登录表单未出现不能说明已登录（页面可能只是还没渲染出表单）。
+        """
+        if not self._session_restored or not email or email != self._session_email or not logged_in_selector:
+            return False
+        valid = await ui_operations.elem_is_visible(logged_in_selector, UIConfig.SESSION_CHECK_TIMEOUT)
+        self._session_verified = valid
+        if not valid:
+            log_info(f"[{self.task_id}] 登录会话已失效，回退到真实登录: {email}")
+            session_vault.invalidate(self.product_address, email)
+            self._session_restored = False
+        return valid
+
+    async def _save_session(self, ui_operations: UIOperations, email: str):
+        """登录/注册成功后保存会话"""
+        if not UIConfig.SESSION_REUSE_ENABLED or not email:
+            return
+        try:
+            storage_state = await ui_operations.page.context.storage_state()
+            session_vault.save(self.product_address, email, storage_state)
+            log_info(f"[{self.task_id}] 已保存登录会话: {self.product_address} / {email}")
+        except Exception as e:
+            log_info(f"[{self.task_id}] 保存登录会话失败: {e}")
+
+    # =============================================================================
+    # 执行
+    # =============================================================================
+    async def run_steps(self, ui_operations: UIOperations):
+        """在已打开的页面上依次执行全部步骤"""
+        for action in self._actions:
+            await action(ui_operations)
+
+    async def run(self, browser_args: List[str]):
+        """
+        启动独立的浏览器实例并执行全部步骤（与生成代码中每个产品的测试函数等价）
+
+        Args:
+            browser_args: screen_manager.get_browser_args 生成的浏览器启动参数
+        """
+        task_id = self.task_id
+        async with async_playwright() as p:
+            browser = None
+            context = None
+            page = None
+            try:
+                with browser_launch_seconds.time():
+                    browser = await p.chromium.launch(**screen_manager.get_launch_options(browser_args))
+                context_options = screen_manager.get_context_options()
+                storage_state = self._load_session()
+                if storage_state is not None:
+                    context_options['storage_state'] = storage_state
+                context = await browser.new_context(**context_options)
+                page = await context.new_page()
+                ui_operations = UIOperations(page, task_id=task_id)
+
+                await ui_operations.navigate_to(self.product_address)
+                if await ui_operations.is_browser_closed():
+                    log_info(f"[{task_id}] 检测到浏览器已关闭，{task_id} 测试无法继续")
+                    raise Exception(BROWSER_CLOSED_ERROR)
+
+                await self.run_steps(ui_operations)
+
+                await asyncio.sleep(2)
+                if await ui_operations.is_browser_closed():
+                    log_info(f"检测到浏览器已关闭，{task_id} 无法截图")
+                    raise Exception(BROWSER_CLOSED_ERROR)
+                await ui_operations.page_screenshot(task_id, f"over_test_test_step_{len(self._actions)}")
+                if self._session_verified:
+                    # 已确认登录态的会话跑完全部步骤，刷新保存的Cookie和有效期
+                    await self._save_session(ui_operations, self._session_email)
+
+                stats = ui_operations.get_image_stats()
+                log_info(f"[{task_id}] 图片识别统计: 截图识别成功 {stats['screenshot_success']} 次, "
+                         f"pyautogui成功 {stats['pyautogui_success']} 次, "
+                         f"总成功率 {stats['success_rate']:.2%}")
+                log_info(f"[{task_id}] {task_id} 完成")
+            except Exception:
+                log_info(f"[{task_id}] {task_id} 失败")
+                raise
+            finally:
+                if page:
+                    await page.close()
+                if context:
+                    await context.close()
+                if browser:
+                    await browser.close()
+                # 释放该浏览器占用的虚拟显示
+                screen_manager.release_browser_args(browser_args)
+
+
+def build_step_runners(test_steps: List[Dict], product_addresses: List[Tuple[str, str]],
+                       task_ids: Optional[List[str]] = None) -> List[StepRunner]:
+    """
+    为每个产品地址构建预编译的步骤解释器
+
+    Args:
+        test_steps: 项目保存的测试步骤
+        product_addresses: [(product_id, product_address), ...]
+        task_ids: 每个产品的任务ID，生成的测试文件中与测试函数名一致
+    """
+    task_ids = task_ids or [f"step_runner_{i+1}" for i in range(len(product_addresses))]
+    credentials = resolve_step_credentials(test_steps, product_addresses)
+    return [
+        StepRunner(test_steps, product_address, task_id=task_id, credentials=product_credentials)
+        for (_, product_address), task_id, product_credentials in zip(product_addresses, task_ids, credentials)
+    ]
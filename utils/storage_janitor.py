@@ -0,0 +1,299 @@
+import os
+import re
+import json
+import time
+import fnmatch
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+# 从项目配置、执行日志中提取被引用的文件名（图片、测试文件）
+_FILE_NAME_PATTERN = re.compile(r'[\w\-.]+\.(?:png|jpe?g|webp|gif|bmp|py)', re.IGNORECASE)
+
+
+class StorageJanitor:
+    """存储清理器 - 按目录的容量上限和保留天数定时清理截图、日志、生成的测试文件和上传图片
+
+    每个目录的文件列表（大小、修改时间、inode）保存在索引文件中：目录修改时间未变时直接复用索引，不再逐个stat；
+    目录有变化时只对新增或被替换（inode变化，如日志轮转改名）的文件stat，这些目录中的文件写入后不再修改。
+    被活跃项目引用的文件（项目图片、步骤/断言配置中的图片、活跃项目的测试文件）和最近N次执行开始后
+    产生的文件一律不删除，容量超限时从最旧的可删除文件开始清理。
+    """
+
+    def __init__(self, index_file: str = None, rules: List[Dict[str, Any]] = None):
+        self.index_file = index_file or os.path.join(BASE_DIR, UIConfig.JANITOR_INDEX_FILE)
+        self.rules = rules if rules is not None else UIConfig.JANITOR_RULES
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, Any]] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.last_report: Optional[Dict[str, Any]] = None
+
+    # ------------------------------------------------------------------
+    # 增量索引
+    # ------------------------------------------------------------------
+    def _load_index(self) -> Dict[str, Any]:
+        if self._index is None:
+            try:
+                with open(self.index_file, 'r', encoding='utf-8') as f:
+                    self._index = json.load(f)
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+        tmp_path = f"{self.index_file}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._index, f, ensure_ascii=False)
+        os.replace(tmp_path, self.index_file)
+
+    def scan(self, directory: str) -> Dict[str, List[float]]:
+        """
+        返回目录下的文件 {文件名: [大小, 修改时间, inode]}（不递归）
+
+        目录修改时间与索引一致时不访问磁盘；否则列目录，只对新增或被替换的文件stat，已删除的文件移出索引。
+        """
+        abs_dir = os.path.join(BASE_DIR, directory)
+        index = self._load_index()
+        try:
+            dir_mtime = os.stat(abs_dir).st_mtime_ns
+        except OSError:
+            index.pop(directory, None)
+            return {}
+        entry = index.get(directory)
+        if entry and entry.get('mtime_ns') == dir_mtime:
+            return entry['files']
+        old_files = entry['files'] if entry else {}
+        files = {}
+        with os.scandir(abs_dir) as it:
+            for item in it:
+                try:
+                    cached = old_files.get(item.name)
+                    if cached and cached[2] == item.inode():
+                        files[item.name] = cached
+                        continue
+                    if not item.is_file(follow_symlinks=False):
+                        continue
+                    stat = item.stat(follow_symlinks=False)
+                except OSError:
+                    continue
+                files[item.name] = [stat.st_size, stat.st_mtime, stat.st_ino]
+        index[directory] = {'mtime_ns': dir_mtime, 'files': files}
+        return files
+
+    # ------------------------------------------------------------------
+    # 引用保护
+    # ------------------------------------------------------------------
+    @staticmethod
+    def _parse_time(value) -> Optional[float]:
+        if value is None:
+            return None
+        if hasattr(value, 'timestamp'):
+            return value.timestamp()
+        try:
+            return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S').timestamp()
+        except ValueError:
+            return None
+
+    def collect_protected(self) -> Tuple[Set[str], Set[str], Optional[float]]:
+        """
+        Returns:
+            (被引用的文件名, 平台生成过的测试文件名, 最近N次执行中最早的开始时间)
+        """
+        from config.database import get_db_connection_with_retry
+        from utils.db_adapter import adapt_query_placeholders, execute_query_with_results
+
+        referenced: Set[str] = set()
+        generated: Set[str] = set()
+        protect_since = None
+        with get_db_connection_with_retry() as conn:
+            for row in execute_query_with_results(conn, adapt_query_placeholders(
+                    "SELECT test_steps, assertion_config, screenshot_config FROM automation_projects")):
+                for value in row:
+                    referenced.update(_FILE_NAME_PATTERN.findall(str(value or '')))
+            for row in execute_query_with_results(conn, adapt_query_placeholders(
+                    "SELECT product_image FROM projects")):
+                referenced.update(_FILE_NAME_PATTERN.findall(str(row[0] or '')))
+            for row in execute_query_with_results(conn, adapt_query_placeholders(
+                    "SELECT file_name, is_active FROM project_files")):
+                generated.add(row[0])
+                if row[1]:
+                    referenced.add(row[0])
+            recent = execute_query_with_results(conn, adapt_query_placeholders(
+                "SELECT start_time, detailed_log FROM automation_executions ORDER BY id DESC LIMIT ?"),
+                (int(UIConfig.JANITOR_RECENT_EXECUTIONS),))
+            for row in recent:
+                referenced.update(_FILE_NAME_PATTERN.findall(str(row[1] or '')))
+                started = self._parse_time(row[0])
+                if started is not None:
+                    protect_since = started if protect_since is None else min(protect_since, started)
+        return referenced, generated, protect_since
+
+    # ------------------------------------------------------------------
+    # 清理
+    # ------------------------------------------------------------------
+    def _clean_rule(self, rule: Dict[str, Any], referenced: Set[str], generated: Set[str],
+                    protect_since: Optional[float], now: float, dry_run: bool) -> Dict[str, Any]:
+        directory = os.path.normpath(rule['dir'])
+        files = self.scan(directory)
+        patterns = rule.get('patterns') or ['*']
+        matched = [(name, size, mtime) for name, (size, mtime, _inode) in files.items()
+                   if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+        total = sum(size for _name, size, _mtime in matched)
+
+        def deletable(name, mtime):
+            if name in referenced:
+                return False
+            if rule.get('generated_only') and name not in generated:
+                return False
+            return protect_since is None or mtime < protect_since
+
+        candidates = sorted((mtime, name, size) for name, size, mtime in matched if deletable(name, mtime))
+        to_delete = []
+        max_age_days = rule.get('max_age_days')
+        if max_age_days is not None:
+            cutoff = now - max_age_days * 86400
+            to_delete = [item for item in candidates if item[0] < cutoff]
+        max_mb = rule.get('max_mb')
+        if max_mb is not None:
+            remaining = total - sum(size for _mtime, _name, size in to_delete)
+            for item in candidates[len(to_delete):]:
+                if remaining <= max_mb * 1024 * 1024:
+                    break
+                to_delete.append(item)
+                remaining -= item[2]
+
+        deleted, reclaimed = [], 0
+        for _mtime, name, size in to_delete:
+            if not dry_run:
+                try:
+                    os.remove(os.path.join(BASE_DIR, directory, name))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    log_info(f"清理文件失败: {os.path.join(directory, name)}, {e}")
+                    continue
+                files.pop(name, None)
+            deleted.append(os.path.join(directory, name).replace('\\', '/'))
+            reclaimed += size
+        if deleted and not dry_run:
+            # 删除文件改变了目录修改时间，同步到索引，下次不必重新列目录
+            try:
+                self._index[directory]['mtime_ns'] = os.stat(os.path.join(BASE_DIR, directory)).st_mtime_ns
+            except (OSError, KeyError):
+                pass
+        return {
+            'dir': directory.replace('\\', '/'),
+            'files': len(matched),
+            'bytes': total,
+            'protected': len(matched) - len(candidates),
+            'deleted': len(deleted),
+            'reclaimed_bytes': reclaimed,
+            'deleted_files': deleted,
+        }
+
+    def run(self, dry_run: bool = False, only: str = None, max_age_days: int = None) -> Dict[str, Any]:
+        """
+        执行一次清理
+
+        Args:
+            dry_run: 只统计不删除
+            only: 只清理该目录（如 IMG_LOGS/IMA_ASSERT）
+            max_age_days: 覆盖该次清理的保留天数
+
+        Returns:
+            清理报告（各目录文件数、保护数、删除数、释放字节数）
+        """
+        start = time.perf_counter()
+        now = time.time()
+        with self._lock:
+            referenced, generated, protect_since = self.collect_protected()
+            rules = self.rules
+            if only:
+                rules = [rule for rule in rules if os.path.normpath(rule['dir']) == os.path.normpath(only)]
+            results = []
+            for rule in rules:
+                if max_age_days is not None:
+                    rule = dict(rule, max_age_days=max_age_days)
+                try:
+                    results.append(self._clean_rule(rule, referenced, generated, protect_since, now, dry_run))
+                except Exception as e:
+                    log_info(f"清理目录失败: {rule.get('dir')}, {e}")
+            self._save_index()
+
+            artifacts = None
+            if not only and not dry_run:
+                artifacts = self._clean_artifacts(results, protect_since, now)
+
+        report = {
+            'dry_run': dry_run,
+            'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'elapsed': round(time.perf_counter() - start, 3),
+            'protect_since': datetime.fromtimestamp(protect_since).strftime('%Y-%m-%d %H:%M:%S') if protect_since else None,
+            'deleted': sum(r['deleted'] for r in results),
+            'reclaimed_bytes': sum(r['reclaimed_bytes'] for r in results) + (artifacts or {}).get('freed_bytes', 0),
+            'directories': results,
+            'artifacts': artifacts,
+        }
+        if not dry_run:
+            self.last_report = report
+        log_info(f"存储清理完成{'（试运行）' if dry_run else ''}: 删除 {report['deleted']} 个文件，"
+                 f"释放 {report['reclaimed_bytes'] / 1024 / 1024:.1f}MB，耗时 {report['elapsed']}s")
+        return report
+
+    @staticmethod
+    def _clean_artifacts(results: List[Dict[str, Any]], protect_since: Optional[float], now: float) -> Dict[str, Any]:
+        """产物存储：删除已清理文件的路径映射和过期的截图映射，再回收无引用的对象"""
+        from utils.artifact_store import artifact_store
+        forgotten = artifact_store.forget([path for r in results for path in r['deleted_files']])
+        expired = 0
+        if UIConfig.JANITOR_ARTIFACT_SCREENSHOT_DAYS is not None:
+            expired = artifact_store.expire('screenshot', now - UIConfig.JANITOR_ARTIFACT_SCREENSHOT_DAYS * 86400,
+                                            keep_after=protect_since)
+        result = artifact_store.gc()
+        return dict(result, forgotten_links=forgotten, expired_screenshots=expired)
+
+    # ------------------------------------------------------------------
+    # 定时任务
+    # ------------------------------------------------------------------
+    def start(self, interval: float = None):
+        """启动后台定时清理线程（重复调用只启动一个）"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        interval = UIConfig.JANITOR_INTERVAL if interval is None else interval
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, args=(interval,), name='storage-janitor', daemon=True)
+        self._thread.start()
+        log_info(f"存储清理线程已启动，间隔 {interval}s")
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self, interval: float):
+        from utils.run_registry import run_registry
+        # 启动后稍等再做第一次清理，避免与应用初始化争用磁盘和数据库
+        while not self._stop.wait(min(60.0, interval) if self.last_report is None else interval):
+            # 多 worker 部署时每个 worker 都会启动该线程，只由持有监督者租约的 worker 执行清理
+            if not run_registry.is_supervisor:
+                continue
+            try:
+                self.run()
+            except Exception as e:
+                log_info(f"存储清理失败: {e}")
+                self.last_report = {'error': str(e), 'finished_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            'running': self._thread is not None and self._thread.is_alive(),
+            'interval': UIConfig.JANITOR_INTERVAL,
+            'rules': self.rules,
+            'last_report': self.last_report,
+        }
+
+
+# 全局存储清理器实例
+storage_janitor = StorageJanitor()
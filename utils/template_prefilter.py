@@ -0,0 +1,146 @@
+import os
+import json
+import time
+import threading
+import cv2
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+
+
+class FrameSignature:
+    """单帧截图的预筛选特征：降采样灰度图和颜色直方图（每帧只计算一次，供多个尺度/模板复用）"""
+
+    def __init__(self, frame: np.ndarray, downsample: int, hist_bins: int):
+        h, w = frame.shape[:2]
+        self.downsample = downsample
+        self.coarse = cv2.resize(frame, (max(1, w // downsample), max(1, h // downsample)),
+                                 interpolation=cv2.INTER_AREA)
+        self.coarse_gray = cv2.cvtColor(self.coarse, cv2.COLOR_BGR2GRAY)
+        self.hist = color_histogram(self.coarse, hist_bins)
+
+
+def color_histogram(image: np.ndarray, bins: int) -> np.ndarray:
+    """BGR三通道联合直方图（像素计数，不归一化）"""
+    hist = cv2.calcHist([image], [0, 1, 2], None, [bins, bins, bins], [0, 256, 0, 256, 0, 256])
+    return hist.ravel()
+
+
+class TemplatePrefilter:
+    """模板预筛选 - 在全分辨率 matchTemplate 前快速排除画面中明显不存在的模板
+
+    两级筛选，任一级不通过即判定不存在：
+    1. 颜色直方图覆盖率：模板的颜色分布在画面中必须有足够的像素数支撑；
+    2. 粗匹配：在降采样后的画面上做一次 matchTemplate，得分低于 (阈值 - 余量) 时放弃。
+    两级都只在降采样图像上计算，耗时远低于全分辨率多尺度匹配。
+    """
+
+    def __init__(self, downsample: int = None, hist_bins: int = None,
+                 hist_min_coverage: float = None, coarse_margin: float = None):
+        self.downsample = max(1, int(downsample or UIConfig.PREFILTER_DOWNSAMPLE))
+        self.hist_bins = int(hist_bins or UIConfig.PREFILTER_HIST_BINS)
+        self.hist_min_coverage = UIConfig.PREFILTER_HIST_MIN_COVERAGE if hist_min_coverage is None else hist_min_coverage
+        self.coarse_margin = UIConfig.PREFILTER_COARSE_MARGIN if coarse_margin is None else coarse_margin
+        self.min_coarse_size = UIConfig.PREFILTER_MIN_COARSE_SIZE
+        # 模板特征缓存：{(模板路径, 尺度): (降采样灰度模板, 直方图)}
+        self._signatures: Dict[Tuple[str, float], Tuple[np.ndarray, np.ndarray]] = {}
+        self.stats = {'checks': 0, 'hist_rejects': 0, 'coarse_rejects': 0, 'passed': 0, 'skipped': 0}
+
+    def frame_signature(self, frame: np.ndarray) -> FrameSignature:
+        return FrameSignature(frame, self.downsample, self.hist_bins)
+
+    def _template_signature(self, template: np.ndarray, template_key: str,
+                            scale_factor: float) -> Tuple[np.ndarray, np.ndarray]:
+        key = (template_key, round(float(scale_factor), 4))
+        signature = self._signatures.get(key)
+        if signature is None:
+            h, w = template.shape[:2]
+            factor = float(scale_factor) / self.downsample
+            coarse = cv2.resize(template, (max(1, int(w * factor)), max(1, int(h * factor))),
+                                interpolation=cv2.INTER_AREA)
+            signature = (cv2.cvtColor(coarse, cv2.COLOR_BGR2GRAY), color_histogram(coarse, self.hist_bins))
+            self._signatures[key] = signature
+        return signature
+
+    def check(self, frame_sig: FrameSignature, template: np.ndarray, template_key: str,
+              scale_factor: float, confidence: float) -> Tuple[bool, str, Optional[float]]:
+        """
+        判断模板在该尺度下是否可能出现在画面中
+
+        Args:
+            frame_sig: 画面特征（frame_signature 的返回值）
+            template: 原始BGR模板（未缩放）
+            template_key: 模板缓存键（规范化路径）
+            scale_factor: 本次匹配的模板尺度
+            confidence: 全分辨率匹配使用的置信度阈值
+
+        Returns:
+            Tuple[bool, str, Optional[float]]: (是否需要继续全分辨率匹配, 原因, 粗匹配得分)
+        """
+        self.stats['checks'] += 1
+        coarse_template, template_hist = self._template_signature(template, template_key, scale_factor)
+        tpl_h, tpl_w = coarse_template.shape[:2]
+        img_h, img_w = frame_sig.coarse_gray.shape[:2]
+        # 降采样后模板过小或大于画面时无法可靠判断，交给全分辨率匹配
+        if tpl_h < self.min_coarse_size or tpl_w < self.min_coarse_size or tpl_h > img_h or tpl_w > img_w:
+            self.stats['skipped'] += 1
+            return True, 'skipped', None
+
+        # 第一级：颜色直方图覆盖率
+        total = float(template_hist.sum())
+        if total > 0:
+            coverage = float(np.minimum(template_hist, frame_sig.hist).sum()) / total
+            if coverage < self.hist_min_coverage:
+                self.stats['hist_rejects'] += 1
+                return False, f'histogram({coverage:.2f})', None
+
+        # 第二级：降采样画面上的粗匹配
+        result = cv2.matchTemplate(frame_sig.coarse_gray, coarse_template, cv2.TM_CCOEFF_NORMED)
+        coarse_score = float(result.max())
+        if coarse_score < confidence - self.coarse_margin:
+            self.stats['coarse_rejects'] += 1
+            return False, f'coarse({coarse_score:.3f})', coarse_score
+
+        self.stats['passed'] += 1
+        return True, 'passed', coarse_score
+
+    def clear(self):
+        self._signatures.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        checks = self.stats['checks']
+        rejects = self.stats['hist_rejects'] + self.stats['coarse_rejects']
+        return dict(self.stats, reject_rate=rejects / checks if checks else 0.0)
+
+
+_corpus_lock = threading.Lock()
+
+
+def record_corpus_sample(corpus_dir: str, frame: np.ndarray, fingerprint: Optional[str], template_path: str,
+                         confidence: float, scales, position: Optional[Tuple[int, int]]):
+    """
+    记录一条基准语料：保存画面截图并在 manifest.jsonl 追加模板和全量匹配结果
+
+    由 UI_VISION_CORPUS_DIR 开启，供 scripts/benchmark_prefilter.py 统计预筛选的漏检率。
+    """
+    try:
+        frames_dir = os.path.join(corpus_dir, 'frames')
+        os.makedirs(frames_dir, exist_ok=True)
+        frame_name = f"{fingerprint or int(time.time() * 1000)}.png"
+        frame_path = os.path.join(frames_dir, frame_name)
+        if not os.path.exists(frame_path):
+            cv2.imwrite(frame_path, frame)
+        sample = {
+            'frame': f"frames/{frame_name}",
+            'template': template_path.replace('\\', '/'),
+            'confidence': float(confidence),
+            'scales': list(scales) if scales else None,
+            'position': list(position) if position else None,
+            'ts': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        with _corpus_lock:
+            with open(os.path.join(corpus_dir, 'manifest.jsonl'), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(sample, ensure_ascii=False) + '\n')
+    except Exception as e:
+        log_info(f"记录基准语料失败: {e}")
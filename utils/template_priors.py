@@ -0,0 +1,223 @@
+import os
+import json
+import time
+import atexit
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+from Base_ENV.config import BASE_DIR
+
+
+class TemplatePriorStore:
+    """模板匹配先验统计 - 按 (模板, 浏览器布局) 记录历史成功匹配的尺度、置信度和位置
+
+    ImageRecognition 据此优先尝试最常命中的尺度和区域，只保留少量相邻尺度作为兜底，
+    避免每次都从 1.0 开始逐级做整屏匹配。统计以JSON文件保存在 Game_Img/ 下，
+    写入采用去抖+原子替换，进程退出时自动落盘。
+    """
+
+    def __init__(self, file_path: str = None):
+        self.file_path = file_path or os.path.join(BASE_DIR, UIConfig.TEMPLATE_PRIORS_FILE)
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self._dirty = False
+        self._last_save = 0.0
+        self._load()
+        atexit.register(self.flush)
+
+    # =============================================================================
+    # 持久化
+    # =============================================================================
+    def _load(self):
+        if not os.path.exists(self.file_path):
+            return
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if isinstance(data, dict):
+                self._data = data.get('templates', {})
+                log_info(f"加载模板先验统计: {self.file_path}, 模板数 {len(self._data)}")
+        except Exception as e:
+            log_info(f"加载模板先验统计失败，将重新统计: {e}")
+            self._data = {}
+
+    def reload(self):
+        """从文件重新加载统计（测试在独立进程中运行，查看前需读取最新落盘数据）"""
+        with self._lock:
+            if self._dirty:
+                return
+            self._data = {}
+            self._load()
+
+    def _save_locked(self):
+        directory = os.path.dirname(self.file_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': 1, 'templates': self._data}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.file_path)
+        self._dirty = False
+        self._last_save = time.time()
+
+    def flush(self):
+        """将未保存的统计写入文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            try:
+                self._save_locked()
+            except Exception as e:
+                log_info(f"保存模板先验统计失败: {e}")
+
+    # =============================================================================
+    # 统计读写
+    # =============================================================================
+    @staticmethod
+    def template_key(template_path: str) -> str:
+        """模板键：相对项目根目录、统一为正斜杠的路径"""
+        normalized = os.path.normpath(template_path)
+        if os.path.isabs(normalized):
+            try:
+                normalized = os.path.relpath(normalized, BASE_DIR)
+            except ValueError:
+                pass
+        return normalized.replace('\\', '/')
+
+    @staticmethod
+    def layout_key(width: int, height: int, dpr: float, space: str = 'device') -> str:
+        """布局键：CSS视口尺寸按 TEMPLATE_PRIORS_LAYOUT_BUCKET 取整后与DPR组合，例如 960x540@1.25
+
+        截图归一化到CSS像素后坐标空间不同，追加 /css 后缀分开统计。
+        """
+        bucket = max(1, int(UIConfig.TEMPLATE_PRIORS_LAYOUT_BUCKET))
+        width = int(round(width / bucket) * bucket)
+        height = int(round(height / bucket) * bucket)
+        key = f"{width}x{height}@{float(dpr):g}"
+        return f"{key}/css" if space == 'css' else key
+
+    def record(self, template_path: str, layout: str, scale: float, score: float, position: Tuple[int, int]):
+        """记录一次成功匹配（坐标为截图坐标空间，见 layout_key）"""
+        template = self.template_key(template_path)
+        scale_key = f"{float(scale):.2f}"
+        with self._lock:
+            entry = self._data.setdefault(template, {}).setdefault(layout, {
+                'hits': 0, 'scales': {}, 'score_sum': 0.0, 'score_min': None, 'positions': [], 'updated_at': None,
+            })
+            entry['hits'] += 1
+            entry['scales'][scale_key] = entry['scales'].get(scale_key, 0) + 1
+            entry['score_sum'] += float(score)
+            entry['score_min'] = float(score) if entry['score_min'] is None else min(entry['score_min'], float(score))
+            entry['positions'].append([int(position[0]), int(position[1])])
+            del entry['positions'][:-UIConfig.TEMPLATE_PRIORS_MAX_POSITIONS]
+            entry['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._dirty = True
+            if time.time() - self._last_save >= UIConfig.TEMPLATE_PRIORS_SAVE_INTERVAL:
+                try:
+                    self._save_locked()
+                except Exception as e:
+                    log_info(f"保存模板先验统计失败: {e}")
+
+    def get_prior(self, template_path: str, layout: str) -> Optional[Dict[str, Any]]:
+        """
+        获取模板在当前布局下的先验
+
+        Returns:
+            Optional[Dict]: {'scales': 按命中次数排序的尺度列表, 'region': 历史位置包围盒 (x1, y1, x2, y2), 'hits': 命中次数}；
+                样本不足时返回None
+        """
+        template = self.template_key(template_path)
+        with self._lock:
+            entry = (self._data.get(template) or {}).get(layout)
+            if not entry or entry['hits'] < UIConfig.TEMPLATE_PRIORS_MIN_HITS:
+                return None
+            scales = [float(scale) for scale, _count in
+                      sorted(entry['scales'].items(), key=lambda item: item[1], reverse=True)]
+            positions = list(entry['positions'])
+            hits = entry['hits']
+        region = None
+        if positions:
+            xs = [p[0] for p in positions]
+            ys = [p[1] for p in positions]
+            region = (min(xs), min(ys), max(xs), max(ys))
+        return {'scales': scales, 'region': region, 'hits': hits}
+
+    def order_scales(self, prior: Optional[Dict[str, Any]], all_scales: List[float], attempt: int) -> List[float]:
+        """
+        根据先验排列尝试的尺度
+
+        首次尝试只保留历史命中的尺度及其相邻尺度（窄兜底集合）；之后的尝试在其后补齐全部尺度。
+        """
+        if not prior:
+            return list(all_scales)
+        preferred = [s for s in prior['scales'] if any(abs(s - a) < 1e-6 for a in all_scales)]
+        if not preferred:
+            return list(all_scales)
+        ordered = list(preferred)
+        # 相邻尺度作为窄兜底
+        for scale in preferred:
+            index = min(range(len(all_scales)), key=lambda i: abs(all_scales[i] - scale))
+            for neighbor in all_scales[max(0, index - 1):index + 2]:
+                if neighbor not in ordered:
+                    ordered.append(neighbor)
+        if attempt > 0:
+            ordered.extend(s for s in all_scales if s not in ordered)
+        return ordered
+
+    def get_stats(self, template_path: str = None) -> Dict[str, Any]:
+        """获取统计（供管理接口查看），可按模板过滤"""
+        with self._lock:
+            if template_path:
+                template = self.template_key(template_path)
+                data = {template: self._data.get(template, {})}
+            else:
+                data = self._data
+            result = {}
+            for template, layouts in data.items():
+                result[template] = {}
+                for layout, entry in layouts.items():
+                    hits = entry['hits']
+                    result[template][layout] = {
+                        'hits': hits,
+                        'scales': dict(entry['scales']),
+                        'score_avg': round(entry['score_sum'] / hits, 4) if hits else None,
+                        'score_min': entry['score_min'],
+                        'positions': len(entry['positions']),
+                        'updated_at': entry['updated_at'],
+                    }
+            return result
+
+    def reset(self, template_path: str = None, layout: str = None) -> int:
+        """
+        重置先验统计
+
+        Args:
+            template_path: 只重置该模板，为空时重置全部
+            layout: 只重置该布局（需同时指定模板）
+
+        Returns:
+            int: 被删除的 (模板, 布局) 条目数
+        """
+        with self._lock:
+            if template_path is None:
+                removed = sum(len(layouts) for layouts in self._data.values())
+                self._data = {}
+            else:
+                template = self.template_key(template_path)
+                layouts = self._data.get(template, {})
+                if layout is None:
+                    removed = len(layouts)
+                    self._data.pop(template, None)
+                else:
+                    removed = 1 if layouts.pop(layout, None) is not None else 0
+                    if not layouts:
+                        self._data.pop(template, None)
+            self._dirty = True
+            self._save_locked()
+        log_info(f"模板先验统计已重置: 模板={template_path or '全部'}, 布局={layout or '全部'}, 删除 {removed} 条")
+        return removed
+
+
+# 全局模板先验统计实例
+template_priors = TemplatePriorStore()
@@ -2,19 +2,29 @@ import asyncio
 import time
 import cv2
 import numpy as np
-from PIL import Image
-import io
 from datetime import datetime
 from os import path
 import uuid
 import json
 import re
-import pyautogui
+try:
+    import pyautogui
+except Exception:
+    # 无头/无显示环境下pyautogui不可用，相关兜底路径会被配置关闭
+    pyautogui = None
 from typing import List, Dict, Any, Optional, Tuple
 from playwright.async_api import Page, Browser, Locator
 from playwright.async_api import expect
-from config.logger import log_info
+from config.logger import log_info, get_current_execution_id
+from config.ui_config import UIConfig
 from utils.hybrid_image_manager import HybridImageManager
+from utils.vision_executor import vision_executor
+from utils.search_budget import SearchBudget
+from utils.metrics import click_verifications, page_stable_seconds, observe_image_search
+from utils.reference_store import reference_store
+from utils import phash
+from utils.phash import screenshot_index
+from utils.artifact_store import artifact_store
 # 注释掉 scikit-image 导入，使用 OpenCV 替代
 # from skimage.metrics import structural_similarity as ssim
 
@@ -48,6 +58,8 @@ class UIOperations:
             'roi_side': 96,  # ROI正方形边长（像素）
             'template_move_min_distance': 16  # 模板被点击后至少移动的像素距离（CSS）
         }
+        # 最近一次图片查找的预算使用情况
+        self.last_search_report: Dict[str, Any] = {}
         log_info(f"创建UIOperations实例: {self.task_id}")
 
         # 网络活动统计（基于Playwright事件）
@@ -144,6 +156,11 @@ class UIOperations:
             log_info(f"[{self.task_id}] 读取DOM状态失败: {e}")
             return {'domQuietMs': 0, 'readyState': 'unknown'}
 
+    @staticmethod
+    def _average_hash_from_png(png_bytes: bytes) -> int:
+        """计算PNG图片的64位均值哈希（在视觉线程池中执行）"""
+        return phash.hash_png(png_bytes, 'ahash')
+
     async def _capture_roi_hash(self, x_css: int, y_css: int, side: int = None):
         try:
             if side is None:
@@ -160,10 +177,7 @@ class UIOperations:
 
             clip = { 'x': left, 'y': top, 'width': side, 'height': side }
             roi_bytes = await self.page.screenshot(clip=clip, type='png')
-            roi_img = Image.open(io.BytesIO(roi_bytes)).convert('L').resize((8, 8))
-            arr = np.array(roi_img, dtype=np.float32)
-            avg = float(arr.mean())
-            return (arr > avg).astype(np.uint8).flatten()
+            return await vision_executor.run(self._average_hash_from_png, roi_bytes, task_id=self.task_id)
         except Exception as e:
             log_info(f"[{self.task_id}] 获取ROI哈希失败: {e}")
             return None
@@ -201,7 +215,7 @@ class UIOperations:
             try:
                 curr_hash = await self._capture_roi_hash(x_css, y_css)
                 if pre_hash is not None and curr_hash is not None:
-                    dist = int(np.sum(curr_hash != pre_hash))
+                    dist = phash.hamming(curr_hash, pre_hash)
                     visual_th = int(self.config.get('visual_hash_distance_threshold', 4))
                     if dist >= visual_th:  # ROI明显变化
                         seen_vis = True
@@ -219,8 +233,10 @@ class UIOperations:
                     if pos is None:
                         template_disappeared = True
                     else:
-                        dx = float(pos[0] - x_css)
-                        dy = float(pos[1] - y_css)
+                        # 识别坐标换算为CSS坐标后再与点击位置比较
+                        coord_scale = await self.image_manager.image_recognition.get_coordinate_scale(self.page) or 1.0
+                        dx = float(pos[0] / coord_scale - x_css)
+                        dy = float(pos[1] / coord_scale - y_css)
                         move_dist = (dx * dx + dy * dy) ** 0.5
                         if move_dist >= float(self.config.get('template_move_min_distance', 16)):
                             template_moved = True
@@ -236,11 +252,13 @@ class UIOperations:
                 else:
                     reason = 'dom+visual' if (seen_dom and seen_vis) else 'visual+time'
                 log_info(f"[{self.task_id}] 点击效果验证通过: 原因={reason} 网络={seen_net} DOM={seen_dom} 视觉={seen_vis}")
+                click_verifications.inc(result='passed', reason=reason)
                 return True
 
             await asyncio.sleep(0.2)
 
         log_info(f"[{self.task_id}] 点击效果验证失败: 在{effect_timeout}s内未检测到有效变化")
+        click_verifications.inc(result='failed', reason='no_effect')
         return False
 
     async def wait_for_page_stable(self, timeout: int = 10, check_interval: float = 2, *, strict: bool = True) -> bool:
@@ -256,6 +274,16 @@ class UIOperations:
         Returns:
             bool: 页面是否稳定
         """
+        started = time.perf_counter()
+        stable = False
+        try:
+            stable = await self._wait_for_page_stable(timeout, check_interval, strict)
+            return stable
+        finally:
+            page_stable_seconds.observe(time.perf_counter() - started, result='stable' if stable else 'unstable')
+
+    async def _wait_for_page_stable(self, timeout: float, check_interval: float, strict: bool) -> bool:
+        """wait_for_page_stable 的实现"""
         try:
             log_info(f"[{self.task_id}] 开始等待页面稳定，超时时间: {timeout}秒 严格模式:{strict}")
             start_time = time.time()
@@ -313,13 +341,10 @@ class UIOperations:
                 # 视觉稳定判断（使用感知哈希，抗轻微像素抖动）
                 try:
                     screenshot_bytes = await self.page.screenshot(type='png')
-                    img = Image.open(io.BytesIO(screenshot_bytes)).convert('L').resize((8, 8))
-                    arr = np.array(img, dtype=np.float32)
-                    avg = float(arr.mean())
-                    curr_hash = (arr > avg).astype(np.uint8).flatten()
+                    curr_hash = await vision_executor.run(self._average_hash_from_png, screenshot_bytes, task_id=self.task_id)
                     if prev_hash is not None:
                         # 汉明距离
-                        dist = int(np.sum(curr_hash != prev_hash))
+                        dist = phash.hamming(curr_hash, prev_hash)
                         # 小于等于2位差异认为视觉稳定
                         if dist <= 2:
                             visual_stable_count += 1
@@ -375,29 +400,74 @@ class UIOperations:
             log_info(f"[{self.task_id}] 页面稳定性检测失败: {e}")
             return False
 
+    async def wait_for_settle(self, timeout: float = 1.0, quiet_ms: int = 300,
+                              poll_interval: float = 0.1) -> bool:
+        """
+        等待操作后页面短暂稳定（非阻塞），用于替代生成代码中的固定time.sleep
+
+        条件满足即返回：无进行中的请求，且网络与DOM均已静默quiet_ms毫秒；
+        最长等待timeout秒。全程只使用await，不会阻塞其他并发浏览器的事件循环。
+
+        Args:
+            timeout: 最长等待时间（秒）
+            quiet_ms: 要求的连续静默时间（毫秒）
+            poll_interval: 轮询间隔（秒）
+
+        Returns:
+            bool: 是否在超时前检测到稳定
+        """
+        start = time.time()
+        quiet_seconds = max(0, quiet_ms) / 1000.0
+        try:
+            await self._install_stability_observers()
+        except Exception:
+            pass
+        while True:
+            try:
+                net_quiet = (int(self._inflight_requests) == 0 and
+                             (time.time() - float(self._last_network_activity)) >= quiet_seconds)
+                dom_state = await self._get_dom_state()
+                dom_quiet = float(dom_state.get('domQuietMs', 0) or 0) >= quiet_ms
+                if net_quiet and dom_quiet:
+                    return True
+            except Exception:
+                pass
+            remaining = timeout - (time.time() - start)
+            if remaining <= 0:
+                return False
+            await asyncio.sleep(min(poll_interval, remaining))
+
     async def find_image(self, image_path: str, confidence: float = None,
-                         timeout: int = None) -> Optional[Tuple[int, int]]:
-        """查找图片"""
+                         timeout: int = None, budget: SearchBudget = None,
+                         engine: str = None) -> Optional[Tuple[int, int]]:
+        """查找图片（timeout为整次查找的截止时间，也可传入上层已创建的预算；engine指定识别引擎）"""
         return await self.image_manager.find_image(
-            self.page, image_path, confidence, timeout
+            self.page, image_path, confidence, timeout, budget=budget, engine=engine
         )
 
+    def _finish_search(self, budget: SearchBudget, image_path: str, success: bool):
+        """记录并输出本次查找的预算使用情况"""
+        self.last_search_report = dict(budget.report(), success=success)
+        observe_image_search(self.last_search_report, success)
+        log_info(f"[{self.task_id}] 图片查找{'成功' if success else '失败'}: {image_path}, {budget.summary()}")
+
     async def click_image_with_fallback(self, image_path: str, confidence: float = None,
                                         timeout: int = None, max_retries: int = None, 
                                         wait_page_stable: bool = True, 
                                         min_confidence_threshold: float = 0.5,
                                         stable_first_attempt_only: bool = True,
-                                        is_open: bool = False) -> bool:
+                                        is_open: bool = False, engine: str = None) -> bool:
         """
         查找并点击图片，支持混合识别和重试机制
 
         Args:
             image_path: 图片路径
             confidence: 匹配置信度
-            timeout: 超时时间
-            max_retries: 最大重试次数
+            timeout: 查找预算（秒），识别和点击重试共享该预算；进入时的初始等待、遮挡处理和首轮页面稳定等待不计入
+            max_retries: 找到图片但点击未生效时的最大点击轮数
             wait_page_stable: 是否在识别前等待页面稳定
             min_confidence_threshold: 最低置信度阈值，低于此值视为误匹配
+            engine: 识别引擎 template/feature/auto，为空时按模板配置选择
 
         Returns:
             bool: 是否成功点击
@@ -421,27 +491,39 @@ class UIOperations:
         except Exception:
             pass
 
-        for attempt in range(max_retries):
+        # 首次识别前等待页面稳定（严格模式，若检测到停滞会快速返回），不占用查找预算
+        if wait_page_stable:
+            log_info(f"[{self.task_id}] 等待页面稳定后再进行图片识别...")
+            try:
+                await self.wait_for_page_stable(timeout=8, check_interval=0.5, strict=True)
+            except Exception:
+                pass
+
+        # 识别和点击重试共享同一个查找预算，三层识别都不再各自重试计时，超过截止时间立即返回
+        budget = SearchBudget.from_config(timeout, label=image_path)
+        attempt = -1
+        click_rounds = 0
+        while budget.can_continue() and click_rounds < max_retries:
+            attempt += 1
             try:
                 log_info(f"[{self.task_id}] 第{attempt + 1}次尝试查找并点击图片: {image_path}")
 
-                # 首次或按需等待页面稳定（严格模式，若检测到停滞会快速返回）
-                if wait_page_stable and (attempt == 0 or not stable_first_attempt_only):
+                # 按需在后续轮次再次等待页面稳定，最多占用剩余预算的一小部分
+                if wait_page_stable and attempt > 0 and not stable_first_attempt_only:
                     log_info(f"[{self.task_id}] 等待页面稳定后再进行图片识别...")
-                    await self.wait_for_page_stable(timeout=8, check_interval=0.5, strict=True)
-                # 使用图片识别管理器，并获取实际置信度
+                    stable_timeout = min(8, budget.remaining() * UIConfig.IMAGE_SEARCH_STABLE_WAIT_FRACTION)
+                    await self.wait_for_page_stable(timeout=stable_timeout, check_interval=0.5, strict=True)
+                # 使用图片识别管理器在同一预算内识别一轮
                 position = await self.image_manager.find_image(
-                    self.page, image_path, confidence, timeout
+                    self.page, image_path, confidence, budget=budget, engine=engine
                 )
 
                 if position:
+                    click_rounds += 1
                     # 找到图片，执行点击
                     x, y = position
-                    # 适配DPI/缩放：Playwright点击使用CSS像素，截图坐标为设备像素，需要按devicePixelRatio换算
-                    try:
-                        dpr = await self.page.evaluate('window.devicePixelRatio')
-                    except Exception:
-                        dpr = 1.0
+                    # 适配DPI/缩放：Playwright点击使用CSS像素；截图已归一化到CSS像素时倍数为1，否则按devicePixelRatio换算
+                    dpr = await self.image_manager.image_recognition.get_coordinate_scale(self.page)
                     x_css = int(x / (dpr if dpr else 1.0))
                     y_css = int(y / (dpr if dpr else 1.0))
                     log_info(f"[{self.task_id}] 准备点击图片: {image_path}, 截图坐标: ({x}, {y}), DPR: {dpr}, 点击坐标(CSS): ({x_css}, {y_css})")
@@ -512,7 +594,8 @@ class UIOperations:
                             )
                     
                     # 方式4: 最后备用方案 - 使用PyAutoGUI重新查找并点击（限定到当前窗口区域）
-                    if not click_success:
+                    # 无头/虚拟显示模式下浏览器不在真实屏幕上，跳过该方案
+                    if not click_success and self.image_manager.config.get('use_pyautogui_fallback', True):
                         try:
                             log_info(f"[{self.task_id}] 尝试PyAutoGUI备用点击方案")
                             # 规范化图片路径为绝对路径，修复路径分隔符问题
@@ -528,13 +611,11 @@ class UIOperations:
                             if py_conf <= 0 or py_conf > 1:
                                 py_conf = max(0.1, min(py_conf, 1.0))
                             region = await self._get_window_region()
-                            if region:
-                                pyautogui_pos = pyautogui.locateCenterOnScreen(abs_image_path, confidence=py_conf, region=region)
-                            else:
-                                pyautogui_pos = pyautogui.locateCenterOnScreen(abs_image_path, confidence=py_conf)
-                            if pyautogui_pos:
-                                pyautogui.click(pyautogui_pos.x, pyautogui_pos.y)
-                                log_info(f"[{self.task_id}] PyAutoGUI点击完成: ({pyautogui_pos.x}, {pyautogui_pos.y})")
+                            # 通过共享截屏服务和模板缓存查找，PyAutoGUI只负责点击
+                            screen_pos = await self.image_manager.find_on_screen(abs_image_path, py_conf, region, self.page)
+                            if screen_pos:
+                                pyautogui.click(screen_pos[0], screen_pos[1])
+                                log_info(f"[{self.task_id}] PyAutoGUI点击完成: ({screen_pos[0]}, {screen_pos[1]})")
                                 click_success = await self._verify_click_effect(
                                     x_css, y_css, pre_hash, pre_inflight, pre_last_net, template_path=image_path
                                 )
@@ -545,6 +626,7 @@ class UIOperations:
                     
                     if click_success:
                         log_info(f"[{self.task_id}] 图片点击成功（已验证页面效果）: {image_path}, 点击坐标(CSS): ({x_css}, {y_css})")
+                        self._finish_search(budget, image_path, True)
                         return True
                     else:
                         log_info(f"[{self.task_id}] 所有点击方式都失败了: {image_path}")
@@ -552,33 +634,26 @@ class UIOperations:
                 else:
                     log_info(f"[{self.task_id}] 第{attempt + 1}次尝试：没有找到图片 {image_path}")
 
-                    # 如果还有重试机会，等待后重试（退避延迟，避免长时间空等）
-                    if attempt < max_retries - 1:
-                        base_delay = float(self.config.get('retry_delay', 3.0))
-                        retry_delay = max(0.5, min(6.0, base_delay * (1 + 0.5 * attempt)))
-                        log_info(f"[{self.task_id}] 等待{retry_delay}秒后重试（给页面更多加载时间）...")
-                        await asyncio.sleep(retry_delay)
-                    else:
-                        log_info(f"[{self.task_id}] 所有{max_retries}次尝试都失败，无法找到图片")
+                    # 在剩余预算内退避后重试，预算耗尽则结束
+                    if not await budget.backoff():
+                        log_info(f"[{self.task_id}] 查找预算已耗尽，无法找到图片")
 
             except Exception as e:
                 log_info(f"[{self.task_id}] 第{attempt + 1}次图片定位失败: {e}")
 
-                # 如果还有重试机会，等待后重试（退避延迟）
-                if attempt < max_retries - 1:
-                    base_delay = float(self.config.get('retry_delay', 3.0))
-                    retry_delay = max(0.5, min(6.0, base_delay * (1 + 0.5 * attempt)))
-                    log_info(f"[{self.task_id}] 等待{retry_delay}秒后重试（给页面更多加载时间）...")
-                    await asyncio.sleep(retry_delay)
-                else:
-                    log_info(f"[{self.task_id}] 所有{max_retries}次尝试都失败")
+                # 在剩余预算内退避后重试
+                if not await budget.backoff():
+                    self._finish_search(budget, image_path, False)
                     raise Exception(f"图片定位失败：无法找到图片 {image_path}")
 
+        self._finish_search(budget, image_path, False)
         return False
 
     def get_image_stats(self):
-        """获取图片识别统计信息，包含任务ID"""
-        return self.image_manager.get_image_stats()
+        """获取图片识别统计信息，包含任务ID和最近一次查找的预算使用情况"""
+        stats = self.image_manager.get_image_stats()
+        stats['last_search'] = self.last_search_report or self.image_manager.last_search_report
+        return stats
 
     def reset_image_stats(self):
         """重置图片识别统计信息"""
@@ -657,10 +732,7 @@ class UIOperations:
                             continue
 
                         x, y = pos
-                        try:
-                            dpr = await self.page.evaluate('window.devicePixelRatio')
-                        except Exception:
-                            dpr = 1.0
+                        dpr = await self.image_manager.image_recognition.get_coordinate_scale(self.page)
                         x_css = int(x / (dpr if dpr else 1.0))
                         y_css = int(y / (dpr if dpr else 1.0))
                         pre_hash = await self._capture_roi_hash(x_css, y_css)
@@ -737,6 +809,18 @@ class UIOperations:
     def locator_element(self, element):
         return self.page.locator(element)
 
+    async def elem_is_visible(self, element, timeout: float = 3.0) -> bool:
+        """元素在timeout秒内是否可见（只做探测，不抛出断言错误）"""
+        try:
+            await self.locator_element(element).first.wait_for(state='visible', timeout=timeout * 1000)
+            return True
+        except Exception as e:
+            error_msg = str(e).lower()
+            if any(keyword in error_msg for keyword in ['target closed', 'browser has been closed', 'disconnected', 'session closed']):
+                log_info(f"[{self.task_id}] 检测到浏览器连接异常，元素可见性检查失败")
+                raise Exception("BROWSER_CLOSED_BY_USER")
+            return False
+
     async def elem_click(self, element):
         try:
             # 设置超时时间，防止无限等待
@@ -1218,6 +1302,17 @@ class UIOperations:
                 raise Exception("BROWSER_CLOSED_BY_USER")
             raise e
 
+    def _index_stored_screenshot(self, future, screenshot_path: str, screenshot_bytes: bytes):
+        """截图入库完成后（入库线程中）把对象文件加入感知哈希索引"""
+        if future.exception() is not None:
+            return
+        try:
+            resolved = artifact_store.resolve(screenshot_path)
+            if resolved is not None:
+                screenshot_index.add(resolved[0], phash.decode_png(screenshot_bytes))
+        except Exception as e:
+            log_info(f"[{self.task_id}] 截图索引失败: {screenshot_path}, {e}")
+
     # 页面截图
     async def page_screenshot(self, func_name, test_step):
         try:
@@ -1229,7 +1324,23 @@ class UIOperations:
             screenshot_path = path.join(path.dirname(path.dirname(__file__)), 'IMG_LOGS',
                                       f'{func_name}_{test_step}_{datetime.fromtimestamp(time.time()).strftime("%Y_%m_%d_%H_%M_%S")}.png')
             
-            await self.page.screenshot(path=screenshot_path)
+            if UIConfig.ARTIFACT_STORE_SCREENSHOTS:
+                # 截图交给产物存储后台转码入库，/IMG_LOGS/ 路由按原路径查表返回。
+                # 产物存储优先于 PHASH_DEDUP_SCREENSHOTS：相同内容由存储按sha256去重，不再做画面硬链接去重；
+                # 感知哈希索引记录入库后的对象文件路径（原路径下没有文件）
+                screenshot_bytes = await self.page.screenshot(type='png')
+                future = artifact_store.submit(screenshot_path, screenshot_bytes, kind='screenshot',
+                                               execution_id=get_current_execution_id(), step=str(test_step))
+                if UIConfig.PHASH_INDEX_SCREENSHOTS:
+                    future.add_done_callback(
+                        lambda done: self._index_stored_screenshot(done, screenshot_path, screenshot_bytes))
+            elif UIConfig.PHASH_INDEX_SCREENSHOTS:
+                # 保存截图的同时写入感知哈希索引（可选按画面去重）
+                screenshot_bytes = await self.page.screenshot(type='png')
+                await vision_executor.run(screenshot_index.save_screenshot, screenshot_path, screenshot_bytes,
+                                          task_id=self.task_id)
+            else:
+                await self.page.screenshot(path=screenshot_path)
             log_info(f"[{self.task_id}] 测试步骤_{test_step}_截图成功保存: {screenshot_path}")
             return screenshot_path
             
@@ -1426,6 +1537,20 @@ class UIOperations:
             log_info(f"[{self.task_id}] {error_msg}")
             raise AssertionError(error_msg)
     
+    async def _assertion_screenshot(self, screenshot_area: dict = None) -> bytes:
+        """图片断言用的页面截图"""
+        if screenshot_area:
+            return await self.page.screenshot(clip=screenshot_area, type='png')
+        return await self.page.screenshot(type='png')
+    
+    @staticmethod
+    def _decode_screenshot(screenshot_bytes: bytes) -> np.ndarray:
+        """解码PNG截图为BGR（丢弃透明通道）"""
+        image = cv2.imdecode(np.frombuffer(screenshot_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("无法解码页面截图")
+        return image
+    
     async def image_assert_mse(self, reference_image_path: str, threshold: float = 100.0,
                                screenshot_area: dict = None) -> bool:
         """
@@ -1446,30 +1571,13 @@ class UIOperations:
             
             log_info(f"[{self.task_id}] 图片断言 - MSE比较: {reference_image_path}, 阈值: {threshold}")
             
-            # 获取页面截图
-            if screenshot_area:
-                screenshot_bytes = await self.page.screenshot(
-                    clip=screenshot_area,
-                    type='png'
-                )
-            else:
-                screenshot_bytes = await self.page.screenshot(type='png')
-            
-            # 转换截图为OpenCV格式
-            screenshot_image = Image.open(io.BytesIO(screenshot_bytes))
-            screenshot_cv = cv2.cvtColor(np.array(screenshot_image), cv2.COLOR_RGB2BGR)
-            
-            # 读取参考图片
-            reference_cv = cv2.imread(reference_image_path)
-            if reference_cv is None:
-                raise FileNotFoundError(f"无法读取参考图片: {reference_image_path}")
+            screenshot_bytes = await self._assertion_screenshot(screenshot_area)
             
-            # 调整图片尺寸使其一致
-            height, width = reference_cv.shape[:2]
-            screenshot_cv = cv2.resize(screenshot_cv, (width, height))
+            def calculate_mse():
+                """解码截图并与缓存的参考图计算MSE（在视觉线程池中执行）"""
+                return reference_store.mse(reference_image_path, self._decode_screenshot(screenshot_bytes))
             
-            # 计算MSE
-            mse = np.mean((screenshot_cv - reference_cv) ** 2)
+            mse = await vision_executor.run(calculate_mse, task_id=self.task_id)
             
             if mse <= threshold:
                 log_info(f"[{self.task_id}] 图片断言成功 - MSE: {mse:.2f} <= {threshold}")
@@ -1487,15 +1595,18 @@ class UIOperations:
             raise AssertionError(error_msg)
     
     async def image_assert_ssim(self, reference_image_path: str, threshold: float = 0.8,
-                                screenshot_area: dict = None) -> bool:
+                                screenshot_area: dict = None, downscale: float = None,
+                                roi: dict = None) -> bool:
         """
         图片断言：使用结构相似性指数(SSIM)比较当前页面截图与参考图片
-        使用OpenCV实现SSIM计算，避免依赖scikit-image
+        使用OpenCV实现SSIM计算（float32），避免依赖scikit-image；参考图的均值/方差图按参考图缓存
         
         Args:
             reference_image_path: 参考图片路径
             threshold: SSIM阈值，高于此值认为图片相似
             screenshot_area: 截图区域
+            downscale: 比较前的缩小比例 (0, 1]，默认取 UIConfig.SSIM_DOWNSCALE
+            roi: 只评估参考图中的该区域 {"x": 0, "y": 0, "width": 200, "height": 100}
             
         Returns:
             bool: 图片是否相似
@@ -1506,57 +1617,14 @@ class UIOperations:
         try:
             log_info(f"[{self.task_id}] 图片断言 - SSIM比较: {reference_image_path}, 阈值: {threshold}")
             
-            def calculate_ssim(img1, img2):
-                """使用OpenCV计算SSIM"""
-                # 计算均值
-                mu1 = cv2.GaussianBlur(img1.astype(np.float64), (11, 11), 1.5)
-                mu2 = cv2.GaussianBlur(img2.astype(np.float64), (11, 11), 1.5)
-                
-                mu1_sq = mu1 * mu1
-                mu2_sq = mu2 * mu2
-                mu1_mu2 = mu1 * mu2
-                
-                # 计算方差和协方差
-                sigma1_sq = cv2.GaussianBlur(img1.astype(np.float64) * img1.astype(np.float64), (11, 11), 1.5) - mu1_sq
-                sigma2_sq = cv2.GaussianBlur(img2.astype(np.float64) * img2.astype(np.float64), (11, 11), 1.5) - mu2_sq
-                sigma12 = cv2.GaussianBlur(img1.astype(np.float64) * img2.astype(np.float64), (11, 11), 1.5) - mu1_mu2
-                
-                # SSIM常数
-                C1 = (0.01 * 255) ** 2
-                C2 = (0.03 * 255) ** 2
-                
-                # 计算SSIM
-                ssim_map = ((2 * mu1_mu2 + C1) * (2 * sigma12 + C2)) / ((mu1_sq + mu2_sq + C1) * (sigma1_sq + sigma2_sq + C2))
-                
-                return np.mean(ssim_map)
-            
-            # 获取页面截图
-            if screenshot_area:
-                screenshot_bytes = await self.page.screenshot(
-                    clip=screenshot_area,
-                    type='png'
-                )
-            else:
-                screenshot_bytes = await self.page.screenshot(type='png')
-            
-            # 转换截图为OpenCV格式
-            screenshot_image = Image.open(io.BytesIO(screenshot_bytes))
-            screenshot_cv = cv2.cvtColor(np.array(screenshot_image), cv2.COLOR_RGB2BGR)
-            screenshot_gray = cv2.cvtColor(screenshot_cv, cv2.COLOR_BGR2GRAY)
+            screenshot_bytes = await self._assertion_screenshot(screenshot_area)
             
-            # 读取参考图片
-            reference_cv = cv2.imread(reference_image_path)
-            if reference_cv is None:
-                raise FileNotFoundError(f"无法读取参考图片: {reference_image_path}")
+            def compare_with_reference():
+                """解码截图并与缓存的参考图计算SSIM（在视觉线程池中执行）"""
+                return reference_store.ssim(reference_image_path, self._decode_screenshot(screenshot_bytes),
+                                            downscale=downscale, roi=roi)
             
-            reference_gray = cv2.cvtColor(reference_cv, cv2.COLOR_BGR2GRAY)
-            
-            # 调整图片尺寸使其一致
-            height, width = reference_gray.shape
-            screenshot_gray = cv2.resize(screenshot_gray, (width, height))
-            
-            # 计算SSIM
-            ssim_value = calculate_ssim(screenshot_gray, reference_gray)
+            ssim_value = await vision_executor.run(compare_with_reference, task_id=self.task_id)
             
             if ssim_value >= threshold:
                 log_info(f"[{self.task_id}] 图片断言成功 - SSIM: {ssim_value:.4f} >= {threshold}")
@@ -1593,46 +1661,13 @@ class UIOperations:
             
             log_info(f"[{self.task_id}] 图片断言 - 感知哈希比较: {reference_image_path}, 阈值: {threshold}")
             
-            def calculate_perceptual_hash(image):
-                """计算图片的感知哈希值"""
-                # 转换为灰度图
-                gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-                # 缩放到8x8
-                resized = cv2.resize(gray, (8, 8))
-                # 计算平均值
-                avg = resized.mean()
-                # 生成哈希
-                hash_bits = (resized > avg).astype(np.uint8)
-                return hash_bits.flatten()
-            
-            def hamming_distance(hash1, hash2):
-                """计算汉明距离"""
-                return np.sum(hash1 != hash2)
-            
-            # 获取页面截图
-            if screenshot_area:
-                screenshot_bytes = await self.page.screenshot(
-                    clip=screenshot_area,
-                    type='png'
-                )
-            else:
-                screenshot_bytes = await self.page.screenshot(type='png')
-            
-            # 转换截图为OpenCV格式
-            screenshot_image = Image.open(io.BytesIO(screenshot_bytes))
-            screenshot_cv = cv2.cvtColor(np.array(screenshot_image), cv2.COLOR_RGB2BGR)
-            
-            # 读取参考图片
-            reference_cv = cv2.imread(reference_image_path)
-            if reference_cv is None:
-                raise FileNotFoundError(f"无法读取参考图片: {reference_image_path}")
+            screenshot_bytes = await self._assertion_screenshot(screenshot_area)
             
-            # 计算感知哈希
-            screenshot_hash = calculate_perceptual_hash(screenshot_cv)
-            reference_hash = calculate_perceptual_hash(reference_cv)
+            def compare_with_reference():
+                """解码截图并与缓存的参考图哈希计算汉明距离（在视觉线程池中执行）"""
+                return reference_store.hash_distance(reference_image_path, self._decode_screenshot(screenshot_bytes))
             
-            # 计算汉明距离
-            distance = hamming_distance(screenshot_hash, reference_hash)
+            distance = await vision_executor.run(compare_with_reference, task_id=self.task_id)
             
             if distance <= threshold:
                 log_info(f"[{self.task_id}] 图片断言成功 - 哈希距离: {distance} <= {threshold}")
@@ -0,0 +1,132 @@
+import os
+import time
+import atexit
+import shutil
+import signal
+import subprocess
+import threading
+from typing import Dict, List, Optional, Tuple
+from config.ui_config import UIConfig
+from config.logger import log_info
+
+
+class VirtualDisplayAllocator:
+    """虚拟显示分配器 - 为每个浏览器实例分配独立的Xvfb显示，与ScreenManager配合使用
+
+    真实桌面模式下所有浏览器平分同一块屏幕，并发数受屏幕面积限制；
+    xvfb模式下每个浏览器独占一个满尺寸的虚拟显示，并发数只受机器资源限制。
+    """
+
+    def __init__(self, base: int = None, max_displays: int = None, size: Tuple[int, int] = None):
+        self.base = base if base is not None else UIConfig.VIRTUAL_DISPLAY_BASE
+        self.max_displays = max_displays if max_displays is not None else UIConfig.VIRTUAL_DISPLAY_MAX
+        self.size = tuple(size or UIConfig.VIRTUAL_DISPLAY_SIZE)
+        # 显示编号 -> Xvfb进程
+        self._displays: Dict[int, subprocess.Popen] = {}
+        self._lock = threading.Lock()
+        self._previous_sigterm = None
+        self._sigterm_installed = False
+        # 进程退出时回收所有虚拟显示，避免遗留Xvfb进程
+        atexit.register(self.release_all)
+
+    def _install_sigterm_handler(self):
+        """
+        安装SIGTERM处理器：取消/超时时服务端对pytest子进程发送SIGTERM，
+        默认动作会直接结束进程而不执行atexit，Xvfb会成为孤儿进程，因此先回收再按原处理方式退出
+        """
+        if self._sigterm_installed or threading.current_thread() is not threading.main_thread():
+            return
+        try:
+            self._previous_sigterm = signal.signal(signal.SIGTERM, self._handle_sigterm)
+            self._sigterm_installed = True
+        except (ValueError, OSError) as e:
+            log_info(f"安装SIGTERM处理器失败，取消时可能遗留Xvfb进程: {e}")
+
+    def _handle_sigterm(self, signum, frame):
+        self.release_all()
+        previous = self._previous_sigterm
+        if callable(previous):
+            previous(signum, frame)
+        elif previous != signal.SIG_IGN:
+            # 恢复默认处理并重新发送信号，保持进程以SIGTERM结束的返回码
+            signal.signal(signum, signal.SIG_DFL)
+            os.kill(os.getpid(), signum)
+
+    @staticmethod
+    def _display_in_use(number: int) -> bool:
+        """判断显示编号是否已被本机其他进程占用"""
+        return (os.path.exists(f"/tmp/.X{number}-lock") or
+                os.path.exists(f"/tmp/.X11-unix/X{number}"))
+
+    def _start_xvfb(self, number: int, startup_timeout: float = 5.0) -> Optional[subprocess.Popen]:
+        """启动一个Xvfb进程，等待其socket就绪；启动失败返回None"""
+        xvfb = shutil.which('Xvfb')
+        if not xvfb:
+            raise RuntimeError("未找到Xvfb可执行文件，请先安装xvfb或切换到headless执行模式")
+        width, height = self.size
+        process = subprocess.Popen(
+            [xvfb, f":{number}", '-screen', '0', f"{width}x{height}x24", '-nolisten', 'tcp', '-ac'],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + startup_timeout
+        while time.time() < deadline:
+            if process.poll() is not None:
+                # 编号冲突等原因导致Xvfb立即退出
+                return None
+            if os.path.exists(f"/tmp/.X11-unix/X{number}"):
+                return process
+            time.sleep(0.05)
+        process.terminate()
+        return None
+
+    def acquire(self) -> str:
+        """
+        分配一个空闲的虚拟显示
+
+        Returns:
+            str: 显示名称，例如 ":99"
+        """
+        self._install_sigterm_handler()
+        with self._lock:
+            for number in range(self.base, self.base + self.max_displays):
+                if number in self._displays or self._display_in_use(number):
+                    continue
+                process = self._start_xvfb(number)
+                if process is None:
+                    continue
+                self._displays[number] = process
+                log_info(f"虚拟显示已分配: :{number} ({self.size[0]}x{self.size[1]})")
+                return f":{number}"
+        raise RuntimeError(f"没有可用的虚拟显示（上限 {self.max_displays} 个）")
+
+    def release(self, display: str):
+        """释放指定的虚拟显示"""
+        try:
+            number = int(str(display).lstrip(':').split('.')[0])
+        except ValueError:
+            return
+        with self._lock:
+            process = self._displays.pop(number, None)
+        if process is None:
+            return
+        try:
+            process.terminate()
+            process.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log_info(f"虚拟显示已释放: :{number}")
+
+    def release_all(self):
+        """释放全部虚拟显示"""
+        for number in list(self._displays.keys()):
+            self.release(f":{number}")
+
+    def active_displays(self) -> List[str]:
+        """获取当前已分配的虚拟显示列表"""
+        with self._lock:
+            return [f":{number}" for number in sorted(self._displays)]
+
+
+# 全局虚拟显示分配器实例
+virtual_display_allocator = VirtualDisplayAllocator()
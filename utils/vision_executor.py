@@ -0,0 +1,144 @@
+import time
+import asyncio
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+from config.ui_config import UIConfig
+from config.logger import log_info
+
+
+class VisionExecutor:
+    """视觉计算执行器 - 将OpenCV等CPU密集型计算放到线程池中执行，避免阻塞事件循环
+
+    多个浏览器在同一个 asyncio.gather 中并发时，任何一次同步的 matchTemplate/GaussianBlur
+    都会冻结所有浏览器的Playwright通信。OpenCV在计算期间会释放GIL，放到线程池后
+    各浏览器的识别可以真正并行。支持按任务限流并统计排队/执行耗时。
+    """
+
+    def __init__(self, max_workers: int = None, per_task_limit: int = None):
+        self.max_workers = max_workers or UIConfig.VISION_EXECUTOR_WORKERS
+        self.per_task_limit = max(1, per_task_limit or UIConfig.VISION_PER_TASK_LIMIT)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='vision')
+        # 每个事件循环各自维护按任务划分的信号量（asyncio信号量与事件循环绑定）
+        self._task_semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self._metrics_lock = threading.Lock()
+        self._metrics = self._empty_metrics()
+        log_info(f"创建VisionExecutor: 线程数 {self.max_workers}, 单任务并发上限 {self.per_task_limit}")
+
+    @staticmethod
+    def _empty_metrics() -> Dict[str, Any]:
+        return {
+            'calls': 0,
+            'failures': 0,
+            'total_queue_time': 0.0,
+            'max_queue_time': 0.0,
+            'total_run_time': 0.0,
+            'max_run_time': 0.0,
+            'by_task': {},
+        }
+
+    def _get_task_semaphore(self, task_id: str) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        semaphores = self._task_semaphores.get(loop)
+        if semaphores is None:
+            semaphores = {}
+            self._task_semaphores[loop] = semaphores
+        semaphore = semaphores.get(task_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(self.per_task_limit)
+            semaphores[task_id] = semaphore
+        return semaphore
+
+    def _record(self, task_id: str, name: str, queue_time: float, run_time: float, failed: bool):
+        with self._metrics_lock:
+            metrics = self._metrics
+            metrics['calls'] += 1
+            metrics['failures'] += int(failed)
+            metrics['total_queue_time'] += queue_time
+            metrics['max_queue_time'] = max(metrics['max_queue_time'], queue_time)
+            metrics['total_run_time'] += run_time
+            metrics['max_run_time'] = max(metrics['max_run_time'], run_time)
+            task_metrics = metrics['by_task'].setdefault(task_id, {
+                'calls': 0, 'total_queue_time': 0.0, 'total_run_time': 0.0, 'by_function': {}
+            })
+            task_metrics['calls'] += 1
+            task_metrics['total_queue_time'] += queue_time
+            task_metrics['total_run_time'] += run_time
+            task_metrics['by_function'][name] = task_metrics['by_function'].get(name, 0) + 1
+
+    async def run(self, func: Callable, *args, task_id: str = None, **kwargs) -> Any:
+        """
+        在线程池中执行同步函数并等待结果
+
+        Args:
+            func: 同步的CPU密集型函数
+            *args: 位置参数
+            task_id: 任务ID，用于按任务限流和统计
+            **kwargs: 关键字参数
+
+        Returns:
+            func 的返回值；func 抛出的异常会原样抛出
+        """
+        task_id = task_id or 'default'
+        name = getattr(func, '__name__', repr(func))
+        submitted = time.perf_counter()
+        timing = {'started': submitted, 'finished': submitted}
+
+        def _invoke():
+            timing['started'] = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timing['finished'] = time.perf_counter()
+
+        failed = False
+        async with self._get_task_semaphore(task_id):
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self._pool, _invoke)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                # 排队时间包含等待本任务信号量与等待线程池空闲两部分
+                queue_time = max(0.0, timing['started'] - submitted)
+                run_time = max(0.0, timing['finished'] - timing['started'])
+                self._record(task_id, name, queue_time, run_time, failed)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """获取执行统计信息（秒）"""
+        with self._metrics_lock:
+            metrics = self._metrics
+            calls = metrics['calls']
+            return {
+                'max_workers': self.max_workers,
+                'per_task_limit': self.per_task_limit,
+                'calls': calls,
+                'failures': metrics['failures'],
+                'avg_queue_time': metrics['total_queue_time'] / calls if calls else 0.0,
+                'max_queue_time': metrics['max_queue_time'],
+                'avg_run_time': metrics['total_run_time'] / calls if calls else 0.0,
+                'max_run_time': metrics['max_run_time'],
+                'by_task': {
+                    task_id: {
+                        'calls': task['calls'],
+                        'avg_queue_time': task['total_queue_time'] / task['calls'],
+                        'avg_run_time': task['total_run_time'] / task['calls'],
+                        'by_function': dict(task['by_function']),
+                    }
+                    for task_id, task in metrics['by_task'].items()
+                },
+            }
+
+    def reset_metrics(self):
+        """重置统计信息"""
+        with self._metrics_lock:
+            self._metrics = self._empty_metrics()
+
+    def shutdown(self, wait: bool = True):
+        """关闭线程池"""
+        self._pool.shutdown(wait=wait)
+
+
+# 全局视觉计算执行器实例
+vision_executor = VisionExecutor()
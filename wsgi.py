@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WSGI入口（生产环境）
+供 gunicorn / waitress 等WSGI服务器加载，推荐通过 scripts/serve.py 启动：
+    python scripts/serve.py --workers 4
+也可直接使用服务器命令：
+    gunicorn -w 4 -k gthread --threads 8 -b 0.0.0.0:5000 wsgi:app
+    waitress-serve --listen=0.0.0.0:5000 wsgi:app
+
+运行中的测试、取消标志和监督者租约保存在共享运行状态（utils/run_registry.py）中，各 worker 均可查询和取消任意运行。
+"""
+
+from app import create_app
+
+app = create_app()